@@ -2,17 +2,67 @@
 # Версия 2.0
 # Общий класс для работы с xml-rpc
 import sys
+import http.client
 import xmlrpc.client as rpc
 from xml.parsers.expat import ExpatError
 
 
+class KeepAliveConnection(http.client.HTTPConnection):
+    """
+    HTTP/1.1 соединение с раздельными таймаутами:
+    connect_timeout - на установку TCP-соединения, read_timeout - на ожидание ответа UTM.
+    """
+    def __init__(self, host, connect_timeout, read_timeout):
+        super().__init__(host, timeout=connect_timeout)
+        self.read_timeout = read_timeout
+
+    def connect(self):
+        super().connect()
+        self.sock.settimeout(self.read_timeout)
+
+
+class UtmTransport(rpc.Transport):
+    """
+    Транспорт xml-rpc, использующий одно постоянное соединение HTTP/1.1 (keep-alive) для всех запросов.
+    Если UTM закрыл простаивающее соединение, транспорт переподключается и повторяет запрос один раз.
+    """
+    stale_errors = (
+        http.client.RemoteDisconnected,
+        http.client.CannotSendRequest,
+        http.client.ResponseNotReady,
+        ConnectionResetError,
+        ConnectionAbortedError,
+        BrokenPipeError,
+    )
+
+    def __init__(self, connect_timeout=10, read_timeout=300):
+        super().__init__()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        self._connection = host, KeepAliveConnection(chost, self.connect_timeout, self.read_timeout)
+        return self._connection[1]
+
+    def request(self, host, handler, request_body, verbose=False):
+        try:
+            return self.single_request(host, handler, request_body, verbose)
+        except self.stale_errors:
+            self.close()
+        return self.single_request(host, handler, request_body, verbose)
+
+
 class UTM:
-    def __init__(self, server_ip, login, password):
+    def __init__(self, server_ip, login, password, connect_timeout=10, read_timeout=300):
         self._login = login
         self._password = password
         self._url = f'http://{server_ip}:4040/rpc'
         self._auth_token = None
         self._server = None
+        self._transport = UtmTransport(connect_timeout, read_timeout)
         self.version = None
         self.server_ip = server_ip
         self.node_name = None
@@ -20,7 +70,7 @@ class UTM:
     def connect(self):
         """Подключиться к UTM"""
         try:
-            self._server = rpc.ServerProxy(self._url, verbose=False)
+            self._server = rpc.ServerProxy(self._url, transport=self._transport, verbose=False)
             if self.get_node_status() == 'work':
                 result = self._server.v2.core.login(self._login, self._password, {'origin': 'dev-script'})
                 self._auth_token = result.get('auth_token')
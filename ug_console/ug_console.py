@@ -22,6 +22,8 @@
 #--------------------------------------------------------------------------------------------------- 
 #
 import os, sys
+import zipfile
+import tempfile
 import console_classes as cc
 import config_style as cs
 from PyQt6.QtGui import QFont, QPalette
@@ -36,6 +38,7 @@ class MainWindow(QMainWindow):
         self._connect_actions()
         self.setWindowTitle("Консоль")
         self.base_path = ""
+        self.bundle_dir = None          # Временный каталог с распакованным архивом конфигурации
 
         self.settings = QWidget()
         self.settings.setContentsMargins(0, 0, 0, 0)
@@ -69,6 +72,7 @@ class MainWindow(QMainWindow):
         menu_bar = self.menuBar()
         file_menu = menu_bar.addMenu("Файл")
         self.open_config_action = file_menu.addAction("Загрузить конфигурацию")
+        self.open_bundle_action = file_menu.addAction("Загрузить конфигурацию из архива")
         self.save_config_action = file_menu.addAction("Сохранить конфигурацию")
         file_menu.addSeparator()
         self.exit_action = file_menu.addAction("Выход", self.close)
@@ -78,6 +82,7 @@ class MainWindow(QMainWindow):
     def _connect_actions(self):
         # Menu actions
         self.open_config_action.triggered.connect(self.load_config_data)
+        self.open_bundle_action.triggered.connect(self.load_config_bundle)
         self.save_config_action.triggered.connect(self.save_config_data)
 
     def load_config_data(self):
@@ -88,6 +93,32 @@ class MainWindow(QMainWindow):
         print("Загружаем конфигурацию...")
         self.base_path = QFileDialog.getExistingDirectory(self, directory="~")
         print(self.base_path)
+        self._read_config_sections()
+
+    def load_config_bundle(self):
+        """
+        Выбираем архив конфигурации (один файл zip, см. UG_EXPORT_BUNDLE в ug_convert_config). Архив читается
+        одним файлом и распаковывается во временный каталог на локальном диске, дальше работаем с ним как с каталогом.
+        """
+        print("Загружаем конфигурацию из архива...")
+        file_name, _ = QFileDialog.getOpenFileName(self, directory="~", filter="Архив конфигурации (*.zip)")
+        if not file_name:
+            return
+        if self.bundle_dir:
+            self.bundle_dir.cleanup()
+        self.bundle_dir = tempfile.TemporaryDirectory(prefix="ug_console_")
+        try:
+            with zipfile.ZipFile(file_name) as bundle:
+                bundle.extractall(self.bundle_dir.name, [x for x in bundle.namelist() if x != "bundle.json"])
+        except (OSError, zipfile.BadZipFile) as err:
+            print("Ошибка:", err)
+            return
+        self.base_path = self.bundle_dir.name
+        print(file_name)
+        self._read_config_sections()
+
+    def _read_config_sections(self):
+        """Формируем set() с именами подкаталогов разделов каталога self.base_path и разблокируем пункты дерева разделов"""
         data = set()
         if not os.path.isdir(self.base_path):
             print("Нет каталога с конфигурацией.")
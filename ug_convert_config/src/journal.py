@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+# Версия 1.0
+# Журнал импорта: какие разделы и объекты уже загружены на UTM. Прерванный импорт продолжается с места остановки.
+import os, json
+import time
+import threading
+
+
+class JournalError(Exception): pass
+
+
+class ImportJournal:
+    """
+    Журнал импорта конфигурации на узел - файл, в который дописываются строки json:
+        {"node": имя узла, "host": ip, "started": время}            - заголовок;
+        {"run": [команды]}                                          - запуск импорта разделов;
+        {"section": команда, "kind": вид, "name": имя, "id": id}    - объект загружен (создан или обновлён);
+        {"section": команда, "done": true}                          - раздел импортирован полностью.
+    Каждая запись сразу сбрасывается в файл, а завершение раздела - ещё и на диск (fsync), поэтому после аварийного
+    завершения импорта (fault 104, обрыв сети, UtmError в геттере) в журнале есть всё, что успело загрузиться.
+    Повторный импорт на тот же узел пропускает импортированные разделы и загруженные объекты.
+    Вид объекта (kind) - имя служебного словаря UTM {name: id}: self.services, self.list_IP и т.д.
+    path=None - журнал выключен (экспорт или импорт без журнала).
+    """
+    SYNC_INTERVAL = 1.0         # Не чаще раза в секунду сбрасывать записи объектов на диск (fsync)
+
+    def __init__(self, path=None, node=None, host=None):
+        self.path = path
+        self.sections = set()   # Импортированные разделы
+        self.runs = set()       # Разделы всех запусков импорта, записанных в журнал
+        self.objects = {}       # Загруженные объекты {вид: {имя: id}}
+        self.resumed = False    # Журнал остался от прерванного импорта
+        self._fh = None
+        self._synced = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path is None:
+            return
+        if os.path.isfile(path):
+            self._load(node, host)
+        self._fh = open(path, 'a', encoding='utf-8')
+        if not self.resumed:
+            self._append({'node': node, 'host': host, 'started': time.strftime('%Y-%m-%d %H:%M:%S')}, sync=True)
+
+    def _load(self, node, host):
+        """Прочитать журнал прерванного импорта. Оборванная последняя строка (процесс завершился во время записи) отбрасывается."""
+        with open(self.path, 'rb') as fh:
+            lines = fh.read().split(b'\n')
+        offset = 0
+        records = []
+        for i, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                if i < len(lines) - 1:
+                    raise JournalError(f'Журнал импорта {self.path} повреждён (строка {i + 1}).')
+                break
+            offset += len(line) + 1
+        if offset < sum(len(x) + 1 for x in lines) - 1:
+            with open(self.path, 'r+b') as fh:
+                fh.truncate(offset)
+        if not records:
+            return
+        header = records[0]
+        if (header.get('node'), header.get('host')) != (node, host):
+            raise JournalError(f'Журнал импорта {self.path} относится к узлу {header.get("node")} ({header.get("host")}).\n'
+                               '\tУдалите журнал или укажите другой файл журнала (UG_IMPORT_JOURNAL).')
+        for record in records[1:]:
+            if 'run' in record:
+                self.runs.update(record['run'])
+            elif record.get('done'):
+                self.sections.add(record['section'])
+            elif 'kind' in record:
+                self.objects.setdefault(record['kind'], {})[record['name']] = record['id']
+        self.resumed = True
+
+    def _append(self, record, sync=False):
+        if self._fh is None:
+            return
+        with self._lock:
+            self._fh.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._fh.flush()
+            if sync or time.monotonic() - self._synced > self.SYNC_INTERVAL:
+                os.fsync(self._fh.fileno())
+                self._synced = time.monotonic()
+
+    @property
+    def enabled(self):
+        return self._fh is not None
+
+    def start(self, commands):
+        """Записать запуск импорта разделов commands. Возвращает разделы, которые ещё не импортированы."""
+        if self.enabled:
+            self.runs.update(commands)
+            self._append({'run': list(commands)}, sync=True)
+        return [x for x in commands if x not in self.sections]
+
+    def section(self, command):
+        """
+        Контекст импорта раздела в текущем потоке: объекты, записанные в журнал, относятся к этому разделу.
+        Если раздел завершился без исключения и не сброшен признак complete, он отмечается в журнале как импортированный.
+        """
+        return _Section(self, command)
+
+    def loaded(self, kind, name):
+        """Объект уже загружен прерванным импортом. Пропущенные объекты считаются для итога раздела."""
+        if name in self.objects.get(kind, ()):
+            self._local.skipped = getattr(self._local, 'skipped', 0) + 1
+            return True
+        return False
+
+    def record(self, kind, name, object_id):
+        """Записать в журнал загруженный объект и его id на UTM"""
+        if self.enabled:
+            with self._lock:
+                self.objects.setdefault(kind, {})[name] = object_id
+            self._append({'section': getattr(self._local, 'section', None), 'kind': kind, 'name': name, 'id': object_id})
+
+    def finish(self):
+        """
+        Закрыть журнал после успешного импорта. Если импортированы все разделы всех запусков, журнал удаляется.
+        Возвращает True, если журнал удалён.
+        """
+        self.close()
+        if self.path and self.runs <= self.sections and os.path.isfile(self.path):
+            os.remove(self.path)
+            return True
+        return False
+
+    def close(self):
+        if self._fh is not None:
+            with self._lock:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                self._fh.close()
+                self._fh = None
+
+
+class _Section:
+    def __init__(self, journal, command):
+        self.journal = journal
+        self.command = command
+        self.skipped = 0        # Пропущено объектов, загруженных прерванным импортом
+        self.complete = True    # Раздел импортирован полностью (сбрасывается, если связь с UTM терялась)
+
+    def __enter__(self):
+        local = self.journal._local
+        local.section, local.skipped = self.command, 0
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        local = self.journal._local
+        self.skipped = local.skipped
+        local.section = None
+        if exc_type is None and self.complete and self.journal.enabled:
+            self.journal.sections.add(self.command)
+            self.journal._append({'section': self.command, 'done': True}, sync=True)
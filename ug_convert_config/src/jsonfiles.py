@@ -0,0 +1,446 @@
+#!/usr/bin/python3
+# Версия 1.0
+# Запись и чтение файлов конфигурации в форматах indent (как раньше), compact и gzip.
+# Потоковая запись и чтение списков: элементы пишутся и читаются по одному, без загрузки всего файла в память.
+# Архив конфигурации: весь каталог data в одном файле zip, импорт читает файлы прямо из архива.
+import os, io, json
+import gzip
+import time
+import queue
+import shutil
+import fnmatch
+import zipfile
+import weakref
+import threading
+
+
+FORMATS = ('indent', 'compact', 'gzip')
+GZIP_SUFFIX = '.gz'
+BUNDLE_INDEX = 'bundle.json'
+
+export_format = os.environ.get('UG_EXPORT_FORMAT', 'indent')
+_bundle = None                  # Подключённый архив (mount_bundle) и каталог, который он заменяет
+_bundle_root = None
+
+
+class BundleError(Exception): pass
+
+
+def set_export_format(fmt):
+    """
+    Задать формат файлов экспорта:
+        indent  - JSON с отступами (по умолчанию, файлы как в прежних версиях);
+        compact - JSON без отступов и пробелов;
+        gzip    - compact JSON, сжатый gzip, файл <имя>.json.gz.
+    """
+    global export_format
+    if fmt not in FORMATS:
+        raise ValueError(f'Неизвестный формат экспорта "{fmt}" (допустимо: {", ".join(FORMATS)}).')
+    export_format = fmt
+
+
+def find_json(file_name):
+    """
+    Фактический файл для file_name (путь вида <имя>.json): сам файл или его сжатый вариант <имя>.json.gz.
+    Если нет ни того, ни другого, возвращает file_name (открытие вызовет FileNotFoundError).
+    """
+    if _in_bundle(file_name):
+        return file_name
+    if file_name.endswith(GZIP_SUFFIX) or os.path.isfile(file_name):
+        return file_name
+    if os.path.isfile(file_name + GZIP_SUFFIX):
+        return file_name + GZIP_SUFFIX
+    return file_name
+
+
+def json_exists(file_name):
+    """Есть ли файл file_name или его сжатый вариант"""
+    return os.path.isfile(find_json(file_name))
+
+
+def remove_json(file_name):
+    """Удалить файл file_name и его сжатый вариант"""
+    for name in (file_name, file_name + GZIP_SUFFIX):
+        if os.path.isfile(name):
+            os.remove(name)
+
+
+def open_json(file_name):
+    """Открыть файл конфигурации на чтение (текстовый режим). Сжатый файл распознаётся по сигнатуре gzip."""
+    name = _in_bundle(file_name)
+    if name is not None:
+        return io.TextIOWrapper(_bundle.open(name), encoding='utf-8')
+    file_name = find_json(file_name)
+    with open(file_name, 'rb') as fh:
+        magic = fh.read(2)
+    if magic == b'\x1f\x8b':
+        return gzip.open(file_name, 'rt', encoding='utf-8')
+    return open(file_name, 'r', encoding='utf-8')
+
+
+def load_json(file_name):
+    """Прочитать файл конфигурации в любом из форматов"""
+    with open_json(file_name) as fh:
+        return json.load(fh)
+
+
+class JsonWriter:
+    """
+    Запись файла конфигурации в текущем формате экспорта. Файл пишется во временный и переименовывается
+    при успешном завершении, файл другого формата с тем же именем удаляется (чтобы импорт не прочитал его дважды).
+    Для списков элементы пишутся по одному методом write() по мере получения, весь список в памяти не собирается:
+        with JsonWriter('data/network_policies/config_firewall_rules.json') as writer:
+            for item in rules:
+                writer.write(item)
+    """
+    def __init__(self, file_name, fmt=None):
+        self.file_name = file_name
+        self.fmt = fmt or export_format
+        if self.fmt not in FORMATS:
+            raise ValueError(f'Неизвестный формат экспорта "{self.fmt}" (допустимо: {", ".join(FORMATS)}).')
+        self.path = file_name + GZIP_SUFFIX if self.fmt == 'gzip' else file_name
+        self.count = 0
+        self._fh = None
+
+    def _dumps(self, data, level=0):
+        if self.fmt == 'indent':
+            text = json.dumps(data, indent=4, ensure_ascii=False)
+            return text.replace('\n', '\n' + ' ' * 4 * level) if level else text
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+    def __enter__(self):
+        self._tmp_name = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        if self.fmt == 'gzip':
+            # Без имени файла и времени в заголовке gzip: одинаковое содержимое даёт одинаковые байты
+            # (на этом основана дедупликация снимков в snapshots.py).
+            self._raw = open(self._tmp_name, 'wb')
+            gz = gzip.GzipFile(filename='', mode='wb', compresslevel=6, fileobj=self._raw, mtime=0)
+            self._fh = io.TextIOWrapper(gz, encoding='utf-8')
+        else:
+            self._raw = None
+            self._fh = open(self._tmp_name, 'w', encoding='utf-8')
+        return self
+
+    def write(self, item):
+        """Записать очередной элемент списка"""
+        if self.count == 0:
+            self._fh.write('[')
+        else:
+            self._fh.write(',')
+        if self.fmt == 'indent':
+            self._fh.write('\n    ')
+        self._fh.write(self._dumps(item, level=1))
+        self.count += 1
+
+    def dump(self, data):
+        """Записать объект целиком (вместо write())"""
+        self._fh.write(self._dumps(data))
+        self.count = None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None and self.count is not None:
+                self._fh.write(('\n]' if self.fmt == 'indent' else ']') if self.count else '[]')
+        finally:
+            try:
+                self._fh.close()
+            finally:
+                if self._raw is not None:
+                    self._raw.close()
+        if exc_type is not None:
+            os.remove(self._tmp_name)
+            return False
+        os.replace(self._tmp_name, self.path)
+        other = self.file_name if self.fmt == 'gzip' else self.file_name + GZIP_SUFFIX
+        if os.path.isfile(other):
+            os.remove(other)
+        return False
+
+
+def dump_json(data, file_name, fmt=None):
+    """Записать объект data в файл конфигурации file_name в текущем формате экспорта"""
+    with JsonWriter(file_name, fmt) as writer:
+        writer.dump(data)
+    return writer.path
+
+
+class JsonArrayReader:
+    """
+    Потоковое чтение файла конфигурации со списком (в любом из форматов): элементы разбираются по одному
+    по мере чтения файла, в памяти находится только текущий кусок файла и ещё не обработанные элементы.
+        data = JsonArrayReader('data/network_policies/config_firewall_rules.json', prefetch=100)
+        if not data:
+            ...    # список пуст
+        for item in data:
+            ...
+    Файл открывается сразу (нет файла - FileNotFoundError). Если prefetch, файл разбирается в отдельном потоке
+    на prefetch элементов вперёд, пока вызывающий код отправляет запросы на UTM. Ошибка разбора файла
+    (json.JSONDecodeError) возникает при получении элемента, на котором она обнаружена.
+    Прочитать элементы можно только один раз.
+    """
+    def __init__(self, file_name, prefetch=0, chunk_size=65536):
+        self.file_name = file_name
+        self.chunk_size = chunk_size
+        self._fh = open_json(file_name)
+        self._items = self._parse(self._fh, chunk_size)
+        if prefetch:
+            self._items = self._prefetch(self._items, prefetch)
+        self._head = []
+
+    @staticmethod
+    def _parse(fh, chunk_size):
+        """Разбор элементов списка из файла fh"""
+        decoder = json.JSONDecoder()
+        buffer, pos, eof = '', 0, False
+        expect = '['       # '[' - начало списка, 'first' - первый элемент или ']', 'value' - элемент, ',' - ',' или ']'
+
+        def more(size):
+            nonlocal buffer, pos, eof
+            data = fh.read(size)
+            buffer = buffer[pos:] + data
+            pos = 0
+            eof = not data
+
+        try:
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+                    pos += 1
+                if pos == len(buffer):
+                    if eof:
+                        raise json.JSONDecodeError('Неожиданный конец файла', buffer, pos)
+                    more(chunk_size)
+                    continue
+                char = buffer[pos]
+                if expect == '[':
+                    if char != '[':
+                        raise json.JSONDecodeError('Файл не содержит список', buffer, pos)
+                    pos += 1
+                    expect = 'first'
+                elif char == ']' and expect in ('first', ','):
+                    return
+                elif expect == ',':
+                    if char != ',':
+                        raise json.JSONDecodeError('Ожидается "," или "]"', buffer, pos)
+                    pos += 1
+                    expect = 'value'
+                else:
+                    try:
+                        item, end = decoder.raw_decode(buffer, pos)
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                        end = len(buffer)
+                    if not eof and (end == len(buffer) or (char in '-0123456789' and buffer[end] not in ',] \t\r\n')):
+                        # Элемент не поместился в буфер (или число разрезано границей куска) - дочитываем файл.
+                        # Буфер растёт вдвое, поэтому большой элемент разбирается за линейное время.
+                        more(max(chunk_size, len(buffer) - pos))
+                        continue
+                    pos = end
+                    expect = ','
+                    yield item
+        finally:
+            fh.close()
+
+    def _prefetch(self, items, size):
+        """
+        Разбирать элементы в отдельном потоке на size элементов вперёд. Поток запускается сразу, чтобы файл
+        разбирался, пока вызывающий код ещё занят запросами к UTM, и завершается, если объект чтения больше не нужен.
+        """
+        buffer = queue.Queue(maxsize=size)
+        stop = threading.Event()
+        end = object()
+
+        def put(value):
+            while not stop.is_set():
+                try:
+                    buffer.put(value, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def worker():
+            try:
+                for item in items:
+                    if not put((item, None)):
+                        return
+                put((end, None))
+            except Exception as err:
+                put((end, err))
+            finally:
+                items.close()
+
+        def read():
+            try:
+                while True:
+                    item, err = buffer.get()
+                    if item is end:
+                        if err:
+                            raise err
+                        return
+                    yield item
+            finally:
+                stop.set()
+
+        weakref.finalize(self, stop.set)
+        threading.Thread(target=worker, name='JsonArrayReader', daemon=True).start()
+        return read()
+
+    def __bool__(self):
+        """Есть ли в списке элементы (первый элемент читается заранее)"""
+        if not self._head:
+            for item in self._items:
+                self._head.append(item)
+                break
+        return bool(self._head)
+
+    def __iter__(self):
+        yield from self._head
+        self._head.clear()
+        yield from self._items
+
+    def close(self):
+        """Прекратить чтение файла"""
+        self._items.close()
+
+
+class Bundle:
+    """
+    Архив конфигурации (zip): все файлы каталога data в одном файле и индекс bundle.json (узел, версия UTM,
+    дата и список файлов с размерами). Сжатые файлы <имя>.json.gz хранятся в архиве как <имя>.json - архив сжимает их сам.
+    """
+    def __init__(self, path):
+        self.path = path
+        try:
+            self._zip = zipfile.ZipFile(path)
+        except (OSError, zipfile.BadZipFile) as err:
+            raise BundleError(f'Ошибка чтения архива {path}: {err}')
+        self.files = set()
+        self.dirs = {''}
+        for name in self._zip.namelist():
+            if name.endswith('/'):
+                self.dirs.add(name.rstrip('/'))
+            elif name != BUNDLE_INDEX:
+                self.files.add(name)
+            parts = name.rstrip('/').split('/')
+            self.dirs.update('/'.join(parts[:i]) for i in range(1, len(parts)))
+        try:
+            self.index = json.loads(self._zip.read(BUNDLE_INDEX))
+        except KeyError:
+            self.index = {}
+        except ValueError as err:
+            raise BundleError(f'Ошибка чтения индекса архива {path}: {err}')
+
+    def isfile(self, name):
+        return name in self.files
+
+    def isdir(self, name):
+        return name in self.dirs
+
+    def listdir(self, name):
+        """Имена файлов и каталогов в каталоге name архива"""
+        if name not in self.dirs:
+            raise FileNotFoundError(f'Нет каталога {name} в архиве {self.path}')
+        prefix = f'{name}/' if name else ''
+        return sorted({x[len(prefix):].split('/')[0] for x in self.files | self.dirs if x.startswith(prefix) and x != name})
+
+    def open(self, name):
+        """Открыть файл архива на чтение (двоичный режим)"""
+        if name not in self.files:
+            raise FileNotFoundError(f'Нет файла {name} в архиве {self.path}')
+        return self._zip.open(name)
+
+    def close(self):
+        self._zip.close()
+
+
+def make_bundle(data_dir, bundle_path, exclude=('*.tmp',), info=None):
+    """
+    Упаковать каталог data_dir в архив конфигурации bundle_path (см. Bundle). Архив пишется во временный файл
+    и переименовывается по завершении. info - дополнительные сведения для индекса. Возвращает индекс архива.
+    """
+    if not os.path.isdir(data_dir):
+        raise BundleError(f'Нет каталога {data_dir}.')
+    files = {}
+    tmp_name = f'{bundle_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with zipfile.ZipFile(tmp_name, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as zf:
+            for root, dirs, names in os.walk(data_dir):
+                dirs.sort()
+                rel_root = os.path.relpath(root, data_dir).replace(os.sep, '/')
+                if not dirs and not names and root != data_dir:
+                    zf.writestr(f'{rel_root}/', b'')
+                for name in sorted(names):
+                    if any(fnmatch.fnmatch(name, x) for x in exclude):
+                        continue
+                    file_name = os.path.join(root, name)
+                    arc_name = name if rel_root == '.' else f'{rel_root}/{name}'
+                    if name.endswith(f'.json{GZIP_SUFFIX}'):
+                        arc_name = arc_name[:-len(GZIP_SUFFIX)]
+                        with gzip.open(file_name, 'rb') as src, zf.open(arc_name, 'w') as dst:
+                            shutil.copyfileobj(src, dst, 1024 * 1024)
+                    else:
+                        zf.write(file_name, arc_name)
+                    files[arc_name] = zf.getinfo(arc_name).file_size
+            index = {'format': 1, 'created': time.strftime('%Y-%m-%d %H:%M:%S'), **(info or {}), 'files': files}
+            zf.writestr(BUNDLE_INDEX, json.dumps(index, indent=4, ensure_ascii=False))
+        os.replace(tmp_name, bundle_path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+    return index
+
+
+def mount_bundle(path, root='data'):
+    """
+    Читать файлы каталога root из архива path: load_json, JsonArrayReader, is_dir, list_dir и read_file
+    для путей root/... обращаются к архиву, а не к файловой системе. Возвращает Bundle.
+    """
+    global _bundle, _bundle_root
+    bundle = Bundle(path)
+    unmount_bundle()
+    _bundle, _bundle_root = bundle, os.path.normpath(root).replace(os.sep, '/')
+    return bundle
+
+
+def unmount_bundle():
+    """Отключить архив, подключённый mount_bundle"""
+    global _bundle, _bundle_root
+    if _bundle:
+        _bundle.close()
+    _bundle = _bundle_root = None
+
+
+def _in_bundle(path):
+    """Имя файла в подключённом архиве для пути path или None, если путь не относится к архиву"""
+    if not _bundle:
+        return None
+    path = os.path.normpath(path).replace(os.sep, '/')
+    if path == _bundle_root:
+        return ''
+    if path.startswith(f'{_bundle_root}/'):
+        return path[len(_bundle_root) + 1:]
+    return None
+
+
+def is_dir(path):
+    """os.path.isdir с учётом подключённого архива"""
+    name = _in_bundle(path)
+    return os.path.isdir(path) if name is None else _bundle.isdir(name)
+
+
+def list_dir(path):
+    """os.listdir с учётом подключённого архива"""
+    name = _in_bundle(path)
+    return os.listdir(path) if name is None else _bundle.listdir(name)
+
+
+def read_file(path):
+    """Содержимое файла (bytes) с учётом подключённого архива"""
+    name = _in_bundle(path)
+    if name is None:
+        with open(path, 'rb') as fh:
+            return fh.read()
+    with _bundle.open(name) as fh:
+        return fh.read()
@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+# Версия 1.0
+# Хранилище снимков экспортированной конфигурации (файлы хранятся по хешу содержимого)
+import os, sys, json
+import gzip
+import time
+import fnmatch
+import hashlib
+import argparse
+import threading
+
+
+class SnapshotError(Exception): pass
+
+
+class SnapshotStore:
+    """
+    Хранилище снимков каталога data. Каждый файл конфигурации сохраняется один раз в objects/<xx>/<sha256>.gz
+    (xx - первые два символа хеша), снимок - это небольшой файл snapshots/<узел>/<id>.json со списком
+    {путь файла: хеш}. Файлы, не изменившиеся между снимками (в том числе снимками разных узлов), не дублируются.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def _object_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], f'{digest}.gz')
+
+    def _node_path(self, node):
+        if not node or node.startswith('.') or os.sep in node or (os.altsep and os.altsep in node):
+            raise SnapshotError(f'Недопустимое имя узла "{node}".')
+        return os.path.join(self.path, 'snapshots', node)
+
+    def _manifest_path(self, node, snapshot_id):
+        if os.sep in snapshot_id or (os.altsep and os.altsep in snapshot_id):
+            raise SnapshotError(f'Недопустимый id снимка "{snapshot_id}".')
+        return os.path.join(self._node_path(node), f'{snapshot_id}.json')
+
+    @staticmethod
+    def _write_atomic(file_name, data, opener=open):
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        tmp_name = f'{file_name}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with opener(tmp_name, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_name, file_name)
+
+    def put(self, data):
+        """Сохранить содержимое файла. Возвращает хеш и признак того, что такого содержимого в хранилище ещё не было."""
+        digest = hashlib.sha256(data).hexdigest()
+        file_name = self._object_path(digest)
+        if os.path.isfile(file_name):
+            return digest, False
+        self._write_atomic(file_name, data, opener=lambda name, mode: gzip.open(name, mode, compresslevel=6))
+        return digest, True
+
+    def get(self, digest):
+        """Содержимое файла по хешу. Содержимое проверяется по хешу."""
+        try:
+            with gzip.open(self._object_path(digest), 'rb') as fh:
+                data = fh.read()
+        except (OSError, EOFError) as err:
+            raise SnapshotError(f'Ошибка чтения объекта {digest}: {err}')
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise SnapshotError(f'Объект {digest} повреждён.')
+        return data
+
+    def save(self, node, data_dir='data', exclude=('*.tmp',), info=None):
+        """
+        Сохранить снимок каталога data_dir узла node. exclude - шаблоны имён файлов, которые не сохраняются.
+        info - дополнительные сведения для манифеста (версия UTM и т.п.).
+        Возвращает манифест снимка (id, число файлов, число новых объектов и их объём).
+        """
+        if not os.path.isdir(data_dir):
+            raise SnapshotError(f'Нет каталога {data_dir}.')
+        files = {}
+        empty_dirs = []
+        new_objects = new_bytes = size = 0
+        for root, dirs, names in os.walk(data_dir):
+            dirs.sort()
+            if not dirs and not names and root != data_dir:
+                empty_dirs.append(os.path.relpath(root, data_dir).replace(os.sep, '/'))
+            for name in sorted(names):
+                if any(fnmatch.fnmatch(name, x) for x in exclude):
+                    continue
+                file_name = os.path.join(root, name)
+                with open(file_name, 'rb') as fh:
+                    data = fh.read()
+                digest, new = self.put(data)
+                files[os.path.relpath(file_name, data_dir).replace(os.sep, '/')] = digest
+                size += len(data)
+                if new:
+                    new_objects += 1
+                    new_bytes += len(data)
+
+        snapshot_id = time.strftime('%Y%m%d-%H%M%S')
+        suffix = 1
+        while os.path.exists(self._manifest_path(node, snapshot_id)):
+            suffix += 1
+            snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        manifest = {
+            'id': snapshot_id,
+            'node': node,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            **(info or {}),
+            'size': size,
+            'new_objects': new_objects,
+            'new_bytes': new_bytes,
+            'files': files,
+            'empty_dirs': empty_dirs,
+        }
+        self._write_atomic(self._manifest_path(node, snapshot_id), json.dumps(manifest, indent=4, ensure_ascii=False).encode('utf-8'))
+        return manifest
+
+    def nodes(self):
+        """Узлы, для которых есть снимки"""
+        path = os.path.join(self.path, 'snapshots')
+        return sorted(x for x in os.listdir(path) if os.path.isdir(os.path.join(path, x))) if os.path.isdir(path) else []
+
+    def list(self, node):
+        """id снимков узла node, от старых к новым"""
+        path = self._node_path(node)
+        if not os.path.isdir(path):
+            return []
+        return sorted(x[:-5] for x in os.listdir(path) if x.endswith('.json'))
+
+    def manifest(self, node, snapshot_id=None):
+        """Манифест снимка snapshot_id узла node (по умолчанию - последнего)"""
+        if snapshot_id is None:
+            snapshots = self.list(node)
+            if not snapshots:
+                raise SnapshotError(f'Нет снимков узла {node}.')
+            snapshot_id = snapshots[-1]
+        try:
+            with open(self._manifest_path(node, snapshot_id), 'r') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise SnapshotError(f'Нет снимка {snapshot_id} узла {node}.')
+
+    def restore(self, node, snapshot_id=None, data_dir='data'):
+        """
+        Восстановить снимок узла в каталог data_dir в той структуре, которую читает импорт.
+        Каталог data_dir должен быть пустым или отсутствовать. Возвращает манифест снимка.
+        """
+        manifest = self.manifest(node, snapshot_id)
+        if os.path.isdir(data_dir) and os.listdir(data_dir):
+            raise SnapshotError(f'Каталог {data_dir} не пуст.')
+        for rel_path in [*manifest['files'], *manifest.get('empty_dirs', [])]:
+            path = os.path.normpath(os.path.join(data_dir, rel_path))
+            if os.path.isabs(rel_path) or os.path.relpath(path, data_dir).startswith('..'):
+                raise SnapshotError(f'Недопустимый путь {rel_path} в снимке {manifest["id"]}.')
+        for rel_path in manifest.get('empty_dirs', []):
+            os.makedirs(os.path.join(data_dir, rel_path), exist_ok=True)
+        for rel_path, digest in manifest['files'].items():
+            file_name = os.path.join(data_dir, rel_path)
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+            with open(file_name, 'wb') as fh:
+                fh.write(self.get(digest))
+        return manifest
+
+    def prune(self, node, keep):
+        """Удалить старые снимки узла, оставить keep последних. Возвращает id удалённых снимков."""
+        snapshots = self.list(node)
+        removed = snapshots[:-keep] if keep > 0 else snapshots
+        for snapshot_id in removed:
+            os.remove(self._manifest_path(node, snapshot_id))
+        return removed
+
+    def gc(self):
+        """
+        Удалить объекты, на которые не ссылается ни один снимок. Возвращает число удалённых объектов и их объём.
+        Не запускать одновременно с save: объект, уже найденный save в хранилище, может быть удалён до записи манифеста.
+        """
+        used = set()
+        for node in self.nodes():
+            for snapshot_id in self.list(node):
+                used.update(self.manifest(node, snapshot_id)['files'].values())
+        removed = freed = 0
+        objects = os.path.join(self.path, 'objects')
+        for root, _, names in os.walk(objects):
+            for name in names:
+                if name.endswith('.gz') and name[:-3] not in used:
+                    file_name = os.path.join(root, name)
+                    freed += os.path.getsize(file_name)
+                    os.remove(file_name)
+                    removed += 1
+        return removed, freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Снимки экспортированной конфигурации UTM.')
+    parser.add_argument('--store', default=os.environ.get('UG_SNAPSHOT_STORE', 'snapshots'),
+                        help='каталог хранилища (по умолчанию $UG_SNAPSHOT_STORE или ./snapshots)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    cmd = commands.add_parser('save', help='сохранить снимок каталога data')
+    cmd.add_argument('node', help='имя узла')
+    cmd.add_argument('--data', default='data', help='каталог конфигурации (по умолчанию ./data)')
+    cmd = commands.add_parser('list', help='список снимков')
+    cmd.add_argument('node', nargs='?', help='имя узла (по умолчанию - все узлы)')
+    cmd = commands.add_parser('restore', help='восстановить снимок в каталог data')
+    cmd.add_argument('node', help='имя узла')
+    cmd.add_argument('snapshot', nargs='?', help='id снимка (по умолчанию - последний)')
+    cmd.add_argument('--data', default='data', help='каталог для восстановления (должен быть пустым)')
+    cmd = commands.add_parser('prune', help='удалить старые снимки и неиспользуемые объекты')
+    cmd.add_argument('node', nargs='?', help='имя узла (по умолчанию - все узлы)')
+    cmd.add_argument('--keep', type=int, default=30, help='сколько последних снимков оставить (по умолчанию 30)')
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.store)
+    try:
+        if args.command == 'save':
+            manifest = store.save(args.node, args.data)
+            print(f"Снимок {manifest['id']} узла {args.node}: файлов {len(manifest['files'])}, "
+                  f"новых {manifest['new_objects']} ({manifest['new_bytes'] / 1024:.1f} КБ из {manifest['size'] / 1024:.1f} КБ).")
+        elif args.command == 'list':
+            for node in [args.node] if args.node else store.nodes():
+                print(f'{node}:')
+                for snapshot_id in store.list(node):
+                    manifest = store.manifest(node, snapshot_id)
+                    print(f"\t{snapshot_id:<20} {manifest.get('version', ''):<18} файлов {len(manifest['files']):>6}  "
+                          f"{manifest['size'] / 1024:>10.1f} КБ  новых {manifest['new_bytes'] / 1024:>10.1f} КБ")
+        elif args.command == 'restore':
+            manifest = store.restore(args.node, args.snapshot, args.data)
+            print(f"Снимок {manifest['id']} узла {args.node} восстановлен в каталог {args.data}.")
+        elif args.command == 'prune':
+            for node in [args.node] if args.node else store.nodes():
+                removed = store.prune(node, args.keep)
+                if removed:
+                    print(f'{node}: удалено снимков {len(removed)}.')
+            removed, freed = store.gc()
+            print(f'Удалено объектов: {removed} ({freed / 1024:.1f} КБ).')
+    except SnapshotError as err:
+        print(f'\033[31m{err}\033[0m')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
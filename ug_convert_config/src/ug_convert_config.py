@@ -25,16 +25,66 @@
 # или между устройствами 6-ой версии.
 #
 import os, sys
+import time
+import threading
 import stdiomask
 import json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import xmlrpc.client as rpc
 from utm import UtmXmlRpc, UtmError, character_map
+from snapshots import SnapshotStore, SnapshotError
+from journal import ImportJournal, JournalError
+from jsonfiles import JsonWriter, JsonArrayReader, dump_json, load_json, json_exists, remove_json
+from jsonfiles import BundleError, make_bundle, mount_bundle, unmount_bundle, is_dir, list_dir, read_file
+
+
+# Поля, которые UTM заполняет сам. Не учитываются при сравнении объектов в режиме импорта только изменений.
+DIFF_IGNORED = {'id', 'guid', 'cc', 'version', 'last_update', 'rownumber', 'position_layer', 'deleted_users'}
+
+def same_config(new, current):
+    """
+    Проверить, что объект из файла конфигурации не отличается от объекта на UTM.
+    Сравниваются только поля, которые есть в файле, поля из DIFF_IGNORED пропускаются.
+    """
+    if isinstance(new, dict):
+        if not isinstance(current, dict):
+            return False
+        return all(k in current and same_config(v, current[k]) for k, v in new.items() if k not in DIFF_IGNORED)
+    if isinstance(new, (list, tuple)):
+        if not isinstance(current, (list, tuple)) or len(new) != len(current):
+            return False
+        return all(same_config(x, y) for x, y in zip(new, current))
+    return new == current
+
+def chunks(iterable, size):
+    """Разбить поток записей на списки по size записей"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def all_but_last(iterable):
+    """Поток записей без последней записи"""
+    iterator = iter(iterable)
+    for previous in iterator:
+        for item in iterator:
+            yield previous
+            previous = item
+        return
+
+# Состояние прошлого экспорта (инкрементальный экспорт): версии выгруженных списков и шаблонов.
+EXPORT_STATE = 'data/export_state.json'
 
 
 class UTM(UtmXmlRpc):
     def __init__(self, server_ip, login, password):
         super().__init__(server_ip, login, password)
-        self._categories = {}           # Список Категорий URL {id: name} для экспорта и {name: id} для импорта
+        self._catalogs = {}             # Справочники UTM (категории URL, категории и приложения L7), загружаются при первом обращении
+        self._catalogs_for_import = False   # Справочники {id: name} для экспорта или {name: id} для импорта
         self.zones = {}                 # Список зон {id: name} для экспорта и {name: id} для импорта
         self.services = {}              # Список сервисов раздела библиотеки {id: name} для экспорта и {name: id} для импорта
         self.shaper = {}                # Список полос пропускания раздела библиотеки {name: id}
@@ -48,8 +98,6 @@ class UTM(UtmXmlRpc):
         self.list_templates = {}        # Списки шаблонов страниц раздела библиотеки  {name: id}
         self.list_urlcategorygroup = {} # Список групп категорий URL раздела библиотеки {id: name} для экспорта и {name: id} для импорта
         self.list_applicationgroup = {} # Список групп приложений раздела библиотеки {id: name} для экспорта и {name: id} для импорта
-        self.l7_categories = {}         # Список L7 категорий
-        self.l7_apps = {}               # Список L7 приложений
         self.list_notifications = {}    # Список профилей оповещения {id: name} для экспорта и {name: id} для импорта
         self.list_netflow = {}          # Список профилей netflow {name: id}
         self.list_ssl_profiles = {}     # Список профилей ssl {name: id}
@@ -70,6 +118,11 @@ class UTM(UtmXmlRpc):
         self.tcpudp_rules = {}
         self.icap_loadbalancing = {}
         self.reverse_rules = {}
+        self.diff_import = False        # Импорт только изменений: объекты, которые не отличаются от UTM, пропускаются
+        self.incremental_export = False # Экспорт только изменений: не изменившиеся с прошлого экспорта списки не выгружаются
+        self.export_state = {}          # Состояние экспорта {вид: {id: {'stamp': [version, last_update], 'name': имя}}}
+        self._state_lock = threading.Lock()
+        self.journal = ImportJournal()  # Журнал импорта: загруженные разделы и объекты (см. open_journal)
         self.default_url_category = {
             'Parental Control': 'URL_CATEGORY_GROUP_PARENTAL_CONTROL',
             'Productivity': 'URL_CATEGORY_GROUP_PRODUCTIVITY',
@@ -83,56 +136,49 @@ class UTM(UtmXmlRpc):
     def init_struct_for_export(self):
         """Заполнить служебные структуры данных"""
         trans_table = str.maketrans(character_map)
+        self._catalogs.clear()
+        self._catalogs_for_import = False
+        batch = self.batch()
+        batch.add('v2.nlists.list', self._auth_token, 'network', 0, 5000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'mime', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'url', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'timerestrictiongroup', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'urlcategorygroup', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'applicationgroup', 0, 1000, {})
+        batch.add('v3.accounts.groups.list', self._auth_token, 0, 1000, {})
+        batch.add('v1.auth.user.auth.profiles.list', self._auth_token)
+        batch.add('v1.notification.profiles.list', self._auth_token)
+        batch.add('v1.captiveportal.profiles.list', self._auth_token, 0, 100, '')
         try:
-            result = self._server.v2.core.get.categories()
-            self._categories = {x['id']: x['name'] for x in result}
-            
-            result = self._server.v2.core.get.l7categories(self._auth_token, 0, 10000, '')
-            self.l7_categories = {x['id']: x['name'] for x in result['items'] if result['count']}
-            
-            if self.version.startswith('6'):
-                result = self._server.v2.core.get.l7apps(self._auth_token, 0, 10000, {}, [])
-            else:
-                result = self._server.v2.core.get.l7apps(self._auth_token, 0, 10000, '')
-            self.l7_apps = {x['id'] if 'id' in x.keys() else x['app_id']: x['name'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'network', 0, 5000, {})
-            self.list_IP = {x['id']: x['name'].strip().translate(trans_table) for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'mime', 0, 1000, {})
-            self.list_mime = {x['id']: x['name'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'url', 0, 1000, {})
-            self.list_url = {x['id']: x['name'].strip().translate(trans_table) for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'timerestrictiongroup', 0, 1000, {})
-            self.list_calendar = {x['id']: x['name'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'urlcategorygroup', 0, 1000, {})
-            self.list_urlcategorygroup = {x['id']: self.default_url_category.get(x['name'], x['name']) for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'applicationgroup', 0, 1000, {})
-            self.list_applicationgroup = {x['id']: x['name'] for x in result['items'] if result['count']}
-
-            result = self._server.v3.accounts.groups.list(self._auth_token, 0, 1000, {})
-            self.list_groups = {x['guid']: x['name'] for x in result['items'] if result['total']}
-
-            result = self._server.v1.auth.user.auth.profiles.list(self._auth_token)
-            self.auth_profiles = {x['id']: x['name'] for x in result}
-            
-            result = self._server.v1.notification.profiles.list(self._auth_token)
-            self.list_notifications = {x['id']: x['name'] for x in result}
-
-            result = self._server.v1.captiveportal.profiles.list(self._auth_token, 0, 100, '')
-            self.captive_profiles = {x['id']: x['name'] for x in result['items']}
+            results = []
+            for err, result in batch.execute():
+                if err:
+                    raise result
+                results.append(result)
+            (nlist_ip, nlist_mime, nlist_url, nlist_calendar, nlist_urlcategorygroup, nlist_applicationgroup,
+             groups, auth_profiles, notifications, captive_profiles) = results
+
+            # Окна запросов batch фиксированные: записи сверх окна дочитываются постранично (batch_items).
+            items = self.batch_items
+            self.list_IP = {x['id']: x['name'].strip().translate(trans_table) for x in items(nlist_ip, 'v2.nlists.list', 'network')}
+            self.list_mime = {x['id']: x['name'] for x in items(nlist_mime, 'v2.nlists.list', 'mime')}
+            self.list_url = {x['id']: x['name'].strip().translate(trans_table) for x in items(nlist_url, 'v2.nlists.list', 'url')}
+            self.list_calendar = {x['id']: x['name'] for x in items(nlist_calendar, 'v2.nlists.list', 'timerestrictiongroup')}
+            self.list_urlcategorygroup = {
+                x['id']: self.default_url_category.get(x['name'], x['name'])
+                    for x in items(nlist_urlcategorygroup, 'v2.nlists.list', 'urlcategorygroup')
+            }
+            self.list_applicationgroup = {x['id']: x['name'] for x in items(nlist_applicationgroup, 'v2.nlists.list', 'applicationgroup')}
+            self.list_groups = {x['guid']: x['name'] for x in items(groups, 'v3.accounts.groups.list')}
+            self.auth_profiles = {x['id']: x['name'] for x in auth_profiles}
+            self.list_notifications = {x['id']: x['name'] for x in notifications}
+            self.captive_profiles = {x['id']: x['name'] for x in items(captive_profiles, 'v1.captiveportal.profiles.list', tail=('',))}
 
         except rpc.Fault as err:
             if err.faultCode == 102:
-                print("\033[31m\tУ вас нет прав для использования API.")
-                print("\tДобавьте необходимые разрешения в профиль администратора.\033[0m\n")
-            else:
-                print(f"\033[31mОшибка ug_convert_config/init_struct_for_export: [{err.faultCode}] {err.faultString}\033[0m")
-            sys.exit(1)
+                raise UtmError("\033[31m\tУ вас нет прав для использования API.\n"
+                               "\tДобавьте необходимые разрешения в профиль администратора.\033[0m\n")
+            raise UtmError(f"\033[31mОшибка ug_convert_config/init_struct_for_export: [{err.faultCode}] {err.faultString}\033[0m")
 
         total, data = self.get_users_list()
         self.list_users = {x['guid']: x['name'] for x in data if total}
@@ -141,7 +187,7 @@ class UTM(UtmXmlRpc):
         self.zones = {x['id']: x['name'] for x in data if total}
 
         total, data = self.get_services_list()
-        self.services = {x['id']: x['name'] for x in data['items'] if total}
+        self.services = {x['id']: x['name'] for x in data if total}
 
         total, data = self.get_templates_list()
         self.list_templates = {x['type'] if x['default'] else x['id']: x['name'] for x in data if total}
@@ -158,76 +204,134 @@ class UTM(UtmXmlRpc):
         total, data = self.get_reverseproxy_servers()
         self.reverse_servers = {x['id']: x['name'] for x in data if total}
 
-    def init_struct_for_import(self):
-        """Заполнить служебные структуры данных"""
-        try:
-            result = self._server.v2.core.get.categories()
-            self._categories = {x['name']: x['id'] for x in result}
-
-            result = self._server.v1.libraries.services.list(self._auth_token, 0, 1000, {}, [])
-            self.services = {x['name']: x['id'] for x in result['items'] if result['total']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'morphology', 0, 1000, {})
-            self.list_morph = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'network', 0, 5000, {})
-            self.list_IP = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'useragent', 0, 1000, {})
-            self.list_useragent = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'mime', 0, 1000, {})
-            self.list_mime = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'url', 0, 1000, {})
-            self.list_url = {x['name']: x['id'] for x in result['items'] if result['count']}
+        self.load_export_state()
 
-            result = self._server.v2.nlists.list(self._auth_token, 'timerestrictiongroup', 0, 1000, {})
-            self.list_calendar = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'urlcategorygroup', 0, 1000, {})
-            self.list_urlcategorygroup = {self.default_url_category.get(x['name'], x['name']): x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.nlists.list(self._auth_token, 'applicationgroup', 0, 1000, {})
-            self.list_applicationgroup = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v2.core.get.l7categories(self._auth_token, 0, 10000, '')
-            self.l7_categories = {x['name']: x['id'] for x in result['items'] if result['count']}
-            
-            if self.version.startswith('6'):
-                result = self._server.v2.core.get.l7apps(self._auth_token, 0, 10000, {}, [])
-            else:
-                result = self._server.v2.core.get.l7apps(self._auth_token, 0, 10000, '')
-            self.l7_apps = {x['name']: x['id'] if 'id' in x.keys() else x['app_id'] for x in result['items'] if result['count']}
-
-            result = self._server.v1.notification.profiles.list(self._auth_token)
-            self.list_notifications = {x['name']: x['id'] for x in result}
-
-            result = self._server.v1.netmanager.netflow.profiles.list(self._auth_token, 0, 1000, {})
-            self.list_netflow = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v1.content.ssl.profiles.list(self._auth_token, 0, 100, {})
-            self.list_ssl_profiles = {x['name']: x['id'] for x in result['items'] if result['count']}
-
-            result = self._server.v3.accounts.groups.list(self._auth_token, 0, 1000, {})
-            self.list_groups = {x['name']: x['guid'] for x in result['items'] if result['total']}
+    def load_export_state(self):
+        """
+        Прочитать состояние прошлого экспорта (EXPORT_STATE) для инкрементального экспорта.
+        Состояние, сохранённое для другого узла или другой версии UTM, не используется.
+        """
+        self.export_state = {}
+        try:
+            with open(EXPORT_STATE, 'r') as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return
+        if state.get('node') == self.node_name and state.get('version') == self.version:
+            self.export_state = state.get('items', {})
+
+    def save_export_state(self):
+        """Записать состояние экспорта. Состояние пишется всегда, чтобы следующий экспорт мог быть инкрементальным."""
+        with self._state_lock:
+            state = {'node': self.node_name, 'version': self.version, 'items': self.export_state}
+            os.makedirs(os.path.dirname(EXPORT_STATE), exist_ok=True)
+            with open(f'{EXPORT_STATE}.tmp', 'w') as fh:
+                json.dump(state, fh, indent=4, ensure_ascii=False)
+            os.replace(f'{EXPORT_STATE}.tmp', EXPORT_STATE)
+
+    def prepare_export_dir(self, path):
+        """Подготовить каталог экспорта. При полном экспорте старые файлы удаляются, при инкрементальном - остаются."""
+        if os.path.isdir(path):
+            if not self.incremental_export:
+                for file_name in os.listdir(path):
+                    os.remove(f"{path}/{file_name}")
+        else:
+            os.makedirs(path, exist_ok=True)
 
-            result = self._server.v1.auth.user.auth.profiles.list(self._auth_token)
-            self.auth_profiles = {x['name']: x['id'] for x in result}
+    def unchanged_items(self, kind, path, ext='json'):
+        """
+        Объекты вида kind, которые не надо выгружать заново при инкрементальном экспорте:
+        {id: (version, last_update)} из состояния прошлого экспорта, если файл объекта path/<имя>.<ext>
+        (или его сжатый вариант <имя>.<ext>.gz) на месте.
+        """
+        if not self.incremental_export:
+            return {}
+        with self._state_lock:
+            items = self.export_state.get(kind, {})
+        return {
+            int(key) if key.isdigit() else key: tuple(value['stamp'])
+                for key, value in items.items() if not ext or json_exists(f"{path}/{value['name']}.{ext}")
+        }
 
-            result = self._server.v1.captiveportal.profiles.list(self._auth_token, 0, 100, '')
-            self.captive_profiles = {x['name']: x['id'] for x in result['items']}
+    def set_export_state(self, kind, path, items, ext='json'):
+        """
+        Запомнить версии выгруженных объектов вида kind: items - {id: (version, last_update, имя)}.
+        Списки, содержимое которых не загрузилось (self.nlist_failures), не запоминаются и выгружаются в следующий раз.
+        При инкрементальном экспорте удаляет из каталога path файлы объектов, которых больше нет на UTM.
+        """
+        failed = self.nlist_failures.get(kind, ())
+        items = {key: value for key, value in items.items() if key not in failed}
+        if self.incremental_export and ext:
+            names = {f'{x[2]}.{ext}' for x in items.values()}
+            with self._state_lock:
+                previous = self.export_state.get(kind, {})
+            for value in previous.values():
+                file_name = f"{value['name']}.{ext}"
+                if file_name not in names:
+                    remove_json(f"{path}/{file_name}")
+        with self._state_lock:
+            self.export_state[kind] = {
+                str(key): {'stamp': [str(x[0]), str(x[1])], 'name': x[2]} for key, x in items.items()
+            }
 
-            result = self._server.v1.captiveportal.rules.list(self._auth_token, 0, 100, {})
-            self.captive_portal_rules = {x['name']: x['id'] for x in result['items']}
+    def init_struct_for_import(self):
+        """Заполнить служебные структуры данных"""
+        self._catalogs.clear()
+        self._catalogs_for_import = True
+        batch = self.batch()
+        batch.add('v1.libraries.services.list', self._auth_token, 0, 1000, {}, [])
+        batch.add('v2.nlists.list', self._auth_token, 'morphology', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'network', 0, 5000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'useragent', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'mime', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'url', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'timerestrictiongroup', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'urlcategorygroup', 0, 1000, {})
+        batch.add('v2.nlists.list', self._auth_token, 'applicationgroup', 0, 1000, {})
+        batch.add('v1.notification.profiles.list', self._auth_token)
+        batch.add('v1.netmanager.netflow.profiles.list', self._auth_token, 0, 1000, {})
+        batch.add('v1.content.ssl.profiles.list', self._auth_token, 0, 100, {})
+        batch.add('v3.accounts.groups.list', self._auth_token, 0, 1000, {})
+        batch.add('v1.auth.user.auth.profiles.list', self._auth_token)
+        batch.add('v1.captiveportal.profiles.list', self._auth_token, 0, 100, '')
+        batch.add('v1.captiveportal.rules.list', self._auth_token, 0, 100, {})
+        try:
+            results = []
+            for err, result in batch.execute():
+                if err:
+                    raise result
+                results.append(result)
+            (services, nlist_morph, nlist_ip, nlist_useragent, nlist_mime, nlist_url, nlist_calendar,
+             nlist_urlcategorygroup, nlist_applicationgroup, notifications, netflow,
+             ssl_profiles, groups, auth_profiles, captive_profiles, captive_portal_rules) = results
+
+            # Окна запросов batch фиксированные: записи сверх окна дочитываются постранично (batch_items).
+            items = self.batch_items
+            self.services = {x['name']: x['id'] for x in items(services, 'v1.libraries.services.list', tail=({}, []))}
+            self.list_morph = {x['name']: x['id'] for x in items(nlist_morph, 'v2.nlists.list', 'morphology')}
+            self.list_IP = {x['name']: x['id'] for x in items(nlist_ip, 'v2.nlists.list', 'network')}
+            self.list_useragent = {x['name']: x['id'] for x in items(nlist_useragent, 'v2.nlists.list', 'useragent')}
+            self.list_mime = {x['name']: x['id'] for x in items(nlist_mime, 'v2.nlists.list', 'mime')}
+            self.list_url = {x['name']: x['id'] for x in items(nlist_url, 'v2.nlists.list', 'url')}
+            self.list_calendar = {x['name']: x['id'] for x in items(nlist_calendar, 'v2.nlists.list', 'timerestrictiongroup')}
+            self.list_urlcategorygroup = {
+                self.default_url_category.get(x['name'], x['name']): x['id']
+                    for x in items(nlist_urlcategorygroup, 'v2.nlists.list', 'urlcategorygroup')
+            }
+            self.list_applicationgroup = {x['name']: x['id'] for x in items(nlist_applicationgroup, 'v2.nlists.list', 'applicationgroup')}
+            self.list_notifications = {x['name']: x['id'] for x in notifications}
+            self.list_netflow = {x['name']: x['id'] for x in items(netflow, 'v1.netmanager.netflow.profiles.list')}
+            self.list_ssl_profiles = {x['name']: x['id'] for x in items(ssl_profiles, 'v1.content.ssl.profiles.list')}
+            self.list_groups = {x['name']: x['guid'] for x in items(groups, 'v3.accounts.groups.list')}
+            self.auth_profiles = {x['name']: x['id'] for x in auth_profiles}
+            self.captive_profiles = {x['name']: x['id'] for x in items(captive_profiles, 'v1.captiveportal.profiles.list', tail=('',))}
+            self.captive_portal_rules = {x['name']: x['id'] for x in items(captive_portal_rules, 'v1.captiveportal.rules.list')}
 
         except rpc.Fault as err:
             if err.faultCode == 102:
-                print("\033[31m\tУ вас нет прав для использования API.")
-                print("\tДобавьте необходимые разрешения в профиль администратора.\033[0m\n")
-            else:
-                print(f"\033[31mОшибка ug_convert_config/init_struct_for_export: [{err.faultCode}] {err.faultString}\033[0m")
-            sys.exit(1)
+                raise UtmError("\033[31m\tУ вас нет прав для использования API.\n"
+                               "\tДобавьте необходимые разрешения в профиль администратора.\033[0m\n")
+            raise UtmError(f"\033[31mОшибка ug_convert_config/init_struct_for_export: [{err.faultCode}] {err.faultString}\033[0m")
 
         total, data = self.get_zones_list()
         self.zones = {x['name']: x['id'] for x in data if total}
@@ -257,6 +361,146 @@ class UTM(UtmXmlRpc):
         total, reverse = self.get_reverseproxy_servers()
         self.reverse_servers = {x['name']: x['id'] for x in reverse if total}
 
+    def _catalog(self, name, getter):
+        """
+        Справочник UTM {id: name} для экспорта или {name: id} для импорта.
+        Загружается при первом обращении (с диска, если справочник есть в кэше, см. UtmXmlRpc.get_cached).
+        """
+        if name not in self._catalogs:
+            _, data = getter()
+            ids = [x['id'] if 'id' in x else x['app_id'] for x in data]
+            if self._catalogs_for_import:
+                self._catalogs[name] = {x['name']: y for x, y in zip(data, ids)}
+            else:
+                self._catalogs[name] = {y: x['name'] for x, y in zip(data, ids)}
+        return self._catalogs[name]
+
+    @property
+    def _categories(self):
+        """Список категорий URL"""
+        return self._catalog('categories', self.get_url_categories)
+
+    @property
+    def l7_categories(self):
+        """Список категорий L7"""
+        return self._catalog('l7_categories', self.get_l7_categories)
+
+    @property
+    def l7_apps(self):
+        """Список приложений L7"""
+        return self._catalog('l7_apps', self.get_l7_apps)
+
+    def refresh_maps(self, names):
+        """
+        Перечитать с UTM служебные словари {name: id} для импорта.
+        names - имена атрибутов (self.list_IP, self.zones и т.д.). Применяется при параллельном импорте
+        перед запуском разделов, которые ссылаются на объекты, созданные предыдущими разделами.
+        """
+        nlists = {
+            'list_morph': 'morphology',
+            'list_IP': 'network',
+            'list_useragent': 'useragent',
+            'list_mime': 'mime',
+            'list_url': 'url',
+            'list_calendar': 'timerestrictiongroup',
+            'list_urlcategorygroup': 'urlcategorygroup',
+            'list_applicationgroup': 'applicationgroup',
+        }
+        getters = {
+            'services': self.get_services_list,
+            'list_notifications': self.get_notification_profiles_list,
+            'list_netflow': self.get_netflow_profiles_list,
+            'list_ssl_profiles': self.get_ssl_profiles_list,
+            'zones': self.get_zones_list,
+            'shaper': self.get_shaper_list,
+            'list_scada': self.get_scada_list,
+            'list_templates': self.get_templates_list,
+            'list_groups': self.get_groups_list,
+            'list_users': self.get_users_list,
+            'profiles_2fa': self.get_2fa_profiles,
+            'auth_profiles': self.get_auth_profiles,
+            'captive_profiles': self.get_captive_profiles,
+            'scenarios_rules': self.get_scenarios_rules,
+            'icap_servers': self.get_icap_servers,
+            'reverse_servers': self.get_reverseproxy_servers,
+        }
+        for name in names:
+            if name in nlists:
+                try:
+                    data = list(self.iter_items('v2.nlists.list', nlists[name]))
+                except rpc.Fault as err:
+                    raise UtmError(f"\033[31mОшибка ug_convert_config/refresh_maps: [{err.faultCode}] — {err.faultString}\033[0m")
+                if name == 'list_urlcategorygroup':
+                    data = [{**x, 'name': self.default_url_category.get(x['name'], x['name'])} for x in data]
+            elif name == 'auth_servers':
+                ldap, radius, tacacs, ntlm, saml = self.get_auth_servers()
+                data = [*ldap, *radius, *tacacs, *ntlm, *saml]
+            else:
+                _, data = getters[name]()
+            if name in ('list_groups', 'list_users'):
+                setattr(self, name, {x['name']: x['guid'] for x in data})
+                if name == 'list_users':
+                    self.list_authlogin = {x['auth_login']: x['guid'] for x in data}
+            else:
+                setattr(self, name, {x['name']: x['id'] for x in data})
+
+    def apply_journal(self):
+        """
+        Дополнить служебные словари {name: id} объектами из журнала прерванного импорта.
+        Словари разделов, импортированных до прерывания, не перечитываются с UTM (см. run_sections).
+        """
+        for kind, objects in self.journal.objects.items():
+            current = getattr(self, kind, None)
+            if isinstance(current, dict):
+                current.update(objects)
+
+    def get_current_nlists(self, list_type):
+        """
+        Для импорта только изменений получить именованные списки, которые уже есть на UTM: {name: список с содержимым}.
+        В обычном режиме импорта возвращает пустой словарь.
+        """
+        if not self.diff_import:
+            return {}
+        _, data = self.get_nlist_list(list_type)
+        return {x['name']: x for x in data}
+
+    def diff_nlist(self, named_list, content, current):
+        """
+        Сравнить именованный список из файла конфигурации со списком на UTM.
+        Возвращает (изменились ли параметры списка, значения из content, которых нет в списке на UTM).
+        """
+        values = {x.get('value') for x in current['content']}
+        return not same_config(named_list, current), [x for x in content if x.get('value') not in values]
+
+    def upload_nlists_content(self, uploads, kind):
+        """
+        Загрузить содержимое именованных списков параллельно, частями (см. UtmXmlRpc.add_nlist_items).
+        uploads - [(имя списка, id списка, значения), ...] или генератор таких записей: следующие списки
+        читаются из файлов, пока загружаются предыдущие, в памяти одновременно не больше 2*self.workers списков.
+        kind - словарь списков {name: id} (list_IP, list_url): список, содержимое которого загружено полностью,
+        записывается в журнал импорта под этим видом.
+        """
+        lists = []
+        def jobs():
+            for name, list_id, content in uploads:
+                lists.append((name, list_id))
+                yield list_id, content
+
+        results = self.add_nlists_items(jobs())
+        for (name, list_id), (err, result) in zip(lists, results):
+            if err in (1, 3):
+                print(f'\tСписок "{name}":', result.lstrip())
+            elif err == 2:
+                print(f'\033[31m\tСодержимое списка "{name}" загружено не полностью.\n{result}\033[0m')
+                continue
+            else:
+                print(f'\tСодержимое списка "{name}" обновлено. Added {result} record.')
+            self.journal.record(kind, name, list_id)
+
+    def print_import_stats(self, stats):
+        """Напечатать итог импорта: сколько объектов создано, обновлено и не изменилось"""
+        print(f"\tСоздано: {stats['created']}, обновлено: {stats['updated']}, без изменений: {stats['unchanged']}.")
+
     def init_struct(self):
         """Заполнить служебные структуры данных. Применяется при экспорте и импорте."""
         pass
@@ -265,19 +509,20 @@ class UTM(UtmXmlRpc):
     def export_morphology_lists(self):
         """Выгружает списки морфологии и преобразует формат атрибутов списков к версии 6"""
         print('Выгружаются списки морфологии раздела "Библиотеки":')
-        if os.path.isdir('data/library/morphology'):
-            for file_name in os.listdir('data/library/morphology'):
-                os.remove(f"data/library/morphology/{file_name}")
-        else:
-            os.makedirs('data/library/morphology')
+        self.prepare_export_dir('data/library/morphology')
 
-        total, data = self.get_nlist_list('morphology')
+        total, data = self.get_nlist_list('morphology', self.unchanged_items('morphology', 'data/library/morphology'))
+        self.set_export_state('morphology', 'data/library/morphology',
+                              {x['id']: (x.get('version'), x.get('last_update'), x['name']) for x in data})
 
         if not data:
             print("\tНет пользовательских списков морфологии для зкспорта.")
             return
 
         for item in data:
+            if item['content'] is None:
+                print(f'\tСписок морфологии "{item["name"]}" не изменился.')
+                continue
             if self.version.startswith('5'):
                 attributes = {}
                 for attr in item['attributes']:
@@ -295,24 +540,24 @@ class UTM(UtmXmlRpc):
             item.pop('last_update')
             for content in item['content']:
                 content.pop('id')
-            with open(f"data/library/morphology/{item['name']}.json", "w") as fd:
-                json.dump(item, fd, indent=4, ensure_ascii=False)
+            dump_json(item, f"data/library/morphology/{item['name']}.json")
             print(f'\tСписок морфологии "{item["name"]}" выгружен в файл "data/library/morphology/{item["name"]}.json"')
 
     def import_morphology(self):
         """Импортировать списки морфологии на UTM"""
         print('Импорт списков морфологии раздела "Библиотеки":')
-        if os.path.isdir('data/library/morphology'):
-            files_list = os.listdir('data/library/morphology')
+        if is_dir('data/library/morphology'):
+            files_list = list_dir('data/library/morphology')
             if files_list:
                 for file_name in files_list:
                     try:
-                        with open(f"data/library/morphology/{file_name}", "r") as fh:
-                            morph_list = json.load(fh)
+                        morph_list = load_json(f"data/library/morphology/{file_name}")
                     except FileNotFoundError as err:
                         print(f'\t\033[31mСписок "Морфология" не импортирован!\n\tНе найден файл "data/library/morphology/{file_name}" с сохранённой конфигурацией!\033[0;0m')
                         return
 
+                    if self.journal.loaded('list_morph', morph_list['name']):
+                        continue
                     content = morph_list.pop('content')
                     err, result = self.add_nlist(morph_list)
                     if err == 1:
@@ -329,13 +574,17 @@ class UTM(UtmXmlRpc):
                     else:
                         self.list_morph[morph_list['name']] = result
                         print(f'\tДобавлен список морфологии: "{morph_list["name"]}".')
+                    complete = True
                     for item in content:
                         err2, result2 = self.add_nlist_item(result, item)
                         if err2 == 2:
                             print(f"\033[31m{result2}\033[0m")
+                            complete = False
 #                        elif err2 == 1:
 #                            print(result2)
                     print(f'\t\tСодержимое списка "{morph_list["name"]}" обновлено.')
+                    if complete:
+                        self.journal.record('list_morph', morph_list['name'], result)
             else:
                 print("\t\033[33mНет списков морфологии для импорта.\033[0m")
         else:
@@ -345,11 +594,11 @@ class UTM(UtmXmlRpc):
         """Выгрузить список сервисов раздела библиотеки"""
         print('Выгружается список сервисов раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         _, data = self.get_services_list()
 
-        for item in data['items']:
+        for item in data:
             item.pop('id')
             item.pop('guid')
             item.pop('cc', None)
@@ -359,22 +608,34 @@ class UTM(UtmXmlRpc):
                     item['protocols'][0]['proto'] = 'pop3'
                 if item['protocols'][0]['port'] == '995':
                     item['protocols'][0]['proto'] = 'pop3s'
-        with open("data/library/config_services.json", "w") as fh:
-            json.dump(data['items'], fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_services.json")
         print(f'\tСписок сервисов выгружен в файл "data/library/config_services.json".')
 
     def import_services(self):
         """Импортировать список сервисов раздела библиотеки"""
         print('Импорт списка сервисов раздела "Библиотеки":')
         try:
-            with open("data/library/config_services.json", "r") as fh:
-                services = json.load(fh)
+            services = load_json("data/library/config_services.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Сервисы" не импортирован!\n\tНе найден файл "data/library/config_services.json" с сохранённой конфигурацией!\033[0;0m')
             return
 
+        current = {}
+        if self.diff_import:
+            _, data = self.get_services_list()
+            current = {x['name']: x for x in data}
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0}
+
         for item in services:
-            err, result = self.add_service(item)
+            if self.journal.loaded('services', item['name']):
+                continue
+            if item['name'] in current:
+                if same_config(item, current[item['name']]):
+                    stats['unchanged'] += 1
+                    continue
+                err, result = 1, f"\tСервис: '{item['name']}' изменён."
+            else:
+                err, result = self.add_service(item)
             if err == 1:
                 print(result, end= ' - ')
                 try:
@@ -385,26 +646,32 @@ class UTM(UtmXmlRpc):
                     if err1 != 0:
                         print(result1)
                     else:
+                        stats['updated'] += 1
+                        self.journal.record('services', item['name'], self.services[item['name']])
                         print("\033[32mOk!\033[0;0m")
             elif err == 2:
                 print(result)
             else:
                 self.services[item['name']] = result
+                self.journal.record('services', item['name'], result)
+                stats['created'] += 1
                 print(f'\tСервис "{item["name"]}" добавлен.')
+        self.print_import_stats(stats)
 
     def export_IP_lists(self):
         """Выгружает списки IP-адресов и преобразует формат атрибутов списков к версии 6"""
         print('Выгружаются списки IP-адресов раздела "Библиотеки":')
-        if os.path.isdir('data/library/ip_lists'):
-            for file_name in os.listdir('data/library/ip_lists'):
-                os.remove(f"data/library/ip_lists/{file_name}")
-        else:
-            os.makedirs('data/library/ip_lists')
+        self.prepare_export_dir('data/library/ip_lists')
 
-        total, data = self.get_nlist_list('network')
+        total, data = self.get_nlist_list('network', self.unchanged_items('network', 'data/library/ip_lists'))
         trans_table = str.maketrans(character_map)
+        self.set_export_state('network', 'data/library/ip_lists',
+                              {x['id']: (x.get('version'), x.get('last_update'), x['name'].translate(trans_table)) for x in data})
 
         for item in data:
+            if item['content'] is None:
+                print(f'\tСписок IP-адресов "{item["name"].translate(trans_table)}" не изменился.')
+                continue
             if self.version.startswith('5'):
                 item['attributes'] = {'threat_level': x['value'] for x in item['attributes']}
             item.pop('id')
@@ -417,50 +684,67 @@ class UTM(UtmXmlRpc):
             item['name'] = item['name'].translate(trans_table)
             for content in item['content']:
                 content.pop('id')
-            with open(f"data/library/ip_lists/{item['name']}.json", "w") as fd:
-                json.dump(item, fd, indent=4, ensure_ascii=False)
+            dump_json(item, f"data/library/ip_lists/{item['name']}.json")
             print(f'\tСписок IP-адресов "{item["name"]}" выгружен в файл "data/library/ip_lists/{item["name"]}.json".')
 
     def import_IP_lists(self):
         """Импортировать списки IP адресов"""
         print('Импорт списков IP-адресов раздела "Библиотеки":')
-        if os.path.isdir('data/library/ip_lists'):
-            files_list = os.listdir('data/library/ip_lists')
+        if is_dir('data/library/ip_lists'):
+            files_list = list_dir('data/library/ip_lists')
             if files_list:
-                for file_name in files_list:
-                    try:
-                        with open(f"data/library/ip_lists/{file_name}", "r") as fh:
-                            ip_list = json.load(fh)
-                    except FileNotFoundError as err:
-                        print(f'\t\033[31mСписок "IP-адреса" не импортирован!\n\tНе найден файл "data/library/ip_lists/{file_name}" с сохранённой конфигурацией!\033[0;0m')
-                        return
+                current = self.get_current_nlists('network')
+                stats = {'created': 0, 'updated': 0, 'unchanged': 0}
 
-                    content = ip_list.pop('content')
-                    err, result = self.add_nlist(ip_list)
-                    if err == 1:
-                        print(result, end= ' - ')
-                        result = self.list_IP[ip_list['name']]
-                        err1, result1 = self.update_nlist(result, ip_list)
-                        if err1 != 0:
-                            print("\n", f"\033[31m{result1}\033[0m")
+                def lists():
+                    """Списки из файлов по одному по мере чтения: (имя, id, значения для загрузки)"""
+                    for file_name in files_list:
+                        try:
+                            ip_list = load_json(f"data/library/ip_lists/{file_name}")
+                        except FileNotFoundError as err:
+                            print(f'\t\033[31mСписок "IP-адреса" не импортирован!\n\tНе найден файл "data/library/ip_lists/{file_name}" с сохранённой конфигурацией!\033[0;0m')
+                            return
+
+                        if self.journal.loaded('list_IP', ip_list['name']):
+                            continue
+                        content = ip_list.pop('content')
+                        changed = True
+                        if ip_list['name'] in current:
+                            changed, content = self.diff_nlist(ip_list, content, current[ip_list['name']])
+                            if not changed and not content:
+                                stats['unchanged'] += 1
+                                continue
+                            err, result = 1, f'\tСписок IP-адресов "{ip_list["name"]}" изменён.'
                         else:
-                            print("\033[32mUpdated!\033[0;0m")
-                    elif err == 2:
-                        print(f"\033[31m{result}\033[0m")
-                        continue
-                    else:
-                        self.list_IP[ip_list['name']] = result
-                        print(f'\tДобавлен список IP-адресов: "{ip_list["name"]}".')
-                    if content:
-                        err2, result2 = self.add_nlist_items(result, content)
-                        if err2 in (1, 3):
-                            print(result2)
-                        elif err2 == 2:
-                            print(f"\033[31m{result2}\033[0m")
+                            err, result = self.add_nlist(ip_list)
+                        if err == 1:
+                            print(result, end= ' - ')
+                            result = self.list_IP[ip_list['name']]
+                            if changed:
+                                err1, result1 = self.update_nlist(result, ip_list)
+                                if err1 != 0:
+                                    print("\n", f"\033[31m{result1}\033[0m")
+                                else:
+                                    stats['updated'] += 1
+                                    print("\033[32mUpdated!\033[0;0m")
+                            else:
+                                stats['updated'] += 1
+                                print("\033[32mOk!\033[0;0m")
+                        elif err == 2:
+                            print(f"\033[31m{result}\033[0m")
+                            continue
                         else:
-                            print(f'\tСодержимое списка "{ip_list["name"]}" обновлено. Added {result2} record.')
-                    else:
-                        print(f'\tСписок "{ip_list["name"]}" пуст.')
+                            self.list_IP[ip_list['name']] = result
+                            stats['created'] += 1
+                            print(f'\tДобавлен список IP-адресов: "{ip_list["name"]}".')
+                        if content:
+                            yield ip_list['name'], result, content
+                        else:
+                            print(f'\tСписок "{ip_list["name"]}" пуст.')
+                            self.journal.record('list_IP', ip_list['name'], result)
+
+                self.upload_nlists_content(lists(), 'list_IP')
+                self.print_import_stats(stats)
             else:
                 print("\033[33m\tНет списков IP-адресов для импорта.\033[0m")
         else:
@@ -470,7 +754,7 @@ class UTM(UtmXmlRpc):
         """Выгружает списки useragent и преобразует формат атрибутов списков к версии 6"""
         print('Выгружаются список "Useragent браузеров" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         total, data = self.get_nlist_list('useragent')
 
@@ -486,16 +770,14 @@ class UTM(UtmXmlRpc):
             item.pop('last_update', None)
             for content in item['content']:
                 content.pop('id')
-        with open("data/library/config_useragents.json", "w") as fd:
-                json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_useragents.json")
         print(f'\tСписок "Useragent браузеров" выгружен в файл "data/library/config_useragents.json".')
 
     def import_useragent_lists(self):
         """Импортировать списки Useragent браузеров"""
         print('Импорт списков "Useragent браузеров" раздела "Библиотеки":')
         try:
-            with open("data/library/config_useragents.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_useragents.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Useragent браузеров" не импортирован!\n\tНе найден файл "data/library/config_useragents.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -503,22 +785,38 @@ class UTM(UtmXmlRpc):
         if not data:
             print("\tНет списков Useragent для импорта.")
             return
+        current = self.get_current_nlists('useragent')
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0}
         for item in data:
             content = item.pop('content')
-            err, result = self.add_nlist(item)
+            changed = True
+            if item['name'] in current:
+                changed, content = self.diff_nlist(item, content, current[item['name']])
+                if not changed and not content:
+                    stats['unchanged'] += 1
+                    continue
+                err, result = 1, f'\tСписок "{item["name"]}" изменён.'
+            else:
+                err, result = self.add_nlist(item)
             if err == 1:
                 print(result, end= ' - ')
                 result = self.list_useragent[item['name']]
-                err1, result1 = self.update_nlist(result, item)
-                if err1 != 0:
-                    print("\n", f"\033[31m{result1}\033[0m")
+                if changed:
+                    err1, result1 = self.update_nlist(result, item)
+                    if err1 != 0:
+                        print("\n", f"\033[31m{result1}\033[0m")
+                    else:
+                        stats['updated'] += 1
+                        print("\033[32mOk!\033[0;0m")
                 else:
+                    stats['updated'] += 1
                     print("\033[32mOk!\033[0;0m")
             elif err == 2:
                 print(f"\033[31m{result}\033[0m")
                 continue
             else:
                 self.list_useragent[item['name']] = result
+                stats['created'] += 1
                 print(f'\tДобавлен список Useragent: "{item["name"]}".')
 
             for agent in content:
@@ -528,12 +826,13 @@ class UTM(UtmXmlRpc):
 #                elif err2 == 1:
 #                    print(result2)
             print(f'\t\tСодержимое списка "{item["name"]}" обновлено.')
+        self.print_import_stats(stats)
 
     def export_mime_lists(self):
         """Выгружает списки Типов контента и преобразует формат атрибутов списков к версии 6"""
         print('Выгружается список "Типы контента" (mime типы) раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         total, data = self.get_nlist_list('mime')
 
@@ -549,16 +848,14 @@ class UTM(UtmXmlRpc):
             item.pop('last_update', None)
             for content in item['content']:
                 content.pop('id')
-        with open("data/library/config_mime_types.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_mime_types.json")
         print(f'\tСписок "Типы контента" выгружен в файл "data/library/config_mime_types.json".')
 
     def import_mime_lists(self):
         """Импортировать списки Типов контента"""
         print('Импорт списка "Типы контента" раздела "Библиотеки":')
         try:
-            with open("data/library/config_mime_types.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_mime_types.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Типы контента" не импортирован!\n\tНе найден файл "data/library/config_mime_types.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -566,22 +863,38 @@ class UTM(UtmXmlRpc):
         if not data:
             print('\033[33m\tНет списка "Типы контента" для импорта.\033[0m')
             return
+        current = self.get_current_nlists('mime')
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0}
         for item in data:
             content = item.pop('content')
-            err, result = self.add_nlist(item)
+            changed = True
+            if item['name'] in current:
+                changed, content = self.diff_nlist(item, content, current[item['name']])
+                if not changed and not content:
+                    stats['unchanged'] += 1
+                    continue
+                err, result = 1, f'\tСписок "{item["name"]}" изменён.'
+            else:
+                err, result = self.add_nlist(item)
             if err == 1:
                 print(result, end= ' - ')
                 result = self.list_mime[item['name']]
-                err1, result1 = self.update_nlist(result, item)
-                if err1 != 0:
-                    print("\n", f"\033[31m{result1}\033[0m")
+                if changed:
+                    err1, result1 = self.update_nlist(result, item)
+                    if err1 != 0:
+                        print("\n", f"\033[31m{result1}\033[0m")
+                    else:
+                        stats['updated'] += 1
+                        print("\033[32mOk!\033[0;0m")
                 else:
+                    stats['updated'] += 1
                     print("\033[32mOk!\033[0;0m")
             elif err == 2:
                 print(f"\033[31m{result}\033[0m")
                 continue
             else:
                 self.list_mime[item['name']] = result
+                stats['created'] += 1
                 print(f"\tДобавлен список типов контента '{item['name']}'.")
 
             for x in content:
@@ -589,20 +902,22 @@ class UTM(UtmXmlRpc):
                 if err2 == 2:
                    print(f"\033[31m{result2}\033[0m")
             print(f'\t\tСодержимое списка "{item["name"]}" обновлено.')
+        self.print_import_stats(stats)
 
     def export_url_lists(self):
         """Выгружает списки URL и преобразует формат атрибутов списков к версии 6"""
         print('Выгружаются "Списки URL" раздела "Библиотеки":')
-        if os.path.isdir('data/library/url'):
-            for file_name in os.listdir('data/library/url'):
-                os.remove(f"data/library/url/{file_name}")
-        else:
-            os.makedirs('data/library/url')
+        self.prepare_export_dir('data/library/url')
 
-        total, data = self.get_nlist_list('url')
+        total, data = self.get_nlist_list('url', self.unchanged_items('url', 'data/library/url'))
         trans_table = str.maketrans(character_map)
+        self.set_export_state('url', 'data/library/url',
+                              {x['id']: (x.get('version'), x.get('last_update'), x['name'].translate(trans_table)) for x in data})
 
         for item in data:
+            if item['content'] is None:
+                print(f'\tСписок URL "{item["name"].translate(trans_table)}" не изменился.')
+                continue
             if self.version.startswith('5'):
                 item['attributes'] = {'threat_level': x['value'] for x in item['attributes']}
             item.pop('id')
@@ -616,51 +931,68 @@ class UTM(UtmXmlRpc):
             item['name'] = url_list_name
             for content in item['content']:
                 content.pop('id', None)
-            with open(f"data/library/url/{url_list_name}.json", "w") as fd:
-                json.dump(item, fd, indent=4, ensure_ascii=False)
+            dump_json(item, f"data/library/url/{url_list_name}.json")
             print(f'\tСписок URL "{item["name"]}" выгружен в файл data/library/url/{url_list_name}.json')
 
     def import_url_lists(self):
         """Импортировать списки URL на UTM"""
         print('Импорт списков URL раздела "Библиотеки":')
-        if os.path.isdir('data/library/url'):
-            files_list = os.listdir('data/library/url')
+        if is_dir('data/library/url'):
+            files_list = list_dir('data/library/url')
             if files_list:
-                for file_name in files_list:
-                    try:
-                        with open(f"data/library/url/{file_name}", "r") as fh:
-                            url_list = json.load(fh)
-                    except FileNotFoundError as err:
-                        print(f'\t\033[31mСписок "Списки URL" не импортирован!\n\tНе найден файл "data/library/url/{file_name}" с сохранённой конфигурацией!\033[0;0m')
-                        return
+                current = self.get_current_nlists('url')
+                stats = {'created': 0, 'updated': 0, 'unchanged': 0}
 
-                    print(f'\tДобавляется список URL: "{url_list["name"]}".')
-                    content = url_list.pop('content')
-                    err, result = self.add_nlist(url_list)
-                    if err == 1:
-                        print(result, end= ' - ')
-                        result = self.list_url[url_list['name']]
-                        err1, result1 = self.update_nlist(result, url_list)
-                        if err1 != 0:
-                            print("\n", f'\033[31m{result1}\033[0m')
+                def lists():
+                    """Списки из файлов по одному по мере чтения: (имя, id, значения для загрузки)"""
+                    for file_name in files_list:
+                        try:
+                            url_list = load_json(f"data/library/url/{file_name}")
+                        except FileNotFoundError as err:
+                            print(f'\t\033[31mСписок "Списки URL" не импортирован!\n\tНе найден файл "data/library/url/{file_name}" с сохранённой конфигурацией!\033[0;0m')
+                            return
+
+                        if self.journal.loaded('list_url', url_list['name']):
+                            continue
+                        content = url_list.pop('content')
+                        changed = True
+                        if url_list['name'] in current:
+                            changed, content = self.diff_nlist(url_list, content, current[url_list['name']])
+                            if not changed and not content:
+                                stats['unchanged'] += 1
+                                continue
+                            err, result = 1, f'\tСписок URL "{url_list["name"]}" изменён.'
                         else:
-                            print("\033[32mOk!\033[0;0m")
-                    elif err == 2:
-                        print(f"\033[31m{result}\033[0m")
-                        continue
-                    else:
-                        self.list_url[url_list['name']] = result
-                        print(f'\t\tСписок URL: "{url_list["name"]}" добавлен.')
-                    if content:
-                        for item in content:
-                            print(f"\t\tURL '{item['value']}' добавляется в список.")
-                            err2, result2 = self.add_nlist_item(result, item)
-                            if err2 == 2:
-                                print(f"\033[31m\t\tURL '{item['value']}' не добавлен.\033[0m")
-                                print(f"\033[31m{result2}\033[0m")
-                        print(f'\t\tСодержимое списка "{url_list["name"]}" обновлено.')
-                    else:
-                        print(f'\t\tСписок "{url_list["name"]}" пуст.')
+                            print(f'\tДобавляется список URL: "{url_list["name"]}".')
+                            err, result = self.add_nlist(url_list)
+                        if err == 1:
+                            print(result, end= ' - ')
+                            result = self.list_url[url_list['name']]
+                            if changed:
+                                err1, result1 = self.update_nlist(result, url_list)
+                                if err1 != 0:
+                                    print("\n", f'\033[31m{result1}\033[0m')
+                                else:
+                                    stats['updated'] += 1
+                                    print("\033[32mOk!\033[0;0m")
+                            else:
+                                stats['updated'] += 1
+                                print("\033[32mOk!\033[0;0m")
+                        elif err == 2:
+                            print(f"\033[31m{result}\033[0m")
+                            continue
+                        else:
+                            self.list_url[url_list['name']] = result
+                            stats['created'] += 1
+                            print(f'\t\tСписок URL: "{url_list["name"]}" добавлен.')
+                        if content:
+                            yield url_list['name'], result, content
+                        else:
+                            print(f'\t\tСписок "{url_list["name"]}" пуст.')
+                            self.journal.record('list_url', url_list['name'], result)
+
+                self.upload_nlists_content(lists(), 'list_url')
+                self.print_import_stats(stats)
             else:
                 print("\033[33m\tНет списков URL для импорта.\033[0m")
         else:
@@ -670,7 +1002,7 @@ class UTM(UtmXmlRpc):
         """Выгружает содержимое календарей и преобразует формат атрибутов списков к версии 6"""
         print('Выгружается список "Календари" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         total, data = self.get_nlist_list('timerestrictiongroup')
 
@@ -689,16 +1021,14 @@ class UTM(UtmXmlRpc):
                 content.pop('fixed_date_from', None)
                 content.pop('fixed_date_to', None)
                 content.pop('fixed_date', None)
-        with open("data/library/config_calendars.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_calendars.json")
         print(f'\tСписок "Календари" выгружен в файл "data/library/config_calendars.json".')
 
     def import_time_restricted_lists(self):
         """Импортировать содержимое календарей"""
         print('Импорт списка "Календари" раздела "Библиотеки":')
         try:
-            with open("data/library/config_calendars.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_calendars.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Календари" не импортирован!\n\tНе найден файл "data/library/config_calendars.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -733,7 +1063,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список Полос пропускания раздела библиотеки"""
         print('Выгружается список "Полосы пропускания" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         _, data = self.get_shaper_list()
 
@@ -741,16 +1071,14 @@ class UTM(UtmXmlRpc):
             item.pop('id')
             item.pop('guid')
             item.pop('cc', None)
-        with open("data/library/config_shaper.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_shaper.json")
         print(f'\tСписок "Полосы пропускания" выгружен в файл "data/library/config_shaper.json".')
 
     def import_shaper(self):
         """Импортировать список Полос пропускания раздела библиотеки"""
         print('Импорт списка "Полосы пропускания" раздела "Библиотеки":')
         try:
-            with open("data/library/config_shaper.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_shaper.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Полосы пропускания" не импортирован!\n\tНе найден файл "data/library/config_shaper.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -777,23 +1105,21 @@ class UTM(UtmXmlRpc):
         """Выгрузить список профилей АСУ ТП раздела библиотеки"""
         print('Выгружается список "Профили АСУ ТП" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         _, data = self.get_scada_list()
 
         for item in data:
             item.pop('id')
             item.pop('cc', None)
-        with open("data/library/config_scada.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_scada.json")
         print(f'\tСписок "Профили АСУ ТП" выгружен в файл "data/library/config_scada.json".')
 
     def import_scada_list(self):
         """Импортировать список профилей АСУ ТП раздела библиотеки"""
         print('Импорт списка "Профили АСУ ТП" раздела "Библиотеки":')
         try:
-            with open("data/library/config_scada.json", "r") as fh:
-                scada = json.load(fh)
+            scada = load_json("data/library/config_scada.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили АСУ ТП" не импортирован!\n\tНе найден файл "data/library/config_scada.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -819,24 +1145,26 @@ class UTM(UtmXmlRpc):
         Выгружает файл HTML только для изменённых страниц шаблонов.
         """
         print('Выгружается список "Шаблоны страниц" раздела "Библиотеки":')
-        if os.path.isdir('data/library/templates'):
-            for file_name in os.listdir('data/library/templates'):
-                os.remove(f"data/library/templates/{file_name}")
-        else:
-            os.makedirs('data/library/templates')
+        self.prepare_export_dir('data/library/templates')
 
         _, data = self.get_templates_list()
+        unchanged = self.unchanged_items('templates', 'data/library/templates', ext=None)
+        self.set_export_state('templates', 'data/library/templates',
+                              {x['id']: (x.get('version'), x.get('last_update'), x['name']) for x in data}, ext='html')
         for item in data:
-            _, html_data = self.get_template_data(item['type'], item['id'])
-            if html_data:
-                with open(f"data/library/templates/{item['name']}.html", "w") as fh:
-                    fh.write(html_data)
-                print(f'\tСтраница HTML для шаблона "{item["name"]}" выгружена в файл "data/library/templates/{item["name"]}.html".')
+            # Страница HTML шаблона, не изменившегося с прошлого экспорта, не запрашивается - файл остаётся прежним.
+            if not self.nlist_unchanged(item, unchanged):
+                _, html_data = self.get_template_data(item['type'], item['id'])
+                if html_data:
+                    with open(f"data/library/templates/{item['name']}.html", "w") as fh:
+                        fh.write(html_data)
+                    print(f'\tСтраница HTML для шаблона "{item["name"]}" выгружена в файл "data/library/templates/{item["name"]}.html".')
+                elif os.path.isfile(f"data/library/templates/{item['name']}.html"):
+                    os.remove(f"data/library/templates/{item['name']}.html")
             item.pop('id')
             item.pop('last_update', None)
             item.pop('cc', None)
-        with open("data/library/templates/config_templates.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/templates/config_templates.json")
         print('\tСписок "Шаблоны страниц" выгружен в файл "data/library/templates/config_templates.json".')
 
     def import_templates_list(self):
@@ -846,13 +1174,12 @@ class UTM(UtmXmlRpc):
         """
         print('Импорт списка "Шаблоны страниц" раздела "Библиотеки":')
         try:
-            with open("data/library/templates/config_templates.json", "r") as fh:
-                templates = json.load(fh)
+            templates = load_json("data/library/templates/config_templates.json")
         except FileNotFoundError as err:
             print('\t\033[31mСписок "Шаблоны страниц" не импортирован!\n\tНе найден файл "data/library/templates/config_templates.json" с сохранённой конфигурацией!\033[0;0m')
             return
 
-        html_files = os.listdir('data/library/templates')
+        html_files = list_dir('data/library/templates')
 
         for item in templates:
             err, result = self.add_template(item)
@@ -872,8 +1199,7 @@ class UTM(UtmXmlRpc):
                 print(f'\tШаблон страницы "{item["name"]}" добавлен.')
 
             if f"{item['name']}.html" in html_files:
-                with open(f"data/library/templates/{item['name']}.html", "br") as fh:
-                    file_data = fh.read()
+                file_data = read_file(f"data/library/templates/{item['name']}.html")
                 _, result2 = self.set_template_data(result, file_data)
                 if result2:
                     print(f'\t\tСтраница "{item["name"]}.html" добавлена.')
@@ -884,7 +1210,7 @@ class UTM(UtmXmlRpc):
         group_name_revert = {v: k for k, v in self.default_url_category.items()}
 
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         total, data = self.get_nlist_list('urlcategorygroup')
 
@@ -904,16 +1230,14 @@ class UTM(UtmXmlRpc):
                     content['category_id'] = content.pop('value')
                     content['name'] = self._categories[int(content['category_id'])]
 
-        with open("data/library/config_categories_url.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_categories_url.json")
         print(f'\tСписок "Категории URL" выгружен в файл "data/library/config_categories_url.json".')
 
     def import_categories_groups(self):
         """Импортировать список "Категории URL" на UTM"""
         print('Импорт списка "Категории URL" раздела "Библиотеки":')
         try:
-            with open("data/library/config_categories_url.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_categories_url.json")
         except FileNotFoundError as err:
             print('\t\033[31mСписок "Категории URL" не импортирован!\n\tНе найден файл "data/library/config_categories_url.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -949,7 +1273,7 @@ class UTM(UtmXmlRpc):
         group_name_revert = {v: k for k, v in self.default_url_category.items()}
 
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         err, data = self.get_custom_url_list()
         if err == 2:
@@ -964,16 +1288,14 @@ class UTM(UtmXmlRpc):
             item.pop('cc', None)
             item['categories'] = [self._categories[x] for x in item['categories']]
 
-        with open("data/library/custom_categories_url.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/custom_categories_url.json")
         print(f'\tСписок "Изменённые категории URL" выгружен в файл "data/library/custom_categories_url.json".')
 
     def import_custom_url_list(self):
         """Импортировать список "Изменённые категории URL" на UTM"""
         print('Импорт списка "Изменённые категории URL" раздела "Библиотеки":')
         try:
-            with open("data/library/custom_categories_url.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/custom_categories_url.json")
         except FileNotFoundError as err:
             print('\t\033[31mСписок "Изменённые категории URL" не импортирован!\n\tНе найден файл "data/library/custom_categories_url.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1013,7 +1335,7 @@ class UTM(UtmXmlRpc):
         """Выгружает список "Приложения" и преобразует формат атрибутов списков к версии 6"""
         print('Выгружается список "Приложения" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         total, data = self.get_nlist_list('applicationgroup')
 
@@ -1033,16 +1355,14 @@ class UTM(UtmXmlRpc):
                 elif content['value'] == 'Facebook Chat':
                     content['value'] = 'Facebook  Chat'     # Добавляем лишний пробел
 
-        with open("data/library/config_applications.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_applications.json")
         print(f'\tСписок "Приложения" выгружен в файл "data/library/config_applications.json".')
 
     def import_application_groups(self):
         """Импортировать список "Приложения" на UTM"""
         print('Импорт списка "Приложения" раздела "Библиотеки":')
         try:
-            with open("data/library/config_applications.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_applications.json")
         except FileNotFoundError as err:
             print('\t\033[31mСписок "Приложения" не импортирован!\n\tНе найден файл "data/library/config_applications.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1078,7 +1398,7 @@ class UTM(UtmXmlRpc):
             }
         print(f'Выгружается список "{list_name[list_type]}" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         total, data = self.get_nlist_list(list_type)
 
@@ -1093,8 +1413,7 @@ class UTM(UtmXmlRpc):
             for content in item['content']:
                 content.pop('id')
 
-        with open(f"data/library/config_{list_type}.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, f"data/library/config_{list_type}.json")
         print(f'\tСписок "{list_name[list_type]}" выгружен в файл "data/library/config_{list_type}.json".')
 
     def import_nlist_groups(self, list_type):
@@ -1105,8 +1424,7 @@ class UTM(UtmXmlRpc):
             }
         print(f'Импорт списка "{list_name[list_type][0]}" раздела "Библиотеки":')
         try:
-            with open(f"data/library/config_{list_type}.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json(f"data/library/config_{list_type}.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "{list_name[list_type][0]}" не импортирован!\n\tНе найден файл "data/library/config_{list_type}.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1137,7 +1455,7 @@ class UTM(UtmXmlRpc):
         """Выгружает списки: "Профили СОВ" и преобразует формат списков к версии 6"""
         print(f'Выгружается список "Профили СОВ" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         total, data = self.get_nlist_list('ipspolicy')
 
@@ -1160,16 +1478,14 @@ class UTM(UtmXmlRpc):
                 if 'threat_level' in content.keys():
                     content['threat'] = content.pop('threat_level')
 
-        with open(f"data/library/config_ips_profiles.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, f"data/library/config_ips_profiles.json")
         print(f'\tСписок "Профили СОВ" выгружен в файл "data/library/config_ips_profiles.json".')
 
     def import_ips_profiles(self):
         """Импортировать списки: "Профили СОВ" на UTM"""
         print(f'Импорт списка "Профили СОВ" раздела "Библиотеки":')
         try:
-            with open(f"data/library/config_ips_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json(f"data/library/config_ips_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили СОВ" не импортирован!\n\tНе найден файл "data/library/config_ips_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1213,22 +1529,20 @@ class UTM(UtmXmlRpc):
         """Выгрузить список профилей оповещения раздела библиотеки"""
         print('Выгружается список "Профили оповещений" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         _, data = self.get_notification_profiles_list()
 
         for item in data:
             item.pop('cc', None)
-        with open("data/library/config_notification_profiles.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_notification_profiles.json")
         print(f'\tСписок "Профили оповещений" выгружен в файл "data/library/config_notification_profiles.json".')
 
     def import_notification_profiles(self):
         """Импортировать список профилей оповещения раздела библиотеки"""
         print('Импорт списка "Профили оповещений" раздела "Библиотеки":')
         try:
-            with open("data/library/config_notification_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_notification_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили оповещений" не импортирован!\n\tНе найден файл "data/library/config_notification_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1256,22 +1570,20 @@ class UTM(UtmXmlRpc):
         """Выгрузить список профилей netflow раздела библиотеки"""
         print('Выгружается список "Профили netflow" раздела "Библиотеки":')
         if not os.path.isdir('data/library'):
-            os.makedirs('data/library')
+            os.makedirs('data/library', exist_ok=True)
 
         _, data = self.get_netflow_profiles_list()
 
         for item in data:
             item.pop('cc', None)
-        with open("data/library/config_netflow_profiles.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/library/config_netflow_profiles.json")
         print(f'\tСписок "Профили netflow" выгружен в файл "data/library/config_netflow_profiles.json".')
 
     def import_netflow_profiles(self):
         """Импортировать список профилей netflow раздела библиотеки"""
         print('Импорт списка "Профили netflow" раздела "Библиотеки":')
         try:
-            with open("data/library/config_netflow_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_netflow_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили netflow" не импортирован!\n\tНе найден файл "data/library/config_netflow_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1300,21 +1612,19 @@ class UTM(UtmXmlRpc):
         if self.version.startswith('6'):
             print('Выгружается список "Профили SSL" раздела "Библиотеки":')
             if not os.path.isdir('data/library'):
-                os.makedirs('data/library')
+                os.makedirs('data/library', exist_ok=True)
 
             _, data = self.get_ssl_profiles_list()
             for item in data:
                 item.pop('cc', None)
-            with open("data/library/config_ssl_profiles.json", "w") as fh:
-                json.dump(data, fh, indent=4, ensure_ascii=False)
+            dump_json(data, "data/library/config_ssl_profiles.json")
             print(f'\tСписок "Профили SSL" выгружен в файл "data/library/config_ssl_profiles.json".')
 
     def import_ssl_profiles(self):
         """Импортировать список профилей SSL раздела библиотеки"""
         print('Импорт списка "Профили SSL" раздела "Библиотеки":')
         try:
-            with open("data/library/config_ssl_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/library/config_ssl_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили SSL" не импортирован!\n\tНе найден файл "data/library/config_ssl_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1343,7 +1653,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить настройки интерфейса"""
         print('Выгружаются "Настройки интерфейса" веб-консоли раздела "Настройки":')
         if not os.path.isdir('data/settings'):
-            os.makedirs('data/settings')
+            os.makedirs('data/settings', exist_ok=True)
 
         params = ['ui_timezone', 'ui_language', 'web_console_ssl_profile_id', 'response_pages_ssl_profile_id']
         _, data = self.get_settings_params(params)
@@ -1354,16 +1664,14 @@ class UTM(UtmXmlRpc):
             data['web_console_ssl_profile_id'] = ssl_profiles[data['web_console_ssl_profile_id']]
             data['response_pages_ssl_profile_id'] = ssl_profiles[data['response_pages_ssl_profile_id']]
 
-        with open("data/settings/config_settings_ui.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/settings/config_settings_ui.json")
         print(f'\t"Настройки интерфейса" веб-консоли выгружены в файл "data/settings/config_settings_ui.json".')
 
     def import_ui(self):
         """Импортировать настройки интерфейса"""
         print('Импорт "Настройки интерфейса" веб-консоли раздела "Настройки":')
         try:
-            with open("data/settings/config_settings_ui.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/settings/config_settings_ui.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Настройки интерфейса" не импортирован!\n\tНе найден файл "data/settings/config_settings_ui.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1394,23 +1702,21 @@ class UTM(UtmXmlRpc):
         """Выгрузить настройки NTP"""
         print('Выгружаются "Настройки NTP" раздела "Настройки":')
         if not os.path.isdir('data/settings'):
-            os.makedirs('data/settings')
+            os.makedirs('data/settings', exist_ok=True)
 
         _, data = self.get_ntp_config()
         if data:
             data.pop('local_time', None)
             data.pop('timezone', None)
             data.pop('utc_time', None)
-        with open("data/settings/config_ntp.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/settings/config_ntp.json")
         print(f'\tНастройки NTP выгружены в файл "data/settings/config_ntp.json".')
 
     def import_ntp(self):
         """Импортировать настройки NTP"""
         print('Импорт настроек NTP раздела "Настройки":')
         try:
-            with open("data/settings/config_ntp.json", "r") as fh:
-                ntp = json.load(fh)
+            ntp = load_json("data/settings/config_ntp.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mНастройки NTP не импортированы!\n\tНе найден файл "data/settings/config_ntp.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1425,33 +1731,29 @@ class UTM(UtmXmlRpc):
         """Выгрузить настройки"""
         print('Выгружаются настройки кэширования HTTP и модулей раздела "Настройки":')
         if not os.path.isdir('data/settings'):
-            os.makedirs('data/settings')
+            os.makedirs('data/settings', exist_ok=True)
 
         params = ["auth_captive", "logout_captive", "block_page_domain", "ftpclient_captive",
                   "ftp_proxy_enabled", "http_cache_mode", "http_cache_docsize_max", "http_cache_precache_size"]
         _, data = self.get_settings_params(params)
-        with open("data/settings/config_settings.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/settings/config_settings.json")
         print(f'\tНастройки кэширования HTTP и модулей выгружены в файл "data/settings/config_settings.json".')
 
         _, data = self.get_proxy_port()
         if data:
-            with open("data/settings/config_proxy_port.json", "w") as fh:
-                json.dump(data, fh, indent=4, ensure_ascii=False)
+            dump_json(data, "data/settings/config_proxy_port.json")
 
         _, data = self.get_nlist_list('httpcwl')
         for content in data['content']:
             content.pop('id')
-        with open("data/settings/config_proxy_exceptions.json", "w") as fd:
-            json.dump(data['content'], fd, indent=4, ensure_ascii=False)
+        dump_json(data['content'], "data/settings/config_proxy_exceptions.json")
         print(f'\tИсключения кеширования http выгружены в файл data/settings/config_proxy_exceptions.json')
 
     def import_settings(self):
         """Импортировать настройки"""
         print('Импорт настроек кэширования HTTP и модулей раздела "Настройки":')
         try:
-            with open("data/settings/config_proxy_port.json", "r") as fh:
-                port = json.load(fh)
+            port = load_json("data/settings/config_proxy_port.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mПорт прокси не импортирован!\n\tНе найден файл "data/settings/config_proxy_port.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1463,8 +1765,7 @@ class UTM(UtmXmlRpc):
             print(f'\tHTTP(S)-прокси порт - \033[32mUpdated!\033[0m.')
 
         try:
-            with open("data/settings/config_settings.json", "r") as fh:
-                settings = json.load(fh)
+            settings = load_json("data/settings/config_settings.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mНастройки кэширования HTTP и модулей не импортированы!\n\tНе найден файл "data/settings/config_settings.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1488,8 +1789,7 @@ class UTM(UtmXmlRpc):
                 print(f'\t{params[key]} - \033[32mUpdated!\033[0m')
 
         try:
-            with open("data/settings/config_proxy_exceptions.json", "r") as fh:
-                settings = json.load(fh)
+            settings = load_json("data/settings/config_proxy_exceptions.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mИсключения кеширования http не импортированы!\n\tНе найден файл "data/settings/config_proxy_exceptions.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1508,7 +1808,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить настройки веб-портала"""
         print('Выгружаются настройки Веб-портала раздела "UserGate/Настройки":')
         if not os.path.isdir('data/settings'):
-            os.makedirs('data/settings')
+            os.makedirs('data/settings', exist_ok=True)
 
         err, result = self.get_certificates_list()
         list_certificates = {x['id']: x['name'] for x in result}
@@ -1527,16 +1827,14 @@ class UTM(UtmXmlRpc):
         data['proxy_portal_login_template_id'] = self.list_templates.get(data['proxy_portal_login_template_id'], -1)
         data['certificate_id'] = list_certificates.get(data['certificate_id'], -1)
 
-        with open("data/settings/config_proxy_portal.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/settings/config_proxy_portal.json")
         print(f'\tНастройки Веб-портала выгружены в файл "data/settings/config_proxy_portal.json".')
 
     def import_proxy_portal(self):
         """Импортировать настройки веб-портала"""
         print('Импорт настроек веб-портала раздела "UserGate/Настройки":')
         try:
-            with open("data/settings/config_proxy_portal.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/settings/config_proxy_portal.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mНастройки Веб-портала не импортированы!\n\tНе найден файл "data/settings/config_proxy_portal.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1578,7 +1876,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список профилей администраторов"""
         print('Выгружается список "Профили администраторов" раздела "UserGate/Администраторы":')
         if not os.path.isdir('data/usergate'):
-            os.makedirs('data/usergate')
+            os.makedirs('data/usergate', exist_ok=True)
 
         _, data = self.get_admin_profiles_list()
 
@@ -1586,16 +1884,14 @@ class UTM(UtmXmlRpc):
             item.pop('id', None)
             item.pop('cc', None)
 
-        with open("data/usergate/admin_profiles_list.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/usergate/admin_profiles_list.json")
         print(f'\tСписок "Профили администраторов" выгружен в файл "data/usergate/admin_profiles_list.json".')
 
     def import_admin_profiles(self):
         """Импортировать список профилей администраторов"""
         print('Импорт списка "Профили администраторов" раздела "UserGate/Администраторы":')
         try:
-            with open("data/usergate/admin_profiles_list.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/usergate/admin_profiles_list.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили администраторов" не импортирован!\n\tНе найден файл "data/usergate/admin_profiles_list.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1627,20 +1923,18 @@ class UTM(UtmXmlRpc):
         """Выгрузить настройки пароля для администраторов"""
         print('Выгружаются настройки пароля для администраторов раздела "UserGate/Администраторы":')
         if not os.path.isdir('data/usergate'):
-            os.makedirs('data/usergate')
+            os.makedirs('data/usergate', exist_ok=True)
 
         _, data = self.get_admin_config()
 
-        with open("data/usergate/admin_config.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/usergate/admin_config.json")
         print(f'\tНастройки пароля для администраторов выгружены в файл "data/usergate/admin_config.json".')
 
     def import_admin_config(self):
         """Импортировать настройки пароля для администраторов"""
         print('Импорт настроек паролей для администраторов" раздела "UserGate/Администраторы":')
         try:
-            with open("data/usergate/admin_config.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/usergate/admin_config.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили администраторов" не импортирован!\n\tНе найден файл "data/usergate/admin_config.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1655,7 +1949,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список администраторов"""
         print('Выгружается список администраторов раздела "UserGate/Администраторы":')
         if not os.path.isdir('data/usergate'):
-            os.makedirs('data/usergate')
+            os.makedirs('data/usergate', exist_ok=True)
 
         _, result = self.get_admin_profiles_list()
         admin_profiles = {x['id']: x['name'] for x in result}
@@ -1674,16 +1968,14 @@ class UTM(UtmXmlRpc):
                 group_name = [x.split('=') for x in item['login'].split(',')]
                 item['login'] = f'{group_name[-2][1]}.{group_name[-1][1]}\{group_name[0][1]}'
 
-        with open("data/usergate/admins_list.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/usergate/admins_list.json")
         print(f'\tСписок администраторов выгружен в файл "data/usergate/admins_list.json".')
 
     def import_admins(self):
         """Импортировать список администраторов UTM"""
         print('Импорт списка "Администраторы" раздела "UserGate/Администраторы":')
         try:
-            with open("data/usergate/admins_list.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/usergate/admins_list.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Администраторы" не импортирован!\n\tНе найден файл "data/usergate/admins_list.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1729,7 +2021,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список сертификатов"""
         print('Выгружаются список "Сертификаты" раздела "UserGate":')
         if not os.path.isdir('data/usergate/certivicates'):
-            os.makedirs('data/usergate/certivicates')
+            os.makedirs('data/usergate/certivicates', exist_ok=True)
 
         err, data = self.get_certificates_list()
 
@@ -1737,8 +2029,7 @@ class UTM(UtmXmlRpc):
             self.export_certivicate_details(item['id'], item['name'])
             item.pop('id', None)
             item.pop('cc', None)
-        with open("data/usergate/certivicates/certivicates_list.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, "data/usergate/certivicates/certivicates_list.json")
         print(f'\tСписок "Сертификаты" выгружен в файл "data/usergate/certivicates_list.json".')
 
     def export_certivicate_details(self, cert_id, cert_name):
@@ -1746,15 +2037,14 @@ class UTM(UtmXmlRpc):
 
         data = self.get_certificate_details(cert_id)
 
-        with open(f"data/usergate/certivicates/{cert_name}.json", "w") as fh:
-            json.dump(data, fh, indent=4, ensure_ascii=False)
+        dump_json(data, f"data/usergate/certivicates/{cert_name}.json")
 
 ################### Пользователи и устройства ################################
     def export_groups_lists(self):
         """Выгружает список групп"""
         print('Выгружается список локальных групп раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.makedirs('data/users_and_devices')
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
         _, data = self.get_groups_list()
 
@@ -1766,21 +2056,22 @@ class UTM(UtmXmlRpc):
             else:
                 item['users'] = [x['name'] for x in users]
 
-        with open(f"data/users_and_devices/config_groups.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, f"data/users_and_devices/config_groups.json")
         print(f"\tСписок локальных групп выгружен в файл data/users_and_devices/config_groups.json")
 
     def import_groups_list(self):
         """Импортировать локальные группы"""
         print('Импорт списка локальных групп раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_groups.json", "r") as fh:
-                groups = json.load(fh)
+            groups = load_json("data/users_and_devices/config_groups.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок локальных групп не импортирован!\n\tНе найден файл "data/users_and_devices/config_groups.json" с сохранённой конфигурацией!\033[0;0m')
             return
 
+        self.ldap.prefetch_guids(('user', *x.split("\\", 1)) for item in groups for x in item['users'] if "\\" in x)
         for item in groups:
+            if self.journal.loaded('list_groups', item['name']):
+                continue
             users = item.pop('users')
             err, result = self.add_group(item)
             if err == 1:
@@ -1812,40 +2103,42 @@ class UTM(UtmXmlRpc):
                         print(f"\033[31m{result2}\033[0m")
                     else:
                         print(f'\t\tПользователь "{user_name}" добавлен в группу.')
+            else:
+                if item['name'] in self.list_groups:
+                    self.journal.record('list_groups', item['name'], self.list_groups[item['name']])
 
     def export_users_lists(self):
         """Выгружает список локальных пользователей"""
         print('Выгружается список локальных пользователей раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.makedirs('data/users_and_devices')
-
-        _, data = self.get_users_list()
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
-        for item in data:
-            item.pop('guid')
-            item.pop('creation_date')
-            item.pop('expiration_date')
-            item.pop('cc', None)
-            if not item['first_name']:
-                item['first_name'] = ""
-            if not item['last_name']:
-                item['last_name'] = ""
-            item['groups'] = [self.list_groups[guid] for guid in item['groups']]
-        with open(f"data/users_and_devices/config_users.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
-        print(f"\tСписок локальных пользователей выгружен в файл data/users_and_devices/config_users.json")
+        with JsonWriter("data/users_and_devices/config_users.json") as writer:
+            for item in self.iter_users_list():
+                item.pop('guid')
+                item.pop('creation_date')
+                item.pop('expiration_date')
+                item.pop('cc', None)
+                if not item['first_name']:
+                    item['first_name'] = ""
+                if not item['last_name']:
+                    item['last_name'] = ""
+                item['groups'] = [self.list_groups[guid] for guid in item['groups']]
+                writer.write(item)
+        print(f"\tСписок локальных пользователей выгружен в файл {writer.path}")
 
     def import_users_list(self):
         """Импортировать список локальных пользователей"""
         print('Импорт списка локальных пользователей раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_users.json", "r") as fh:
-                users = json.load(fh)
+            users = JsonArrayReader("data/users_and_devices/config_users.json", prefetch=self.page_size)
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок локальных пользователей не импортирован!\n\tНе найден файл "data/users_and_devices/config_users.json" с сохранённой конфигурацией!\033[0;0m')
             return
 
         for item in users:
+            if self.journal.loaded('list_users', item['name']):
+                continue
             item['groups'] = [self.list_groups[name] for name in item['groups']]
             err, result = self.add_user(item)
             if err == 1:
@@ -1866,41 +2159,37 @@ class UTM(UtmXmlRpc):
                 err2, result2 = self.add_user_in_group(group_guid, item['guid'])
                 if err2 != 0:
                     print("\n", f"\033[31m{result2}\033[0m")
+            if 'guid' in item:
+                self.journal.record('list_users', item['name'], item['guid'])
 
     def export_auth_servers(self):
         """Выгрузить списки серверов авторизации"""
         print('Выгружается список "Cерверы авторизации" раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.makedirs('data/users_and_devices')
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
         ldap, radius, tacacs, ntlm, saml = self.get_auth_servers()
 
-        with open("data/users_and_devices/config_ldap_servers.json", "w") as fd:
-            json.dump(ldap, fd, indent=4, ensure_ascii=False)
+        dump_json(ldap, "data/users_and_devices/config_ldap_servers.json")
         print(f"\tСписок серверов LDAP выгружен в файл 'data/users_and_devices/config_ldap_servers.json'.")
 
-        with open("data/users_and_devices/config_radius_servers.json", "w") as fd:
-            json.dump(radius, fd, indent=4, ensure_ascii=False)
+        dump_json(radius, "data/users_and_devices/config_radius_servers.json")
         print(f"\tСписок серверов RADIUS выгружен в файл 'data/users_and_devices/config_radius_servers.json'.")
 
-        with open("data/users_and_devices/config_tacacs_servers.json", "w") as fd:
-            json.dump(tacacs, fd, indent=4, ensure_ascii=False)
+        dump_json(tacacs, "data/users_and_devices/config_tacacs_servers.json")
         print(f"\tСписок серверов TACACS выгружен в файл 'data/users_and_devices/config_tacacs_static.json'.")
 
-        with open("data/users_and_devices/config_ntlm_servers.json", "w") as fd:
-            json.dump(ntlm, fd, indent=4, ensure_ascii=False)
+        dump_json(ntlm, "data/users_and_devices/config_ntlm_servers.json")
         print(f"\tСписок серверов NTLM выгружен в файл 'data/users_and_devices/config_ntlm_servers.json'.")
 
-        with open("data/users_and_devices/config_saml_servers.json", "w") as fd:
-            json.dump(saml, fd, indent=4, ensure_ascii=False)
+        dump_json(saml, "data/users_and_devices/config_saml_servers.json")
         print(f"\tСписок серверов SAML выгружен в файл 'data/users_and_devices/config_saml_servers.json'.")
 
     def import_ldap_server(self):
         """Импортировать список серверов LDAP"""
         print('Импорт списка серверов LDAP раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_ldap_servers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_ldap_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок серверов LDAP не импортирован!\n\tНе найден файл "data/users_and_devices/config_ldap_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1920,13 +2209,14 @@ class UTM(UtmXmlRpc):
             else:
                 print(f'\tСервер авторизации LDAP "{item["name"]}" добавлен.')
                 print(f'\t\033[36mНеобходимо включить "{item["name"]}", ввести пароль и импортировать keytab файл.\033[0m')
+        # Список LDAP-коннекторов в кэше поиска пользователей и групп устарел.
+        self.ldap.reset()
 
     def import_ntlm_server(self):
         """Импортировать список серверов NTLM"""
         print('Импорт списка серверов NTLM раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_ntlm_servers.json", "r") as fh:
-                ntlm = json.load(fh)
+            ntlm = load_json("data/users_and_devices/config_ntlm_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок серверов LDAP не импортирован!\n\tНе найден файл "data/users_and_devices/config_ntlm_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1948,8 +2238,7 @@ class UTM(UtmXmlRpc):
         """Импортировать список серверов RADIUS"""
         print('Импорт списка серверов RADIUS раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_radius_servers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_radius_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок серверов RADIUS не импортирован!\n\tНе найден файл "data/users_and_devices/config_radius_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1972,8 +2261,7 @@ class UTM(UtmXmlRpc):
         """Импортировать список серверов TACACS"""
         print('Импорт списка серверов TACACS раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_tacacs_servers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_tacacs_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок серверов TACACS не импортирован!\n\tНе найден файл "data/users_and_devices/config_tacacs_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -1996,8 +2284,7 @@ class UTM(UtmXmlRpc):
         """Импортировать список серверов SAML"""
         print('Импорт списка серверов SAML раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_saml_servers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_saml_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок серверов SAML не импортирован!\n\tНе найден файл "data/users_and_devices/config_saml_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2020,7 +2307,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список 2FA профилей"""
         print('Выгружается список "Профили MFA" раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.mkdir('data/users_and_devices')
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
         _, data = self.get_2fa_profiles()
         for item in data:
@@ -2028,16 +2315,14 @@ class UTM(UtmXmlRpc):
                 item['init_notification_profile_id'] = self.list_notifications.get(item['init_notification_profile_id'], item['init_notification_profile_id'])
             else:
                 item['auth_notification_profile_id'] = self.list_notifications.get(item['auth_notification_profile_id'], item['auth_notification_profile_id'])
-        with open("data/users_and_devices/config_2fa_profiles.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/users_and_devices/config_2fa_profiles.json")
         print(f'\tСписок "Профили MFA" выгружен в файл "data/users_and_devices/config_2fa_profiles.json".')
 
     def import_2fa_profiles(self):
         """Импортировать список 2FA профилей"""
         print('Импорт списка "Профили MFA" раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_2fa_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_2fa_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили MFA" не импортирован!\n\tНе найден файл "data/users_and_devices/config_2fa_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2087,7 +2372,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список профилей авторизации"""
         print('Выгружается список "Профили авторизации" раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.makedirs('data/users_and_devices')
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
         _, data = self.get_auth_profiles()
 
@@ -2097,16 +2382,14 @@ class UTM(UtmXmlRpc):
                 if len(auth_method) == 2:
                     self.get_auth_profile_methods(auth_method)
 
-        with open("data/users_and_devices/config_auth_profiles.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/users_and_devices/config_auth_profiles.json")
         print(f'\tСписок "Профили авторизации" выгружен в файл "data/users_and_devices/config_auth_profiles.json".')
 
     def import_auth_profiles(self):
         """Импортировать список профилей авторизации"""
         print('Импорт списка "Профили авторизации" раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_auth_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_auth_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили авторизации" не импортирован!\n\tНе найден файл "data/users_and_devices/config_auth_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2144,7 +2427,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список Captive-профилей"""
         print('Выгружается список "Captive-профили" раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.makedirs('data/users_and_devices')
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
         _, data = self.get_captive_profiles()
 
@@ -2155,24 +2438,21 @@ class UTM(UtmXmlRpc):
             if self.version.startswith('5'):
                 item['ta_groups'] = [self.list_groups[guid] for guid in item['ta_groups']]
             else:
-                result = self._server.v3.accounts.groups.list(self._auth_token, 0, 1000, {})
-                groups = {x['id']: x['name'] for x in result['items'] if result['total']}
+                groups = {x['id']: x['name'] for x in self.iter_items('v3.accounts.groups.list')}
                 item['ta_groups'] = [groups[id] for id in item['ta_groups']]
             item.pop('id', None)
             item.pop('guid', None)
             item.pop('ta_expiration_date', None),
             item.pop('cc', None)
 
-        with open("data/users_and_devices/config_captive_profiles.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/users_and_devices/config_captive_profiles.json")
         print(f'\tСписок "Captive-профили" выгружен в файл "data/users_and_devices/config_captive_profiles.json".')
 
     def import_captive_profiles(self):
         """Импортировать список Captive-профилей"""
         print('Импорт списка "Captive-профили" раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_captive_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_captive_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Captive-профили" не импортирован!\n\tНе найден файл "data/users_and_devices/config_captive_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2180,8 +2460,7 @@ class UTM(UtmXmlRpc):
         if not data:
             print("\tНет Captive-профилей для импорта.")
             return
-        result = self._server.v3.accounts.groups.list(self._auth_token, 0, 1000, {})
-        groups = {x['name']: x['id'] for x in result['items'] if result['total']}
+        groups = {x['name']: x['id'] for x in self.iter_items('v3.accounts.groups.list')}
         for item in data:
             item['captive_template_id'] = self.list_templates.get(item['captive_template_id'], -1)
 
@@ -2222,7 +2501,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил Captive-портала"""
         print('Выгружается список "Captive-портал" раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.makedirs('data/users_and_devices')
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
         _, data = self.get_captive_portal_rules()
 
@@ -2237,8 +2516,7 @@ class UTM(UtmXmlRpc):
             self.set_urls_and_categories(item)
             self.set_time_restrictions(item)
 
-        with open("data/users_and_devices/config_captive_portal_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/users_and_devices/config_captive_portal_rules.json")
         print(f'\tСписок "Captive-портал" выгружен в файл "data/users_and_devices/config_captive_portal_rules.json".')
 
 
@@ -2246,8 +2524,7 @@ class UTM(UtmXmlRpc):
         """Импортировать список правил Captive-портала"""
         print('Импорт списка правил "Captive-портала" раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_captive_portal_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_captive_portal_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Captive-портал" не импортирован!\n\tНе найден файл "data/users_and_devices/config_captive_portal_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2284,10 +2561,11 @@ class UTM(UtmXmlRpc):
         """Выгрузить список Политики BYOD"""
         print('Выгружается список "Политики BYOD" раздела "Пользователи и устройства":')
         if not os.path.isdir('data/users_and_devices'):
-            os.makedirs('data/users_and_devices')
+            os.makedirs('data/users_and_devices', exist_ok=True)
 
         _, data = self.get_byod_policy()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -2295,16 +2573,14 @@ class UTM(UtmXmlRpc):
             item.pop('deleted_users', None)
             self.get_names_users_and_groups(item)
 
-        with open("data/users_and_devices/config_byod_policy.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/users_and_devices/config_byod_policy.json")
         print(f'\tСписок "Политики BYOD" выгружен в файл "data/users_and_devices/config_byod_policy.json".')
 
     def import_byod_policy(self):
         """Импортировать список Политики BYOD"""
         print('Импорт списка "Политики BYOD" раздела "Пользователи и устройства":')
         try:
-            with open("data/users_and_devices/config_byod_policy.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/users_and_devices/config_byod_policy.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Политики BYOD" не импортирован!\n\tНе найден файл "data/users_and_devices/config_byod_policy.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2316,6 +2592,7 @@ class UTM(UtmXmlRpc):
         total, byods = self.get_byod_policy()
         self.byod_rules = {x['name']: x['id'] for x in byods if total}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.get_guids_users_and_groups(item)
             err, result = self.add_byod_policy(item)
@@ -2335,44 +2612,42 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил межсетевого экрана"""
         print('Выгружается список "Межсетевой экран" раздела "Политики сети":')
         if not os.path.isdir('data/network_policies'):
-            os.makedirs('data/network_policies')
+            os.makedirs('data/network_policies', exist_ok=True)
 
         duplicate = {}
-        _, data = self.get_firewall_rules()
-
-        for item in data:
-            if item['name'] in duplicate.keys():
-                num = duplicate[item['name']]
-                num = num + 1
-                duplicate[item['name']] = num
-                item['name'] = f"{item['name']} {num}"
-            else:
-                duplicate[item['name']] = 0
-            item.pop('id', None)
-            item.pop('rownumber', None)
-            item.pop('guid', None)
-            item.pop('position_layer', None),
-            item.pop('deleted_users', None)
-            item['name'] = item['name'].strip()
-            if item['scenario_rule_id']:
-                item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
-            self.get_names_users_and_groups(item)
-            self.set_src_zone_and_ips(item)
-            self.set_dst_zone_and_ips(item)
-            self.set_time_restrictions(item)
-            item['services'] = [self.services[x] for x in item['services']]
-            self.get_apps(item['apps'])
-
-        with open("data/network_policies/config_firewall_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
-        print(f'\tСписок "Межсетевой экран" выгружен в файл "data/network_policies/config_firewall_rules.json".')
+        with JsonWriter("data/network_policies/config_firewall_rules.json") as writer:
+            for data in chunks(self.iter_firewall_rules(), self.page_size):
+                self.prefetch_ldap_names(data)
+                for item in data:
+                    if item['name'] in duplicate.keys():
+                        num = duplicate[item['name']]
+                        num = num + 1
+                        duplicate[item['name']] = num
+                        item['name'] = f"{item['name']} {num}"
+                    else:
+                        duplicate[item['name']] = 0
+                    item.pop('id', None)
+                    item.pop('rownumber', None)
+                    item.pop('guid', None)
+                    item.pop('position_layer', None),
+                    item.pop('deleted_users', None)
+                    item['name'] = item['name'].strip()
+                    if item['scenario_rule_id']:
+                        item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    self.get_names_users_and_groups(item)
+                    self.set_src_zone_and_ips(item)
+                    self.set_dst_zone_and_ips(item)
+                    self.set_time_restrictions(item)
+                    item['services'] = [self.services[x] for x in item['services']]
+                    self.get_apps(item['apps'])
+                    writer.write(item)
+        print(f'\tСписок "Межсетевой экран" выгружен в файл "{writer.path}".')
 
     def import_firewall_rules(self):
         """Импортировать список правил межсетевого экрана"""
         print('Импорт списка "Межсетевой экран" раздела "Политики сети":')
         try:
-            with open("data/network_policies/config_firewall_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = JsonArrayReader("data/network_policies/config_firewall_rules.json", prefetch=self.page_size)
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Межсетевой экран" не импортирован!\n\tНе найден файл "data/network_policies/config_firewall_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2383,81 +2658,95 @@ class UTM(UtmXmlRpc):
 
         total, firewall = self.get_firewall_rules()
         self.firewall_rules = {x['name']: x['id'] for x in firewall if total}
-
-        for item in data:
-            if item['scenario_rule_id']:
+        current = {x['name']: x for x in firewall} if self.diff_import else {}
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0}
+
+        for page in chunks(data, self.page_size):
+            page = [x for x in page if not self.journal.loaded('firewall_rules', x['name'])]
+            self.prefetch_ldap_guids(page)
+            for item in page:
+                if item['scenario_rule_id']:
+                    try:
+                        item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    except KeyError as err:
+                        print(f'\t\033[33mНе найден сценарий {err} для правила "{item["name"]}".\n\tЗагрузите сценарии и повторите попытку.\033[0m')
+                        item['scenario_rule_id'] = False
+                self.get_guids_users_and_groups(item)
+                self.set_src_zone_and_ips(item)
+                self.set_dst_zone_and_ips(item)
+                self.set_time_restrictions(item)
                 try:
-                    item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    item['services'] = [self.services[x] for x in item['services']]
                 except KeyError as err:
-                    print(f'\t\033[33mНе найден сценарий {err} для правила "{item["name"]}".\n\tЗагрузите сценарии и повторите попытку.\033[0m')
-                    item['scenario_rule_id'] = False
-            self.get_guids_users_and_groups(item)
-            self.set_src_zone_and_ips(item)
-            self.set_dst_zone_and_ips(item)
-            self.set_time_restrictions(item)
-            try:
-                item['services'] = [self.services[x] for x in item['services']]
-            except KeyError as err:
-                print(f'\t\033[33mНе найден сервис {err} для правила "{item["name"]}".\n\tЗагрузите сервисы и повторите попытку.\033[0m')
-                item['services'] = []
-            try:
-                self.get_apps(item['apps'])
-            except KeyError as err:
-                print(f'\t\033[33mНе найдено приложение {err} для правила "{item["name"]}".\n\tЗагрузите приложения и повторите попытку.\033[0m')
-                item['apps'] = []
+                    print(f'\t\033[33mНе найден сервис {err} для правила "{item["name"]}".\n\tЗагрузите сервисы и повторите попытку.\033[0m')
+                    item['services'] = []
+                try:
+                    self.get_apps(item['apps'])
+                except KeyError as err:
+                    print(f'\t\033[33mНе найдено приложение {err} для правила "{item["name"]}".\n\tЗагрузите приложения и повторите попытку.\033[0m')
+                    item['apps'] = []
 
-            err, result = self.add_firewall_rule(item)
-            if err == 1:
-                print(result, end= ' - ')
-                err1, result1 = self.update_firewall_rule(item)
-                if err1 != 0:
-                    print("\n", f"\033[31m{result1}\033[0m")
+                if item['name'] in current:
+                    if same_config(item, current[item['name']]):
+                        stats['unchanged'] += 1
+                        continue
+                    err, result = 1, f'\tПравило МЭ "{item["name"]}" изменено.'
                 else:
-                    print("\033[32mUpdated!\033[0;0m")
-            elif err == 2:
-                print(f"\033[31m{result}\033[0m")
-            else:
-                print(f'\tПравило МЭ "{item["name"]}" добавлено.')
+                    err, result = self.add_firewall_rule(item)
+                if err == 1:
+                    print(result, end= ' - ')
+                    err1, result1 = self.update_firewall_rule(item)
+                    if err1 != 0:
+                        print("\n", f"\033[31m{result1}\033[0m")
+                    else:
+                        stats['updated'] += 1
+                        self.journal.record('firewall_rules', item['name'], self.firewall_rules.get(item['name']))
+                        print("\033[32mUpdated!\033[0;0m")
+                elif err == 2:
+                    print(f"\033[31m{result}\033[0m")
+                else:
+                    stats['created'] += 1
+                    self.journal.record('firewall_rules', item['name'], result)
+                    print(f'\tПравило МЭ "{item["name"]}" добавлено.')
+        self.print_import_stats(stats)
 
     def export_nat_rules(self):
         """Выгрузить список правил NAT"""
         print('Выгружается список "NAT и маршрутизация" раздела "Политики сети":')
         if not os.path.isdir('data/network_policies'):
-            os.makedirs('data/network_policies')
-
-        _, data = self.get_traffic_rules()
+            os.makedirs('data/network_policies', exist_ok=True)
 
-        for item in data:
-            item.pop('id', None)
-            item.pop('cc', None)
-            item.pop('guid', None)
-            item.pop('position_layer', None),
-            item.pop('log_limit', None)
-            item.pop('log_limit_value', None)
-            item.pop('log_limit_burst', None)
-            item['log_session_start'] = True
-            if item['scenario_rule_id']:
-                item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
-            if self.version.startswith('6'):
-                self.get_names_users_and_groups(item)
-            self.set_src_zone_and_ips(item)
-            self.set_dst_zone_and_ips(item)
-            try:
-                item['service'] = [self.services[x] for x in item['service']]
-            except TypeError as err:
-                print(f'\t\033[33mНе найден сервис для правила "{item["name"]}".\n\t{item["service"]}\033[0m')
-                item['service'] = []
-
-        with open("data/network_policies/config_nat_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
-        print(f'\tСписок "NAT и маршрутизация" выгружен в файл "data/network_policies/config_nat_rules.json".')
+        with JsonWriter("data/network_policies/config_nat_rules.json") as writer:
+            for data in chunks(self.iter_traffic_rules(), self.page_size):
+                self.prefetch_ldap_names(data)
+                for item in data:
+                    item.pop('id', None)
+                    item.pop('cc', None)
+                    item.pop('guid', None)
+                    item.pop('position_layer', None),
+                    item.pop('log_limit', None)
+                    item.pop('log_limit_value', None)
+                    item.pop('log_limit_burst', None)
+                    item['log_session_start'] = True
+                    if item['scenario_rule_id']:
+                        item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    if self.version.startswith('6'):
+                        self.get_names_users_and_groups(item)
+                    self.set_src_zone_and_ips(item)
+                    self.set_dst_zone_and_ips(item)
+                    try:
+                        item['service'] = [self.services[x] for x in item['service']]
+                    except TypeError as err:
+                        print(f'\t\033[33mНе найден сервис для правила "{item["name"]}".\n\t{item["service"]}\033[0m')
+                        item['service'] = []
+                    writer.write(item)
+        print(f'\tСписок "NAT и маршрутизация" выгружен в файл "{writer.path}".')
 
     def import_nat_rules(self):
         """Импортировать список правил NAT"""
         print('Импорт списка "NAT и маршрутизация" раздела "Политики сети":')
         try:
-            with open("data/network_policies/config_nat_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = JsonArrayReader("data/network_policies/config_nat_rules.json", prefetch=self.page_size)
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "NAT и маршрутизация" не импортирован!\n\tНе найден файл "data/network_policies/config_nat_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2468,44 +2757,60 @@ class UTM(UtmXmlRpc):
 
         total, list_nat = self.get_traffic_rules()
         self.nat_rules = {x['name']: x['id'] for x in list_nat if total}
-
-        for item in data:
-            if item['scenario_rule_id']:
+        current = {x['name']: x for x in list_nat} if self.diff_import else {}
+        stats = {'created': 0, 'updated': 0, 'unchanged': 0}
+
+        for page in chunks(data, self.page_size):
+            page = [x for x in page if not self.journal.loaded('nat_rules', x['name'])]
+            self.prefetch_ldap_guids(page)
+            for item in page:
+                if item['scenario_rule_id']:
+                    try:
+                        item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    except KeyError as err:
+                        print(f'\t\033[33mНе найден сценарий {err} для правила "{item["name"]}".\n\tЗагрузите сценарии и повторите попытку.\033[0m')
+                        item['scenario_rule_id'] = False
+                if self.version.startswith('6'):
+                    self.get_guids_users_and_groups(item)
+                self.set_src_zone_and_ips(item)
+                self.set_dst_zone_and_ips(item)
                 try:
-                    item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    item['service'] = [self.services[x] for x in item['service']]
                 except KeyError as err:
-                    print(f'\t\033[33mНе найден сценарий {err} для правила "{item["name"]}".\n\tЗагрузите сценарии и повторите попытку.\033[0m')
-                    item['scenario_rule_id'] = False
-            if self.version.startswith('6'):
-                self.get_guids_users_and_groups(item)
-            self.set_src_zone_and_ips(item)
-            self.set_dst_zone_and_ips(item)
-            try:
-                item['service'] = [self.services[x] for x in item['service']]
-            except KeyError as err:
-                print(f'\t\033[33mНе найден сервис {err} для правила "{item["name"]}".\n\tЗагрузите сервисы и повторите попытку.\033[0m')
-                item['service'] = []
-            if item['action'] == 'route':
-                print(f'\t\033[33mПроверьте шлюз для правила ПБР "{item["name"]}".\n\tВ случае отсутствия, установите вручную.\033[0m')
-
-            err, result = self.add_traffic_rule(item)
-            if err == 1:
-                print(result, end= ' - ')
-                err1, result1 = self.update_traffic_rule(item)
-                if err1 != 0:
-                    print("\n", f"\033[31m{result1}\033[0m")
+                    print(f'\t\033[33mНе найден сервис {err} для правила "{item["name"]}".\n\tЗагрузите сервисы и повторите попытку.\033[0m')
+                    item['service'] = []
+                if item['action'] == 'route':
+                    print(f'\t\033[33mПроверьте шлюз для правила ПБР "{item["name"]}".\n\tВ случае отсутствия, установите вручную.\033[0m')
+
+                if item['name'] in current:
+                    if same_config(item, current[item['name']]):
+                        stats['unchanged'] += 1
+                        continue
+                    err, result = 1, f'\tПравило "{item["name"]}" изменено.'
                 else:
-                    print("\033[32mUpdated!\033[0;0m")
-            elif err == 2:
-                print(f"\033[31m{result}\033[0m")
-            else:
-                print(f'\tПравило "{item["name"]}" добавлено.')
+                    err, result = self.add_traffic_rule(item)
+                if err == 1:
+                    print(result, end= ' - ')
+                    err1, result1 = self.update_traffic_rule(item)
+                    if err1 != 0:
+                        print("\n", f"\033[31m{result1}\033[0m")
+                    else:
+                        stats['updated'] += 1
+                        self.journal.record('nat_rules', item['name'], self.nat_rules.get(item['name']))
+                        print("\033[32mUpdated!\033[0;0m")
+                elif err == 2:
+                    print(f"\033[31m{result}\033[0m")
+                else:
+                    stats['created'] += 1
+                    self.journal.record('nat_rules', item['name'], result)
+                    print(f'\tПравило "{item["name"]}" добавлено.')
+        self.print_import_stats(stats)
 
     def export_icap_servers(self):
         """Выгрузить список серверов ICAP"""
         print('Выгружается список "ICAP-серверы" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         _, data = self.get_icap_servers()
 
@@ -2513,8 +2818,7 @@ class UTM(UtmXmlRpc):
             item.pop('id', None)
             item.pop('cc', None)
 
-        with open("data/security_policies/config_icap_servers.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_icap_servers.json")
         print(f'\tСписок "ICAP-серверы" выгружен в файл "data/security_policies/config_icap_servers.json".')
 
 
@@ -2522,8 +2826,7 @@ class UTM(UtmXmlRpc):
         """Импортировать список серверов ICAP"""
         print('Импорт списка "ICAP-серверы" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_icap_servers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_icap_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "ICAP-серверы" не импортирован!\n\tНе найден файл "data/security_policies/config_icap_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2552,7 +2855,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил балансировки нагрузки"""
         print('Выгружается список "Балансировка нагрузки" раздела "Политики сети":')
         if not os.path.isdir('data/network_policies'):
-            os.makedirs('data/network_policies')
+            os.makedirs('data/network_policies', exist_ok=True)
 
         total, data = self.get_icap_servers()
         self.icap_servers = {x['id']: x['name'] for x in data if total}
@@ -2569,16 +2872,13 @@ class UTM(UtmXmlRpc):
             item.pop('id', None)
             item['profiles'] = [self.reverse_servers[x] for x in item['profiles']]
 
-        with open("data/network_policies/config_loadbalancing_tcpudp.json", "w") as fd:
-            json.dump(tcpudp, fd, indent=4, ensure_ascii=False)
+        dump_json(tcpudp, "data/network_policies/config_loadbalancing_tcpudp.json")
         print(f'\tСписок балансировщиков TCP/UDP выгружен в файл "data/network_policies/config_loadbalancing_tcpudp.json".')
 
-        with open("data/network_policies/config_loadbalancing_icap.json", "w") as fd:
-            json.dump(icap, fd, indent=4, ensure_ascii=False)
+        dump_json(icap, "data/network_policies/config_loadbalancing_icap.json")
         print(f'\tСписок балансировщиков ICAP выгружен в файл "data/network_policies/config_loadbalancing_icap.json".')
 
-        with open("data/network_policies/config_loadbalancing_reverse.json", "w") as fd:
-            json.dump(reverse, fd, indent=4, ensure_ascii=False)
+        dump_json(reverse, "data/network_policies/config_loadbalancing_reverse.json")
         print(f'\tСписок балансировщиков reverse-прокси выгружен в файл "data/network_policies/config_loadbalancing_reverse.json".')
 
     def import_loadbalancing_rules(self):
@@ -2590,8 +2890,7 @@ class UTM(UtmXmlRpc):
         self.reverse_rules = {x['name']: x['id'] for x in reverse}
 
         try:
-            with open("data/network_policies/config_loadbalancing_tcpudp.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network_policies/config_loadbalancing_tcpudp.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок балансировщиков TCP/UDP не импортирован!\n\tНе найден файл "data/network_policies/config_loadbalancing_tcpudp.json" с сохранённой конфигурацией!\033[0;0m')
         else:
@@ -2613,8 +2912,7 @@ class UTM(UtmXmlRpc):
                 print('\tНет правил в списке балансировщиков TCP/UDP для импорта.')
 
         try:
-            with open("data/network_policies/config_loadbalancing_icap.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network_policies/config_loadbalancing_icap.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок балансировщиков ICAP не импортирован!\n\tНе найден файл "data/network_policies/config_loadbalancing_icap.json" с сохранённой конфигурацией!\033[0;0m')
         else:
@@ -2644,8 +2942,7 @@ class UTM(UtmXmlRpc):
                 print('\tНет правил в списке балансировщиков ICAP для импорта.')
 
         try:
-            with open("data/network_policies/config_loadbalancing_reverse.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network_policies/config_loadbalancing_reverse.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок балансировщиков reverse-proxy не импортирован!\n\tНе найден файл "data/network_policies/config_loadbalancing_reverse.json" с сохранённой конфигурацией!\033[0;0m')
         else:
@@ -2675,13 +2972,14 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил пропускной способности"""
         print('Выгружается список "Пропускная способность" раздела "Политики сети":')
         if not os.path.isdir('data/network_policies'):
-            os.makedirs('data/network_policies')
+            os.makedirs('data/network_policies', exist_ok=True)
 
         total, data = self.get_shaper_list()
         self.shaper = {x['id']: x['name'] for x in data if total}
 
         _, data = self.get_shaper_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -2698,16 +2996,14 @@ class UTM(UtmXmlRpc):
             self.set_time_restrictions(item)
             item['pool'] = self.shaper[item['pool']]
 
-        with open("data/network_policies/config_shaper_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network_policies/config_shaper_rules.json")
         print(f'\tСписок "Пропускная способность" выгружен в файл "data/network_policies/config_shaper_rules.json".')
 
     def import_shaper_rules(self):
         """Импортировать список правил пропускной способности"""
         print('Импорт списка "Пропускная способность" раздела "Политики сети":')
         try:
-            with open("data/network_policies/config_shaper_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network_policies/config_shaper_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Пропускная способность" не импортирован!\n\tНе найден файл "data/network_policies/config_shaper_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2719,6 +3015,7 @@ class UTM(UtmXmlRpc):
         _, shaperrules = self.get_shaper_rules()
         shaper_rules = {x['name']: x['id'] for x in shaperrules}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             if item['scenario_rule_id']:
                 try:
@@ -2763,61 +3060,56 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил фильтрации контента"""
         print('Выгружается список "Фильтрация контента" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
-
-        result = self._server.v2.nlists.list(self._auth_token, 'morphology', 0, 1000, {})
-        self.list_morph = {x['id']: x['name'] for x in result['items'] if result['count']}
-        result = self._server.v2.nlists.list(self._auth_token, 'useragent', 0, 1000, {})
-        self.list_useragent = {x['id']: x['name'] for x in result['items'] if result['count']}
-
-        _, data = self.get_content_rules()
-        data.pop()    # удаляем последнее правило (защищённое).
+            os.makedirs('data/security_policies', exist_ok=True)
 
-        for item in data:
-            item.pop('id', None)
-            item.pop('rownumber', None)
-            item.pop('guid', None)
-            item.pop('position_layer', None)
-            item.pop('deleted_users', None)
-            item['blockpage_template_id'] = self.list_templates.get(item['blockpage_template_id'], -1)
-            if item['scenario_rule_id']:
-                item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
-            self.get_names_users_and_groups(item)
-            self.set_src_zone_and_ips(item)
-            self.set_dst_zone_and_ips(item)
-            self.set_time_restrictions(item)
-            self.set_urls_and_categories(item)
-            item['morph_categories'] = [self.list_morph[x] for x in item['morph_categories']]
-            item['referers'] = [self.list_url[x] for x in item['referers']]
-            for x in item['user_agents']:
-                x[1] = self.list_useragent[x[1]] if x[0] == 'list_id' else x[1]
-            try:
-                item['content_types'] = [self.list_mime[x] for x in item['content_types']]
-            except KeyError as err:
-                print(f'\t\033[33mНе найден mime (тип контента) "{err}" для правила "{item["name"]}".\033[0m')
-                print(f'\t\033[33mВозможно нет лицензии и UTM не обновил списки типов контента.\033[0m')
-                item['content_types'] = []
-            if 'referer_categories' in item.keys():
-                try:
-                    for x in item['referer_categories']:
-                        if x[0] == 'list_id':
-                            x[1] = self.list_urlcategorygroup[x[1]]
-                        elif x[0] == 'category_id':
-                            x[1] = self._categories[x[1]]
-                except KeyError as err:
-                    print(f'\t\033[33mНе найдена группа URL-категорий {err} для правила "{item["name"]}".\n\tЗагрузите ктегории URL и повторите попытку.\033[0m')
-                    item['referer_categories'] = []
+        self.list_morph = {x['id']: x['name'] for x in self.iter_items('v2.nlists.list', 'morphology')}
+        self.list_useragent = {x['id']: x['name'] for x in self.iter_items('v2.nlists.list', 'useragent')}
 
-        with open("data/security_policies/config_content_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
-        print(f'\tСписок "Фильтрация контента" выгружен в файл "data/security_policies/config_content_rules.json".')
+        with JsonWriter("data/security_policies/config_content_rules.json") as writer:
+            for data in chunks(all_but_last(self.iter_content_rules()), self.page_size):
+                self.prefetch_ldap_names(data)
+                for item in data:
+                    item.pop('id', None)
+                    item.pop('rownumber', None)
+                    item.pop('guid', None)
+                    item.pop('position_layer', None)
+                    item.pop('deleted_users', None)
+                    item['blockpage_template_id'] = self.list_templates.get(item['blockpage_template_id'], -1)
+                    if item['scenario_rule_id']:
+                        item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    self.get_names_users_and_groups(item)
+                    self.set_src_zone_and_ips(item)
+                    self.set_dst_zone_and_ips(item)
+                    self.set_time_restrictions(item)
+                    self.set_urls_and_categories(item)
+                    item['morph_categories'] = [self.list_morph[x] for x in item['morph_categories']]
+                    item['referers'] = [self.list_url[x] for x in item['referers']]
+                    for x in item['user_agents']:
+                        x[1] = self.list_useragent[x[1]] if x[0] == 'list_id' else x[1]
+                    try:
+                        item['content_types'] = [self.list_mime[x] for x in item['content_types']]
+                    except KeyError as err:
+                        print(f'\t\033[33mНе найден mime (тип контента) "{err}" для правила "{item["name"]}".\033[0m')
+                        print(f'\t\033[33mВозможно нет лицензии и UTM не обновил списки типов контента.\033[0m')
+                        item['content_types'] = []
+                    if 'referer_categories' in item.keys():
+                        try:
+                            for x in item['referer_categories']:
+                                if x[0] == 'list_id':
+                                    x[1] = self.list_urlcategorygroup[x[1]]
+                                elif x[0] == 'category_id':
+                                    x[1] = self._categories[x[1]]
+                        except KeyError as err:
+                            print(f'\t\033[33mНе найдена группа URL-категорий {err} для правила "{item["name"]}".\n\tЗагрузите ктегории URL и повторите попытку.\033[0m')
+                            item['referer_categories'] = []
+                    writer.write(item)
+        print(f'\tСписок "Фильтрация контента" выгружен в файл "{writer.path}".')
 
     def import_content_rules(self):
         """Импортировать список правил фильтрации контента"""
         print('Импорт списка "Фильтрация контента" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_content_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = JsonArrayReader("data/security_policies/config_content_rules.json", prefetch=self.page_size)
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Фильтрация контента" не импортирован!\n\tНе найден файл "data/security_policies/config_content_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2829,74 +3121,80 @@ class UTM(UtmXmlRpc):
         _, rules = self.get_content_rules()
         content_rules = {x['name']: x['id'] for x in rules}
 
-        for item in data:
-            item['blockpage_template_id'] = self.list_templates.get(item['blockpage_template_id'], -1)
-            if item['scenario_rule_id']:
+        for page in chunks(data, self.page_size):
+            page = [x for x in page if not self.journal.loaded('content_rules', x['name'])]
+            self.prefetch_ldap_guids(page)
+            for item in page:
+                item['blockpage_template_id'] = self.list_templates.get(item['blockpage_template_id'], -1)
+                if item['scenario_rule_id']:
+                    try:
+                        item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    except KeyError as err:
+                        print(f'\t\033[33mНе найден сценарий {err} для правила "{item["name"]}".\n\tЗагрузите сценарии и повторите попытку.\033[0m')
+                        item['scenario_rule_id'] = False
+                self.get_guids_users_and_groups(item)
+                self.set_src_zone_and_ips(item)
+                self.set_dst_zone_and_ips(item)
+                self.set_time_restrictions(item)
+                self.set_urls_and_categories(item)
                 try:
-                    item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
+                    item['morph_categories'] = [self.list_morph[x] for x in item['morph_categories']]
                 except KeyError as err:
-                    print(f'\t\033[33mНе найден сценарий {err} для правила "{item["name"]}".\n\tЗагрузите сценарии и повторите попытку.\033[0m')
-                    item['scenario_rule_id'] = False
-            self.get_guids_users_and_groups(item)
-            self.set_src_zone_and_ips(item)
-            self.set_dst_zone_and_ips(item)
-            self.set_time_restrictions(item)
-            self.set_urls_and_categories(item)
-            try:
-                item['morph_categories'] = [self.list_morph[x] for x in item['morph_categories']]
-            except KeyError as err:
-                print(f'\t\033[33mНе найден список морфрлогии {err} для правила "{item["name"]}".\n\tЗагрузите списки морфологии и повторите попытку.\033[0m')
-                item['morph_categories'] = []
-            try:
-                item['referers'] = [self.list_url[x] for x in item['referers']]
-            except KeyError as err:
-                print(f'\t\033[33mНе найден список URL {err} для правила "{item["name"]}".\n\tЗагрузите списки URL и повторите попытку.\033[0m')
-                item['referers'] = []
-            try:
-                for x in item['user_agents']:
-                    x[1] = self.list_useragent[x[1]] if x[0] == 'list_id' else x[1]
-            except KeyError as err:
-                print(f'\t\033[33mНе найден useragent {err} для правила "{item["name"]}".\n\tЗагрузите список Useragent браузеров и повторите попытку.\033[0m')
-                item['user_agents'] = []
-            try:
-                item['content_types'] = [self.list_mime[x] for x in item['content_types']]
-            except KeyError as err:
-                print(f'\t\033[33mНе найден тип контента {err} для правила "{item["name"]}".\n\tЗагрузите список типов контента и повторите попытку.\033[0m')
-                item['content_types'] = []
-            if 'referer_categories' in item.keys():
+                    print(f'\t\033[33mНе найден список морфрлогии {err} для правила "{item["name"]}".\n\tЗагрузите списки морфологии и повторите попытку.\033[0m')
+                    item['morph_categories'] = []
                 try:
-                    for x in item['referer_categories']:
-                        if x[0] == 'list_id':
-                            x[1] = self.list_urlcategorygroup[x[1]]
-                        elif x[0] == 'category_id':
-                            x[1] = self._categories[x[1]]
+                    item['referers'] = [self.list_url[x] for x in item['referers']]
+                except KeyError as err:
+                    print(f'\t\033[33mНе найден список URL {err} для правила "{item["name"]}".\n\tЗагрузите списки URL и повторите попытку.\033[0m')
+                    item['referers'] = []
+                try:
+                    for x in item['user_agents']:
+                        x[1] = self.list_useragent[x[1]] if x[0] == 'list_id' else x[1]
                 except KeyError as err:
-                    print(f'\t\033[33mНе найдена группа URL-категорий {err} для правила "{item["name"]}".\n\tЗагрузите ктегории URL и повторите попытку.\033[0m')
-                    item['referer_categories'] = []
+                    print(f'\t\033[33mНе найден useragent {err} для правила "{item["name"]}".\n\tЗагрузите список Useragent браузеров и повторите попытку.\033[0m')
+                    item['user_agents'] = []
+                try:
+                    item['content_types'] = [self.list_mime[x] for x in item['content_types']]
+                except KeyError as err:
+                    print(f'\t\033[33mНе найден тип контента {err} для правила "{item["name"]}".\n\tЗагрузите список типов контента и повторите попытку.\033[0m')
+                    item['content_types'] = []
+                if 'referer_categories' in item.keys():
+                    try:
+                        for x in item['referer_categories']:
+                            if x[0] == 'list_id':
+                                x[1] = self.list_urlcategorygroup[x[1]]
+                            elif x[0] == 'category_id':
+                                x[1] = self._categories[x[1]]
+                    except KeyError as err:
+                        print(f'\t\033[33mНе найдена группа URL-категорий {err} для правила "{item["name"]}".\n\tЗагрузите ктегории URL и повторите попытку.\033[0m')
+                        item['referer_categories'] = []
 
-            if item['name'] in content_rules:
-                print(f'\tПравило "{item["name"]}" уже существует', end= ' - ')
-                err1, result1 = self.update_content_rule(content_rules[item['name']], item)
-                if err1 == 2:
-                    print("\n", f"\033[31m{result1}\033[0m")
-                else:
-                    print("\033[32mUpdated!\033[0;0m")
-            else:
-                err, result = self.add_content_rule(item)
-                if err == 2:
-                    print(f"\033[31m{result}\033[0m")
+                if item['name'] in content_rules:
+                    print(f'\tПравило "{item["name"]}" уже существует', end= ' - ')
+                    err1, result1 = self.update_content_rule(content_rules[item['name']], item)
+                    if err1 == 2:
+                        print("\n", f"\033[31m{result1}\033[0m")
+                    else:
+                        self.journal.record('content_rules', item['name'], content_rules[item['name']])
+                        print("\033[32mUpdated!\033[0;0m")
                 else:
-                    content_rules[item['name']] = result
-                    print(f'\tПравило "{item["name"]}" добавлено.')
+                    err, result = self.add_content_rule(item)
+                    if err == 2:
+                        print(f"\033[31m{result}\033[0m")
+                    else:
+                        content_rules[item['name']] = result
+                        self.journal.record('content_rules', item['name'], result)
+                        print(f'\tПравило "{item["name"]}" добавлено.')
 
     def export_safebrowsing_rules(self):
         """Выгрузить список правил веб-безопасности"""
         print('Выгружается список "Веб-безопасность" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         _, data = self.get_safebrowsing_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -2908,16 +3206,14 @@ class UTM(UtmXmlRpc):
             self.set_src_zone_and_ips(item)
             item['url_list_exclusions'] = [self.list_url[x] for x in item['url_list_exclusions']]
 
-        with open("data/security_policies/config_safebrowsing_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_safebrowsing_rules.json")
         print(f'\tСписок "Веб-безопасность" выгружен в файл "data/security_policies/config_safebrowsing_rules.json".')
 
     def import_safebrowsing_rules(self):
         """Импортировать список правил веб-безопасности"""
         print('Импорт списка "Веб-безопасность" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_safebrowsing_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_safebrowsing_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Веб-безопасность" не импортирован!\n\tНе найден файл "data/security_policies/config_safebrowsing_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -2929,6 +3225,7 @@ class UTM(UtmXmlRpc):
         _, rules = self.get_safebrowsing_rules()
         safebrowsing_rules = {x['name']: x['id'] for x in rules}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.get_guids_users_and_groups(item)
             self.set_time_restrictions(item)
@@ -2958,7 +3255,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил инспектирования SSL"""
         print('Выгружается список "Инспектирование SSL" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         if self.version.startswith('6'):
             _, data = self.get_ssl_profiles_list()
@@ -2966,6 +3263,7 @@ class UTM(UtmXmlRpc):
 
         _, data = self.get_ssldecrypt_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -2979,16 +3277,14 @@ class UTM(UtmXmlRpc):
             self.set_time_restrictions(item)
             item['ssl_profile_id'] = self.list_ssl_profiles[item['ssl_profile_id']] if 'ssl_profile_id' in item else 'Default SSL profile'
 
-        with open("data/security_policies/config_ssldecrypt_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_ssldecrypt_rules.json")
         print(f'\tСписок "Инспектирование SSL" выгружен в файл "data/security_policies/config_ssldecrypt_rules.json".')
 
     def import_ssldecrypt_rules(self):
         """Импортировать список правил инспектирования SSL"""
         print('Импорт списка "Инспектирование SSL" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_ssldecrypt_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_ssldecrypt_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Инспектирование SSL" не импортирован!\n\tНе найден файл "data/security_policies/config_ssldecrypt_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3000,6 +3296,7 @@ class UTM(UtmXmlRpc):
         _, rules = self.get_ssldecrypt_rules()
         ssldecrypt_rules = {x['name']: x['id'] for x in rules}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.get_guids_users_and_groups(item)
             self.set_src_zone_and_ips(item)
@@ -3032,10 +3329,11 @@ class UTM(UtmXmlRpc):
         if self.version.startswith('6'):
             print('Выгружается список "Инспектирование SSH" раздела "Политики безопасности":')
             if not os.path.isdir('data/security_policies'):
-                os.makedirs('data/security_policies')
+                os.makedirs('data/security_policies', exist_ok=True)
 
             _, data = self.get_sshdecrypt_rules()
 
+            self.prefetch_ldap_names(data)
             for item in data:
                 item.pop('id', None)
                 item.pop('rownumber', None)
@@ -3047,16 +3345,14 @@ class UTM(UtmXmlRpc):
                 self.set_time_restrictions(item)
                 item['protocols'] = [self.services[x] for x in item['protocols']]
 
-            with open("data/security_policies/config_sshdecrypt_rules.json", "w") as fd:
-                json.dump(data, fd, indent=4, ensure_ascii=False)
+            dump_json(data, "data/security_policies/config_sshdecrypt_rules.json")
             print(f'\tСписок "Инспектирование SSH" выгружен в файл "data/security_policies/config_sshdecrypt_rules.json".')
 
     def import_sshdecrypt_rules(self):
         """Импортировать список правил инспектирования SSH"""
         print('Импорт списка "Инспектирование SSH" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_sshdecrypt_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_sshdecrypt_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Инспектирование SSH" не импортирован!\n\tНе найден файл "data/security_policies/config_sshdecrypt_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3068,6 +3364,7 @@ class UTM(UtmXmlRpc):
         _, rules = self.get_sshdecrypt_rules()
         sshdecrypt_rules = {x['name']: x['id'] for x in rules}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.get_guids_users_and_groups(item)
             self.set_src_zone_and_ips(item)
@@ -3098,10 +3395,9 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил СОВ"""
         print('Выгружается список "СОВ" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
-        result = self._server.v2.nlists.list(self._auth_token, 'ipspolicy', 0, 1000, {})
-        idps_profiles = {x['id']: x['name'] for x in result['items']}
+        idps_profiles = {x['id']: x['name'] for x in self.iter_items('v2.nlists.list', 'ipspolicy')}
 
         _, data = self.get_idps_rules()
 
@@ -3132,16 +3428,14 @@ class UTM(UtmXmlRpc):
             else:
                 item['idps_profiles_exclusions'] = []
 
-        with open("data/security_policies/config_idps_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_idps_rules.json")
         print(f'\tСписок "СОВ" выгружен в файл "data/security_policies/config_idps_rules.json".')
 
     def import_idps_rules(self):
         """Импортировать список правил СОВ"""
         print('Импорт списка "СОВ" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_idps_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_idps_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "СОВ" не импортирован!\n\tНе найден файл "data/security_policies/config_idps_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3150,8 +3444,7 @@ class UTM(UtmXmlRpc):
             print("\tНет правил СОВ для импорта.")
             return
 
-        result = self._server.v2.nlists.list(self._auth_token, 'ipspolicy', 0, 1000, {})
-        idps_profiles = {x['name']: x['id'] for x in result['items']}
+        idps_profiles = {x['name']: x['id'] for x in self.iter_items('v2.nlists.list', 'ipspolicy')}
 
         _, rules = self.get_idps_rules()
         idps_rules = {x['name']: x['id'] for x in rules}
@@ -3194,7 +3487,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил АСУ ТП"""
         print('Выгружается список "Правила АСУ ТП" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         _, result = self.get_scada_list()
         scada_profiles = {x['id']: x['name'] for x in result}
@@ -3211,16 +3504,14 @@ class UTM(UtmXmlRpc):
             item['services'] = [self.services[x] for x in item['services']]
             item['scada_profiles'] = [scada_profiles[x] for x in item['scada_profiles']]
 
-        with open("data/security_policies/config_scada_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_scada_rules.json")
         print(f'\tСписок "Правила АСУ ТП" выгружен в файл "data/security_policies/config_scada_rules.json".')
 
     def import_scada_rules(self):
         """Импортировать список правил АСУ ТП"""
         print('Импорт списка "Правила АСУ ТП" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_scada_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_scada_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Правила АСУ ТП" не импортирован!\n\tНе найден файл "data/security_policies/config_scada_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3265,7 +3556,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список сценариев"""
         print('Выгружается список "Сценарии" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         _, data = self.get_scenarios_rules()
 
@@ -3284,16 +3575,14 @@ class UTM(UtmXmlRpc):
                 elif condition['kind'] == 'url_category':
                     condition['url_categories'] = [[x[0], self.list_urlcategorygroup[x[1]] if x[0] == 'list_id' else self._categories[x[1]]] for x in condition['url_categories']]
 
-        with open("data/security_policies/config_scenarios.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_scenarios.json")
         print(f'\tСписок "Сценарии" выгружен в файл "data/security_policies/config_scenarios.json".')
 
     def import_scenarios(self):
         """Импортировать список сценариев"""
         print('Импорт списка "Сценарии" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_scenarios.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_scenarios.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Сценарии" не импортирован!\n\tНе найден файл "data/security_policies/config_scenarios.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3340,13 +3629,14 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил защиты почтового трафика"""
         print('Выгружается список "Защита почтового трафика" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         _, result = self.get_nlist_list('emailgroup')
         email = {x['id']: x['name'] for x in result}
 
         _, data = self.get_mailsecurity_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -3365,8 +3655,7 @@ class UTM(UtmXmlRpc):
             item['envelope_from'] = [[x[0], email[x[1]]] for x in item['envelope_from']]
             item['envelope_to'] = [[x[0], email[x[1]]] for x in item['envelope_to']]
 
-        with open("data/security_policies/config_mailsecurity_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_mailsecurity_rules.json")
         print(f'\tСписок "Защита почтового трафика" выгружен в файл "data/security_policies/config_mailsecurity_rules.json".')
 
         dnsbl, batv = self.get_mailsecurity_dnsbl()
@@ -3378,20 +3667,17 @@ class UTM(UtmXmlRpc):
             if x[0] == 'list_id':
                 x[1] = self.list_IP[x[1]]
 
-        with open("data/security_policies/config_mailsecurity_dnsbl.json", "w") as fd:
-            json.dump(dnsbl, fd, indent=4, ensure_ascii=False)
+        dump_json(dnsbl, "data/security_policies/config_mailsecurity_dnsbl.json")
         print(f'\tНастройки DNSBL выгружены в файл "data/security_policies/config_mailsecurity_dnsbl.json".')
 
-        with open("data/security_policies/config_mailsecurity_batv.json", "w") as fd:
-            json.dump(batv, fd, indent=4, ensure_ascii=False)
+        dump_json(batv, "data/security_policies/config_mailsecurity_batv.json")
         print(f'\tНастройки BATV выгружены в файл "data/security_policies/config_mailsecurity_batv.json".')
 
     def import_mailsecurity_rules(self):
         """Импортировать список правил защиты почтового трафика"""
         print('Импорт списка "Защита почтового трафика" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_mailsecurity_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_mailsecurity_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Защита почтового трафика" не импортирован!\n\tНе найден файл "data/security_policies/config_mailsecurity_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3406,6 +3692,7 @@ class UTM(UtmXmlRpc):
         _, rules = self.get_mailsecurity_rules()
         mailsecurity_rules = {x['name']: x['id'] for x in rules}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.set_src_zone_and_ips(item)
             self.set_dst_zone_and_ips(item)
@@ -3441,12 +3728,16 @@ class UTM(UtmXmlRpc):
                     mailsecurity_rules[item['name']] = result
                     print(f'\tПравило "{item["name"]}" добавлено.')
 
+    def import_mailsecurity(self):
+        """Импортировать правила защиты почтового трафика и настройки DNSBL"""
+        self.import_mailsecurity_rules()
+        self.import_mailsecurity_dnsbl()
+
     def import_mailsecurity_dnsbl(self):
         """Импортировать dnsbl и batv защиты почтового трафика"""
         print('Импорт списка DNSBL защиты почтового трафика:')
         try:
-            with open("data/security_policies/config_mailsecurity_dnsbl.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_mailsecurity_dnsbl.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок DNSBL не импортирован!\n\tНе найден файл "data/security_policies/config_mailsecurity_dnsbl.json" с сохранённой конфигурацией!\033[0;0m')
         else:
@@ -3473,8 +3764,7 @@ class UTM(UtmXmlRpc):
 
         print('Импорт настройки BATV защиты почтового трафика:')
         try:
-            with open("data/security_policies/config_mailsecurity_batv.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_mailsecurity_batv.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mНастройка BATV не импортированы!\n\tНе найден файл "data/security_policies/config_mailsecurity_batv.json" с сохранённой конфигурацией!\033[0;0m')
         else:
@@ -3491,7 +3781,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил ICAP"""
         print('Выгружается список "ICAP-правила" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         total, icapservers = self.get_icap_servers()
         self.icap_servers = {x['id']: x['name'] for x in icapservers if total}
@@ -3500,6 +3790,7 @@ class UTM(UtmXmlRpc):
 
         _, data = self.get_icap_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('guid', None)
@@ -3522,16 +3813,14 @@ class UTM(UtmXmlRpc):
             self.set_urls_and_categories(item)
             item['content_types'] = [self.list_mime[x] for x in item['content_types']]
 
-        with open("data/security_policies/config_icap_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_icap_rules.json")
         print(f'\tСписок "ICAP-правила" выгружен в файл "data/security_policies/config_icap_rules.json".')
 
     def import_icap_rules(self):
         """Импортировать список правил ICAP"""
         print('Импорт списка "ICAP-правила" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_icap_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_icap_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "ICAP-правила" не импортирован!\n\tНе найден файл "data/security_policies/config_icap_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3547,6 +3836,7 @@ class UTM(UtmXmlRpc):
         total, icaprules = self.get_icap_rules()
         icap_rules = {x['name']: x['id'] for x in icaprules if total}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             for server in item['servers']:
                 if server[0] == 'lbrule':
@@ -3584,7 +3874,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список профилей DoS"""
         print('Выгружается список "Профили DoS" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         _, data = self.get_dos_profiles()
 
@@ -3593,16 +3883,14 @@ class UTM(UtmXmlRpc):
             item.pop('guid', None)
             item.pop('cc', None)
 
-        with open("data/security_policies/config_dos_profiles.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_dos_profiles.json")
         print(f'\tСписок "Профили DoS" выгружен в файл "data/security_policies/config_dos_profiles.json".')
 
     def import_dos_profiles(self):
         """Импортировать список профилей DoS"""
         print('Импорт списка "Профили DoS" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_dos_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_dos_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили DoS" не импортирован!\n\tНе найден файл "data/security_policies/config_dos_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3634,13 +3922,14 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил защиты DoS"""
         print('Выгружается список "Правила защиты DoS" раздела "Политики безопасности":')
         if not os.path.isdir('data/security_policies'):
-            os.makedirs('data/security_policies')
+            os.makedirs('data/security_policies', exist_ok=True)
 
         total, dos = self.get_dos_profiles()
         dos_profiles = {x['id']: x['name'] for x in dos if total}
 
         _, data = self.get_dos_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -3655,16 +3944,14 @@ class UTM(UtmXmlRpc):
             if item['scenario_rule_id']:
                 item['scenario_rule_id'] = self.scenarios_rules[item['scenario_rule_id']]
 
-        with open("data/security_policies/config_dos_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/security_policies/config_dos_rules.json")
         print(f'\tСписок "Правила защиты DoS" выгружен в файл "data/security_policies/config_dos_rules.json".')
 
     def import_dos_rules(self):
         """Импортировать список правил защиты DoS"""
         print('Импорт списка "Правила защиты DoS" раздела "Политики безопасности":')
         try:
-            with open("data/security_policies/config_dos_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/security_policies/config_dos_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Правила защиты DoS" не импортирован!\n\tНе найден файл "data/security_policies/config_dos_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3679,6 +3966,7 @@ class UTM(UtmXmlRpc):
         total, rules = self.get_dos_rules()
         dos_rules = {x['name']: x['id'] for x in rules if total}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.get_guids_users_and_groups(item)
             self.set_src_zone_and_ips(item)
@@ -3720,7 +4008,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список URL-ресурсов веб-портала"""
         print('Выгружается список "Веб-портал" раздела "Глобальный портал":')
         if not os.path.isdir('data/proxy_portal'):
-            os.makedirs('data/proxy_portal')
+            os.makedirs('data/proxy_portal', exist_ok=True)
 
         if self.version.startswith('6'):
             _, result = self.get_ssl_profiles_list()
@@ -3730,6 +4018,7 @@ class UTM(UtmXmlRpc):
 
         _, data = self.get_proxyportal_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -3744,16 +4033,14 @@ class UTM(UtmXmlRpc):
                 item['mapping_url_ssl_profile_id'] = 0
                 item['mapping_url_certificate_id'] = 0
 
-        with open("data/proxy_portal/config_web_portal.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/proxy_portal/config_web_portal.json")
         print(f'\tСписок "Веб-портал" выгружен в файл "data/proxy_portal/config_web_portal.json".')
 
     def import_proxyportal_rules(self):
         """Импортировать список URL-ресурсов веб-портала"""
         print('Импорт списка "Веб-портал" раздела "Глобальный портал":')
         try:
-            with open("data/proxy_portal/config_web_portal.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/proxy_portal/config_web_portal.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Веб-портал" не импортирован!\n\tНе найден файл "data/proxy_portal/config_web_portal.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3767,6 +4054,7 @@ class UTM(UtmXmlRpc):
         _, result = self.get_proxyportal_rules()
         list_proxyportal = {x['name']: x['id'] for x in result}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.get_guids_users_and_groups(item)
             try:
@@ -3801,7 +4089,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список серверов reverse-прокси"""
         print('Выгружается список "Серверы reverse-прокси" раздела "Глобальный портал":')
         if not os.path.isdir('data/proxy_portal'):
-            os.makedirs('data/proxy_portal')
+            os.makedirs('data/proxy_portal', exist_ok=True)
 
         _, data = self.get_reverseproxy_servers()
 
@@ -3810,16 +4098,14 @@ class UTM(UtmXmlRpc):
             item.pop('guid', None)
             item.pop('cc', None)
 
-        with open("data/proxy_portal/config_reverseproxy_servers.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/proxy_portal/config_reverseproxy_servers.json")
         print(f'\tСписок "Серверы reverse-прокси" выгружен в файл "data/proxy_portal/config_reverseproxy_servers.json".')
 
     def import_reverseproxy_servers(self):
         """Импортировать список серверов reverse-прокси"""
         print('Импорт списка "Серверы reverse-прокси" раздела "Глобальный портал":')
         try:
-            with open("data/proxy_portal/config_reverseproxy_servers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/proxy_portal/config_reverseproxy_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Серверы reverse-прокси" не импортирован!\n\tНе найден файл "data/proxy_portal/config_reverseproxy_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3848,10 +4134,9 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил reverse-прокси"""
         print('Выгружается список "Правила reverse-прокси" раздела "Глобальный портал":')
         if not os.path.isdir('data/proxy_portal'):
-            os.makedirs('data/proxy_portal')
+            os.makedirs('data/proxy_portal', exist_ok=True)
 
-        result = self._server.v2.nlists.list(self._auth_token, 'useragent', 0, 1000, {})
-        self.list_useragent = {x['id']: x['name'] for x in result['items'] if result['count']}
+        self.list_useragent = {x['id']: x['name'] for x in self.iter_items('v2.nlists.list', 'useragent')}
 
         _, _, reverse = self.get_loadbalancing_rules()
         self.reverse_rules = {x['id']: x['name'] for x in reverse}
@@ -3865,6 +4150,7 @@ class UTM(UtmXmlRpc):
 
         _, data = self.get_reverseproxy_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('guid', None)
@@ -3906,16 +4192,14 @@ class UTM(UtmXmlRpc):
                     print(f'\t\t\033[33mУстановлено значение по умолчанию.\033[0m')
                     x = ['profile', 'Example reverse proxy server']
 
-        with open("data/proxy_portal/config_reverseproxy_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/proxy_portal/config_reverseproxy_rules.json")
         print(f'\tСписок "Правила reverse-прокси" выгружен в файл "data/proxy_portal/config_reverseproxy_rules.json".')
 
     def import_reverseproxy_rules(self):
         """Импортировать список правил reverse-прокси"""
         print('Импорт списка "Правила reverse-прокси" раздела "Глобальный портал":')
         try:
-            with open("data/proxy_portal/config_reverseproxy_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/proxy_portal/config_reverseproxy_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Правила reverse-прокси" не импортирован!\n\tНе найден файл "data/proxy_portal/config_reverseproxy_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -3933,6 +4217,7 @@ class UTM(UtmXmlRpc):
         _, result = self.get_reverseproxy_rules()
         reverseproxy_rules = {x['name']: x['id'] for x in result}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             self.set_src_zone_and_ips(item)
             self.set_dst_zone_and_ips(item)
@@ -3985,7 +4270,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список профилей безопасности VPN"""
         print('Выгружается список "Профили безопасности VPN" раздела "VPN":')
         if not os.path.isdir('data/vpn'):
-            os.makedirs('data/vpn')
+            os.makedirs('data/vpn', exist_ok=True)
 
         _, data = self.get_vpn_security_profiles()
 
@@ -3993,16 +4278,14 @@ class UTM(UtmXmlRpc):
             item.pop('id', None)
             item.pop('cc', None)
 
-        with open("data/vpn/config_vpn_security_profiles.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/vpn/config_vpn_security_profiles.json")
         print(f'\tСписок "Профили безопасности VPN" выгружен в файл "data/vpn/config_vpn_security_profiles.json".')
 
     def import_vpn_security_profiles(self):
         """Импортировать список профилей безопасности VPN"""
         print('Импорт списка "Профили безопасности VPN" раздела "VPN":')
         try:
-            with open("data/vpn/config_vpn_security_profiles.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/vpn/config_vpn_security_profiles.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Профили безопасности VPN" не импортирован!\n\tНе найден файл "data/vpn/config_vpn_security_profiles.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4034,7 +4317,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список сетей VPN"""
         print('Выгружается список "Сети VPN" раздела "VPN":')
         if not os.path.isdir('data/vpn'):
-            os.makedirs('data/vpn')
+            os.makedirs('data/vpn', exist_ok=True)
 
         _, data = self.get_vpn_networks()
 
@@ -4045,16 +4328,14 @@ class UTM(UtmXmlRpc):
                 if x[0] == 'list_id':
                     x[1] = self.list_IP[x[1]]
 
-        with open("data/vpn/config_vpn_networks.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/vpn/config_vpn_networks.json")
         print(f'\tСписок "Сети VPN" выгружен в файл "data/vpn/config_vpn_networks.json".')
 
     def import_vpn_networks(self):
         """Импортировать список сетей VPN"""
         print('Импорт списка "Сети VPN" раздела "VPN":')
         try:
-            with open("data/vpn/config_vpn_networks.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/vpn/config_vpn_networks.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Сети VPN" не импортирован!\n\tНе найден файл "data/vpn/config_vpn_networks.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4090,7 +4371,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список серверных правил VPN"""
         print('Выгружается список "Серверные правила" раздела "VPN":')
         if not os.path.isdir('data/vpn'):
-            os.makedirs('data/vpn')
+            os.makedirs('data/vpn', exist_ok=True)
 
         _, result = self.get_vpn_security_profiles()
         security_profiles = {x['id']: x['name'] for x in result}
@@ -4099,6 +4380,7 @@ class UTM(UtmXmlRpc):
 
         _, data = self.get_vpn_server_rules()
 
+        self.prefetch_ldap_names(data)
         for item in data:
             item.pop('id', None)
             item.pop('rownumber', None)
@@ -4123,16 +4405,14 @@ class UTM(UtmXmlRpc):
             item['tunnel_id'] = vpn_networks[item['tunnel_id']]
             item['auth_profile_id'] = self.auth_profiles[item['auth_profile_id']]
 
-        with open("data/vpn/config_vpn_server_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/vpn/config_vpn_server_rules.json")
         print(f'\tСписок "Серверные правила" выгружен в файл "data/vpn/config_vpn_server_rules.json".')
 
     def import_vpn_server_rules(self):
         """Импортировать список серверных правил VPN"""
         print('Импорт списка "Серверные правила" раздела "VPN":')
         try:
-            with open("data/vpn/config_vpn_server_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/vpn/config_vpn_server_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Серверные правила" не импортирован!\n\tНе найден файл "data/vpn/config_vpn_server_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4148,6 +4428,7 @@ class UTM(UtmXmlRpc):
         _, result = self.get_vpn_server_rules()
         vpn_server_rules = {x['name']: x['id'] for x in result}
 
+        self.prefetch_ldap_guids(data)
         for item in data:
             if item['src_zones']:
                 try:
@@ -4211,7 +4492,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список клиентских правил VPN"""
         print('Выгружается список "Клиентские правила" раздела "VPN":')
         if not os.path.isdir('data/vpn'):
-            os.makedirs('data/vpn')
+            os.makedirs('data/vpn', exist_ok=True)
 
         _, result = self.get_vpn_security_profiles()
         vpn_security_profiles = {x['id']: x['name'] for x in result}
@@ -4224,16 +4505,14 @@ class UTM(UtmXmlRpc):
             item.pop('cc', None)
             item['security_profile_id'] = vpn_security_profiles[item['security_profile_id']]
 
-        with open("data/vpn/config_vpn_client_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/vpn/config_vpn_client_rules.json")
         print(f'\tСписок "Клиентские правила" выгружен в файл "data/vpn/config_vpn_client_rules.json".')
 
     def import_vpn_client_rules(self):
         """Импортировать список клиентских правил VPN"""
         print('Импорт списка "Клиентские правила" раздела "VPN":')
         try:
-            with open("data/vpn/config_vpn_client_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/vpn/config_vpn_client_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Клиентские правила" не импортирован!\n\tНе найден файл "data/vpn/config_vpn_client_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4275,19 +4554,17 @@ class UTM(UtmXmlRpc):
         """Выгрузить список зон"""
         print('Выгружается список "Зоны" раздела "Сеть":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
 
         _, data = self.get_zones_list()
-        with open("data/network/config_zones.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network/config_zones.json")
         print(f"\tСписок зон выгружен в файл 'data/network/config_zones.json'.")
 
     def import_zones(self):
         """Импортировать зоны на UTM"""
         print('Импорт списка "Зоны" раздела "Сеть":')
         try:
-            with open("data/network/config_zones.json", "r") as fd:
-                zones = json.load(fd)
+            zones = load_json("data/network/config_zones.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Зоны" не импортирован!\n\tНе найден файл "data/network/config_zones.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4312,7 +4589,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список шлюзов"""
         print('Выгружается список "Шлюзы" раздела "Сеть":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
 
         _, data = self.get_interfaces_list()
         iface_name = self.translate_iface_name(data)
@@ -4334,16 +4611,14 @@ class UTM(UtmXmlRpc):
                 item['is_automatic'] = False
                 item['vrf'] = 'default'
 
-        with open("data/network/config_gateways.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network/config_gateways.json")
         print(f'\tСписок "Шлюзы" выгружен в файл "data/network/config_gateways.json".')
 
     def import_gateways_list(self):
         """Импортировать список шлюзов"""
         print('Импорт списка "Шлюзы" раздела "Сеть":')
         try:
-            with open("data/network/config_gateways.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_gateways.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Шлюзы" не импортирован!\n\tНе найден файл "data/network/config_gateways.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4376,20 +4651,18 @@ class UTM(UtmXmlRpc):
         """Выгрузить настройки проверки сети шлюзов"""
         print('Выгружаются настройки "Проверка сети" раздела "Сеть/Шлюзы":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
 
         _, data = self.get_gateway_failover()
 
-        with open("data/network/config_gateway_failover.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network/config_gateway_failover.json")
         print(f'\tНастройки "Проверка сети" выгружены в файл "data/network/config_gateway_failover.json".')
 
     def import_gateway_failover(self):
         """Импортировать список шлюзов"""
         print('Импорт настроек "Проверка сети" раздела "Сеть/Шлюзы":')
         try:
-            with open("data/network/config_gateway_failover.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_gateway_failover.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mНастройки "Проверка сети" не импортированы!\n\tНе найден файл "data/network/config_gateway_failover.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4404,7 +4677,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список интерфейсов"""
         print('Выгружается список "Интерфейсы" раздела "Сеть":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
 
         _, result = self.get_netflow_profiles_list()
         self.list_netflow = {x['id']: x['name'] for x in result}
@@ -4468,16 +4741,14 @@ class UTM(UtmXmlRpc):
                         item['dhcp_relay'].pop('iface_id', None)
         data.sort(key=lambda x: x['name'])
 
-        with open("data/network/config_interfaces.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network/config_interfaces.json")
         print(f'\tСписок интерфейсов выгружен в файл "data/network/config_interfaces.json".')
 
     def import_interfaces(self):
         """Импортировать интерфесы"""
         print('Импорт списка "Интерфейсы" раздела "Сеть":')
         try:
-            with open("data/network/config_interfaces.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_interfaces.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Интерфейсы" не импортированы!\n\tНе найден файл "data/network/config_interfaces.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4673,7 +4944,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список DHCP"""
         print('Выгружается список "DHCP" раздела "Сеть":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
 
         _, data = self.get_interfaces_list()
         iface_name = self.translate_iface_name(data)
@@ -4683,16 +4954,14 @@ class UTM(UtmXmlRpc):
         for item in data:
             item['iface_id'] = iface_name[item['iface_id']]
 
-        with open("data/network/config_dhcp_subnets.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network/config_dhcp_subnets.json")
         print(f"\tСписок подсетей DHCP выгружен в файл 'data/network/config_dhcp_subnets.json'.")
 
     def import_dhcp_subnets(self):
         """Добавить DHCP subnets на UTM"""
         print("Импорт DHCP subnets:")
         try:
-            with open("data/network/config_dhcp_subnets.json", "r") as fd:
-                subnets = json.load(fd)
+            subnets = load_json("data/network/config_dhcp_subnets.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "DHCP" не импортирован!\n\tНе найден файл "data/network/config_dhcp_subnets.json.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4731,7 +5000,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить настройки DNS"""
         print('Выгружаются настройки DNS раздела "Сеть":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
         params = (
             'use_cache_enabled',
             'enable_dns_filtering',
@@ -4745,29 +5014,24 @@ class UTM(UtmXmlRpc):
 
         dns_servers, dns_rules, static_records = self.get_dns_config()
 
-        with open("data/network/config_dns_servers.json", "w") as fd:
-            json.dump(dns_servers, fd, indent=4, ensure_ascii=False)
+        dump_json(dns_servers, "data/network/config_dns_servers.json")
         print(f"\tСписок системных DNS серверов выгружен в файл 'data/network/config_dns_servers.json'.")
 
-        with open("data/network/config_dns_rules.json", "w") as fd:
-            json.dump(dns_rules, fd, indent=4, ensure_ascii=False)
+        dump_json(dns_rules, "data/network/config_dns_rules.json")
         print(f"\tСписок правил DNS прокси выгружен в файл 'data/network/config_dns_rules.json'.")
 
-        with open("data/network/config_dns_static.json", "w") as fd:
-            json.dump(static_records, fd, indent=4, ensure_ascii=False)
+        dump_json(static_records, "data/network/config_dns_static.json")
         print(f"\tСтатические записи DNS прокси выгружены в файл 'data/network/config_dns_static.json'.")
 
         _, data = self.get_settings_params(params)
-        with open("data/network/config_dns_proxy.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network/config_dns_proxy.json")
         print(f"\tНастройки DNS-прокси выгружены в файл 'data/network/config_dns_proxy.json'.")
 
     def import_dns_proxy(self):
         """Импортировать настройки DNS прокси"""
         print('Импорт настроек DNS-прокси раздела "Сеть":')
         try:
-            with open("data/network/config_dns_proxy.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_dns_proxy.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mНастройки DNS-прокси не импортированы!\n\tНе найден файл "data/network/config_dns_proxy.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4782,8 +5046,7 @@ class UTM(UtmXmlRpc):
         """Импортировать список системных DNS серверов"""
         print('Импорт системных DNS серверов раздела "Сеть":')
         try:
-            with open("data/network/config_dns_servers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_dns_servers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок системных DNS серверов не импортирован!\n\tНе найден файл "data/network/config_dns_servers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4801,13 +5064,12 @@ class UTM(UtmXmlRpc):
         """Импортировать список правил DNS прокси"""
         print('Импорт списка правил DNS-прокси раздела "Сеть":')
         try:
-            with open("data/network/config_dns_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_dns_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок правил DNS прокси не импортирован!\n\tНе найден файл "data/network/config_dns_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
 
-        dns_rules = [x['name'] for x in self._server.v1.dns.rules.list(self._auth_token, 0, 1000, {})['items']]
+        dns_rules = [x['name'] for x in self.iter_items('v1.dns.rules.list')]
         for item in data:
             if item['name'] in dns_rules:
                 print(f'\tПравило DNS прокси "{item["name"]}" уже существует.')
@@ -4824,8 +5086,7 @@ class UTM(UtmXmlRpc):
         """Импортировать статические записи DNS прокси"""
         print('Импорт статических записей DNS-прокси раздела "Сеть":')
         try:
-            with open("data/network/config_dns_static.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_dns_static.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСтатические записи DNS прокси не импортированы!\n\tНе найден файл "data/network/config_dns_static.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4852,7 +5113,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил WCCP"""
         print('Выгружается список "WCCP" раздела "Сеть":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
 
         err, data = self.get_wccp_list()
         if err == 1:
@@ -4866,16 +5127,14 @@ class UTM(UtmXmlRpc):
                 for x in item['routers']:
                     x[1] = self.list_IP[x[1]] if x[0] == 'list_id' else x[1]
 
-        with open("data/network/config_wccp.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/network/config_wccp.json")
         print(f'\tСписок "WCCP" выгружен в файл "data/network/config_wccp.json".')
 
     def import_wccp_rules(self):
         """Импортировать список правил WCCP"""
         print('Импорт списка правил WCCP раздела "Сеть":')
         try:
-            with open("data/network/config_wccp.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_wccp.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок правил WCCP не импортирован!\n\tНе найден файл "data/network/config_wccp.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -4922,7 +5181,7 @@ class UTM(UtmXmlRpc):
         else:
             print('Выгружается список "Виртуальные маршрутизаторы" раздела "Сеть":')
         if not os.path.isdir('data/network'):
-            os.makedirs('data/network')
+            os.makedirs('data/network', exist_ok=True)
 
         _, data = self.get_interfaces_list()
         iface_name = self.translate_iface_name(data)
@@ -4960,8 +5219,7 @@ class UTM(UtmXmlRpc):
         else:
             routers = data
 
-        with open("data/network/config_routers.json", "w") as fd:
-            json.dump(routers, fd, indent=4, ensure_ascii=False)
+        dump_json(routers, "data/network/config_routers.json")
         print(f'\tСписок "Статические маршруты" выгружен в файл "data/network/config_routers.json".')
 
     def export_ospf_config(self):
@@ -4979,11 +5237,10 @@ class UTM(UtmXmlRpc):
                     'pimsm': {},
                 },]
             if not os.path.isdir('data/network'):
-                os.makedirs('data/network')
+                os.makedirs('data/network', exist_ok=True)
             else:
                 try:
-                    with open("data/network/config_routers.json", "r") as fh:
-                        data = json.load(fh)
+                    data = load_json("data/network/config_routers.json")
                 except FileNotFoundError as err:
                     pass
 
@@ -5004,8 +5261,7 @@ class UTM(UtmXmlRpc):
             for item in data:
                 if item['name'] == 'default':
                     item['ospf'] = ospf
-                    with open("data/network/config_routers.json", "w") as fd:
-                        json.dump(data, fd, indent=4, ensure_ascii=False)
+                    dump_json(data, "data/network/config_routers.json")
                     print(f'\tКонфигурация OSPF выгружена в файл "data/network/config_routers.json".')
                     break
 
@@ -5022,11 +5278,10 @@ class UTM(UtmXmlRpc):
                     'pimsm': {},
                 },]
             if not os.path.isdir('data/network'):
-                os.makedirs('data/network')
+                os.makedirs('data/network', exist_ok=True)
             else:
                 try:
-                    with open("data/network/config_routers.json", "r") as fh:
-                        data = json.load(fh)
+                    data = load_json("data/network/config_routers.json")
                 except FileNotFoundError as err:
                     pass
 
@@ -5050,8 +5305,7 @@ class UTM(UtmXmlRpc):
             for item in data:
                 if item['name'] == 'default':
                     item['bgp'] = bgp
-                    with open("data/network/config_routers.json", "w") as fd:
-                        json.dump(data, fd, indent=4, ensure_ascii=False)
+                    dump_json(data, "data/network/config_routers.json")
                     print(f'\tКонфигурация BGP выгружена в файл "data/network/config_routers.json".')
                     break
 
@@ -5059,8 +5313,7 @@ class UTM(UtmXmlRpc):
         """Импортировать список виртуальных маршрутизаторов"""
         print(f'Импорт списка "Виртуальные маршрутизаторы" раздела "Сеть":')
         try:
-            with open("data/network/config_routers.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/network/config_routers.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mВиртуальные маршрутизаторы не импортированы!\n\tНе найден файл "data/network/config_routers.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -5090,23 +5343,21 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил SNMP"""
         print('Выгружается список правил SNMP раздела "Диагностика и мониторинг/Оповещения":')
         if not os.path.isdir('data/notifications'):
-            os.makedirs('data/notifications')
+            os.makedirs('data/notifications', exist_ok=True)
 
         data = self.get_snmp_rules()
 
         for item in data:
             item.pop('id', None)
 
-        with open("data/notifications/config_snmp_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/notifications/config_snmp_rules.json")
         print(f'\tСписок правил SNMP выгружен в файл "data/notifications/config_snmp_rules.json".')
 
     def import_snmp_rules(self):
         """Импортировать список правил SNMP"""
         print('Импорт списка правил SNMP раздела "Диагностика и мониторинг/Оповещения":')
         try:
-            with open("data/notifications/config_snmp_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/notifications/config_snmp_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок правил SNMP не импортирован!\n\tНе найден файл "data/notifications/config_snmp_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -5133,7 +5384,7 @@ class UTM(UtmXmlRpc):
         """Выгрузить список правил оповещений"""
         print('Выгружается список "Правила оповещений" раздела "Диагностика и мониторинг/Оповещения":')
         if not os.path.isdir('data/notifications'):
-            os.makedirs('data/notifications')
+            os.makedirs('data/notifications', exist_ok=True)
 
         _, email_group = self.get_nlist_list('emailgroup')
         _, phone_group = self.get_nlist_list('phonegroup')
@@ -5148,16 +5399,14 @@ class UTM(UtmXmlRpc):
             item['emails'] = [[x[0], email_group[x[1]]] for x in item['emails']]
             item['phones'] = [[x[0], phone_group[x[1]]] for x in item['phones']]
 
-        with open("data/notifications/config_alert_rules.json", "w") as fd:
-            json.dump(data, fd, indent=4, ensure_ascii=False)
+        dump_json(data, "data/notifications/config_alert_rules.json")
         print(f'\tСписок "Правила оповещений" выгружен в файл "data/notifications/config_alert_rules.json".')
 
     def import_notification_alert_rules(self):
         """Импортировать список правил оповещений"""
         print('Импорт списка "Правила оповещений" раздела "Диагностика и мониторинг/Оповещения":')
         try:
-            with open("data/notifications/config_alert_rules.json", "r") as fh:
-                data = json.load(fh)
+            data = load_json("data/notifications/config_alert_rules.json")
         except FileNotFoundError as err:
             print(f'\t\033[31mСписок "Правила оповещений" не импортирован!\n\tНе найден файл "data/notifications/config_alert_rules.json" с сохранённой конфигурацией!\033[0;0m')
             return
@@ -5217,8 +5466,7 @@ class UTM(UtmXmlRpc):
                         iface_name[key] = f'port{ports_num}.{vlan}'
         else:
             iface_name = {x['name']: x['name'] for x in data}
-        with open("data/iface_translate.json", "w") as fd:
-            json.dump(iface_name, fd, indent=4, ensure_ascii=False)
+        dump_json(iface_name, "data/iface_translate.json", fmt='indent')
         return iface_name
 
     def set_src_zone_and_ips(self, item):
@@ -5319,6 +5567,32 @@ class UTM(UtmXmlRpc):
                 except KeyError as err:
                     print(f'\t\033[33mНе найдено приложение №{err}.\n\tВозможно нет лицензии, и UTM не получил список приложений l7.\n\tЗагрузите приложения или установите лицензию и повторите попытку.\033[0m')
 
+    def prefetch_ldap_names(self, data):
+        """
+        Найти имена всех доменных пользователей и групп из правил data одной пачкой запросов,
+        чтобы get_names_users_and_groups() брал их из кэша (см. UtmXmlRpc.ldap).
+        """
+        refs = []
+        for item in data:
+            for x in item.get('users') or []:
+                if (x[0] == 'user' and x[1] not in self.list_users) or (x[0] == 'group' and x[1] not in self.list_groups):
+                    refs.append((x[0], x[1]))
+        self.ldap.prefetch_names(refs)
+
+    def prefetch_ldap_guids(self, data):
+        """
+        Найти GUID всех доменных пользователей и групп из правил data одной пачкой запросов,
+        чтобы get_guids_users_and_groups() брал их из кэша (см. UtmXmlRpc.ldap).
+        """
+        refs = []
+        for item in data:
+            for x in item.get('users') or []:
+                if x[0] in ('user', 'group') and x[1]:
+                    domain, _, name = x[1].partition("\\")
+                    if name:
+                        refs.append((x[0], domain, name))
+        self.ldap.prefetch_guids(refs)
+
     def get_names_users_and_groups(self, item):
         """
         Получить имена групп и пользователей по их GUID.
@@ -5398,6 +5672,360 @@ class UTM(UtmXmlRpc):
         else:
             item['users'] = []
 
+# Разделы экспорта по номерам команд меню: {команда: (метод UTM, аргументы, команды-зависимости)}.
+# Раздел запускается после своих зависимостей, если они выбраны для экспорта вместе с ним:
+# он использует объекты или словари id->name, которые обновляют эти разделы.
+EXPORT_SECTIONS = {
+    101: ('export_morphology_lists', (), ()),
+    102: ('export_services_list', (), ()),
+    103: ('export_IP_lists', (), ()),
+    104: ('export_useragent_lists', (), ()),
+    105: ('export_mime_lists', (), ()),
+    106: ('export_url_lists', (), ()),
+    107: ('export_time_restricted_lists', (), ()),
+    108: ('export_shaper_list', (), ()),
+    109: ('export_scada_list', (), ()),
+    110: ('export_templates_list', (), ()),
+    111: ('export_categories_groups', (), ()),
+    112: ('export_custom_url_list', (), ()),
+    113: ('export_application_groups', (), ()),
+    114: ('export_nlist_groups', ('emailgroup',), ()),
+    115: ('export_nlist_groups', ('phonegroup',), ()),
+    116: ('export_ips_profiles', (), ()),
+    117: ('export_notification_profiles_list', (), ()),
+    118: ('export_netflow_profiles_list', (), ()),
+    119: ('export_ssl_profiles_list', (), ()),
+    201: ('export_zones_list', (), ()),
+    202: ('export_interfaces_list', (), (118, 201)),
+    203: ('export_gateways_list', (), ()),
+    204: ('export_gateway_failover', (), ()),
+    205: ('export_dhcp_subnets', (), (202,)),
+    206: ('export_dns_config', (), ()),
+    207: ('export_routers_list', (), (202,)),
+    208: ('export_ospf_config', (), (202,)),
+    209: ('export_bgp_config', (), (202,)),
+    210: ('export_wccp_list', (), ()),
+    301: ('export_ui', (), ()),
+    302: ('export_ntp', (), ()),
+    303: ('export_settings', (), ()),
+    304: ('export_proxy_portal', (), ()),
+    305: ('export_admin_profiles_list', (), ()),
+    306: ('export_admin_config', (), ()),
+    307: ('export_admins_list', (), (305,)),
+    308: ('export_certivicates_list', (), ()),
+    401: ('export_groups_lists', (), ()),
+    402: ('export_users_lists', (), (401,)),
+    403: ('export_2fa_profiles', (), ()),
+    404: ('export_auth_servers', (), ()),
+    405: ('export_auth_profiles', (), (403, 404)),
+    406: ('export_captive_profiles', (), (405,)),
+    407: ('export_captive_portal_rules', (), (406,)),
+    408: ('export_byod_policy', (), ()),
+    501: ('export_firewall_rules', (), (102, 103, 607)),
+    502: ('export_nat_rules', (), (102, 103)),
+    503: ('export_loadbalancing_rules', (), (609,)),
+    504: ('export_shaper_rules', (), (108,)),
+    601: ('export_content_rules', (), (101, 104, 106)),
+    602: ('export_safebrowsing_rules', (), ()),
+    603: ('export_ssldecrypt_rules', (), (119,)),
+    604: ('export_sshdecrypt_rules', (), ()),
+    605: ('export_idps_rules', (), (116,)),
+    606: ('export_scada_rules', (), (109,)),
+    607: ('export_scenarios', (), ()),
+    608: ('export_mailsecurity_rules', (), (114,)),
+    609: ('export_icap_servers', (), ()),
+    610: ('export_icap_rules', (), (503, 609)),
+    611: ('export_dos_profiles', (), ()),
+    612: ('export_dos_rules', (), (611,)),
+    701: ('export_proxyportal_rules', (), ()),
+    702: ('export_reverseproxy_servers', (), ()),
+    703: ('export_reverseproxy_rules', (), (503, 601, 702)),
+    801: ('export_vpn_security_profiles', (), ()),
+    802: ('export_vpn_networks', (), ()),
+    803: ('export_vpn_server_rules', (), (801, 802)),
+    804: ('export_vpn_client_rules', (), (801,)),
+    901: ('export_snmp_rules', (), ()),
+    902: ('export_notification_alert_rules', (), (114, 115, 117)),
+}
+
+
+# Разделы импорта по номерам команд меню: {команда: (метод UTM, аргументы, команды-зависимости, словари)}.
+# Раздел запускается после своих зависимостей, если они выбраны для импорта вместе с ним.
+# "Словари" - атрибуты UTM со словарями name->id, которые дополняет раздел. Перед запуском
+# зависящих от него разделов эти словари перечитываются с UTM (см. UTM.refresh_maps).
+IMPORT_SECTIONS = {
+    101: ('import_morphology', (), (), ('list_morph',)),
+    102: ('import_services', (), (), ('services',)),
+    103: ('import_IP_lists', (), (), ('list_IP',)),
+    104: ('import_useragent_lists', (), (), ('list_useragent',)),
+    105: ('import_mime_lists', (), (), ('list_mime',)),
+    106: ('import_url_lists', (), (), ('list_url',)),
+    107: ('import_time_restricted_lists', (), (), ('list_calendar',)),
+    108: ('import_shaper', (), (), ('shaper',)),
+    109: ('import_scada_list', (), (), ('list_scada',)),
+    110: ('import_templates_list', (), (), ('list_templates',)),
+    111: ('import_categories_groups', (), (), ('list_urlcategorygroup',)),
+    112: ('import_custom_url_list', (), (), ()),
+    113: ('import_application_groups', (), (), ('list_applicationgroup',)),
+    114: ('import_nlist_groups', ('emailgroup',), (), ()),
+    115: ('import_nlist_groups', ('phonegroup',), (), ()),
+    116: ('import_ips_profiles', (), (), ()),
+    117: ('import_notification_profiles', (), (), ('list_notifications',)),
+    118: ('import_netflow_profiles', (), (), ('list_netflow',)),
+    119: ('import_ssl_profiles', (), (), ('list_ssl_profiles',)),
+    201: ('import_zones', (), (), ('zones',)),
+    202: ('import_interfaces', (), (118, 201), ()),
+    203: ('import_gateways_list', (), (202,), ()),
+    204: ('import_gateway_failover', (), (203,), ()),
+    205: ('import_dhcp_subnets', (), (202,), ()),
+    206: ('import_dns_config', (), (), ()),
+    207: ('import_virt_routes', (), (202,), ()),
+    208: ('import_wccp_rules', (), (103,), ()),
+    301: ('import_ui', (), (110, 119), ()),
+    302: ('import_ntp', (), (), ()),
+    303: ('import_settings', (), (), ()),
+    304: ('import_admin_profiles', (), (), ()),
+    305: ('import_admin_config', (), (), ()),
+    306: ('import_admins', (), (304, 404, 405, 406, 407, 408), ()),
+    401: ('import_groups_list', (), (404,), ('list_groups',)),
+    402: ('import_users_list', (), (401,), ('list_users',)),
+    403: ('import_2fa_profiles', (), (117,), ('profiles_2fa',)),
+    404: ('import_ldap_server', (), (), ('auth_servers',)),
+    405: ('import_ntlm_server', (), (), ('auth_servers',)),
+    406: ('import_radius_server', (), (), ('auth_servers',)),
+    407: ('import_tacacs_server', (), (), ('auth_servers',)),
+    408: ('import_saml_server', (), (), ('auth_servers',)),
+    409: ('import_auth_profiles', (), (403, 404, 405, 406, 407, 408), ('auth_profiles',)),
+    410: ('import_captive_profiles', (), (110, 117, 409), ('captive_profiles',)),
+    411: ('import_captive_portal_rules', (), (103, 106, 107, 111, 201, 410), ()),
+    412: ('import_byod_policy', (), (401, 402, 404), ()),
+    501: ('import_scenarios', (), (105, 111, 113), ('scenarios_rules',)),
+    502: ('import_firewall_rules', (), (102, 103, 106, 107, 113, 201, 401, 402, 404, 501), ()),
+    503: ('import_nat_rules', (), (102, 103, 106, 201, 401, 402, 404, 501), ()),
+    504: ('import_icap_servers', (), (), ('icap_servers',)),
+    506: ('import_loadbalancing_rules', (), (504, 703), ()),
+    507: ('import_shaper_rules', (), (102, 103, 106, 107, 108, 113, 201, 401, 402, 404, 501), ()),
+    601: ('import_content_rules', (), (101, 103, 104, 105, 106, 107, 110, 111, 201, 401, 402, 404, 501), ()),
+    602: ('import_safebrowsing_rules', (), (103, 106, 107, 201, 401, 402, 404), ()),
+    603: ('import_ssldecrypt_rules', (), (103, 106, 107, 111, 119, 201, 401, 402, 404), ()),
+    604: ('import_sshdecrypt_rules', (), (102, 103, 106, 107, 201, 401, 402, 404), ()),
+    605: ('import_idps_rules', (), (102, 103, 106, 116, 201), ()),
+    606: ('import_scada_rules', (), (102, 103, 106, 109, 201), ()),
+    607: ('import_mailsecurity', (), (102, 103, 106, 114, 201, 401, 402, 404), ()),
+    608: ('import_icap_rules', (), (103, 105, 106, 111, 201, 401, 402, 404, 504, 506), ()),
+    609: ('import_dos_profiles', (), (), ()),
+    610: ('import_dos_rules', (), (102, 103, 106, 107, 201, 401, 402, 404, 501, 609), ()),
+    701: ('import_proxy_portal', (), (110, 409), ()),
+    702: ('import_proxyportal_rules', (), (119, 401, 402, 404), ()),
+    703: ('import_reverseproxy_servers', (), (), ('reverse_servers',)),
+    704: ('import_reverseproxy_rules', (), (103, 104, 106, 119, 201, 401, 402, 404, 506, 703), ()),
+    801: ('import_vpn_security_profiles', (), (), ()),
+    802: ('import_vpn_networks', (), (103,), ()),
+    803: ('import_vpn_server_rules', (), (103, 106, 201, 401, 402, 404, 409, 801, 802), ()),
+    804: ('import_vpn_client_rules', (), (801,), ()),
+    901: ('import_snmp_rules', (), (), ()),
+    902: ('import_notification_alert_rules', (), (114, 115, 117), ()),
+}
+
+# Разделы, которые могут запросить ввод у пользователя. Они выполняются в основном потоке,
+# когда остальные разделы завершены.
+INTERACTIVE_SECTIONS = {('import_dhcp_subnets', ())}
+
+
+class SectionOutput:
+    """
+    Подменяет sys.stdout на время параллельного экспорта или импорта.
+    Вывод каждого раздела копится в буфере своего потока и печатается целиком, когда раздел завершён,
+    чтобы сообщения разных разделов не перемешивались.
+    """
+    def __init__(self):
+        self._stdout = sys.stdout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        sys.stdout = self
+        return self
+
+    def __exit__(self, *exc):
+        sys.stdout = self._stdout
+
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            with self._lock:
+                return self._stdout.write(text)
+        buffer.append(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(self._local, 'buffer', None) is None:
+            self._stdout.flush()
+
+    def begin(self):
+        self._local.buffer = []
+
+    def end(self):
+        buffer, self._local.buffer = self._local.buffer, None
+        with self._lock:
+            self._stdout.write(''.join(buffer))
+            self._stdout.flush()
+
+
+def call_section(utm, sections, command):
+    """
+    Выполнить раздел. При импорте с журналом раздел отмечается в журнале как импортированный (см. ImportJournal),
+    если за время его выполнения ни один запрос к UTM не сорвался из-за потери сессии или соединения.
+    """
+    method, args = sections[command][:2]
+    counter = utm.failure_counter()     # Ошибки только этого раздела (разделы выполняются в разных потоках)
+    failures = counter[0]
+    with utm.journal.section(command) as section:
+        getattr(utm, method)(*args)
+        section.complete = counter[0] == failures
+    if not section.complete and utm.journal.enabled:
+        print(f"\t\033[33mВо время импорта раздела терялась связь с UTM, раздел будет повторён при следующем импорте.\033[0m")
+    if section.skipped:
+        print(f"\tПропущено объектов, загруженных до прерывания импорта: {section.skipped}.")
+
+def run_section(utm, sections, command, output):
+    """Выполнить один раздел в потоке пула. Возвращает время выполнения в секундах."""
+    utm.bind_thread_connection()
+    output.begin()
+    start = time.monotonic()
+    try:
+        call_section(utm, sections, command)
+    finally:
+        elapsed = time.monotonic() - start
+        output.end()
+    return elapsed
+
+def run_sections(utm, sections, commands, workers=4):
+    """
+    Выполнить несколько разделов экспорта или импорта параллельно (workers потоков, у каждого своё соединение с UTM).
+    sections - EXPORT_SECTIONS или IMPORT_SECTIONS. Независимые разделы выполняются одновременно,
+    раздел с зависимостями ждёт их завершения. Если в описании разделов указаны словари name->id,
+    перед запуском раздела перечитываются словари, которые дополнили его зависимости.
+    Возвращает время выполнения каждого раздела {команда: секунды}.
+    """
+    commands = [x for x in sections if x in commands]
+    pending = {x: {y for y in sections[x][2] if y in commands} for x in commands}
+    running = {}
+    timing = {}
+    refreshed = set()
+
+    def refresh(command):
+        """Барьер перед запуском раздела: перечитать словари, которые дополнили его зависимости"""
+        maps = set()
+        for x in sections[command][2]:
+            if x in commands and len(sections[x]) > 3:
+                maps.update(sections[x][3])
+        if maps - refreshed:
+            utm.refresh_maps(maps - refreshed)
+            refreshed.update(maps)
+
+    try:
+        with SectionOutput() as output, ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for command in [x for x, deps in pending.items() if not deps]:
+                    if sections[command][:2] in INTERACTIVE_SECTIONS:
+                        continue
+                    del pending[command]
+                    refresh(command)
+                    running[executor.submit(run_section, utm, sections, command, output)] = command
+                if not running:
+                    command = next((x for x, deps in pending.items() if not deps), None)
+                    if command is None:
+                        raise UtmError(f"Ошибка: циклические зависимости разделов {sorted(pending)}.")
+                    del pending[command]
+                    refresh(command)
+                    start = time.monotonic()
+                    call_section(utm, sections, command)
+                    timing[command] = time.monotonic() - start
+                else:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        command = running.pop(future)
+                        timing[command] = future.result()
+                for deps in pending.values():
+                    deps.difference_update(timing)
+    finally:
+        utm.close_thread_connections()
+    return timing
+
+def print_timing(sections, timing, title):
+    """Напечатать время выполнения разделов, начиная с самых долгих"""
+    print(f"\n\033[36mВремя {title} разделов:\033[0m")
+    for command, elapsed in sorted(timing.items(), key=lambda x: x[1], reverse=True):
+        method, args = sections[command][:2]
+        print(f"\t{command:<5}{method + ('(' + args[0] + ')' if args else ''):<45}{elapsed:8.2f} сек.")
+
+def export_sections(utm, commands, workers=4):
+    """Экспортировать разделы параллельно и напечатать время экспорта каждого раздела"""
+    start = time.monotonic()
+    timing = run_sections(utm, EXPORT_SECTIONS, commands, workers)
+    print_timing(EXPORT_SECTIONS, timing, 'экспорта')
+    print(f"\tВсего: {time.monotonic() - start:.2f} сек.\n")
+
+def import_sections(utm, commands, workers=4):
+    """Импортировать разделы параллельно в порядке зависимостей и напечатать время импорта каждого раздела"""
+    start = time.monotonic()
+    timing = run_sections(utm, IMPORT_SECTIONS, resume_sections(utm, commands), workers)
+    print_timing(IMPORT_SECTIONS, timing, 'импорта')
+    print(f"\tВсего: {time.monotonic() - start:.2f} сек.\n")
+
+def open_journal(utm):
+    """
+    Открыть журнал импорта на узел: файл $UG_IMPORT_JOURNAL или import_journal_<узел>.jsonl в текущем каталоге.
+    Если журнал остался от прерванного импорта, служебные словари {name: id} дополняются из журнала.
+    """
+    node = utm.node_name.translate(str.maketrans(character_map))
+    utm.journal = ImportJournal(os.environ.get('UG_IMPORT_JOURNAL') or f'import_journal_{node}.jsonl', utm.node_name, utm.server_ip)
+    if utm.journal.resumed:
+        print(f"\033[36mПродолжается прерванный импорт (журнал {utm.journal.path}): импортировано разделов - "
+              f"{len(utm.journal.sections)}, загружено объектов - {sum(len(x) for x in utm.journal.objects.values())}.\033[0m")
+        utm.apply_journal()
+
+def close_journal(utm, success):
+    """Закрыть журнал импорта. После успешного импорта всех начатых разделов журнал удаляется."""
+    if not utm.journal.enabled:
+        return
+    if not success:
+        utm.journal.close()
+        print(f"\033[33mИмпорт прерван. Журнал импорта сохранён в {utm.journal.path}: повторный импорт продолжится с места остановки.\033[0m")
+    elif not utm.journal.finish():
+        print(f"\033[33mНе все начатые разделы импортированы, журнал импорта сохранён в {utm.journal.path}.\033[0m")
+    utm.journal = ImportJournal()
+
+def resume_sections(utm, commands):
+    """Записать в журнал запуск импорта разделов commands. Возвращает разделы, которые ещё не импортированы."""
+    pending = utm.journal.start(commands)
+    if len(pending) < len(commands):
+        done = [str(x) for x in commands if x not in pending]
+        print(f"Разделы, импортированные до прерывания импорта, пропускаются: {', '.join(done)}.")
+    return pending
+
+def save_snapshot(utm, store_path):
+    """Сохранить снимок каталога data в хранилище снимков (см. snapshots.py)"""
+    node = utm.node_name.translate(str.maketrans(character_map))
+    try:
+        manifest = SnapshotStore(store_path).save(node, 'data', info={'host': utm.server_ip, 'version': utm.version})
+    except (SnapshotError, OSError) as err:
+        print(f'\033[31mСнимок конфигурации не сохранён: {err}\033[0m')
+    else:
+        print(f"\033[32mСнимок конфигурации {manifest['id']} сохранён в {store_path}: файлов {len(manifest['files'])}, "
+              f"новых {manifest['new_objects']} ({manifest['new_bytes'] / 1024:.1f} КБ).\033[0m")
+
+def save_bundle(utm, bundle_path):
+    """Упаковать каталог data в архив конфигурации (один файл zip, см. jsonfiles.Bundle)"""
+    try:
+        index = make_bundle('data', bundle_path, info={'node': utm.node_name, 'host': utm.server_ip, 'version': utm.version})
+    except (BundleError, OSError) as err:
+        print(f'\033[31mАрхив конфигурации не сохранён: {err}\033[0m')
+    else:
+        print(f"\033[32mКонфигурация упакована в архив {bundle_path}: файлов {len(index['files'])}, "
+              f"{os.path.getsize(bundle_path) / 1024:.1f} КБ.\033[0m")
+
 def menu1(utm):
     print("\033c")
     print(f"\033[1;36;43mUserGate\033[1;37;43m                     Экспорт / Импорт конфигурации                 \033[3;37;43mIP:{utm.server_ip}\033[0m\n")
@@ -5405,11 +6033,13 @@ def menu1(utm):
     print("Вы можете изменить содержимое файлов и импортировать данные конфигурационные файлы в UTM.\033[0m\n")
     print("1  - Экспорт конфигурации")
     print("2  - Импорт конфигурации")
+    print("3  - Импорт только изменений (объекты, которые не отличаются от UTM, пропускаются)")
+    print("4  - Экспорт только изменений (списки и шаблоны, не изменившиеся с прошлого экспорта, не выгружаются)")
     print("\033[33m0  - Выход.\033[0m")
     while True:
         try:
             mode = int(input("\nВведите номер нужной операции: "))
-            if mode not in [0, 1, 2]:
+            if mode not in [0, 1, 2, 3, 4]:
                 print("Вы ввели несуществующую команду.")
             elif mode == 0:
                 utm.logout()
@@ -5696,311 +6326,28 @@ def menu3(utm, mode, section):
 def executor(utm, mode, section, command):
     command = section * 100 + command
     utm.init_struct()
-    if mode == 1:
+    if mode == 1 and command % 100 != 99 and command not in EXPORT_SECTIONS:
+        print(f"\033[33mНесуществующая команда экспорта {command}.\033[0m")
+        while True:
+            input_value = input("\nНажмите пробел для возврата в меню: ")
+            if input_value == " ":
+                break
+    elif mode == 1:
         if not os.path.isdir('data'):
             os.mkdir('data')
             print("Создана директория 'data' в текущем каталоге.")
         utm.init_struct_for_export()
         try:
-            if command == 101:
-                utm.export_morphology_lists()
-            elif command == 102:
-                utm.export_services_list()
-            elif command == 103:
-                utm.export_IP_lists()
-            elif command == 104:
-                utm.export_useragent_lists()
-            elif command == 105:
-                utm.export_mime_lists()
-            elif command == 106:
-                utm.export_url_lists()
-            elif command == 107:
-                utm.export_time_restricted_lists()
-            elif command == 108:
-                utm.export_shaper_list()
-            elif command == 109:
-                utm.export_scada_list()
-            elif command == 110:
-                utm.export_templates_list()
-            elif command == 111:
-                utm.export_categories_groups()
-            elif command == 112:
-                utm.export_custom_url_list()
-            elif command == 113:
-                utm.export_application_groups()
-            elif command == 114:
-                utm.export_nlist_groups('emailgroup')
-            elif command == 115:
-                utm.export_nlist_groups('phonegroup')
-            elif command == 116:
-                utm.export_ips_profiles()
-            elif command == 117:
-                utm.export_notification_profiles_list()
-            elif command == 118:
-                utm.export_netflow_profiles_list()
-            elif command == 119:
-                utm.export_ssl_profiles_list()
-            elif command == 199:
-                utm.export_morphology_lists()
-                utm.export_services_list()
-                utm.export_IP_lists()
-                utm.export_useragent_lists()
-                utm.export_mime_lists()
-                utm.export_url_lists()
-                utm.export_time_restricted_lists()
-                utm.export_shaper_list()
-                utm.export_scada_list()
-                utm.export_templates_list()
-                utm.export_categories_groups()
-                utm.export_custom_url_list()
-                utm.export_application_groups()
-                utm.export_nlist_groups('emailgroup')
-                utm.export_nlist_groups('phonegroup')
-                utm.export_ips_profiles()
-                utm.export_notification_profiles_list()
-                utm.export_netflow_profiles_list()
-                utm.export_ssl_profiles_list()
-
-            elif command == 201:
-                utm.export_zones_list()
-            elif command == 202:
-                utm.export_interfaces_list()
-            elif command == 203:
-                utm.export_gateways_list()
-            elif command == 204:
-                utm.export_gateway_failover()
-            elif command == 205:
-                utm.export_dhcp_subnets()
-            elif command == 206:
-                utm.export_dns_config()
-            elif command == 207:
-                utm.export_routers_list()
-            elif command == 208:
-                utm.export_ospf_config()
-            elif command == 209:
-                utm.export_bgp_config()
-            elif command == 210:
-                utm.export_wccp_list()
-            elif command == 299:
-                utm.export_zones_list()
-                utm.export_interfaces_list()
-                utm.export_gateways_list()
-                utm.export_gateway_failover()
-                utm.export_dhcp_subnets()
-                utm.export_dns_config()
-                utm.export_routers_list()
-                utm.export_ospf_config()
-                utm.export_bgp_config()
-                utm.export_wccp_list()
-
-            elif command == 301:
-                utm.export_ui()
-            elif command == 302:
-                utm.export_ntp()
-            elif command == 303:
-                utm.export_settings()
-            elif command == 304:
-                utm.export_proxy_portal()
-            elif command == 305:
-                utm.export_admin_profiles_list()
-            elif command == 306:
-                utm.export_admin_config()
-            elif command == 307:
-                utm.export_admins_list()
-            elif command == 308:
-                utm.export_certivicates_list()
-            elif command == 399:
-                utm.export_ui()
-                utm.export_ntp()
-                utm.export_settings()
-                utm.export_proxy_portal()
-                utm.export_admin_profiles_list()
-                utm.export_admin_config()
-                utm.export_admins_list()
-                utm.export_certivicates_list()
-
-            elif command == 401:
-                utm.export_groups_lists()
-            elif command == 402:
-                utm.export_users_lists()
-            elif command == 403:
-                utm.export_2fa_profiles()
-            elif command == 404:
-                utm.export_auth_servers()
-            elif command == 405:
-                utm.export_auth_profiles()
-            elif command == 406:
-                utm.export_captive_profiles()
-            elif command == 407:
-                utm.export_captive_portal_rules()
-            elif command == 408:
-                utm.export_byod_policy()
-            elif command == 499:
-                utm.export_groups_lists()
-                utm.export_users_lists()
-                utm.export_2fa_profiles()
-                utm.export_auth_servers()
-                utm.export_auth_profiles()
-                utm.export_captive_profiles()
-                utm.export_captive_portal_rules()
-                utm.export_byod_policy()
-
-            elif command == 501:
-                utm.export_firewall_rules()
-            elif command == 502:
-                utm.export_nat_rules()
-            elif command == 503:
-                utm.export_loadbalancing_rules()
-            elif command == 504:
-                utm.export_shaper_rules()
-            elif command == 599:
-                utm.export_firewall_rules()
-                utm.export_nat_rules()
-                utm.export_loadbalancing_rules()
-                utm.export_shaper_rules()
-
-            elif command == 601:
-                utm.export_content_rules()
-            elif command == 602:
-                utm.export_safebrowsing_rules()
-            elif command == 603:
-                utm.export_ssldecrypt_rules()
-            elif command == 604:
-                utm.export_sshdecrypt_rules()
-            elif command == 605:
-                utm.export_idps_rules()
-            elif command == 606:
-                utm.export_scada_rules()
-            elif command == 607:
-                utm.export_scenarios()
-            elif command == 608:
-                utm.export_mailsecurity_rules()
-            elif command == 609:
-                utm.export_icap_servers()
-            elif command == 610:
-                utm.export_icap_rules()
-            elif command == 611:
-                utm.export_dos_profiles()
-            elif command == 612:
-                utm.export_dos_rules()
-            elif command == 699:
-                utm.export_content_rules()
-                utm.export_safebrowsing_rules()
-                utm.export_ssldecrypt_rules()
-                utm.export_sshdecrypt_rules()
-                utm.export_idps_rules()
-                utm.export_scada_rules()
-                utm.export_scenarios()
-                utm.export_mailsecurity_rules()
-                utm.export_icap_servers()
-                utm.export_icap_rules()
-                utm.export_dos_profiles()
-                utm.export_dos_rules()
-
-            elif command == 701:
-                utm.export_proxyportal_rules()
-            elif command == 702:
-                utm.export_reverseproxy_servers()
-            elif command == 703:
-                utm.export_reverseproxy_rules()
-            elif command == 799:
-                utm.export_proxyportal_rules()
-                utm.export_reverseproxy_servers()
-                utm.export_reverseproxy_rules()
-
-            elif command == 801:
-                utm.export_vpn_security_profiles()
-            elif command == 802:
-                utm.export_vpn_networks()
-            elif command == 803:
-                utm.export_vpn_server_rules()
-            elif command == 804:
-                utm.export_vpn_client_rules()
-            elif command == 899:
-                utm.export_vpn_security_profiles()
-                utm.export_vpn_networks()
-                utm.export_vpn_server_rules()
-                utm.export_vpn_client_rules()
-
-            elif command == 901:
-                utm.export_snmp_rules()
-            elif command == 902:
-                utm.export_notification_alert_rules()
-            elif command == 999:
-                utm.export_snmp_rules()
-                utm.export_notification_alert_rules()
-
-            elif command == 9999:
-                utm.export_morphology_lists()
-                utm.export_services_list()
-                utm.export_IP_lists()
-                utm.export_useragent_lists()
-                utm.export_mime_lists()
-                utm.export_url_lists()
-                utm.export_time_restricted_lists()
-                utm.export_shaper_list()
-                utm.export_scada_list()
-                utm.export_templates_list()
-                utm.export_categories_groups()
-                utm.export_custom_url_list()
-                utm.export_application_groups()
-                utm.export_nlist_groups('emailgroup')
-                utm.export_nlist_groups('phonegroup')
-                utm.export_ips_profiles()
-                utm.export_notification_profiles_list()
-                utm.export_netflow_profiles_list()
-                utm.export_ssl_profiles_list()
-                utm.export_zones_list()
-                utm.export_interfaces_list()
-                utm.export_gateways_list()
-                utm.export_gateway_failover()
-                utm.export_dhcp_subnets()
-                utm.export_dns_config()
-                utm.export_routers_list()
-                utm.export_ospf_config()
-                utm.export_bgp_config()
-                utm.export_wccp_list()
-                utm.export_ui()
-                utm.export_ntp()
-                utm.export_settings()
-                utm.export_proxy_portal()
-                utm.export_admin_profiles_list()
-                utm.export_admin_config()
-                utm.export_admins_list()
-                utm.export_certivicates_list()
-                utm.export_groups_lists()
-                utm.export_users_lists()
-                utm.export_2fa_profiles()
-                utm.export_auth_servers()
-                utm.export_auth_profiles()
-                utm.export_captive_profiles()
-                utm.export_captive_portal_rules()
-                utm.export_byod_policy()
-                utm.export_firewall_rules()
-                utm.export_nat_rules()
-                utm.export_loadbalancing_rules()
-                utm.export_shaper_rules()
-                utm.export_content_rules()
-                utm.export_safebrowsing_rules()
-                utm.export_ssldecrypt_rules()
-                utm.export_sshdecrypt_rules()
-                utm.export_idps_rules()
-                utm.export_scada_rules()
-                utm.export_scenarios()
-                utm.export_mailsecurity_rules()
-                utm.export_icap_servers()
-                utm.export_icap_rules()
-                utm.export_dos_profiles()
-                utm.export_dos_rules()
-                utm.export_proxyportal_rules()
-                utm.export_reverseproxy_servers()
-                utm.export_reverseproxy_rules()
-                utm.export_vpn_security_profiles()
-                utm.export_vpn_networks()
-                utm.export_vpn_server_rules()
-                utm.export_vpn_client_rules()
-                utm.export_snmp_rules()
-                utm.export_notification_alert_rules()
+            if command % 100 == 99:
+                export_sections(utm, [x for x in EXPORT_SECTIONS if section == 99 or x // 100 == section])
+            else:
+                method, args, _ = EXPORT_SECTIONS[command]
+                getattr(utm, method)(*args)
+            utm.save_export_state()
+            if os.environ.get('UG_SNAPSHOT_STORE'):
+                save_snapshot(utm, os.environ['UG_SNAPSHOT_STORE'])
+            if os.environ.get('UG_EXPORT_BUNDLE'):
+                save_bundle(utm, os.environ['UG_EXPORT_BUNDLE'])
         except UtmError as err:
             print(err)
             utm.logout()
@@ -6016,315 +6363,27 @@ def executor(utm, mode, section, command):
                 if input_value == " ":
                     break
     else:
-        if utm.version.startswith('6'):
+        if command % 100 != 99 and command not in IMPORT_SECTIONS:
+            # Пункта меню без раздела импорта нет: журнал не открывается, ничего не выполняется.
+            print(f"\033[33mНесуществующая команда импорта {command}.\033[0m")
+            while True:
+                input_value = input("\nНажмите пробел для возврата в меню: ")
+                if input_value == " ":
+                    break
+        elif utm.version.startswith('6'):
             utm.init_struct_for_import()
+            success = False
             try:
-                if command == 101:
-                    utm.import_morphology()
-                elif command == 102:
-                    utm.import_services()
-                elif command == 103:
-                    utm.import_IP_lists()
-                elif command == 104:
-                    utm.import_useragent_lists()
-                elif command == 105:
-                    utm.import_mime_lists()
-                elif command == 106:
-                    utm.import_url_lists()
-                elif command == 107:
-                    utm.import_time_restricted_lists()
-                elif command == 108:
-                    utm.import_shaper()
-                elif command == 109:
-                    utm.import_scada_list()
-                elif command == 110:
-                    utm.import_templates_list()
-                elif command == 111:
-                    utm.import_categories_groups()
-                elif command == 112:
-                    utm.import_custom_url_list()
-                elif command == 113:
-                    utm.import_application_groups()
-                elif command == 114:
-                    utm.import_nlist_groups('emailgroup')
-                elif command == 115:
-                    utm.import_nlist_groups('phonegroup')
-                elif command == 116:
-                    utm.import_ips_profiles()
-                elif command == 117:
-                    utm.import_notification_profiles()
-                elif command == 118:
-                    utm.import_netflow_profiles()
-                elif command == 119:
-                    utm.import_ssl_profiles()
-                elif command == 199:
-                    utm.import_morphology()
-                    utm.import_services()
-                    utm.import_IP_lists()
-                    utm.import_useragent_lists()
-                    utm.import_mime_lists()
-                    utm.import_url_lists()
-                    utm.import_time_restricted_lists()
-                    utm.import_shaper()
-                    utm.import_scada_list()
-                    utm.import_templates_list()
-                    utm.import_categories_groups()
-                    utm.import_custom_url_list()
-                    utm.import_application_groups()
-                    utm.import_nlist_groups('emailgroup')
-                    utm.import_nlist_groups('phonegroup')
-                    utm.import_ips_profiles()
-                    utm.import_notification_profiles()
-                    utm.import_netflow_profiles()
-                    utm.import_ssl_profiles()
-
-                elif command == 201:
-                    utm.import_zones()
-                elif command == 202:
-                    utm.import_interfaces()
-                elif command == 203:
-                    utm.import_gateways_list()
-                elif command == 204:
-                    utm.import_gateway_failover()
-                elif command == 205:
-                    utm.import_dhcp_subnets()
-                elif command == 206:
-                    utm.import_dns_config()
-                elif command == 207:
-                    utm.import_virt_routes()
-                elif command == 208:
-                    utm.import_wccp_rules()
-                elif command == 299:
-                    utm.import_zones()
-                    utm.import_interfaces()
-                    utm.import_gateways_list()
-                    utm.import_gateway_failover()
-                    utm.import_dhcp_subnets()
-                    utm.import_dns_config()
-                    utm.import_virt_routes()
-                    utm.import_wccp_rules()
-
-                elif command == 301:
-                    utm.import_ui()
-                elif command == 302:
-                    utm.import_ntp()
-                elif command == 303:
-                    utm.import_settings()
-                elif command == 304:
-                    utm.import_admin_profiles()
-                elif command == 305:
-                    utm.import_admin_config()
-                elif command == 306:
-                    utm.import_admins()
-                elif command == 399:
-                    utm.import_ui()
-                    utm.import_ntp()
-                    utm.import_settings()
-                    utm.import_admin_profiles()
-                    utm.import_admin_config()
-                    utm.import_admins()
-
-                elif command == 401:
-                    utm.import_groups_list()
-                elif command == 402:
-                    utm.import_users_list()
-                elif command == 403:
-                    utm.import_2fa_profiles()
-                elif command == 404:
-                    utm.import_ldap_server()
-                elif command == 405:
-                    utm.import_ntlm_server()
-                elif command == 406:
-                    utm.import_radius_server()
-                elif command == 407:
-                    utm.import_tacacs_server()
-                elif command == 408:
-                    utm.import_saml_server()
-                elif command == 409:
-                    utm.import_auth_profiles()
-                elif command == 410:
-                    utm.import_captive_profiles()
-                elif command == 411:
-                    utm.import_captive_portal_rules()
-                elif command == 412:
-                    utm.import_byod_policy()
-                elif command == 499:
-                    utm.import_groups_list()
-                    utm.import_users_list()
-                    utm.import_2fa_profiles()
-                    utm.import_ldap_server()
-                    utm.import_ntlm_server()
-                    utm.import_radius_server()
-                    utm.import_tacacs_server()
-                    utm.import_saml_server()
-                    utm.import_auth_profiles()
-                    utm.import_captive_profiles()
-                    utm.import_captive_portal_rules()
-                    utm.import_byod_policy()
-                        
-                elif command == 501:
-                    utm.import_scenarios()
-                elif command == 502:
-                    utm.import_firewall_rules()
-                elif command == 503:
-                    utm.import_nat_rules()
-                elif command == 504:
-                    utm.import_icap_servers()
-                elif command == 506:
-                    utm.import_loadbalancing_rules()
-                elif command == 507:
-                    utm.import_shaper_rules()
-                elif command == 599:
-                    utm.import_scenarios()
-                    utm.import_firewall_rules()
-                    utm.import_nat_rules()
-                    utm.import_icap_servers()
-                    utm.import_loadbalancing_rules()
-                    utm.import_shaper_rules()
-
-                elif command == 601:
-                    utm.import_content_rules()
-                elif command == 602:
-                    utm.import_safebrowsing_rules()
-                elif command == 603:
-                    utm.import_ssldecrypt_rules()
-                elif command == 604:
-                    utm.import_sshdecrypt_rules()
-                elif command == 605:
-                    utm.import_idps_rules()
-                elif command == 606:
-                    utm.import_scada_rules()
-                elif command == 607:
-                    utm.import_mailsecurity_rules()
-                    utm.import_mailsecurity_dnsbl()
-                elif command == 608:
-                    utm.import_icap_rules()
-                elif command == 609:
-                    utm.import_dos_profiles()
-                elif command == 610:
-                    utm.import_dos_rules()
-                elif command == 699:
-                    utm.import_content_rules()
-                    utm.import_safebrowsing_rules()
-                    utm.import_ssldecrypt_rules()
-                    utm.import_sshdecrypt_rules()
-                    utm.import_idps_rules()
-                    utm.import_scada_rules()
-                    utm.import_mailsecurity_rules()
-                    utm.import_mailsecurity_dnsbl()
-                    utm.import_icap_rules()
-                    utm.import_dos_profiles()
-                    utm.import_dos_rules()
-
-                elif command == 701:
-                    utm.import_proxy_portal()
-                elif command == 702:
-                    utm.import_proxyportal_rules()
-                elif command == 703:
-                    utm.import_reverseproxy_servers()
-                elif command == 704:
-                    utm.import_reverseproxy_rules()
-                elif command == 799:
-                    utm.import_proxy_portal()
-                    utm.import_proxyportal_rules()
-                    utm.import_reverseproxy_servers()
-                    utm.import_reverseproxy_rules()
-
-                elif command == 801:
-                    utm.import_vpn_security_profiles()
-                elif command == 802:
-                    utm.import_vpn_networks()
-                elif command == 803:
-                    utm.import_vpn_server_rules()
-                elif command == 804:
-                    utm.import_vpn_client_rules()
-                elif command == 899:
-                    utm.import_vpn_security_profiles()
-                    utm.import_vpn_networks()
-                    utm.import_vpn_server_rules()
-                    utm.import_vpn_client_rules()
-
-                elif command == 901:
-                    utm.import_snmp_rules()
-                elif command == 902:
-                    utm.import_notification_alert_rules()
-                elif command == 999:
-                    utm.import_snmp_rules()
-                    utm.import_notification_alert_rules()
-
-                elif command == 9999:
-                    utm.import_morphology()
-                    utm.import_services()
-                    utm.import_IP_lists()
-                    utm.import_useragent_lists()
-                    utm.import_mime_lists()
-                    utm.import_url_lists()
-                    utm.import_time_restricted_lists()
-                    utm.import_shaper()
-                    utm.import_scada_list()
-                    utm.import_templates_list()
-                    utm.import_categories_groups()
-                    utm.import_custom_url_list()
-                    utm.import_application_groups()
-                    utm.import_nlist_groups('emailgroup')
-                    utm.import_nlist_groups('phonegroup')
-                    utm.import_ips_profiles()
-                    utm.import_notification_profiles()
-                    utm.import_netflow_profiles()
-                    utm.import_ssl_profiles()
-                    utm.import_zones()
-                    utm.import_interfaces()
-                    utm.import_gateways_list()
-                    utm.import_gateway_failover()
-                    utm.import_dhcp_subnets()
-                    utm.import_dns_config()
-                    utm.import_virt_routes()
-                    utm.import_wccp_rules()
-                    utm.import_ui()
-                    utm.import_ntp()
-                    utm.import_settings()
-                    utm.import_admin_profiles()
-                    utm.import_admin_config()
-                    utm.import_admins()
-                    utm.import_groups_list()
-                    utm.import_users_list()
-                    utm.import_2fa_profiles()
-                    utm.import_ldap_server()
-                    utm.import_ntlm_server()
-                    utm.import_radius_server()
-                    utm.import_tacacs_server()
-                    utm.import_saml_server()
-                    utm.import_auth_profiles()
-                    utm.import_captive_profiles()
-                    utm.import_captive_portal_rules()
-                    utm.import_byod_policy()
-                    utm.import_scenarios()
-                    utm.import_firewall_rules()
-                    utm.import_nat_rules()
-                    utm.import_icap_servers()
-                    utm.import_loadbalancing_rules()
-                    utm.import_shaper_rules()
-                    utm.import_content_rules()
-                    utm.import_safebrowsing_rules()
-                    utm.import_ssldecrypt_rules()
-                    utm.import_sshdecrypt_rules()
-                    utm.import_idps_rules()
-                    utm.import_scada_rules()
-                    utm.import_mailsecurity_rules()
-                    utm.import_mailsecurity_dnsbl()
-                    utm.import_icap_rules()
-                    utm.import_dos_profiles()
-                    utm.import_dos_rules()
-                    utm.import_proxy_portal()
-                    utm.import_proxyportal_rules()
-                    utm.import_reverseproxy_servers()
-                    utm.import_reverseproxy_rules()
-                    utm.import_vpn_security_profiles()
-                    utm.import_vpn_networks()
-                    utm.import_vpn_server_rules()
-                    utm.import_vpn_client_rules()
-                    utm.import_snmp_rules()
-                    utm.import_notification_alert_rules()
+                open_journal(utm)
+                if os.environ.get('UG_IMPORT_BUNDLE'):
+                    bundle = mount_bundle(os.environ['UG_IMPORT_BUNDLE'])
+                    print(f"Конфигурация читается из архива {bundle.path} (узел {bundle.index.get('node', '-')}, "
+                          f"версия {bundle.index.get('version', '-')}).")
+                if command % 100 == 99:
+                    import_sections(utm, [x for x in IMPORT_SECTIONS if section == 99 or x // 100 == section])
+                elif resume_sections(utm, [command]):
+                    call_section(utm, IMPORT_SECTIONS, command)
+                success = True
             except UtmError as err:
                 print(err)
                 utm.logout()
@@ -6333,11 +6392,15 @@ def executor(utm, mode, section, command):
                 print(f'\n\033[31mОшибка парсинга файла конфигурации: {err}\033[0m')
                 utm.logout()
                 sys.exit()
+            except (BundleError, JournalError) as err:
+                print(f'\n\033[31m{err}\033[0m')
 #            except Exception as err:
 #                print(f'\n\033[31mОшибка ug_convert_config/main(): {err}.\033[0m')
 #                utm.logout()
 #                sys.exit()
             finally:
+                close_journal(utm, success)
+                unmount_bundle()
                 print("\033[32mИмпорт конфигурации завершён.\033[0m\n")
                 while True:
                     input_value = input("\nНажмите пробел для возврата в меню: ")
@@ -6363,33 +6426,41 @@ def main():
         print("\nПрограмма принудительно завершена пользователем.")
         sys.exit(1)
 
+    utm = None
     try:
+        # Сессию поддерживает сам клиент: keepalive при простое и повторный вход при fault 104 (см. UtmXmlRpc.renew_token).
         utm = UTM(server_ip, login, password)
         while True:
-            utm.ping_session()
             mode = menu1(utm)
+            utm.diff_import = mode == 3
+            utm.incremental_export = mode == 4
+            if mode == 4:
+                mode = 1
             while True:
-                utm.ping_session()
                 section = menu2(utm, mode)
                 if section == 999:
                     break
                 elif section == 99:
                     command = 99
-                    utm.ping_session()
                     executor(utm, mode, section, command)
                 else:
                     while True:
-                        utm.ping_session()
                         command = menu3(utm, mode, section)
                         if command == 999:
                             break
                         else:
-                            utm.ping_session()
                             executor(utm, mode, section, command)
                 
     except KeyboardInterrupt:
         print("\nПрограмма принудительно завершена пользователем.\n")
-        utm.logout()
+        if utm:
+            utm.logout()
+    except UtmError as err:
+        # Ошибки UTM (нет соединения, нет прав, узел недоступен после повторов) завершают программу.
+        print(err)
+        if utm:
+            utm.logout()
+        sys.exit(1)
 #    except:
 #        print("\nПрограмма завершена.\n")
 
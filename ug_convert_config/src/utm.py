@@ -1,43 +1,860 @@
 #!/usr/bin/python3
 # Версия 2.20
 # Общий класс для работы с xml-rpc
-import sys
+import os, sys
+import json
+import time
+import atexit
+import gzip
+import zlib
+import base64
+import bisect
+import random
+import socket
+import weakref
+import threading
+import http.client
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import xmlrpc.client as rpc
+import xml.etree.ElementTree as ET
 from xml.parsers.expat import ExpatError
 
 
+class KeepAliveConnection(http.client.HTTPConnection):
+    """
+    HTTP/1.1 соединение с раздельными таймаутами:
+    connect_timeout - на установку TCP-соединения, read_timeout - на ожидание ответа UTM.
+    """
+    def __init__(self, host, connect_timeout, read_timeout):
+        super().__init__(host, timeout=connect_timeout)
+        self.read_timeout = read_timeout
+
+    def connect(self):
+        super().connect()
+        self.sock.settimeout(self.read_timeout)
+
+
+class RetryPolicy:
+    """
+    Повтор запросов к UTM при временных ошибках с экспоненциальной задержкой и случайным разбросом (jitter):
+    перед повтором n ждать min(backoff * 2**(n-1), max_backoff) секунд, уменьшенные на случайную долю до jitter.
+    Временные ошибки - ошибка соединения, ответ HTTP 5xx, повреждённый сжатый ответ и fault из transient_faults (UTM перегружен).
+    Ответ, который не разбирается как xml (ExpatError), - ошибка ответа, а не связи: он не повторяется.
+    Остальные fault (102 - нет прав, 404 - не найдено, 409 - уже существует...) - ответ UTM: они не повторяются.
+    Запросы на изменение (add, update, set...) повторяются, только если запрос точно не дошёл до UTM
+    (соединение не установлено, HTTP 502/503/504), иначе UTM мог успеть их выполнить.
+    Число повторов задаётся переменной окружения UG_RPC_RETRIES (0 - не повторять).
+    После таймаута запрос повторяется не больше timeout_retries раз: каждая такая попытка уже ждала read_timeout.
+    """
+    transient_faults = {500, 502, 503, 504}
+    timeout_retries = 0
+    read_methods = {'get', 'list', 'fetch', 'status', 'ping', 'details', 'multicall'}
+    write_methods = {'add', 'update', 'set', 'delete', 'remove', 'move', 'login', 'logout'}
+    undelivered = (ConnectionRefusedError, socket.gaierror)
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=10, jitter=0.5):
+        self.retries = int(os.environ.get('UG_RPC_RETRIES', retries))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    def transient(self, error):
+        """Ошибка вызвана недоступностью или перегрузкой UTM, а не запросом"""
+        if isinstance(error, UtmUnavailable):
+            return False
+        if isinstance(error, rpc.Fault):
+            return error.faultCode in self.transient_faults
+        if isinstance(error, rpc.ProtocolError):
+            return error.errcode >= 500
+        return isinstance(error, (OSError, EOFError, http.client.HTTPException, GzipDecodeError))
+
+    def should_retry(self, method, error, attempt):
+        """Повторить запрос method, завершившийся ошибкой error в попытке attempt (1, 2...)"""
+        if attempt > self.retries or not self.transient(error):
+            return False
+        if isinstance(error, (socket.timeout, TimeoutError)) and attempt > self.timeout_retries:
+            return False
+        parts = set(method.split('.'))
+        if parts & self.read_methods and not parts & self.write_methods:
+            return True
+        if isinstance(error, rpc.ProtocolError):
+            return error.errcode in (502, 503, 504)
+        return isinstance(error, self.undelivered)
+
+    def delay(self, attempt):
+        """Задержка перед повтором attempt в секундах"""
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+    """
+    Предохранитель узла, общий для всех соединений объекта UtmXmlRpc. После threshold запросов подряд,
+    не выполненных из-за недоступности UTM (с учётом повторов RetryPolicy), предохранитель размыкается:
+    следующие reset_timeout секунд запросы к узлу сразу завершаются ошибкой UtmUnavailable без ожидания таймаутов.
+    Затем к UTM пропускается один пробный запрос: любой ответ UTM замыкает предохранитель, ошибка - снова размыкает.
+    threshold=0 - предохранитель выключен.
+    """
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0       # Запросов подряд, не выполненных из-за недоступности UTM
+        self.opened = None      # Время размыкания (time.monotonic), None - предохранитель замкнут
+        self._trial = False     # Пробный запрос выполняется
+        self._lock = threading.Lock()
+
+    def check(self, host):
+        """Проверить, можно ли отправить запрос. Если предохранитель разомкнут, вызывает UtmUnavailable."""
+        with self._lock:
+            if self.opened is None:
+                return
+            if not self._trial and time.monotonic() - self.opened >= self.reset_timeout:
+                self._trial = True
+                return
+        raise UtmUnavailable(f'Ошибка: UTM {host} недоступен ({self.failures} ошибок соединения подряд), '
+                             f'запросы к узлу приостановлены на {self.reset_timeout} сек.')
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened = None
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or (self.threshold and self.failures >= self.threshold):
+                self.opened = time.monotonic()
+                self._trial = False
+
+    def record(self, error, retry=None):
+        """
+        Учесть запрос, завершившийся ошибкой error. Недоступность UTM (временная ошибка по retry.transient,
+        без retry - любая ошибка, кроме fault) - сбой, ответ UTM - успех. UtmUnavailable самого предохранителя не учитывается.
+        """
+        if isinstance(error, UtmUnavailable):
+            return
+        if retry is not None:
+            unavailable = retry.transient(error)
+        else:
+            unavailable = not isinstance(error, rpc.Fault)
+        if unavailable:
+            self.failure()
+        else:
+            self.success()
+
+
+class RpcCompression:
+    """
+    Сжатие gzip запросов и ответов xml-rpc, общее для всех соединений объекта UtmXmlRpc.
+    Транспорт отправляет Accept-Encoding: gzip и распаковывает сжатые ответы по мере чтения.
+    Запросы больше threshold байт (содержимое списков, правила) сжимаются, когда известно, что UTM понимает gzip -
+    он прислал сжатый ответ. Если UTM отверг сжатый запрос, сжатие запросов выключается, а запрос повторяется без сжатия.
+    UG_RPC_GZIP=0 выключает сжатие запросов и ответов.
+    """
+    # Ответы HTTP, которыми сервер отвергает сжатый запрос, не выполняя его. 500 сюда не входит: запрос мог быть выполнен,
+    # и повтор без сжатия продублировал бы изменение (повторы запросов - только по RetryPolicy).
+    reject_codes = (400, 411, 415, 501)
+
+    def __init__(self, threshold=16384, level=1):
+        enabled = os.environ.get('UG_RPC_GZIP', '1') != '0'
+        self.responses = enabled                # Просить UTM сжимать ответы
+        self.requests = None if enabled else False  # Сжимать запросы: None - пока не известно, понимает ли UTM gzip
+        self.threshold = threshold
+        self.level = level
+
+    def compress(self, body):
+        """Тело запроса для отправки и признак того, что оно сжато"""
+        if self.requests and len(body) > self.threshold:
+            return gzip.compress(body, self.level), True
+        return body, False
+
+    def accepted(self):
+        """UTM прислал сжатый ответ"""
+        if self.requests is None:
+            self.requests = True
+
+    def rejected(self, error):
+        """Сжатый запрос завершился ошибкой error. Возвращает True, если это отказ от gzip (сжатие запросов выключено)."""
+        if (isinstance(error, rpc.ProtocolError) and error.errcode in self.reject_codes
+                or isinstance(error, rpc.Fault) and error.faultCode == -32700):
+            self.requests = False
+            return True
+        return False
+
+
+class RpcResponseParser:
+    """
+    Быстрый разбор ответа xml-rpc вместо rpc.getparser(). Ответ по мере чтения передаётся C-парсеру ElementTree (expat),
+    дерево строится без вызовов Python на каждый тег, затем одним проходом переводится в dict и list.
+    Элементы массивов удаляются из дерева по мере перевода, поэтому дерево и результат целиком в памяти одновременно не держатся.
+    На больших ответах (l7apps, содержимое списков, правила) быстрее xmlrpc.client.Unmarshaller
+    (см. замер parser в ug_benchmark.py). Интерфейс - как у пары (parser, unmarshaller): feed(data), close().
+    close() возвращает кортеж параметров ответа или возбуждает rpc.Fault. dateTime.iso8601 возвращается строкой
+    (результаты сохраняются в json), при use_datetime=True - объектом rpc.DateTime, как в xmlrpc.client.
+    """
+    int_types = {'int', 'i4', 'i8', 'i1', 'i2', 'biginteger'}
+
+    def __init__(self, use_datetime=False):
+        self.use_datetime = use_datetime
+        self._parser = ET.XMLParser()
+        self._result = None
+
+    def feed(self, data):
+        try:
+            self._parser.feed(data)
+        except ET.ParseError as err:
+            raise ExpatError(str(err)) from None
+
+    def close(self):
+        if self._result is None:
+            try:
+                root = self._parser.close()
+            except ET.ParseError as err:
+                raise ExpatError(str(err)) from None
+            body = root[0] if len(root) else None
+            if body is None or body.tag not in ('params', 'fault'):
+                raise rpc.ResponseError(f'неверный ответ xml-rpc: {root.tag}')
+            if body.tag == 'fault':
+                raise rpc.Fault(**self._value(body[0]))
+            self._result = tuple(self._value(param[0]) for param in body)
+        return self._result
+
+    def _value(self, element):
+        """Значение элемента <value>"""
+        if not len(element):
+            return element.text or ''
+        node = element[0]
+        tag = node.tag
+        if tag == 'struct':
+            value = self._value
+            return {member[0].text or '': value(member[1]) for member in node}
+        if tag == 'string':
+            return node.text or ''
+        if tag == 'array':
+            if not len(node):
+                return []
+            # Перевод с конца массива: переведённый элемент сразу удаляется из дерева.
+            data = node[0]
+            value = self._value
+            items = []
+            for i in range(len(data) - 1, -1, -1):
+                items.append(value(data[i]))
+                del data[i]
+            items.reverse()
+            return items
+        if tag in self.int_types:
+            return int(node.text)
+        if tag == 'boolean':
+            if node.text not in ('0', '1'):
+                raise TypeError('bad boolean value')
+            return node.text == '1'
+        if tag in ('double', 'float'):
+            return float(node.text)
+        if tag == 'nil':
+            return None
+        if tag == 'dateTime.iso8601':
+            return rpc.DateTime(node.text) if self.use_datetime else node.text
+        if tag == 'base64':
+            return rpc.Binary(base64.decodebytes((node.text or '').encode('ascii')))
+        return node.text or ''
+
+
+class UtmTransport(rpc.Transport):
+    """
+    Транспорт xml-rpc, использующий одно постоянное соединение HTTP/1.1 (keep-alive) для всех запросов.
+    Если UTM закрыл простаивающее соединение, транспорт переподключается и повторяет запрос один раз.
+    on_expired - функция, которая вызывается, если UTM ответил fault 104 (сессия завершилась): получает тело запроса
+    и возвращает тело с новым auth_token (запрос повторяется один раз) или None (ошибка передаётся дальше).
+    on_failure - функция, которая вызывается, если запрос не выполнен из-за потери сессии (fault 104) или соединения.
+    retry - RetryPolicy (повтор запросов при временных ошибках), breaker - CircuitBreaker узла. None - не используются.
+    parser - класс разбора ответа (RpcResponseParser), None - стандартный разбор xmlrpc.client.
+    compression - RpcCompression (сжатие запросов и ответов gzip), None - без сжатия.
+    """
+    stale_errors = (
+        http.client.RemoteDisconnected,
+        http.client.CannotSendRequest,
+        http.client.ResponseNotReady,
+        ConnectionResetError,
+        ConnectionAbortedError,
+        BrokenPipeError,
+    )
+
+    def __init__(self, connect_timeout=10, read_timeout=300, stats=None, on_failure=None, on_expired=None,
+                 retry=None, breaker=None, parser=None, compression=None):
+        super().__init__()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.stats = stats          # RpcStats - статистика вызовов (None - не собирается)
+        self.on_failure = on_failure
+        self.on_expired = on_expired
+        self.retry = retry
+        self.breaker = breaker
+        self.parser = parser
+        self.compression = compression
+        self.accept_gzip_encoding = compression is not None and compression.responses
+        self.last_request = time.monotonic()    # Время последнего запроса (для keepalive сессии)
+        self._sent = 0              # Байт запроса, отправлено при текущем запросе (после сжатия)
+        self._received = 0          # Байт ответа, прочитано при текущем запросе (до распаковки)
+        self._saved = 0             # Байт, сэкономлено сжатием запроса и ответа
+        self._compressed = False    # Текущий запрос отправлен сжатым
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        self._connection = host, KeepAliveConnection(chost, self.connect_timeout, self.read_timeout)
+        return self._connection[1]
+
+    def request(self, host, handler, request_body, verbose=False):
+        method = RpcStats.method_name(request_body)
+        attempt = 0
+        renewed = False
+        while True:
+            try:
+                if self.breaker is not None:
+                    self.breaker.check(host)
+                result = self._send(host, handler, request_body, verbose, method)
+                if self.breaker is not None:
+                    self.breaker.success()
+                return result
+            except rpc.Fault as err:
+                if err.faultCode == 104 and self.on_expired and not renewed:
+                    renewed = True
+                    body = self.on_expired(request_body)
+                    if body is not None:
+                        request_body = body
+                        continue
+                error = err
+            except (OSError, http.client.HTTPException, rpc.ProtocolError, ExpatError) as err:
+                error = err
+            if self._compressed and self.compression.rejected(error):
+                continue
+            attempt += 1
+            if self.retry is not None and self.retry.should_retry(method, error, attempt):
+                time.sleep(self.retry.delay(attempt))
+                continue
+            if self.breaker is not None:
+                self.breaker.record(error, self.retry)
+            if self.on_failure and (not isinstance(error, rpc.Fault) or error.faultCode == 104):
+                self.on_failure()
+            raise error
+
+    def _send(self, host, handler, request_body, verbose, method):
+        """Одна попытка запроса с учётом в статистике вызовов"""
+        self._sent = len(request_body)
+        self._received = self._saved = 0
+        self._compressed = False
+        fault = None
+        start = self.last_request = time.monotonic()
+        try:
+            return self._request(host, handler, request_body, verbose)
+        except rpc.Fault as err:
+            fault = err.faultCode
+            raise
+        except (OSError, http.client.HTTPException, rpc.ProtocolError, ExpatError) as err:
+            fault = type(err).__name__
+            raise
+        finally:
+            if self.stats is not None:
+                self.stats.record(method, time.monotonic() - start, self._sent, self._received, fault, self._saved)
+
+    def _request(self, host, handler, request_body, verbose):
+        try:
+            return self.single_request(host, handler, request_body, verbose)
+        except self.stale_errors:
+            self.close()
+        return self.single_request(host, handler, request_body, verbose)
+
+    def send_content(self, connection, request_body):
+        if self.compression is not None:
+            body, self._compressed = self.compression.compress(request_body)
+            if self._compressed:
+                connection.putheader('Content-Encoding', 'gzip')
+                self._saved += len(request_body) - len(body)
+                self._sent = len(body)
+                request_body = body
+        connection.putheader('Content-Length', str(len(request_body)))
+        connection.endheaders(request_body)
+
+    def parse_response(self, response):
+        """Прочитать ответ кусками по 64 КБ и передать парсеру. Сжатый ответ (gzip) распаковывается по мере чтения."""
+        decoder = None
+        if response.getheader('Content-Encoding', '') == 'gzip':
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if self.compression is not None:
+                self.compression.accepted()
+        parser, unmarshaller = self.getparser()
+        try:
+            while True:
+                data = response.read(65536)
+                if not data:
+                    break
+                self._received += len(data)
+                if decoder is not None:
+                    size = len(data)
+                    data = decoder.decompress(data)
+                    self._saved += len(data) - size
+                parser.feed(data)
+            if decoder is not None:
+                parser.feed(decoder.flush())
+        except zlib.error as err:
+            raise GzipDecodeError(f'ошибка распаковки ответа gzip: {err}') from None
+        parser.close()
+        return unmarshaller.close()
+
+    def getparser(self):
+        if self.parser is None:
+            return super().getparser()
+        parser = self.parser()
+        return parser, parser
+
+
+class RpcStats:
+    """
+    Статистика вызовов API: для каждого метода число вызовов, гистограмма времени ответа,
+    размер запросов и ответов в байтах (как переданы по сети, после сжатия), сколько байт сэкономило сжатие gzip
+    и коды ошибок. Вызовы внутри system.multicall (RpcBatch) учитываются отдельно в колонке "в пачке".
+    Если задан trace_file, каждый вызов дописывается в него строкой json: время, поток, метод, длительность,
+    размеры запроса и ответа, экономия от сжатия, код ошибки.
+    """
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)   # Границы интервалов гистограммы, сек.
+
+    def __init__(self, trace_file=None):
+        self.methods = {}       # {метод: статистика}
+        self._lock = threading.Lock()
+        self._trace = open(trace_file, 'a') if trace_file else None
+
+    @staticmethod
+    def method_name(request_body):
+        """Имя метода из тела запроса xml-rpc"""
+        start = request_body.find(b'<methodName>') + 12
+        end = request_body.find(b'</methodName>', start)
+        return request_body[start:end].decode('utf-8', 'replace') if start >= 12 and end > 0 else 'unknown'
+
+    def _method(self, method):
+        item = self.methods.get(method)
+        if item is None:
+            item = self.methods[method] = {
+                'count': 0, 'batched': 0, 'time': 0.0, 'max': 0.0, 'sent': 0, 'received': 0, 'saved': 0,
+                'faults': Counter(), 'histogram': [0] * (len(self.buckets) + 1),
+            }
+        return item
+
+    def record(self, method, elapsed, sent, received, fault=None, saved=0):
+        """
+        Учесть вызов метода: elapsed - время ответа в секундах, sent и received - размер запроса и ответа в байтах,
+        saved - сколько байт запроса и ответа сэкономило сжатие.
+        """
+        with self._lock:
+            item = self._method(method)
+            item['count'] += 1
+            item['time'] += elapsed
+            item['max'] = max(item['max'], elapsed)
+            item['sent'] += sent
+            item['received'] += received
+            item['saved'] += saved
+            item['histogram'][bisect.bisect_left(self.buckets, elapsed)] += 1
+            if fault is not None:
+                item['faults'][fault] += 1
+            if self._trace:
+                self._trace.write(json.dumps({
+                    'ts': round(time.time(), 3),
+                    'thread': threading.current_thread().name,
+                    'method': method,
+                    'ms': round(elapsed * 1000, 2),
+                    'sent': sent,
+                    'received': received,
+                    'saved': saved,
+                    'fault': fault,
+                }) + '\n')
+
+    def record_batched(self, method, fault=None):
+        """Учесть вызов метода внутри system.multicall"""
+        with self._lock:
+            item = self._method(method)
+            item['batched'] += 1
+            if fault is not None:
+                item['faults'][fault] += 1
+
+    def percentile(self, item, p):
+        """Оценка p-го процентиля времени ответа по гистограмме (верхняя граница интервала), сек."""
+        rank = p * item['count']
+        total = 0
+        for i, n in enumerate(item['histogram']):
+            total += n
+            if n and total >= rank:
+                return self.buckets[i] if i < len(self.buckets) else item['max']
+        return 0.0
+
+    def summary(self):
+        """Таблица статистики по методам, начиная с методов с наибольшим суммарным временем"""
+        lines = [
+            f"{'Метод':<50}{'вызовов':>9}{'в пачке':>9}{'всего, с':>10}{'сред, мс':>10}{'p50, мс':>9}"
+            f"{'p95, мс':>9}{'макс, мс':>10}{'отпр, КБ':>10}{'получ, КБ':>11}{'сжатие, КБ':>12}  ошибки"
+        ]
+        with self._lock:
+            items = sorted(self.methods.items(), key=lambda x: x[1]['time'], reverse=True)
+            for method, item in items:
+                count = item['count']
+                faults = ', '.join(f'{code}x{n}' for code, n in item['faults'].most_common())
+                lines.append(
+                    f"{method:<50}{count:>9}{item['batched']:>9}{item['time']:>10.2f}"
+                    f"{item['time'] / count * 1000 if count else 0:>10.1f}{self.percentile(item, 0.5) * 1000:>9.0f}"
+                    f"{self.percentile(item, 0.95) * 1000:>9.0f}{item['max'] * 1000:>10.1f}"
+                    f"{item['sent'] / 1024:>10.1f}{item['received'] / 1024:>11.1f}{item['saved'] / 1024:>12.1f}  {faults}"
+                )
+            count = sum(x['count'] for x in self.methods.values())
+            elapsed = sum(x['time'] for x in self.methods.values())
+            sent = sum(x['sent'] for x in self.methods.values())
+            received = sum(x['received'] for x in self.methods.values())
+            saved = sum(x['saved'] for x in self.methods.values())
+        lines.append(f"{'Всего':<50}{count:>9}{'':>9}{elapsed:>10.2f}{'':>38}{sent / 1024:>10.1f}{received / 1024:>11.1f}"
+                     f"{saved / 1024:>12.1f}")
+        return '\n'.join(lines)
+
+    def print_summary(self):
+        """Напечатать статистику вызовов API (вызывается при завершении программы)"""
+        if self.methods:
+            print('\n\033[36mСтатистика вызовов API:\033[0m')
+            print(self.summary())
+        if self._trace:
+            self._trace.close()
+            self._trace = None
+
+
+class CatalogCache:
+    """
+    Дисковый кэш справочников UTM (категории URL, категории и приложения L7 и т.п.).
+    Справочники хранятся в файлах json в каталоге path отдельно для каждого узла и версии ПО UTM,
+    поэтому после обновления UTM справочники загружаются заново. ttl - время жизни записи в секундах.
+    """
+    def __init__(self, path=None, ttl=7*24*3600):
+        self.path = path or os.path.join(os.path.expanduser('~'), '.cache', 'ug_convert_config')
+        self.ttl = ttl
+
+    def _file_name(self, node, version, name):
+        key = f'{node}_{version}_{name}'.replace(os.sep, '_')
+        return os.path.join(self.path, f'{key}.json')
+
+    def get(self, node, version, name, loader):
+        """Получить справочник name. Если его нет в кэше или запись устарела, справочник загружается вызовом loader()."""
+        file_name = self._file_name(node, version, name)
+        try:
+            if time.time() - os.path.getmtime(file_name) < self.ttl:
+                with open(file_name, 'r') as fh:
+                    return json.load(fh)
+        except (OSError, ValueError):
+            pass
+
+        data = loader()
+        tmp_name = f'{file_name}.{os.getpid()}.{threading.get_ident()}'
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp_name, 'w') as fh:
+                json.dump(data, fh, ensure_ascii=False)
+            os.replace(tmp_name, file_name)
+        except (OSError, TypeError, ValueError):
+            # Кэш недоступен для записи или ответ не сохраняется в json - работаем без кэша.
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+        return data
+
+    def invalidate(self, node=None, version=None, name=None):
+        """Удалить записи кэша: все, для узла, для узла и версии или один справочник."""
+        if not os.path.isdir(self.path):
+            return
+        parts = [str(x) for x in (node, version, name) if x is not None]
+        prefix = '_'.join(parts)
+        for file_name in os.listdir(self.path):
+            if not parts or file_name.startswith(f'{prefix}_') or file_name == f'{prefix}.json':
+                os.remove(os.path.join(self.path, file_name))
+
+
+class RpcBatch:
+    """
+    Очередь независимых запросов на чтение.
+    Запросы отправляются пачками через system.multicall, а если UTM его не поддерживает -
+    последовательно по одному постоянному соединению.
+    execute() возвращает список результатов в порядке добавления: (0, result) или (2, rpc.Fault).
+    """
+    def __init__(self, utm, max_calls=50):
+        self._utm = utm
+        self._calls = []
+        self.max_calls = max_calls
+
+    def add(self, method, *params):
+        """Добавить запрос в очередь. Возвращает номер результата в списке execute()."""
+        self._calls.append((method, params))
+        return len(self._calls) - 1
+
+    def execute(self):
+        """Выполнить все запросы из очереди."""
+        calls, self._calls = self._calls, []
+        results = []
+        for i in range(0, len(calls), self.max_calls):
+            chunk = calls[i:i+self.max_calls]
+            if self._utm._multicall_supported is not False:
+                try:
+                    results.extend(self._retried(chunk, self._renewed(chunk, self._multicall(chunk))))
+                    self._utm._multicall_supported = True
+                    continue
+                except rpc.Fault:
+                    self._utm._multicall_supported = False
+            results.extend(self._sequential(chunk))
+        return results
+
+    def _renewed(self, calls, results):
+        """
+        Запросы пачки, получившие fault 104 (сессия завершилась), повторить один раз с новым auth_token.
+        Запросы, выполняемые по одному, повторяет сам транспорт (см. UtmTransport).
+        """
+        expired = [i for i, (err, result) in enumerate(results) if err and result.faultCode == 104 and calls[i][1]]
+        if not expired:
+            return results
+        old_token = calls[expired[0]][1][0]
+        token = self._utm.renew_token(old_token)
+        if token is None:
+            return results
+        expired = [i for i in expired if calls[i][1][0] == old_token]
+        for i in expired:
+            calls[i] = (calls[i][0], (token, *calls[i][1][1:]))
+        for i, result in zip(expired, self._multicall([calls[i] for i in expired])):
+            results[i] = result
+        return results
+
+    def _retried(self, calls, results):
+        """
+        Запросы пачки, получившие временную ошибку UTM (см. RetryPolicy), повторить с задержкой.
+        Ошибки соединения и запросы, выполняемые по одному, повторяет сам транспорт.
+        """
+        policy = self._utm.retry
+        attempt = 1
+        while policy is not None:
+            failed = [i for i, (err, result) in enumerate(results) if err and policy.should_retry(calls[i][0], result, attempt)]
+            if not failed:
+                break
+            time.sleep(policy.delay(attempt))
+            for i, result in zip(failed, self._multicall([calls[i] for i in failed])):
+                results[i] = result
+            attempt += 1
+        return results
+
+    def _multicall(self, calls):
+        response = self._utm._server.system.multicall([{'methodName': m, 'params': list(p)} for m, p in calls])
+        stats = self._utm.stats
+        results = []
+        for (method, _), item in zip(calls, response):
+            if isinstance(item, dict):
+                results.append((2, rpc.Fault(item['faultCode'], item['faultString'])))
+            else:
+                results.append((0, item[0]))
+            if stats:
+                stats.record_batched(method, item['faultCode'] if isinstance(item, dict) else None)
+        return results
+
+    def _sequential(self, calls):
+        results = []
+        for method, params in calls:
+            try:
+                results.append((0, getattr(self._utm._server, method)(*params)))
+            except rpc.Fault as err:
+                results.append((2, err))
+        return results
+
+
+class LdapResolver:
+    """
+    Поиск GUID пользователей и групп LDAP по имени и имён по GUID.
+    Список LDAP-коннекторов запрашивается один раз (reset() - после добавления коннекторов). Найденные соответствия
+    хранятся в LRU-кэше (maxsize записей) в обе стороны: повторный поиск того же имени или GUID не обращается к UTM.
+    Имена из доменов без LDAP-коннектора в кэш не попадают: после добавления коннектора они будут найдены.
+    prefetch_guids() и prefetch_names() находят сразу все значения из списка одной пачкой запросов (RpcBatch).
+    """
+    def __init__(self, utm, maxsize=10000):
+        self._utm = utm
+        self.maxsize = maxsize
+        self._servers = None            # LDAP-коннекторы {domain: id}
+        self._guids = OrderedDict()     # {(kind, domain, name): guid}, kind - 'user' или 'group'
+        self._names = OrderedDict()     # {(kind, guid): 'domain\\name'}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Сбросить кэш (например, после добавления LDAP-коннектора)"""
+        with self._lock:
+            self._servers = None
+            self._guids.clear()
+            self._names.clear()
+
+    def _remember(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.maxsize:
+                cache.popitem(last=False)
+
+    def _lookup(self, cache, key):
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return True, cache[key]
+        return False, None
+
+    def server_id(self, domain):
+        """ID включённого LDAP-коннектора для домена или None"""
+        with self._lock:
+            if self._servers is None:
+                result = self._utm._server.v1.auth.ldap.servers.list(self._utm._auth_token, {})
+                self._servers = {y.lower(): x['id'] for x in result if x['enabled'] for y in x['domains']}
+            return self._servers.get(domain.lower())
+
+    def _guid_call(self, kind, domain, name):
+        """Метод API и параметры для поиска GUID. None, если для домена нет LDAP-коннектора."""
+        server_id = self.server_id(domain)
+        if server_id is None:
+            return None
+        method = 'v1.ldap.users.list' if kind == 'user' else 'v1.ldap.groups.list'
+        return method, self._utm._auth_token, server_id, name
+
+    def _name_call(self, kind, guid):
+        method = 'v1.ldap.user.fetch' if kind == 'user' else 'v1.ldap.group.fetch'
+        return method, self._utm._auth_token, guid
+
+    @staticmethod
+    def _parse_name(kind, result):
+        """Имя пользователя или группы LDAP из ответа v1.ldap.user.fetch/v1.ldap.group.fetch"""
+        name = result['name']
+        if kind == 'user':
+            i = name.find('(')
+            return name[i+1:len(name)-1]
+        for y in [x.split('=') for x in name.split(',')]:
+            if y[0] == 'CN':
+                return f"{result['guid'].split(':')[0]}\\{y[1]}"
+
+    def _store_guid(self, kind, domain, name, result):
+        guid = result[0]['guid'] if result else 0
+        self._remember(self._guids, (kind, domain.lower(), name), guid)
+        return guid
+
+    def _store_name(self, kind, guid, result):
+        name = self._parse_name(kind, result)
+        self._remember(self._names, (kind, guid), name)
+        return name
+
+    def get_guid(self, kind, domain, name):
+        """GUID пользователя (kind='user') или группы (kind='group') LDAP. 0, если не найден. Ошибки UTM - rpc.Fault."""
+        found, guid = self._lookup(self._guids, (kind, domain.lower(), name))
+        if found:
+            return guid
+        call = self._guid_call(kind, domain, name)
+        if call is None:
+            return 0
+        return self._store_guid(kind, domain, name, getattr(self._utm._server, call[0])(*call[1:]))
+
+    def get_name(self, kind, guid):
+        """Имя пользователя или группы LDAP в виде 'domain\\name'. Ошибки UTM - rpc.Fault."""
+        found, name = self._lookup(self._names, (kind, guid))
+        if found:
+            return name
+        call = self._name_call(kind, guid)
+        return self._store_name(kind, guid, getattr(self._utm._server, call[0])(*call[1:]))
+
+    def prefetch_guids(self, refs):
+        """
+        Найти GUID для всех (kind, domain, name) из refs одной пачкой запросов.
+        Повторы и уже известные значения пропускаются. Ошибки не сообщаются: значение,
+        которое не удалось найти, будет запрошено ещё раз при вызове get_guid().
+        """
+        refs = [x for x in dict.fromkeys(refs) if not self._lookup(self._guids, (x[0], x[1].lower(), x[2]))[0]]
+        if not refs:
+            return
+        try:
+            calls = [(ref, self._guid_call(*ref)) for ref in refs]
+        except rpc.Fault:
+            return
+        batch = self._utm.batch()
+        pending = []
+        for ref, call in calls:
+            if call is not None:
+                batch.add(*call)
+                pending.append(ref)
+        for ref, (err, result) in zip(pending, batch.execute()):
+            if not err:
+                self._store_guid(*ref, result)
+
+    def prefetch_names(self, refs):
+        """Найти имена для всех (kind, guid) из refs одной пачкой запросов (см. prefetch_guids)."""
+        refs = [x for x in dict.fromkeys(refs) if not self._lookup(self._names, x)[0]]
+        if not refs:
+            return
+        batch = self._utm.batch()
+        for ref in refs:
+            batch.add(*self._name_call(*ref))
+        for ref, (err, result) in zip(refs, batch.execute()):
+            if not err:
+                self._store_name(*ref, result)
+
+
 class UtmXmlRpc:
-    def __init__(self, server_ip, login, password):
+    def __init__(self, server_ip, login, password, connect_timeout=10, read_timeout=300):
         self._login = login
         self._password = password
         self._url = f'http://{server_ip}:4040/rpc'
         self._auth_token = None
+        self._local = threading.local()     # Соединения потоков (bind_thread_connection) и их счётчики ошибок (failure_counter)
+        self._thread_servers = []
+        self._lock = threading.Lock()
         self._server = None
+        self.retry = RetryPolicy()          # Повтор запросов при временных ошибках UTM
+        self.breaker = CircuitBreaker()     # Предохранитель узла: при недоступности UTM запросы сразу завершаются ошибкой
+        # Разбор ответов: RpcResponseParser или None - стандартный разбор xmlrpc.client (UG_RPC_PARSER=stock).
+        self.response_parser = None if os.environ.get('UG_RPC_PARSER') == 'stock' else RpcResponseParser
+        self.compression = RpcCompression() # Сжатие gzip запросов и ответов
+        self._transport = UtmTransport(connect_timeout, read_timeout, on_failure=self._count_failure, on_expired=self._renew_session,
+                                       retry=self.retry, breaker=self.breaker, parser=self.response_parser,
+                                       compression=self.compression)
+        self._transports = weakref.WeakSet([self._transport])   # Все соединения объекта (для keepalive)
+        self._expired_tokens = []           # Токены завершившихся сессий: запросы с ними повторяются с новым токеном
+        self._session_lock = threading.Lock()
+        self._keepalive_stop = None
+        self._multicall_supported = None    # Поддержка system.multicall: None - не проверялась
         self.version = None
         self.server_ip = server_ip
         self.node_name = None
+        self.page_size = 1000           # Размер страницы при постраничной выгрузке списков (iter_items)
+        self.prefetch = False           # Запрашивать следующую страницу, пока обрабатывается текущая
+        self.workers = 8                # Число параллельных соединений при выгрузке содержимого списков
+        self.nlist_failures = {}        # {вид списка: {id}} - списки, содержимое которых не удалось загрузить (get_nlist_list)
+        self.cache = CatalogCache()     # Дисковый кэш справочников UTM (см. get_cached)
+        self.cache_refresh = bool(os.environ.get('UG_CACHE_REFRESH'))  # Сбросить кэш узла при первом обращении
+        self.ldap = LdapResolver(self)  # Поиск пользователей и групп LDAP с кэшированием
+        self.chunk_size = 1000          # Сколько значений отправлять за один запрос при загрузке содержимого списков
+        self.chunk_retries = 5          # Число повторов запроса при ошибке загрузки части списка
+        self.stats = None               # Статистика вызовов API (см. enable_stats)
+        self.failures = 0               # Запросов, не выполненных из-за потери сессии (fault 104) или соединения с UTM
+        self.keepalive = 120            # Пинг сессии, если к UTM не было запросов дольше keepalive секунд (0 - не пинговать)
+        if os.environ.get('UG_RPC_STATS') or os.environ.get('UG_RPC_TRACE'):
+            self.enable_stats(os.environ.get('UG_RPC_TRACE'))
 
     def _connect(self):
         """Подключиться к UTM"""
         try:
-            self._server = rpc.ServerProxy(self._url, verbose=False)
+            self._server = rpc.ServerProxy(self._url, transport=self._transport, verbose=False)
             if self.get_node_status() == 'work':
                 result = self._server.v2.core.login(self._login, self._password, {'origin': 'dev-script'})
                 self._auth_token = result.get('auth_token')
                 self.node_name =  result.get('node')
                 self.version = result.get('version')
+                self._start_keepalive()
             else:
-                print('Ошибка: UTM не позволяет установить соединение!')
-                sys.exit(1)
+                raise UtmError('Ошибка: UTM не позволяет установить соединение!')
         except OSError as err:
-            print(f'Ошибка: {err} (Node: {self.server_ip}).')
-            sys.exit(1)
+            raise UtmError(f'Ошибка: {err} (Node: {self.server_ip}).')
         except rpc.ProtocolError as err:
-            print(f'Ошибка: [{err.errcode}] {err.errmsg} (Node: {self.server_ip}).')
-            sys.exit(1)
+            raise UtmError(f'Ошибка: [{err.errcode}] {err.errmsg} (Node: {self.server_ip}).')
         except rpc.Fault as err:
-            print(f'Ошибка: [{err.faultCode}] {err.faultString} (Node: {self.server_ip}).')
-            sys.exit(1)
+            raise UtmError(f'Ошибка: [{err.faultCode}] {err.faultString} (Node: {self.server_ip}).')
         return 0
 
     def get_node_status(self):
@@ -45,7 +862,68 @@ class UtmXmlRpc:
         result = self._server.v2.core.node.status()
         return result.get('status')
 
+    def renew_token(self, token):
+        """
+        Сессия с токеном token завершилась (fault 104): выполнить повторный вход и вернуть новый auth_token.
+        Повторный вход выполняется один раз: для запросов других потоков со старым токеном возвращается уже новый.
+        Возвращает None, если token не токен сессии объекта или повторный вход не удался.
+        """
+        with self._session_lock:
+            if token in self._expired_tokens:
+                return self._auth_token
+            if not token or token != self._auth_token:
+                return None
+            transport = UtmTransport(self._transport.connect_timeout, self._transport.read_timeout,
+                                     retry=self.retry, breaker=self.breaker, parser=self.response_parser,
+                                     compression=self.compression)
+            server = rpc.ServerProxy(self._url, transport=transport)
+            try:
+                result = server.v2.core.login(self._login, self._password, {'origin': 'dev-script'})
+            except (rpc.Fault, rpc.ProtocolError, OSError, http.client.HTTPException) as err:
+                print(f'\033[31mСессия завершилась, повторный вход не выполнен: {err}\033[0m')
+                return None
+            finally:
+                server('close')()
+            self._expired_tokens = [token, *self._expired_tokens][:10]
+            self._auth_token = result.get('auth_token')
+            print('\033[33mСессия завершилась по таймауту, выполнен повторный вход.\033[0m')
+            return self._auth_token
+
+    def _renew_session(self, request_body):
+        """Тело запроса, получившего fault 104, с новым auth_token (см. renew_token) или None"""
+        tokens = [x for x in (self._auth_token, *self._expired_tokens) if x]
+        token = next((x for x in tokens if f'<string>{rpc.escape(x)}</string>'.encode() in request_body), None)
+        new_token = self.renew_token(token) if token else None
+        if new_token is None:
+            return None
+        return request_body.replace(f'<string>{rpc.escape(token)}</string>'.encode(), f'<string>{rpc.escape(new_token)}</string>'.encode())
+
+    def _start_keepalive(self):
+        """Запустить фоновый поток, который пингует сессию, пока к UTM нет других запросов (см. keepalive)"""
+        if not self.keepalive or self._keepalive_stop is not None:
+            return
+        self._keepalive_stop = threading.Event()
+        threading.Thread(target=self._keepalive_loop, args=(self._keepalive_stop,), name='utm-keepalive', daemon=True).start()
+
+    def _keepalive_loop(self, stop):
+        server = None
+        while not stop.wait(self.keepalive / 4):
+            with self._lock:
+                last_request = max(x.last_request for x in self._transports)
+            if time.monotonic() - last_request < self.keepalive:
+                continue
+            server = server or self._new_server()
+            try:
+                server.v2.core.session.ping(self._auth_token)
+            except (rpc.Fault, rpc.ProtocolError, OSError, http.client.HTTPException):
+                pass
+        if server is not None:
+            server('close')()
+
     def logout(self):
+        if self._keepalive_stop is not None:
+            self._keepalive_stop.set()
+            self._keepalive_stop = None
         try:
             if self._server is not None and self._auth_token is not None:
                 self._server.v2.core.logout(self._auth_token)
@@ -63,14 +941,188 @@ class UtmXmlRpc:
             else:
                 print(f"\tОшибка utm.ping_session: [{err.faultCode}] — {err.faultString}")
 
+    @property
+    def _server(self):
+        """Соединение текущего потока, если оно открыто, иначе основное соединение"""
+        return getattr(self._local, 'server', None) or self._main_server
+
+    @_server.setter
+    def _server(self, server):
+        self._main_server = server
+
+    def enable_stats(self, trace_file=None):
+        """
+        Включить сбор статистики вызовов API (RpcStats) для всех соединений объекта.
+        Таблица статистики печатается при завершении программы. trace_file - файл для записи каждого вызова.
+        Включается также переменными окружения UG_RPC_STATS=1 и UG_RPC_TRACE=<файл>.
+        """
+        if self.stats is None:
+            self.stats = RpcStats(trace_file)
+            self._transport.stats = self.stats
+            atexit.register(self.stats.print_summary)
+        return self.stats
+
+    def _new_server(self):
+        """Дополнительное соединение с UTM в рамках текущей сессии (для параллельных запросов)"""
+        transport = UtmTransport(self._transport.connect_timeout, self._transport.read_timeout, self.stats,
+                                 self._count_failure, self._renew_session, self.retry, self.breaker, self.response_parser,
+                                 self.compression)
+        with self._lock:
+            self._transports.add(transport)
+        return rpc.ServerProxy(self._url, transport=transport, verbose=False)
+
+    def _count_failure(self):
+        with self._lock:
+            self.failures += 1
+            counter = getattr(self._local, 'failures', None)
+            if counter is not None:
+                counter[0] += 1
+
+    def failure_counter(self):
+        """
+        Счётчик несработавших запросов (см. self.failures) текущего потока и запущенных им пулов: список из одного числа.
+        По нему раздел, выполняемый в потоке, узнаёт о своих ошибках, не путая их с ошибками соседних разделов.
+        """
+        counter = getattr(self._local, 'failures', None)
+        if counter is None:
+            counter = self._local.failures = [0]
+        return counter
+
+    def _share_failure_counter(self, counter):
+        """Считать ошибки потока пула в счётчик запустившего пул потока (initializer для ThreadPoolExecutor)"""
+        self._local.failures = counter
+
+    def bind_thread_connection(self):
+        """
+        Открыть отдельное соединение для текущего потока.
+        Все методы объекта, вызванные из этого потока, будут работать через него.
+        """
+        if getattr(self._local, 'server', None) is None:
+            self._local.server = self._new_server()
+            with self._lock:
+                self._thread_servers.append(self._local.server)
+
+    def close_thread_connections(self):
+        """Закрыть соединения, открытые bind_thread_connection()"""
+        with self._lock:
+            servers, self._thread_servers = self._thread_servers, []
+        for server in servers:
+            server('close')()
+
+    def iter_items(self, method, *args, tail=({},), page_size=None, prefetch=None, server=None, start=0):
+        """
+        Постраничный обход списочного метода API: method(auth_token, *args, offset, limit, *tail).
+        Запрашивает страницы, пока не будут получены все записи (count/total в ответе), и отдаёт записи по одной.
+        Если prefetch, следующая страница запрашивается по отдельному соединению, пока обрабатывается текущая.
+        server - соединение для запросов (по умолчанию основное соединение объекта), start - с какой записи начинать.
+        """
+        page_size = page_size or self.page_size
+        server = server or self._server
+        prefetch = self.prefetch if prefetch is None else prefetch
+
+        def fetch(server, offset):
+            """Возвращает записи страницы и признак последней страницы"""
+            result = getattr(server, method)(self._auth_token, *args, offset, page_size, *tail)
+            if isinstance(result, list):
+                return result, True     # Метод отдал весь список без разбивки на страницы (UTM v.5).
+            total = result.get('total', result.get('count'))
+            last = len(result['items']) < page_size or (total is not None and offset + page_size >= total)
+            return result['items'], last
+
+        if not prefetch:
+            offset = start
+            while True:
+                items, last = fetch(server, offset)
+                yield from items
+                if last:
+                    return
+                offset += page_size
+
+        prefetch_server = self._new_server()
+        try:
+            with ThreadPoolExecutor(max_workers=1, initializer=self._share_failure_counter,
+                                    initargs=(self.failure_counter(),)) as executor:
+                offset = start
+                future = executor.submit(fetch, prefetch_server, offset)
+                while future:
+                    items, last = future.result()
+                    offset += page_size
+                    future = None if last else executor.submit(fetch, prefetch_server, offset)
+                    yield from items
+        finally:
+            prefetch_server('close')()
+
+    def batch(self, max_calls=50):
+        """Создать очередь независимых запросов на чтение (см. RpcBatch)"""
+        return RpcBatch(self, max_calls)
+
+    def batch_items(self, result, method, *args, tail=({},)):
+        """
+        Все записи списочного метода по ответу result на первую страницу (запрос из RpcBatch с offset 0).
+        Если записей на UTM больше (count/total в ответе), остальные дочитываются через iter_items(method, *args, tail=tail).
+        """
+        if isinstance(result, list):
+            return result
+        items = result['items']
+        total = result.get('total', result.get('count'))
+        if total is not None and len(items) < total:
+            items = items + list(self.iter_items(method, *args, tail=tail, start=len(items)))
+        return items
+
+    def get_cached(self, name, method, *args):
+        """
+        Получить справочник UTM из дискового кэша (см. CatalogCache).
+        Если справочника нет в кэше для текущего узла и версии UTM, он загружается вызовом method(*args).
+        Если задана переменная окружения UG_CACHE_REFRESH, при первом обращении кэш узла удаляется (CatalogCache.invalidate),
+        и справочники загружаются с UTM заново (например, после обновления сигнатур приложений L7).
+        """
+        return self._cached(name, lambda: getattr(self._server, method)(*args))
+
+    def get_cached_items(self, name, method, *args, tail=({},)):
+        """Получить справочник-список из дискового кэша (см. get_cached). Записи загружаются постранично (iter_items)."""
+        return self._cached(name, lambda: list(self.iter_items(method, *args, tail=tail)))
+
+    def _cached(self, name, loader):
+        node = self.node_name or self.server_ip
+        with self._lock:
+            refresh, self.cache_refresh = self.cache_refresh, False
+        if refresh:
+            self.cache.invalidate(node)
+        return self.cache.get(node, self.version, name, loader)
+
+    def get_url_categories(self):
+        """Получить список категорий URL"""
+        try:
+            result = self.get_cached('categories', 'v2.core.get.categories')
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_url_categories: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    def get_l7_categories(self):
+        """Получить список категорий приложений L7"""
+        try:
+            result = self.get_cached_items('l7categories.all', 'v2.core.get.l7categories', tail=('',))
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_l7_categories: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    def get_l7_apps(self):
+        """Получить список приложений L7"""
+        try:
+            # Записи кэша с окном 0..10000 (l7apps, l7categories) могли быть неполными - постраничный список хранится под новым именем.
+            tail = ({}, []) if self.version.startswith('6') else ('',)
+            result = self.get_cached_items('l7apps.all', 'v2.core.get.l7apps', tail=tail)
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_l7_apps: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
 ################################### Settings ####################################
     def get_ntp_config(self):
         """Получить конфигурацию NTP"""
         try:
             result = self._server.v2.settings.time.get(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_ntp_config: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_ntp_config: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_ntp_config(self, ntp):
@@ -90,8 +1142,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.settings.get.params(self._auth_token, params)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_settings_params: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_settings_params: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def set_settings_param(self, param_name, param_value):
@@ -107,8 +1158,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.settings.proxy.port.get(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_proxy_port: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_proxy_port: [{err.faultCode}] — {err.faultString}")
         return 0, result  # Возвращает номер порта
 
     def set_proxy_port(self, port):
@@ -124,8 +1174,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.proxyportal.config.get(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_proxyportal_config: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_proxyportal_config: [{err.faultCode}] — {err.faultString}")
         return 0, result
 
     def set_proxyportal_config(self, params):
@@ -141,8 +1190,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.core.administrator.profiles.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_admin_profiles_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_admin_profiles_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_admin_profile(self, profile):
@@ -168,8 +1216,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.core.administrator.config.get(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_admin_config: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_admin_config: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def set_admin_config(self, params):
@@ -185,8 +1232,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.core.administrator.list(self._auth_token, {})
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_admin_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_admin_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_admin(self, admin):
@@ -212,8 +1258,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.settings.certificates.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_certificates_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_certificates_list: [{err.faultCode}] — {err.faultString}")
         return 0, result
 
     def get_certificate_details(self, cert_id):
@@ -221,8 +1266,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.settings.certificate.details(self._auth_token, cert_id)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_certificate_details: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_certificate_details: [{err.faultCode}] — {err.faultString}")
         return result
 
     def get_certificate_data(self, cert_id):
@@ -230,8 +1274,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.settings.certificate.getData(self._auth_token, cert_id)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_certificate_data: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_certificate_data: [{err.faultCode}] — {err.faultString}")
         return result
 
     def get_certificate_chain_data(self, cert_id):
@@ -239,8 +1282,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v2.settings.certificate.getCertWithChainData(self._auth_token, cert_id)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_certificate_chain_data: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_certificate_chain_data: [{err.faultCode}] — {err.faultString}")
         return result
 
     def add_certificate(self, cert):
@@ -258,8 +1300,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.netmanager.zones.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"Ошибка utm.get_zones_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка utm.get_zones_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_zone(self, zone):
@@ -295,8 +1336,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.netmanager.gateways.list(self._auth_token, self.node_name, {})
         except rpc.Fault as err:
-            print(f"Ошибка get_gateways_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка get_gateways_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_gateway(self, gateway):
@@ -325,8 +1365,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.netmanager.failover.config.get(self._auth_token)
         except rpc.Fault as err:
-            print(f"Ошибка get_gateway_failover: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка get_gateway_failover: [{err.faultCode}] — {err.faultString}")
         return 0, result
 
     def set_gateway_failover(self, params):
@@ -343,8 +1382,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.netmanager.interfaces.list(self._auth_token, self.node_name, {})
         except rpc.Fault as err:
-            print(f"Ошибка utm.get_interfaces_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка utm.get_interfaces_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def update_interface(self, iface_id, iface):
@@ -428,8 +1466,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.netmanager.dhcp.subnets.list(self._auth_token, self.node_name, {})
         except rpc.Fault as err:
-            print(f"Ошибка utm.get_dhcp_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка utm.get_dhcp_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_dhcp_subnet(self, subnet):
@@ -451,12 +1488,11 @@ class UtmXmlRpc:
         """Получить настройки DNS"""
         try:
             dns_servers = self._server.v2.settings.custom.dnses.list(self._auth_token)  # список системных DNS-серверов
-            dns_rules = self._server.v1.dns.rules.list(self._auth_token, 0, 1000, {})   # список правил DNS
-            static_records = self._server.v1.dns.static.records.list(self._auth_token, 0, 1000, {})   # список статических записей
+            dns_rules = list(self.iter_items('v1.dns.rules.list'))   # список правил DNS
+            static_records = list(self.iter_items('v1.dns.static.records.list'))   # список статических записей
         except rpc.Fault as err:
-            print(f"Ошибка utm.get_dns_config: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return dns_servers, dns_rules['items'], static_records['items']
+            raise UtmError(f"Ошибка utm.get_dns_config: [{err.faultCode}] — {err.faultString}")
+        return dns_servers, dns_rules, static_records
 
     def add_dns_server(self, dns_server):
         """Добавить DNS server"""
@@ -502,8 +1538,7 @@ class UtmXmlRpc:
             if err.faultCode == 102:
                     return 1, f'\tОшибка: нет прав на чтение конфигурации WCCP. Конфигурация WWCP не выгружена.'
             else:
-                print(f"Ошибка utm.get_wccp_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+                raise UtmError(f"Ошибка utm.get_wccp_list: [{err.faultCode}] — {err.faultString}")
         return 0, result
 
     def add_wccp_rule(self, rule):
@@ -533,8 +1568,7 @@ class UtmXmlRpc:
             else:
                 result = self._server.v1.netmanager.route.list(self._auth_token, self.node_name, {})
         except rpc.Fault as err:
-            print(f"Ошибка utm.get_routers_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка utm.get_routers_list: [{err.faultCode}] — {err.faultString}")
         return result
 
     def add_routers_rule(self, rule):
@@ -569,8 +1603,7 @@ class UtmXmlRpc:
             ifaces = self._server.v1.netmanager.ospf.interfaces.list(self._auth_token, self.node_name)
             areas = self._server.v1.netmanager.ospf.areas.list(self._auth_token, self.node_name)
         except rpc.Fault as err:
-            print(f"Ошибка utm.get_ospf_config: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка utm.get_ospf_config: [{err.faultCode}] — {err.faultString}")
         return data, ifaces, areas
 
     def get_bgp_config(self):
@@ -581,8 +1614,7 @@ class UtmXmlRpc:
             rmaps = self._server.v1.netmanager.bgp.routemaps.list(self._auth_token, self.node_name)
             filters = self._server.v1.netmanager.bgp.filters.list(self._auth_token, self.node_name)
         except rpc.Fault as err:
-            print(f"Ошибка utm.get_bgp_config: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка utm.get_bgp_config: [{err.faultCode}] — {err.faultString}")
         return data, neigh, rmaps, filters
 
 ##################################### Библиотека  ######################################
@@ -590,12 +1622,12 @@ class UtmXmlRpc:
         """Получить список изменённых категорий URL раздела Библиотеки"""
         try:
             if self.version.startswith('6'):
-                result = self._server.v1.content.override.domains.list(self._auth_token, 0, 1000, {}, [])
+                result = list(self.iter_items('v1.content.override.domains.list', tail=({}, [])))
             else:
-                result = self._server.v1.content.override.domains.list(self._auth_token, 0, 1000, {})
+                result = list(self.iter_items('v1.content.override.domains.list'))
         except rpc.Fault as err:
             return 2, f"\tНе удалось выгрузить список изменённых категорий URL!\n\tОшибка get_custom_url_list: [{err.faultCode}] — {err.faultString}"
-        return 0, result['items']
+        return 0, result
 
     def add_custom_url(self, data):
         """Добавить изменённую категорию URL"""
@@ -625,47 +1657,86 @@ class UtmXmlRpc:
         else:
             return 0, result
 
-    def get_nlist_list(self, list_type):
-        """Получить содержимое пользовательских именованных списков раздела Библиотеки"""
-        array = []
+    def get_nlist_list(self, list_type, unchanged=None):
+        """
+        Получить содержимое пользовательских именованных списков раздела Библиотеки.
+        Содержимое списков загружается параллельно (self.workers соединений), порядок списков сохраняется.
+        unchanged - {id: (version, last_update)} списков, содержимое которых уже выгружено (инкрементальный экспорт).
+        Если version и last_update списка не изменились, его содержимое не запрашивается и item['content'] = None.
+        Если содержимое списка загрузить не удалось, item['content'] = [], а id списка запоминается
+        в self.nlist_failures[list_type] (версия такого списка не сохраняется в состоянии экспорта).
+        """
         try:
-            result = self._server.v2.nlists.list(self._auth_token, list_type, 0, 5000, {})
+            result = list(self.iter_items('v2.nlists.list', list_type))
         except rpc.Fault as err:
-            print(f"\tОшибка-1 utm.get_nlist_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка-1 utm.get_nlist_list: [{err.faultCode}] — {err.faultString}")
 
-        for item in result['items']:
-            if item['editable']:
-                item['name'] = item['name'].strip()
-                content = {}
-                utm_version = self.version.split('.')
-                try:
-                    if (list_type == 'ipspolicy' and self.version.startswith('5')) \
-                             or (self.version.startswith('6.1') and int(utm_version[2]) > 8):
-                        content = self._server.v2.nlists.list.list(self._auth_token, item['id'], 0, 5000, {}, [])
-#                    elif self.version.startswith('6.1.8'):
-#                        content = self._server.v2.nlists.list.list(self._auth_token, item['id'], 0, 5000, {}, [])
-                    else:
-                        content = self._server.v2.nlists.list.list(self._auth_token, item['id'], 0, 5000, '', [])
-                except rpc.Fault as err:
-                    print(f'\033[33m\tСодержимое списка "{item["name"]}" не экспортировано. Ошибка загрузки списка!\033[0m')
-                    content['items'] = []
-                except ExpatError:
-                    print(f'\033[33m\tСодержимое списка "{item["name"]}" не экспортировано. Список corrupted!\033[0m')
-                    content['items'] = []
-                except UnboundLocalError:
-                    print(f'\033[33m\tСодержимое списка "{item["name"]}" не экспортировано. Ошибка программы!\033[0m')
-                    content['items'] = []
-                if list_type == 'timerestrictiongroup' and self.version.startswith('5'):
-                    item['content'] = [x['value'] for x in content['items']]
-                elif list_type == 'httpcwl':
-                    array = {'id': item['id'], 'content': content['items']}
-                    break
-                else:
-                    item['content'] = content['items']
-                array.append(item)
+        lists = [item for item in result if item['editable']]
+        if list_type == 'httpcwl':
+            lists = lists[:1]
+        utm_version = self.version.split('.')
+        if (list_type == 'ipspolicy' and self.version.startswith('5')) \
+                 or (self.version.startswith('6.1') and int(utm_version[2]) > 8):
+            tail = ({}, [])
+        else:
+            tail = ('', [])
+
+        unchanged = unchanged or {}
+        for item in lists:
+            item['name'] = item['name'].strip()
+        fetch = [item for item in lists if not self.nlist_unchanged(item, unchanged)]
+
+        local = threading.local()
+        servers = []
+        lock = threading.Lock()
+
+        def get_content(item):
+            """Загрузить содержимое одного списка по соединению текущего потока"""
+            if not hasattr(local, 'server'):
+                local.server = self._new_server()
+                with lock:
+                    servers.append(local.server)
+            try:
+                return list(self.iter_items('v2.nlists.list.list', item['id'], tail=tail, server=local.server))
+            except rpc.Fault as err:
+                print(f'\033[33m\tСодержимое списка "{item["name"]}" не экспортировано. Ошибка загрузки списка!\033[0m')
+            except ExpatError:
+                print(f'\033[33m\tСодержимое списка "{item["name"]}" не экспортировано. Список corrupted!\033[0m')
+            return None
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, initializer=self._share_failure_counter,
+                                    initargs=(self.failure_counter(),)) as executor:
+                contents = dict(zip((x['id'] for x in fetch), executor.map(get_content, fetch)))
+        finally:
+            for server in servers:
+                server('close')()
+        failed = {key for key, content in contents.items() if content is None}
+        self.nlist_failures[list_type] = failed
+        for key in failed:
+            contents[key] = []
+
+        array = []
+        for item in lists:
+            content = contents.get(item['id'])
+            if content is None:
+                item['content'] = None
+            elif list_type == 'timerestrictiongroup' and self.version.startswith('5'):
+                item['content'] = [x['value'] for x in content]
+            elif list_type == 'httpcwl':
+                array = {'id': item['id'], 'content': content}
+                break
+            else:
+                item['content'] = content
+            array.append(item)
         return len(array), array
 
+    @staticmethod
+    def nlist_unchanged(item, unchanged):
+        """Объект не изменился с прошлого экспорта: совпадают version и last_update (хотя бы одно из них заполнено)"""
+        stamp = (item.get('version'), item.get('last_update'))
+        return any(x not in (None, '') for x in stamp) and unchanged.get(item['id']) == tuple(str(x) for x in stamp)
+
     def add_nlist(self, named_list):
         """Добавить именованный список"""
         try:
@@ -694,10 +1765,11 @@ class UtmXmlRpc:
         else:
             return 0, result
 
-    def add_nlist_item(self, named_list_id, item):
+    def add_nlist_item(self, named_list_id, item, server=None):
         """Добавить 1 значение в именованный список"""
+        server = server or self._server
         try:
-            result = self._server.v2.nlists.list.add(self._auth_token, named_list_id, item)
+            result = server.v2.nlists.list.add(self._auth_token, named_list_id, item)
         except TypeError as err:
             return 2, err
         except rpc.Fault as err:
@@ -708,33 +1780,108 @@ class UtmXmlRpc:
         else:
             return 0, result
 
-    def add_nlist_items(self, named_list_id, items):
-        """Добавить список значений в именованный список"""
-        try:
-            result = self._server.v2.nlists.list.add.items(self._auth_token, named_list_id, items)
-        except TypeError as err:
-            return 2, err
-        except rpc.Fault as err:
-            if err.faultCode == 2001:
-                return 1, f"\tСодержимое: {items} не добавлено, так как уже существует."
-            elif err.faultCode == 2003:
-                return 3, f"\tСодержимое: {items} не добавлено, так как обновляется через URL."
+    def add_nlist_items(self, named_list_id, items, server=None):
+        """
+        Добавить список значений в именованный список.
+        Значения отправляются частями по self.chunk_size. При временной ошибке (RetryPolicy.transient) или таймауте
+        запрос повторяется с паузой (1, 2, 4... сек.) и вдвое меньшей частью, начиная с первого не принятого значения.
+        Остальные ошибки UTM (нет прав, неверное значение...) не повторяются. Если UTM недоступен (UtmUnavailable),
+        исключение передаётся вызывающему.
+        Возвращает (0, число добавленных значений). При ошибке (2, сообщение) с числом загруженных значений.
+        """
+        server = server or self._server
+        chunk_size = self.chunk_size
+        offset, added, existing, retries = 0, 0, 0, 0
+        while offset < len(items):
+            chunk = items[offset:offset+chunk_size]
+            try:
+                result = server.v2.nlists.list.add.items(self._auth_token, named_list_id, chunk)
+            except TypeError as err:
+                return 2, err
+            except rpc.Fault as err:
+                if err.faultCode == 2001:
+                    # Часть значений уже есть в списке - добавляем значения этой части по одному.
+                    for item in chunk:
+                        err1, result1 = self.add_nlist_item(named_list_id, item, server=server)
+                        if err1 == 2:
+                            return 2, f'{result1}\n\tЗагружено {offset} из {len(items)} значений.'
+                        elif err1 == 1:
+                            existing += 1
+                        else:
+                            added += 1
+                    offset += len(chunk)
+                    continue
+                elif err.faultCode == 2003:
+                    return 3, f"\tСодержимое не добавлено, так как список обновляется через URL."
+                error = f'[{err.faultCode}] — {err.faultString}'
+                if self.retry is None or not self.retry.transient(err):
+                    return 2, f'\tОшибка utm.add_nlist_items: {error}\n\tЗагружено {offset} из {len(items)} значений.'
+            except UtmUnavailable:
+                raise
+            except (OSError, http.client.HTTPException) as err:
+                server('close')()
+                error = err
             else:
-                return 2, f'\tОшибка utm.add_nlist_items: [{err.faultCode}] — {err.faultString}'
-        else:
-            return 0, result
+                added += result if type(result) is int else len(chunk)
+                offset += len(chunk)
+                retries = 0
+                chunk_size = min(chunk_size * 2, self.chunk_size)
+                continue
+
+            retries += 1
+            if retries > self.chunk_retries:
+                return 2, f'\tОшибка utm.add_nlist_items: {error}\n\tЗагружено {offset} из {len(items)} значений.'
+            time.sleep(2 ** (retries - 1))
+            chunk_size = max(chunk_size // 2, 1)
+
+        if existing and not added:
+            return 1, f"\tСодержимое не добавлено, так как уже существует."
+        return 0, added
+
+    def add_nlists_items(self, uploads):
+        """
+        Загрузить содержимое нескольких именованных списков параллельно (self.workers соединений).
+        uploads - [(id списка, значения), ...] или итератор таких записей. Из итератора берётся не больше
+        2*self.workers списков вперёд, поэтому генератор может читать списки из файлов по мере загрузки.
+        Возвращает результаты add_nlist_items в том же порядке.
+        """
+        local = threading.local()
+        servers = []
+        lock = threading.Lock()
+
+        def upload(job):
+            """Загрузить содержимое одного списка по соединению текущего потока"""
+            if not hasattr(local, 'server'):
+                local.server = self._new_server()
+                with lock:
+                    servers.append(local.server)
+            named_list_id, items = job
+            return self.add_nlist_items(named_list_id, items, server=local.server)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, initializer=self._share_failure_counter,
+                                    initargs=(self.failure_counter(),)) as executor:
+                futures, pending = [], set()
+                for job in uploads:
+                    if len(pending) >= 2 * self.workers:
+                        _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    futures.append(executor.submit(upload, job))
+                    pending.add(futures[-1])
+                return [x.result() for x in futures]
+        finally:
+            for server in servers:
+                server('close')()
 
     def get_services_list(self):
         """Получить список сервисов раздела Библиотеки"""
         try:
             if self.version.startswith('6'):
-                result = self._server.v1.libraries.services.list(self._auth_token, 0, 1000, {}, [])
+                result = list(self.iter_items('v1.libraries.services.list', tail=({}, [])))
             else:
-                result = self._server.v1.libraries.services.list(self._auth_token, 0, 1000, '', [])
+                result = list(self.iter_items('v1.libraries.services.list', tail=('', [])))
         except rpc.Fault as err:
-            print(f"Ошибка get_services_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return result['total'], result
+            raise UtmError(f"Ошибка get_services_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_service(self, service):
         """Добавить список сервисов раздела Библиотеки"""
@@ -767,8 +1914,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.shaper.pool.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"Ошибка get_shaper_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка get_shaper_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_shaper(self, shaper):
@@ -803,13 +1949,12 @@ class UtmXmlRpc:
         """Получить список профилей АСУ ТП раздела Библиотеки"""
         try:
             if self.version.startswith('6'):
-                result = self._server.v1.scada.profiles.list(self._auth_token, 0, 1000, {}, [])
+                result = list(self.iter_items('v1.scada.profiles.list', tail=({}, [])))
             else:
-                result = self._server.v1.scada.profiles.list(self._auth_token, 0, 1000, '', [])
+                result = list(self.iter_items('v1.scada.profiles.list', tail=('', [])))
         except rpc.Fault as err:
-            print(f"Ошибка get_scada_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return result['total'], result['items']
+            raise UtmError(f"Ошибка get_scada_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_scada(self, scada):
         """Добавить профиль АСУ ТП раздела Библиотеки"""
@@ -844,8 +1989,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.libraries.response.page.templates.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"Ошибка get_templates_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка get_templates_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_template(self, template):
@@ -881,8 +2025,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.libraries.response.page.template.public.data.fetch(template_type, template_id)
         except rpc.Fault as err:
-            print(f"Ошибка get_template_data: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка get_template_data: [{err.faultCode}] — {err.faultString}")
         return 0, result
 
     def set_template_data(self, template_id, data):
@@ -891,8 +2034,7 @@ class UtmXmlRpc:
             data64 = rpc.Binary(data)
             result = self._server.v1.libraries.response.page.template.data.update(self._auth_token, template_id, data64)
         except rpc.Fault as err:
-            print(f"Ошибка set_template_data: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка set_template_data: [{err.faultCode}] — {err.faultString}")
         return 0, result    # Возвращает True
 
     def get_notification_profiles_list(self):
@@ -900,8 +2042,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.notification.profiles.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"Ошибка get_notification_profiles_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"Ошибка get_notification_profiles_list: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_notification_profile(self, profile):
@@ -942,11 +2083,10 @@ class UtmXmlRpc:
     def get_netflow_profiles_list(self):
         """Получить список профилей netflow раздела Библиотеки"""
         try:
-            result = self._server.v1.netmanager.netflow.profiles.list(self._auth_token, 0, 100, {})
+            result = list(self.iter_items('v1.netmanager.netflow.profiles.list'))
         except rpc.Fault as err:
-            print(f"Ошибка get_notification_profiles_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"Ошибка get_notification_profiles_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_netflow_profile(self, profile):
         """Добавить профиль netflow в Библиотеку"""
@@ -976,11 +2116,10 @@ class UtmXmlRpc:
     def get_ssl_profiles_list(self):
         """Получить список профилей SSL раздела Библиотеки"""
         try:
-            result = self._server.v1.content.ssl.profiles.list(self._auth_token, 0, 100, {})
+            result = list(self.iter_items('v1.content.ssl.profiles.list'))
         except rpc.Fault as err:
-            print(f"Ошибка get_ssl_profiles_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"Ошибка get_ssl_profiles_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_ssl_profile(self, profile):
         """Добавить профиль SSL в Библиотеку"""
@@ -1011,11 +2150,10 @@ class UtmXmlRpc:
     def get_groups_list(self):
         """Получить список локальных групп"""
         try:
-            result = self._server.v3.accounts.groups.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v3.accounts.groups.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_groups_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_groups_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_group(self, group):
         """Добавить локальную группу"""
@@ -1043,20 +2181,22 @@ class UtmXmlRpc:
     def get_group_users(self, group_guid):
         """Получить список пользователей в группе"""
         try:
-            result = self._server.v3.accounts.group.users.list(self._auth_token, group_guid, 0, 1000, {})
+            result = list(self.iter_items('v3.accounts.group.users.list', group_guid))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_group_users: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_group_users: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def get_users_list(self):
         """Получить список локальных пользователей"""
+        result = list(self.iter_users_list())
+        return len(result), result
+
+    def iter_users_list(self):
+        """Список локальных пользователей по одной записи по мере постраничной загрузки (без сборки всего списка в памяти)"""
         try:
-            result = self._server.v3.accounts.users.list(self._auth_token, 0, 1000, {})
+            yield from self.iter_items('v3.accounts.users.list')
         except rpc.Fault as err:
-            print(f"\tОшибка get_users_list: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка get_users_list: [{err.faultCode}] — {err.faultString}")
 
     def add_user(self, user):
         """Добавить локального пользователя"""
@@ -1097,8 +2237,7 @@ class UtmXmlRpc:
             ntlm = self._server.v1.auth.ntlm.server.list(self._auth_token, {})
             saml = self._server.v1.auth.saml.idp.servers.list(self._auth_token, {})
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_auth_servers: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_auth_servers: [{err.faultCode}] — {err.faultString}")
         return ldap, radius, tacacs, ntlm, saml
 
     def get_ldap_server_id(self, domain):
@@ -1130,18 +2269,18 @@ class UtmXmlRpc:
         except rpc.Fault as err:
             return 2, f"\tОшибка utm.add_auth_server: [{err.faultCode}] — {err.faultString}"
         else:
+            if type == 'ldap':
+                self.ldap.reset()
             self.auth_servers[server['name']] = result
             return 0, result     # Возвращает ID добавленного сервера авторизации
 
     def get_2fa_profiles(self):
         """Получить список профилей MFA"""
         try:
-            f = getattr(self._server, 'v1.2fa.profiles.list')
-            result = f(self._auth_token, 0, 100, '')
+            result = list(self.iter_items('v1.2fa.profiles.list', tail=('',)))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_2fa_profiles: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_2fa_profiles: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_2fa_profile(self, profile):
         """Добавить новый профиль MFA"""
@@ -1161,8 +2300,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.auth.user.auth.profiles.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_auth_profiles: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_auth_profiles: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_auth_profile(self, profile):
@@ -1192,11 +2330,10 @@ class UtmXmlRpc:
     def get_captive_profiles(self):
         """Получить список Captive-профилей"""
         try:
-            result = self._server.v1.captiveportal.profiles.list(self._auth_token, 0, 1000, '')
+            result = list(self.iter_items('v1.captiveportal.profiles.list', tail=('',)))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_captive_profiles: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_captive_profiles: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_captive_profile(self, profile):
         """Добавить новый Captive-профиль"""
@@ -1226,11 +2363,10 @@ class UtmXmlRpc:
     def get_captive_portal_rules(self):
         """Получить список правил Captive-попортала"""
         try:
-            result = self._server.v1.captiveportal.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.captiveportal.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_captive_portal_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_captive_portal_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_captive_portal_rules(self, rule):
         """Добавить новое правило Captive-портала"""
@@ -1260,11 +2396,10 @@ class UtmXmlRpc:
     def get_byod_policy(self):
         """Получить список политик BYOD"""
         try:
-            result = self._server.v1.byod.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.byod.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_byod_policy: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_byod_policy: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_byod_policy(self, rule):
         """Добавить новое правило в Политики BYOD"""
@@ -1293,68 +2428,50 @@ class UtmXmlRpc:
 
     def get_ldap_user_guid(self, ldap_domain, user_name):
         """Получить GUID пользователя LDAP по его имени"""
-        users = []
         try:
-            result = self._server.v1.auth.ldap.servers.list(self._auth_token, {})
-            for x in result:
-                domains = [y.lower() for y in x['domains']]
-                if x['enabled'] and ldap_domain.lower() in domains:
-                    users = self._server.v1.ldap.users.list(self._auth_token, x['id'], user_name)
+            return 0, self.ldap.get_guid('user', ldap_domain, user_name)
         except rpc.Fault as err:
             return 1, f"\tОшибка utm.get_ldap_user_guid: [{err.faultCode}] — {err.faultString}\n\tПроверьте настройки LDAP-коннектора!"
-        return 0, users[0]['guid'] if users else 0
 
     def get_ldap_group_guid(self, ldap_domain, group_name):
         """Получить GUID группы LDAP по её имени"""
-        groups = []
         try:
-            result = self._server.v1.auth.ldap.servers.list(self._auth_token, {})
-            for x in result:
-                domains = [y.lower() for y in x['domains']]
-                if x['enabled'] and ldap_domain.lower() in domains:
-                    groups = self._server.v1.ldap.groups.list(self._auth_token, x['id'], group_name)
+            return 0, self.ldap.get_guid('group', ldap_domain, group_name)
         except rpc.Fault as err:
             return 1, f"\tОшибка utm.get_ldap_group_guid: [{err.faultCode}] — {err.faultString}\n\tПроверьте настройки LDAP-коннектора!"
-        return 0, groups[0]['guid'] if groups else 0
 
     def get_ldap_user_name(self, user_guid):
         """Получить имя пользователя LDAP по его GUID"""
-        user = []
         try:
-            result = self._server.v1.ldap.user.fetch(self._auth_token, user_guid)
+            return 0, self.ldap.get_name('user', user_guid)
         except rpc.Fault as err:
             if err.faultCode == 1:
                 return 2, f'\tНе возможно получить имя доменного пользователя.\n\tПроверьте что версия UTM 5.0.6.4973 (6.1.3.10697) или выше.'
             else:
                 return 1, f"\tОшибка utm.get_ldap_user_name: [{err.faultCode}] — {err.faultString}\n\tПроверьте настройки LDAP-коннектора!"
-        name = result['name']
-        i = name.find('(')
-        return 0, name[i+1:len(name)-1]
 
     def get_ldap_group_name(self, group_guid):
         """Получить имя группы LDAP по её GUID"""
-        user = []
         try:
-            result = self._server.v1.ldap.group.fetch(self._auth_token, group_guid)
+            return 0, self.ldap.get_name('group', group_guid)
         except rpc.Fault as err:
             if err.faultCode == 1:
                 return 2, f'\tНе возможно получить имя доменной группы.\n\tПроверьте что версия UTM 5.0.6.4973 (6.1.3.10697) или выше.'
             else:
                 return 1, f"\tОшибка utm.get_ldap_group_name: [{err.faultCode}] — {err.faultString}\n\tПроверьте настройки LDAP-коннектора!"
-        data = [x.split('=') for x in result['name'].split(',')]
-        for y in data:
-            if y[0] == 'CN':
-                return 0, f"{result['guid'].split(':')[0]}\\{y[1]}"
 
 ################### Политики сети ############################################################
     def get_firewall_rules(self):
         """Получить список правил межсетевого экрана"""
+        result = list(self.iter_firewall_rules())
+        return len(result), result
+
+    def iter_firewall_rules(self):
+        """Список правил межсетевого экрана по одной записи по мере постраничной загрузки (без сборки всего списка в памяти)"""
         try:
-            result = self._server.v1.firewall.rules.list(self._auth_token, 0, 5000, {})
+            yield from self.iter_items('v1.firewall.rules.list')
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_firewall_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_firewall_rules: [{err.faultCode}] — {err.faultString}")
 
     def add_firewall_rule(self, rule):
         """Добавить новое правило в МЭ"""
@@ -1383,12 +2500,15 @@ class UtmXmlRpc:
 
     def get_traffic_rules(self):
         """Получить список правил NAT"""
+        result = list(self.iter_traffic_rules())
+        return len(result), result
+
+    def iter_traffic_rules(self):
+        """Список правил NAT по одной записи по мере постраничной загрузки (без сборки всего списка в памяти)"""
         try:
-            result = self._server.v1.traffic.rules.list(self._auth_token, 0, 1000, {})
+            yield from self.iter_items('v1.traffic.rules.list')
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_traffic_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_traffic_rules: [{err.faultCode}] — {err.faultString}")
 
     def add_traffic_rule(self, rule):
         """Добавить новое правило NAT"""
@@ -1419,8 +2539,7 @@ class UtmXmlRpc:
             icap = self._server.v1.icap.loadbalancing.rules.list(self._auth_token)
             reverse = self._server.v1.reverseproxy.loadbalancing.rules.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_loadbalancing_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_loadbalancing_rules: [{err.faultCode}] — {err.faultString}")
         return tcpudp, icap, reverse
 
     def add_virtualserver_rule(self, rule):
@@ -1495,11 +2614,10 @@ class UtmXmlRpc:
     def get_shaper_rules(self):
         """Получить список правил пропускной способности"""
         try:
-            result = self._server.v1.shaper.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.shaper.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_shaper_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_shaper_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_shaper_rule(self, shaper_rules, rule):
         """Добавить новое правило пропускной способности"""
@@ -1524,12 +2642,15 @@ class UtmXmlRpc:
 
     def get_content_rules(self):
         """Получить список правил фильтрации контента"""
+        result = list(self.iter_content_rules())
+        return len(result), result
+
+    def iter_content_rules(self):
+        """Список правил фильтрации контента по одной записи по мере постраничной загрузки (без сборки всего списка в памяти)"""
         try:
-            result = self._server.v1.content.rules.list(self._auth_token, 0, 1000, {})
+            yield from self.iter_items('v1.content.rules.list')
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_content_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_content_rules: [{err.faultCode}] — {err.faultString}")
 
     def add_content_rule(self, rule):
         """Добавить новое правило фильтрации контента"""
@@ -1552,11 +2673,10 @@ class UtmXmlRpc:
     def get_safebrowsing_rules(self):
         """Получить список правил веб-безопасности"""
         try:
-            result = self._server.v1.content.filtering.options.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.content.filtering.options.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_safebrowsing_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_safebrowsing_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_safebrowsing_rule(self, rule):
         """Добавить новое правило веб-безопасности"""
@@ -1579,11 +2699,10 @@ class UtmXmlRpc:
     def get_ssldecrypt_rules(self):
         """Получить список правил инспектирования SSL"""
         try:
-            result = self._server.v1.content.ssl.decryption.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.content.ssl.decryption.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_ssldecrypt_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_ssldecrypt_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_ssldecrypt_rule(self, rule):
         """Добавить новое правило инспектирования SSL"""
@@ -1606,11 +2725,10 @@ class UtmXmlRpc:
     def get_sshdecrypt_rules(self):
         """Получить список правил инспектирования SSH"""
         try:
-            result = self._server.v1.content.ssh.decryption.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.content.ssh.decryption.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_sshdecrypt_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_sshdecrypt_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_sshdecrypt_rule(self, rule):
         """Добавить новое правило инспектирования SSH"""
@@ -1634,14 +2752,13 @@ class UtmXmlRpc:
         """Получить список правил СОВ"""
         try:
             if self.version.startswith('6'):
-                result = self._server.v1.idps.rules.list(self._auth_token, 0, 1000, {})
-                return len(result['items']), result['items']
+                result = list(self.iter_items('v1.idps.rules.list'))
+                return len(result), result
             else:
                 result = self._server.v1.idps.rules.list(self._auth_token, {})
                 return len(result), result
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_idps_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_idps_rules: [{err.faultCode}] — {err.faultString}")
     
     def add_idps_rule(self, rule):
         """Добавить новое правило СОВ"""
@@ -1665,14 +2782,13 @@ class UtmXmlRpc:
         """Получить список правил АСУ ТП"""
         try:
             if self.version.startswith('6'):
-                result = self._server.v1.scada.rules.list(self._auth_token, 0, 1000, {})
-                return len(result['items']), result['items']
+                result = list(self.iter_items('v1.scada.rules.list'))
+                return len(result), result
             else:
                 result = self._server.v1.scada.rules.list(self._auth_token, {})
                 return len(result), result
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_scada_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_scada_rules: [{err.faultCode}] — {err.faultString}")
 
     def add_scada_rule(self, rule):
         """Добавить новое правило АСУ ТП"""
@@ -1695,11 +2811,10 @@ class UtmXmlRpc:
     def get_scenarios_rules(self):
         """Получить список сценариев"""
         try:
-            result = self._server.v1.scenarios.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.scenarios.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_scenarios_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_scenarios_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_scenarios_rule(self, rule):
         """Добавить новый сценарий в Сценарии"""
@@ -1729,11 +2844,10 @@ class UtmXmlRpc:
     def get_mailsecurity_rules(self):
         """Получить список правил защиты почтового трафика"""
         try:
-            result = self._server.v1.mailsecurity.rules.list(self._auth_token, 0, 1000, {})
+            result = list(self.iter_items('v1.mailsecurity.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_mailsecurity_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_mailsecurity_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_mailsecurity_rule(self, rule):
         """Добавить новое правило защиты почтового трафика"""
@@ -1759,8 +2873,7 @@ class UtmXmlRpc:
             dnsbl = self._server.v1.mailsecurity.dnsbl.config.get(self._auth_token)
             batv = self._server.v1.mailsecurity.batv.config.get(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_mailsecurity_dnsbl: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_mailsecurity_dnsbl: [{err.faultCode}] — {err.faultString}")
         return dnsbl, batv
 
     def set_mailsecurity_dnsbl(self, rule):
@@ -1786,8 +2899,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.icap.profiles.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_icap_servers: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_icap_servers: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_icap_server(self, profile):
@@ -1821,11 +2933,10 @@ class UtmXmlRpc:
             if self.version.startswith('5'):
                 result = self._server.v1.icap.rules.list(self._auth_token, {})
             else:
-                result = self._server.v1.icap.rules.list(self._auth_token, 0, 100, {})
+                result = list(self.iter_items('v1.icap.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_icap_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result), result if self.version.startswith('5') else result['items']
+            raise UtmError(f"\tОшибка utm.get_icap_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_icap_rule(self, icap_rules, rule):
         """Добавить новое ICAP-правило"""
@@ -1852,11 +2963,10 @@ class UtmXmlRpc:
     def get_dos_profiles(self):
         """Получить список профилей DoS"""
         try:
-            result = self._server.v1.dos.profiles.list(self._auth_token, 0, 100, '')
+            result = list(self.iter_items('v1.dos.profiles.list', tail=('',)))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_dos_profiles: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_dos_profiles: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_dos_profile(self, profile):
         """Добавить новый профиль DoS"""
@@ -1879,11 +2989,10 @@ class UtmXmlRpc:
     def get_dos_rules(self):
         """Получить список правил защиты DoS"""
         try:
-            result = self._server.v1.dos.rules.list(self._auth_token, 0, 100, {})
+            result = list(self.iter_items('v1.dos.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_dos_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_dos_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_dos_rule(self, rule):
         """Добавить новое правило защиты DoS"""
@@ -1908,8 +3017,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.proxyportal.bookmarks.list(self._auth_token, {})
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_proxyportal_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_proxyportal_rules: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_proxyportal_rule(self, rule):
@@ -1935,8 +3043,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.reverseproxy.profiles.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_reverseproxy_servers: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_reverseproxy_servers: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_reverseproxy_servers(self, profile):
@@ -1964,11 +3071,10 @@ class UtmXmlRpc:
                 result = self._server.v1.reverseproxy.rules.list(self._auth_token, {})
                 return len(result), result
             else:
-                result = self._server.v1.reverseproxy.rules.list(self._auth_token, 0, 100, {})
-                return len(result['items']), result['items']
+                result = list(self.iter_items('v1.reverseproxy.rules.list'))
+                return len(result), result
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_reverseproxy_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_reverseproxy_rules: [{err.faultCode}] — {err.faultString}")
 
     def add_reverseproxy_rule(self, rule):
         """Добавить новое правило reverse-прокси"""
@@ -1993,8 +3099,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.vpn.security.profiles.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_vpn_security_profiles: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_vpn_security_profiles: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_vpn_security_profile(self, profile):
@@ -2020,8 +3125,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.vpn.tunnels.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_vpn_networks: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_vpn_networks: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_vpn_network(self, network):
@@ -2045,14 +3149,10 @@ class UtmXmlRpc:
     def get_vpn_server_rules(self):
         """Получить список серверных правил VPN"""
         try:
-            result = self._server.v1.vpn.server.rules.list(self._auth_token, 0, 100, {})
+            result = list(self.iter_items('v1.vpn.server.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_vpn_server_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        if self.version.startswith('5'):
-            return len(result), result
-        else:
-            return len(result['items']), result['items']
+            raise UtmError(f"\tОшибка utm.get_vpn_server_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
 
     def add_vpn_server_rule(self, rule):
         """Добавить новое серверное правило VPN"""
@@ -2077,8 +3177,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.vpn.client.rules.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_vpn_client_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_vpn_client_rules: [{err.faultCode}] — {err.faultString}")
         return len(result), result
 
     def add_vpn_client_rule(self, rule):
@@ -2111,8 +3210,7 @@ class UtmXmlRpc:
         try:
             result = self._server.v1.snmp.rules.list(self._auth_token)
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_vpn_client_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_vpn_client_rules: [{err.faultCode}] — {err.faultString}")
         return result
 
     def add_snmp_rule(self, rule):
@@ -2136,10 +3234,9 @@ class UtmXmlRpc:
     def get_notification_alert_rules(self):
         """Получить список правил оповещений"""
         try:
-            result = self._server.v1.notification.alert.rules.list(self._auth_token, 0, 100, {})
+            result = list(self.iter_items('v1.notification.alert.rules.list'))
         except rpc.Fault as err:
-            print(f"\tОшибка utm.get_notification_alert_rules: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
+            raise UtmError(f"\tОшибка utm.get_notification_alert_rules: [{err.faultCode}] — {err.faultString}")
         return result
 
     def add_notification_alert_rule(self, rule):
@@ -2161,6 +3258,8 @@ class UtmXmlRpc:
             return 0, result     # Возвращает ID изменённого правила
 
 class UtmError(Exception): pass
+class UtmUnavailable(UtmError, ConnectionError): pass
+class GzipDecodeError(ExpatError): pass     # Сжатый ответ оборван или повреждён при передаче
 
 character_map = {
     ord('\n'): '',
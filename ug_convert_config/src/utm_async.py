@@ -0,0 +1,719 @@
+#!/usr/bin/python3
+# Версия 1.0
+# Асинхронный клиент xml-rpc UTM (asyncio)
+import time
+import zlib
+import asyncio
+import weakref
+import xmlrpc.client as rpc
+from xml.parsers.expat import ExpatError
+from utm import UtmXmlRpc, UtmError, UtmUnavailable, GzipDecodeError
+
+
+class AsyncConnectionPool:
+    """
+    Пул постоянных соединений HTTP/1.1 (keep-alive) с UTM на asyncio streams.
+    Открывается не больше size соединений, по каждому соединению в каждый момент идёт один запрос.
+    Запрос, которому не хватило соединения, ждёт освобождения. Если UTM закрыл простаивающее соединение,
+    запрос повторяется один раз по новому соединению.
+    """
+    def __init__(self, host, port, size=4, connect_timeout=10, read_timeout=300):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._size = size
+        self._slots = None          # asyncio.Semaphore(size), создаётся в цикле событий при первом запросе
+        self._idle = []             # Свободные соединения [(reader, writer), ...]
+
+    async def request(self, path, body, headers=None):
+        """
+        Отправить POST-запрос с дополнительными заголовками headers {имя: значение}.
+        Возвращает тело ответа (bytes) и заголовки ответа {имя в нижнем регистре: значение}.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._size)
+        async with self._slots:
+            reused = bool(self._idle)
+            conn = self._idle.pop() if reused else await self._open()
+            try:
+                data, response_headers, keep_alive = await asyncio.wait_for(self._exchange(conn, path, body, headers), self.read_timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as err:
+                self._close(conn)
+                if not reused:
+                    raise
+                conn = await self._open()
+                try:
+                    data, response_headers, keep_alive = await asyncio.wait_for(self._exchange(conn, path, body, headers), self.read_timeout)
+                except BaseException:
+                    self._close(conn)
+                    raise
+            except BaseException:
+                self._close(conn)
+                raise
+            if keep_alive:
+                self._idle.append(conn)
+            else:
+                self._close(conn)
+            return data, response_headers
+
+    async def _open(self):
+        return await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.connect_timeout)
+
+    async def _exchange(self, conn, path, body, extra_headers=None):
+        """
+        Один обмен запрос-ответ. Возвращает тело ответа, заголовки ответа
+        и признак того, что соединение можно использовать повторно.
+        """
+        reader, writer = conn
+        head = (
+            f'POST {path} HTTP/1.1\r\n'
+            f'Host: {self.host}:{self.port}\r\n'
+            f'User-Agent: {rpc.Transport.user_agent}\r\n'
+            f'Content-Type: text/xml\r\n'
+            + ''.join(f'{name}: {value}\r\n' for name, value in (extra_headers or {}).items()) +
+            f'Content-Length: {len(body)}\r\n\r\n'
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError('UTM закрыл соединение')
+        version, status, *reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            data = await self._read_chunked(reader)
+        elif 'content-length' in headers:
+            data = await reader.readexactly(int(headers['content-length']))
+        else:
+            data = await reader.read()
+            keep_alive = False
+
+        if int(status) != 200:
+            raise rpc.ProtocolError(f'{self.host}:{self.port}{path}', int(status), ' '.join(reason), headers)
+        return data, headers, keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader):
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0], 16)
+            if not size:
+                await reader.readline()
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    @staticmethod
+    def _close(conn):
+        conn[1].close()
+
+    async def close(self):
+        """Закрыть все свободные соединения"""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn[1].close()
+        for conn in idle:
+            try:
+                await conn[1].wait_closed()
+            except OSError:
+                pass
+
+
+class AsyncMethod:
+    """Метод API: await proxy.v2.core.login(...) -> proxy.call('v2.core.login', params)"""
+    def __init__(self, proxy, name):
+        self._proxy = proxy
+        self._name = name
+
+    def __getattr__(self, name):
+        return AsyncMethod(self._proxy, f'{self._name}.{name}')
+
+    def __call__(self, *params):
+        return self._proxy.call(self._name, params)
+
+
+class AsyncServerProxy:
+    """
+    Асинхронный аналог rpc.ServerProxy. Запросы маршаллируются xmlrpc.client и отправляются через AsyncConnectionPool.
+    Число одновременных запросов ограничено семафором limit (общим для всех клиентов одного UTM).
+    retry, breaker, parser, compression - RetryPolicy, CircuitBreaker, класс разбора ответа и RpcCompression
+    (см. UtmTransport), None - не используются.
+    """
+    def __init__(self, pool, path, limit, stats=None, retry=None, breaker=None, parser=None, compression=None):
+        self._pool = pool
+        self._path = path
+        self._limit = limit
+        self.stats = stats
+        self.retry = retry
+        self.breaker = breaker
+        self.parser = parser
+        self.compression = compression
+
+    def __getattr__(self, name):
+        return AsyncMethod(self, name)
+
+    def __getitem__(self, name):
+        return AsyncMethod(self, name)
+
+    async def call(self, method, params):
+        """
+        Вызвать метод API. При ошибке UTM возбуждается rpc.Fault, как в rpc.ServerProxy.
+        При временных ошибках запрос повторяется по политике retry.
+        """
+        body = rpc.dumps(tuple(params), method, encoding='utf-8').encode('utf-8', 'xmlcharrefreplace')
+        attempt = 0
+        while True:
+            payload, compressed = self.compression.compress(body) if self.compression else (body, False)
+            try:
+                if self.breaker is not None:
+                    self.breaker.check(self._pool.host)
+                result = await self._send(method, body, payload, compressed)
+                if self.breaker is not None:
+                    self.breaker.success()
+                return result
+            except (rpc.Fault, OSError, asyncio.IncompleteReadError, rpc.ProtocolError, ExpatError) as err:
+                error = err
+            if compressed and self.compression.rejected(error):
+                continue
+            attempt += 1
+            if self.retry is not None and self.retry.should_retry(method, error, attempt):
+                await asyncio.sleep(self.retry.delay(attempt))
+                continue
+            if self.breaker is not None:
+                self.breaker.record(error, self.retry)
+            raise error
+
+    async def _send(self, method, body, payload, compressed):
+        """Одна попытка запроса с учётом в статистике вызовов. payload - тело запроса для отправки (сжатое, если compressed)."""
+        headers = {}
+        if self.compression is not None and self.compression.responses:
+            headers['Accept-Encoding'] = 'gzip'
+        if compressed:
+            headers['Content-Encoding'] = 'gzip'
+        data = b''
+        received = 0
+        fault = None
+        start = time.monotonic()
+        try:
+            async with self._limit:
+                data, response_headers = await self._pool.request(self._path, payload, headers)
+            received = len(data)
+            if response_headers.get('content-encoding') == 'gzip':
+                if self.compression is not None:
+                    self.compression.accepted()
+                try:
+                    data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+                except zlib.error as err:
+                    raise GzipDecodeError(f'ошибка распаковки ответа gzip: {err}') from None
+            if self.parser is None:
+                result, _ = rpc.loads(data)
+            else:
+                parser = self.parser()
+                parser.feed(data)
+                result = parser.close()
+            return result[0]
+        except rpc.Fault as err:
+            fault = err.faultCode
+            raise
+        except (OSError, asyncio.IncompleteReadError, rpc.ProtocolError, ExpatError) as err:
+            fault = type(err).__name__
+            raise
+        finally:
+            if self.stats:
+                saved = len(body) - len(payload) + len(data) - received
+                self.stats.record(method, time.monotonic() - start, len(payload), received, fault, saved)
+
+
+class AsyncUtmXmlRpc:
+    """
+    Асинхронный клиент UTM на asyncio: много одновременных запросов по небольшому пулу соединений (connections)
+    без потоков. host_limit - сколько запросов к одному UTM выполняется одновременно (для всех клиентов процесса).
+    Методы повторяют UtmXmlRpc и возвращают то же самое, но вызываются через await:
+
+        async with AsyncUtmXmlRpc(ip, login, password) as utm:
+            (_, rules), (_, nat) = await asyncio.gather(utm.get_firewall_rules(), utm.get_traffic_rules())
+
+    Методы UtmXmlRpc, для которых нет асинхронной реализации, выполняются синхронным клиентом
+    той же сессии (sync) в пуле потоков цикла событий.
+    """
+    host_limit = 8
+    _host_limits = weakref.WeakKeyDictionary()  # {цикл событий: {server_ip: asyncio.Semaphore}}
+
+    def __init__(self, server_ip, login, password, connections=4, connect_timeout=10, read_timeout=300):
+        self._login = login
+        self._password = password
+        self._url = f'http://{server_ip}:4040/rpc'
+        self._auth_token = None
+        self._pool = AsyncConnectionPool(server_ip, 4040, connections, connect_timeout, read_timeout)
+        self._server = None
+        # Синхронный клиент той же сессии: для методов без асинхронной реализации (см. __getattr__).
+        self._sync = UtmXmlRpc(server_ip, login, password, connect_timeout, read_timeout)
+        self.version = None
+        self.server_ip = server_ip
+        self.node_name = None
+        self.page_size = 1000           # Размер страницы при постраничной выгрузке списков (iter_items)
+        self.chunk_size = 1000          # Сколько значений отправлять за один запрос при загрузке содержимого списков
+        self.chunk_retries = 5          # Число повторов запроса при ошибке загрузки части списка
+        self.firewall_rules = {}        # {имя правила МЭ: ID} для add_firewall_rule/update_firewall_rule
+        self.nat_rules = {}             # {имя правила NAT: ID} для add_traffic_rule/update_traffic_rule
+        self.stats = self._sync.stats   # Статистика вызовов API (см. enable_stats), общая с синхронным клиентом
+
+    async def __aenter__(self):
+        await self._connect()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.logout()
+        await self.close()
+
+    def enable_stats(self, trace_file=None):
+        """Включить сбор статистики вызовов API (см. UtmXmlRpc.enable_stats)"""
+        self.stats = self._sync.enable_stats(trace_file)
+        if self._server:
+            self._server.stats = self.stats
+        return self.stats
+
+    def _host_limit(self):
+        limits = self._host_limits.setdefault(asyncio.get_running_loop(), {})
+        if self.server_ip not in limits:
+            limits[self.server_ip] = asyncio.Semaphore(self.host_limit)
+        return limits[self.server_ip]
+
+    async def _connect(self):
+        """Подключиться к UTM"""
+        self._server = AsyncServerProxy(self._pool, '/rpc', self._host_limit(), self.stats,
+                                       self._sync.retry, self._sync.breaker, self._sync.response_parser,
+                                       self._sync.compression)
+        try:
+            if await self.get_node_status() == 'work':
+                result = await self._server.v2.core.login(self._login, self._password, {'origin': 'dev-script'})
+                self._auth_token = result.get('auth_token')
+                self.node_name =  result.get('node')
+                self.version = result.get('version')
+            else:
+                raise UtmError('Ошибка: UTM не позволяет установить соединение!')
+        except OSError as err:
+            raise UtmError(f'Ошибка: {err} (Node: {self.server_ip}).')
+        except rpc.ProtocolError as err:
+            raise UtmError(f'Ошибка: [{err.errcode}] {err.errmsg} (Node: {self.server_ip}).')
+        except rpc.Fault as err:
+            raise UtmError(f'Ошибка: [{err.faultCode}] {err.faultString} (Node: {self.server_ip}).')
+        return 0
+
+    login = _connect
+
+    async def get_node_status(self):
+        """Получить статус узла"""
+        result = await self._server.v2.core.node.status()
+        return result.get('status')
+
+    async def logout(self):
+        try:
+            if self._server is not None and self._auth_token is not None:
+                await self._server.v2.core.logout(self._auth_token)
+        except rpc.Fault as err:
+            if err.faultCode == 104:
+                print('Сессия завершилась по таймауту.')
+
+    async def ping_session(self):
+        """Ping сессии"""
+        try:
+            result = await self._server.v2.core.session.ping(self._auth_token)
+        except rpc.Fault as err:
+            if err.faultCode == 104:
+                print(f'Сессия завершилась по таймауту.')
+            else:
+                print(f"\tОшибка utm.ping_session: [{err.faultCode}] — {err.faultString}")
+
+    async def close(self):
+        """Закрыть соединения с UTM (сессия не завершается, см. logout)"""
+        self._sync.close_thread_connections()
+        await self._pool.close()
+
+    async def iter_items(self, method, *args, tail=({},), page_size=None, prefetch=True):
+        """
+        Постраничный обход списочного метода API (см. UtmXmlRpc.iter_items): async for item in utm.iter_items(...).
+        Если prefetch, следующая страница запрашивается, пока обрабатывается текущая.
+        """
+        page_size = page_size or self.page_size
+        call = self._server[method]
+
+        async def fetch(offset):
+            result = await call(self._auth_token, *args, offset, page_size, *tail)
+            if isinstance(result, list):
+                return result, True     # Метод отдал весь список без разбивки на страницы (UTM v.5).
+            total = result.get('total', result.get('count'))
+            last = len(result['items']) < page_size or (total is not None and offset + page_size >= total)
+            return result['items'], last
+
+        offset = 0
+        task = asyncio.ensure_future(fetch(offset))
+        try:
+            while task:
+                items, last = await task
+                offset += page_size
+                task = None
+                if not last:
+                    task = asyncio.ensure_future(fetch(offset)) if prefetch else None
+                for item in items:
+                    yield item
+                if not last and not prefetch:
+                    task = asyncio.ensure_future(fetch(offset))
+        finally:
+            if task and not task.done():
+                task.cancel()
+
+    async def list_items(self, method, *args, tail=({},)):
+        """Все записи списочного метода API (см. iter_items)"""
+        return [item async for item in self.iter_items(method, *args, tail=tail)]
+
+    def __getattr__(self, name):
+        """Методы UtmXmlRpc без асинхронной реализации выполняются синхронным клиентом этой же сессии в пуле потоков"""
+        method = getattr(UtmXmlRpc, name, None)
+        if name.startswith('_') or not callable(method):
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        async def call(*args, **kwargs):
+            return await asyncio.get_running_loop().run_in_executor(None, self._call_sync, name, args, kwargs)
+        return call
+
+    @property
+    def sync(self):
+        """Синхронный клиент UtmXmlRpc с той же сессией (auth_token), без повторного входа на UTM"""
+        if self._sync._server is None and self._auth_token is not None:
+            self._sync._server = rpc.ServerProxy(self._url, transport=self._sync._transport, verbose=False)
+            self._sync._auth_token = self._auth_token
+            self._sync.version = self.version
+            self._sync.node_name = self.node_name
+        return self._sync
+
+    def _call_sync(self, name, args, kwargs):
+        sync = self.sync
+        sync.bind_thread_connection()
+        return getattr(sync, name)(*args, **kwargs)
+
+######################################## Библиотеки ########################################
+    async def get_services_list(self):
+        """Получить список сервисов раздела Библиотеки"""
+        try:
+            if self.version.startswith('6'):
+                result = await self.list_items('v1.libraries.services.list', tail=({}, []))
+            else:
+                result = await self.list_items('v1.libraries.services.list', tail=('', []))
+        except rpc.Fault as err:
+            raise UtmError(f"Ошибка get_services_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    async def add_service(self, service):
+        """Добавить список сервисов раздела Библиотеки"""
+        try:
+            result = await self._server.v1.libraries.service.add(self._auth_token, service)
+        except TypeError as err:
+            return 2, err
+        except rpc.Fault as err:
+            if err.faultCode == 409:
+                return 1, f"\tСервис: '{service['name']}' уже существует. Проверка параметров..."
+            else:
+                return 2, f"Ошибка add_service: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result     # Возвращает ID сервиса
+
+    async def get_nlist_list(self, list_type):
+        """
+        Получить содержимое пользовательских именованных списков раздела Библиотеки.
+        Содержимое всех списков запрашивается одновременно (ограничено пулом соединений), порядок списков сохраняется.
+        """
+        try:
+            result = await self.list_items('v2.nlists.list', list_type)
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка-1 utm.get_nlist_list: [{err.faultCode}] — {err.faultString}")
+
+        lists = [item for item in result if item['editable']]
+        if list_type == 'httpcwl':
+            lists = lists[:1]
+        utm_version = self.version.split('.')
+        if (list_type == 'ipspolicy' and self.version.startswith('5')) \
+                 or (self.version.startswith('6.1') and int(utm_version[2]) > 8):
+            tail = ({}, [])
+        else:
+            tail = ('', [])
+
+        async def get_content(item):
+            item['name'] = item['name'].strip()
+            try:
+                return await self.list_items('v2.nlists.list.list', item['id'], tail=tail)
+            except rpc.Fault as err:
+                print(f'\033[33m\tСодержимое списка "{item["name"]}" не экспортировано. Ошибка загрузки списка!\033[0m')
+            except ExpatError:
+                print(f'\033[33m\tСодержимое списка "{item["name"]}" не экспортировано. Список corrupted!\033[0m')
+            return []
+
+        contents = await asyncio.gather(*(get_content(item) for item in lists))
+
+        array = []
+        for item, content in zip(lists, contents):
+            if list_type == 'timerestrictiongroup' and self.version.startswith('5'):
+                item['content'] = [x['value'] for x in content]
+            elif list_type == 'httpcwl':
+                array = {'id': item['id'], 'content': content}
+                break
+            else:
+                item['content'] = content
+            array.append(item)
+        return len(array), array
+
+    async def add_nlist(self, named_list):
+        """Добавить именованный список"""
+        try:
+            result = await self._server.v2.nlists.add(self._auth_token, named_list)
+        except TypeError as err:
+            return 2, err
+        except rpc.Fault as err:
+            if err.faultCode == 409:
+                return 1, f'\tСписок: "{named_list["name"]}" уже существует'
+            else:
+                return 2, f"\tОшибка utm.add_nlist: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result
+
+    async def update_nlist(self, named_list_id, named_list):
+        """Обновить параметры именованного списка"""
+        try:
+            result = await self._server.v2.nlists.update(self._auth_token, named_list_id, named_list)
+        except TypeError as err:
+            return 2, err
+        except rpc.Fault as err:
+            if err.faultCode == 409:
+                return 1, f"\tСписок: {named_list['name']} - нет отличающихся параметров для изменения."
+            else:
+                return 2, f"\tОшибка utm.update_nlist: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result
+
+    async def add_nlist_item(self, named_list_id, item):
+        """Добавить 1 значение в именованный список"""
+        try:
+            result = await self._server.v2.nlists.list.add(self._auth_token, named_list_id, item)
+        except TypeError as err:
+            return 2, err
+        except rpc.Fault as err:
+            if err.faultCode == 2001:
+                return 1, f"\t\tСодержимое: {item} не добавлено, так как уже существует."
+            else:
+                return 2, f"\t\tОшибка utm.add_nlist_item: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result
+
+    async def add_nlist_items(self, named_list_id, items):
+        """Добавить список значений в именованный список частями по self.chunk_size (см. UtmXmlRpc.add_nlist_items)"""
+        chunk_size = self.chunk_size
+        offset, added, existing, retries = 0, 0, 0, 0
+        while offset < len(items):
+            chunk = items[offset:offset+chunk_size]
+            try:
+                result = await self._server.v2.nlists.list.add.items(self._auth_token, named_list_id, chunk)
+            except TypeError as err:
+                return 2, err
+            except rpc.Fault as err:
+                if err.faultCode == 2001:
+                    # Часть значений уже есть в списке - добавляем значения этой части по одному.
+                    for item in chunk:
+                        err1, result1 = await self.add_nlist_item(named_list_id, item)
+                        if err1 == 2:
+                            return 2, f'{result1}\n\tЗагружено {offset} из {len(items)} значений.'
+                        elif err1 == 1:
+                            existing += 1
+                        else:
+                            added += 1
+                    offset += len(chunk)
+                    continue
+                elif err.faultCode == 2003:
+                    return 3, f"\tСодержимое не добавлено, так как список обновляется через URL."
+                error = f'[{err.faultCode}] — {err.faultString}'
+                if self._sync.retry is None or not self._sync.retry.transient(err):
+                    return 2, f'\tОшибка utm.add_nlist_items: {error}\n\tЗагружено {offset} из {len(items)} значений.'
+            except UtmUnavailable:
+                raise
+            except (OSError, asyncio.IncompleteReadError, rpc.ProtocolError) as err:
+                error = err
+            else:
+                added += result if type(result) is int else len(chunk)
+                offset += len(chunk)
+                retries = 0
+                chunk_size = min(chunk_size * 2, self.chunk_size)
+                continue
+
+            retries += 1
+            if retries > self.chunk_retries:
+                return 2, f'\tОшибка utm.add_nlist_items: {error}\n\tЗагружено {offset} из {len(items)} значений.'
+            await asyncio.sleep(2 ** (retries - 1))
+            chunk_size = max(chunk_size // 2, 1)
+
+        if existing and not added:
+            return 1, f"\tСодержимое не добавлено, так как уже существует."
+        return 0, added
+
+    async def add_nlists_items(self, uploads):
+        """
+        Загрузить содержимое нескольких именованных списков одновременно.
+        uploads - [(id списка, значения), ...]. Возвращает результаты add_nlist_items в том же порядке.
+        """
+        return await asyncio.gather(*(self.add_nlist_items(named_list_id, items) for named_list_id, items in uploads))
+
+######################################## Сеть ########################################
+    async def get_zones_list(self):
+        """Получить список зон"""
+        try:
+            result = await self._server.v1.netmanager.zones.list(self._auth_token)
+        except rpc.Fault as err:
+            raise UtmError(f"Ошибка utm.get_zones_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+######################################## Пользователи и устройства ########################################
+    async def get_groups_list(self):
+        """Получить список локальных групп"""
+        try:
+            result = await self.list_items('v3.accounts.groups.list')
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_groups_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    async def add_group(self, group):
+        """Добавить локальную группу"""
+        try:
+            result = await self._server.v3.accounts.group.add(self._auth_token, group)
+        except rpc.Fault as err:
+            if err.faultCode == 409:
+                return 1, f"\tГруппа '{group['name']}' уже существует. Проверка параметров..."
+            else:
+                return 2, f"\tОшибка utm.add_group: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result     # Возвращает GUID добавленной группы
+
+    async def get_group_users(self, group_guid):
+        """Получить список пользователей в группе"""
+        try:
+            result = await self.list_items('v3.accounts.group.users.list', group_guid)
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_group_users: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    async def get_users_list(self):
+        """Получить список локальных пользователей"""
+        try:
+            result = await self.list_items('v3.accounts.users.list')
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка get_users_list: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    async def add_user(self, user):
+        """Добавить локального пользователя"""
+        try:
+            result = await self._server.v3.accounts.user.add(self._auth_token, user)
+        except rpc.Fault as err:
+            if err.faultCode == 5002:
+                return 1, f"\tПользователь '{user['name']}' уже существует. Проверка параметров..."
+            else:
+                return 2, f"\tОшибка add_user: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result     # Возвращает GUID добавленного пользователя
+
+######################################## Политики ########################################
+    async def get_firewall_rules(self):
+        """Получить список правил межсетевого экрана"""
+        try:
+            result = await self.list_items('v1.firewall.rules.list')
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_firewall_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    async def add_firewall_rule(self, rule):
+        """Добавить новое правило в МЭ"""
+        if rule['name'] in self.firewall_rules.keys():
+            return 1, f'\tПравило МЭ "{rule["name"]}" уже существует.'
+        try:
+            result = await self._server.v1.firewall.rule.add(self._auth_token, rule)
+        except rpc.Fault as err:
+            if err.faultCode == 110:
+                return 2, f'\tПравило МЭ "{rule["name"]}" не добавлено — {err.faultString}.'
+            else:
+                return 2, f"\tОшибка utm.add_firewall_rule: [{err.faultCode}] — {err.faultString}"
+        else:
+            self.firewall_rules[rule['name']] = result
+            return 0, result     # Возвращает ID добавленного правила
+
+    async def update_firewall_rule(self, rule):
+        """Обновить правило МЭ"""
+        try:
+            rule_id = self.firewall_rules[rule['name']]
+            result = await self._server.v1.firewall.rule.update(self._auth_token, rule_id, rule)
+        except rpc.Fault as err:
+            return 1, f"\tОшибка utm.update_firewall_rule: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result     # Возвращает True
+
+    async def get_traffic_rules(self):
+        """Получить список правил NAT"""
+        try:
+            result = await self.list_items('v1.traffic.rules.list')
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_traffic_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    async def add_traffic_rule(self, rule):
+        """Добавить новое правило NAT"""
+        if rule['name'] in self.nat_rules.keys():
+            return 1, f'\tПравило "{rule["name"]}" уже существует.'
+        try:
+            result = await self._server.v1.traffic.rule.add(self._auth_token, rule)
+        except rpc.Fault as err:
+            return 2, f"\tОшибка utm.add_traffic_rule: [{err.faultCode}] — {err.faultString}"
+        else:
+            self.nat_rules[rule['name']] = result
+            return 0, result     # Возвращает ID добавленного правила
+
+    async def update_traffic_rule(self, rule):
+        """Обновить правило NAT"""
+        try:
+            rule_id = self.nat_rules[rule['name']]
+            result = await self._server.v1.traffic.rule.update(self._auth_token, rule_id, rule)
+        except rpc.Fault as err:
+            return 1, f"\tОшибка utm.update_traffic_rule: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result     # Возвращает True
+
+    async def get_content_rules(self):
+        """Получить список правил фильтрации контента"""
+        try:
+            result = await self.list_items('v1.content.rules.list')
+        except rpc.Fault as err:
+            raise UtmError(f"\tОшибка utm.get_content_rules: [{err.faultCode}] — {err.faultString}")
+        return len(result), result
+
+    async def add_content_rule(self, rule):
+        """Добавить новое правило фильтрации контента"""
+        try:
+            result = await self._server.v1.content.rule.add(self._auth_token, rule)
+        except rpc.Fault as err:
+            return 2, f"\tОшибка utm.add_content_rule: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result     # Возвращает ID добавленного правила
+
+    async def update_content_rule(self, rule_id, rule):
+        """Обновить правило фильтрации контента"""
+        try:
+            result = await self._server.v1.content.rule.update(self._auth_token, rule_id, rule)
+        except rpc.Fault as err:
+            return 2, f"\tОшибка utm.update_content_rule: [{err.faultCode}] — {err.faultString}"
+        else:
+            return 0, result     # Возвращает True
@@ -0,0 +1,383 @@
+#!/usr/bin/python3
+#
+# ug_benchmark (Benchmark of UserGate tools against the local UTM stand-in).
+#
+# Copyright @ 2021-2022 UserGate Corporation. All rights reserved.
+# Author: Aleksei Remnev <ran1024@yandex.ru>
+# License: GPLv3
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, contact the site <https://www.gnu.org/licenses/>.
+#
+#########################################################################################
+# Версия 1.0                                                                            #
+# Замер времени экспорта и импорта (ug_convert_config), отчёта ug_listconf и            #
+# конвертации конфигураций Check Point и Cisco ASA на поддельном UTM (ug_fake_utm)      #
+# при разных размерах данных и задержках ответа. Результаты выводятся в формате json.   #
+#########################################################################################
+import os, sys, json, time, glob
+import argparse
+import builtins
+import platform
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+from ug_fake_utm import FakeUtm, FakeUtmServer
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TOOLS = {
+    'export': os.path.join(ROOT, 'ug_convert_config', 'src'),
+    'export_sections': os.path.join(ROOT, 'ug_convert_config', 'src'),
+    'import': os.path.join(ROOT, 'ug_convert_config', 'src'),
+    'listconf': os.path.join(ROOT, 'ug_listconf', 'src'),
+    'checkpoint': os.path.join(ROOT, 'convert_checkpoint_config'),
+    'asa': os.path.join(ROOT, 'asa_convert_config', 'src'),
+    'parser': os.path.join(ROOT, 'ug_convert_config', 'src'),
+}
+UTM_CASES = ('export', 'export_sections', 'import', 'listconf')   # Замеры с обращением к UTM, выполняются для каждой задержки
+CACHES = ('ug_convert_config', 'ug_listconf')                     # Каталоги дискового кэша справочников в ~/.cache
+NODE = 'benchmark'
+
+
+def git_commit():
+    """Текущий коммит репозитория (для сравнения результатов между версиями)"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def clear_catalog_cache():
+    """Удалить справочники поддельного UTM из дискового кэша, чтобы каждый замер начинался с пустого кэша"""
+    for tool in CACHES:
+        for file_name in glob.glob(os.path.join(os.path.expanduser('~'), '.cache', tool, f'{NODE}_*.json')):
+            os.remove(file_name)
+
+def new_backend(size, list_size):
+    """UTM с синтетическими данными: size правил МЭ и NAT, size/10 списков, size/10 пользователей, size/100 групп"""
+    backend = FakeUtm(version='6.1.8', node=NODE, seed=1)
+    if size:
+        backend.populate(rules=size, lists=max(1, size // 10), list_size=list_size, users=size // 10, groups=max(1, size // 100))
+    else:
+        backend.populate()
+    return backend
+
+#------------------------------------------------ Синтетические конфигурации ------------------------------------------------
+def make_checkpoint_config(size):
+    """Создать в каталоге data_cp объекты и size правил Check Point в формате, который читает convert_checkpoint_config"""
+    os.makedirs('data_cp', exist_ok=True)
+    hosts = max(1, size // 5)
+    objects = [
+        {'uid': 'any', 'type': 'CpmiAnyObject', 'name': 'Any'},
+        {'uid': 'accept', 'type': 'RulebaseAction', 'name': 'Accept'},
+        {'uid': 'drop', 'type': 'RulebaseAction', 'name': 'Drop'},
+    ]
+    for i in range(hosts):
+        objects.append({'uid': f'host{i}', 'type': 'host', 'name': f'host_{i}', 'comments': '',
+                        'ipv4-address': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'})
+        objects.append({'uid': f'net{i}', 'type': 'network', 'name': f'net_{i}', 'comments': '',
+                        'subnet4': f'172.{16 + i // 65536 % 16}.{i // 256 % 256}.0', 'mask-length4': 24})
+    for i in range(0, hosts, 10):
+        objects.append({'uid': f'group{i}', 'type': 'group', 'name': f'group_{i}', 'comments': '',
+                        'members': [f'host{x}' for x in range(i, min(i + 10, hosts))]})
+    for i in range(max(1, size // 10)):
+        objects.append({'uid': f'svc{i}', 'type': 'service-tcp' if i % 2 else 'service-udp', 'name': f'svc_{i}',
+                        'comments': '', 'port': str(1024 + i % 60000)})
+        objects.append({'uid': f'site{i}', 'type': 'application-site', 'name': f'site_{i}', 'comments': '',
+                        'risk': 'Low', 'url-list': [f'site{i}-{x}.example.com' for x in range(10)]})
+    with open('data_cp/Main_4600_objects_pp.json', 'w') as fh:
+        json.dump(objects, fh)
+
+    rules = []
+    for i in range(size):
+        rules.append({
+            'type': 'access-rule',
+            'name': f'rule_{i}',
+            'comments': '',
+            'rule-number': i + 1,
+            'action': 'accept' if i % 3 else 'drop',
+            'content': ['any'],
+            'source': [f'host{i % hosts}'],
+            'destination': [f'net{(i * 7) % hosts}'],
+            'service': [f'svc{i % max(1, size // 10)}'],
+            'track': {'type': 'Log', 'accounting': False, 'per-connection': True},
+            'source-negate': False,
+            'destination-negate': False,
+            'service-negate': False,
+            'content-negate': False,
+        })
+    with open('data_cp/Main_4600 Firewall-Management server_pp.json', 'w') as fh:
+        json.dump(rules, fh)
+
+def make_asa_config(size):
+    """Создать файл data_ca/config_asa.txt с size объектами и группами в синтаксисе Cisco ASA"""
+    os.makedirs('data_ca', exist_ok=True)
+    with open('data_ca/config_asa.txt', 'w') as fh:
+        fh.write(': Saved\nhostname asa\ndomain-name example.com\n')
+        fh.write('interface GigabitEthernet0/1.10\n vlan 10\n nameif inside\n ip address 10.0.0.1 255.255.255.0\n!\n')
+        for i in range(size):
+            fh.write(f'object network host_{i}\n host 10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}\n description host {i}\n')
+            fh.write(f'object network net_{i}\n subnet 172.{16 + i // 65536 % 16}.{i // 256 % 256}.0 255.255.255.0\n')
+            fh.write(f'object service svc_{i}\n service tcp destination eq {1024 + i % 60000}\n')
+        for i in range(0, size, 10):
+            fh.write(f'object-group network group_{i}\n')
+            for x in range(i, min(i + 10, size)):
+                fh.write(f' network-object object host_{x}\n')
+            fh.write(f'object-group service svcgroup_{i} tcp\n port-object range {1024 + i} {1034 + i}\n')
+        for i in range(size):
+            fh.write(f'access-list inside_in extended permit tcp object host_{i} object net_{i} eq 443\n')
+        fh.write('mtu inside 1500\nusername admin password secret\n')
+
+#---------------------------------------------- Замеры (выполняются в отдельном процессе) -----------------------------------------------
+def case_export(server_ip, size):
+    import ug_convert_config as tool
+    os.makedirs('data', exist_ok=True)
+    utm = tool.UTM(server_ip, 'admin', 'benchmark')
+    utm.init_struct()
+    utm.init_struct_for_export()
+    timing = tool.run_sections(utm, tool.EXPORT_SECTIONS, list(tool.EXPORT_SECTIONS))
+    utm.logout()
+    return {'sections': {tool.EXPORT_SECTIONS[x][0] + ''.join(f'({y})' for y in tool.EXPORT_SECTIONS[x][1]): t for x, t in timing.items()}}
+
+def case_export_sections(server_ip, size):
+    import ug_convert_config as tool
+    os.makedirs('data', exist_ok=True)
+    utm = tool.UTM(server_ip, 'admin', 'benchmark')
+    utm.init_struct()
+    utm.init_struct_for_export()
+    timing = {}
+    for method, args, _ in tool.EXPORT_SECTIONS.values():
+        start = time.monotonic()
+        getattr(utm, method)(*args)
+        timing[method + ''.join(f'({y})' for y in args)] = time.monotonic() - start
+    utm.logout()
+    return {'sections': timing}
+
+def case_import(server_ip, size):
+    import ug_convert_config as tool
+    utm = tool.UTM(server_ip, 'admin', 'benchmark')
+    utm.init_struct()
+    utm.init_struct_for_import()
+    commands = [x for x, y in tool.IMPORT_SECTIONS.items() if y[:2] not in tool.INTERACTIVE_SECTIONS]
+    timing = tool.run_sections(utm, tool.IMPORT_SECTIONS, commands)
+    utm.logout()
+    return {'sections': {tool.IMPORT_SECTIONS[x][0] + ''.join(f'({y})' for y in tool.IMPORT_SECTIONS[x][1]): t for x, t in timing.items()}}
+
+def case_listconf(server_ip, size):
+    import ug_listconf as tool
+    answers = iter((server_ip, 'admin'))
+    builtins.input = lambda prompt='': next(answers)
+    tool.stdiomask.getpass = lambda prompt='', mask='*': 'benchmark'
+    tool.main()
+    return {}
+
+def case_checkpoint(server_ip, size):
+    import convert_config as tool
+    make_checkpoint_config(size)
+    start = time.monotonic()
+    with open('data_cp/Main_4600_objects_pp.json', 'r') as fh:
+        data = json.load(fh)
+    objects = {x['uid']: x for x in data}
+    for func in (tool.convert_services, tool.convert_ip_lists, tool.convert_url_lists, tool.convert_application_site,
+                 tool.convert_application_group, tool.convert_access_role, tool.convert_other):
+        func(objects)
+    tool.convert_access_rule_1('Main_4600', objects)
+    return {'seconds': time.monotonic() - start}
+
+def case_asa(server_ip, size):
+    import convert_config as tool
+    make_asa_config(size)
+    start = time.monotonic()
+    tool.convert_file('config_asa')
+    return {'seconds': time.monotonic() - start}
+
+def case_parser(server_ip, size):
+    """
+    Разбор ответов UTM реального размера стандартным xmlrpc.client и RpcResponseParser (utm.py): l7apps (10000),
+    правила МЭ (size) и содержимое списка (size*10 значений). Ответы читаются кусками по 1024 байта, как в rpc.Transport.
+    seconds - время RpcResponseParser, stock_seconds - xmlrpc.client (лучшее из трёх повторов).
+    """
+    import xmlrpc.client as rpc
+    from utm import RpcResponseParser
+    backend = FakeUtm(version='6.1.8', node=NODE, seed=1)
+    backend.populate(rules=size, lists=1, list_size=size * 10, apps=10000)
+    payloads = {
+        'l7apps': list(backend.collections['l7apps'].values()),
+        'firewall_rules': list(backend.collections['firewall.rule'].values()),
+        'nlist_items': next(x for x in backend.nlist_content.values() if x),
+    }
+
+    def parse(getparser, data):
+        parser, unmarshaller = getparser()
+        for i in range(0, len(data), 1024):
+            parser.feed(data[i:i+1024])
+        parser.close()
+        return unmarshaller.close()
+
+    def fast_parser():
+        parser = RpcResponseParser()
+        return parser, parser
+
+    result = {'seconds': 0, 'stock_seconds': 0, 'payloads': {}}
+    for name, items in payloads.items():
+        data = rpc.dumps(({'count': len(items), 'items': items},), methodresponse=True, allow_none=True).encode()
+        record = {'bytes': len(data)}
+        for key, getparser in (('stock', rpc.getparser), ('fast', fast_parser)):
+            timing = []
+            for _ in range(3):
+                start = time.perf_counter()
+                parse(getparser, data)
+                timing.append(time.perf_counter() - start)
+            record[key] = min(timing)
+        if parse(fast_parser, data) != parse(rpc.getparser, data):
+            raise ValueError(f'RpcResponseParser: результат разбора {name} отличается от xmlrpc.client')
+        result['payloads'][name] = record
+        result['seconds'] += record['fast']
+        result['stock_seconds'] += record['stock']
+    return result
+
+CASES = {
+    'export': case_export,
+    'export_sections': case_export_sections,
+    'import': case_import,
+    'listconf': case_listconf,
+    'checkpoint': case_checkpoint,
+    'asa': case_asa,
+    'parser': case_parser,
+}
+
+def run_child(case, server_ip, size, result_file):
+    """Выполнить один замер в текущем процессе (каталог и sys.path подготовлены родителем) и записать результат в result_file"""
+    sys.path.insert(0, TOOLS[case])
+    start = time.monotonic()
+    result = CASES[case](server_ip, size)
+    result.setdefault('seconds', time.monotonic() - start)
+    with open(result_file, 'w') as fh:
+        json.dump(result, fh)
+
+#------------------------------------------------------- Запуск замеров --------------------------------------------------------
+def run_case(case, size, rtt, args, workdir):
+    """
+    Запустить замер case в отдельном процессе (у каждой утилиты свой модуль utm).
+    Для замеров с UTM на время замера запускается поддельный UTM с задержкой ответа rtt мс.
+    """
+    record = {'case': case, 'size': size, 'rtt_ms': rtt if case in UTM_CASES else None}
+    server = None
+    if case in UTM_CASES:
+        # Импорт выполняется на пустой UTM, остальные замеры - на UTM с данными.
+        backend = new_backend(0 if case == 'import' else size, args.list_size)
+        server = FakeUtmServer((args.host, 4040), backend, latency=rtt / 1000, seed=1)
+        server.serve_in_thread()
+        clear_catalog_cache()
+
+    result_file = os.path.join(workdir, f'{case}.result.json')
+    command = [sys.executable, os.path.abspath(__file__), '--child', case, '--host', args.host, '--sizes', str(size), '--result', result_file]
+    try:
+        process = subprocess.run(
+            command, cwd=workdir, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, text=True, timeout=args.timeout
+        )
+        if process.returncode == 0 and os.path.isfile(result_file):
+            with open(result_file, 'r') as fh:
+                record.update(json.load(fh))
+            os.remove(result_file)
+        else:
+            # Утилиты печатают ошибку в stdout и завершаются через sys.exit, поэтому в отчёт идёт последняя строка вывода.
+            lines = [x.strip() for x in process.stdout.splitlines() if x.strip()]
+            record['error'] = lines[-1] if lines else f'код возврата {process.returncode}'
+    except subprocess.TimeoutExpired:
+        record['error'] = f'превышено время ожидания ({args.timeout} сек.)'
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+            record['calls'] = sum(server.calls.values())
+    return record
+
+def run_benchmark(args):
+    results = []
+    cases = [x for x in CASES if x in args.cases]
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix='ug_benchmark_')
+        try:
+            for case in cases:
+                rtts = args.rtt if case in UTM_CASES else [0]
+                for rtt in rtts:
+                    print(f"{case:<16} size={size:<8} rtt={rtt:>4} мс", end=' ', file=sys.stderr, flush=True)
+                    record = run_case(case, size, rtt, args, workdir)
+                    print(record.get('error') or f"{record['seconds']:.2f} сек.", file=sys.stderr)
+                    results.append(record)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    clear_catalog_cache()
+    return {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'list_size': args.list_size,
+        'results': results,
+    }
+
+def compare(old, new):
+    """Напечатать отношение времени замеров new к old (меньше 1 - стало быстрее)"""
+    old_results = {(x['case'], x['size'], x['rtt_ms']): x for x in old['results']}
+    print(f"\nСравнение {old.get('commit')} -> {new.get('commit')}:", file=sys.stderr)
+    for item in new['results']:
+        prev = old_results.get((item['case'], item['size'], item['rtt_ms']))
+        if prev and 'seconds' in prev and 'seconds' in item and prev['seconds']:
+            print(f"\t{item['case']:<16} size={item['size']:<8} rtt={item['rtt_ms'] or 0:>4} мс "
+                  f"{prev['seconds']:8.2f} -> {item['seconds']:8.2f} сек. ({item['seconds'] / prev['seconds']:.2f})", file=sys.stderr)
+
+def int_list(value):
+    return [int(x) for x in value.split(',') if x]
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер времени работы утилит на поддельном UTM.')
+    parser.add_argument('--sizes', type=int_list, default=[1000, 10000], help='размеры наборов данных (число правил) через запятую')
+    parser.add_argument('--rtt', type=int_list, default=[1, 20, 100], help='задержки ответа UTM в мс через запятую')
+    parser.add_argument('--list-size', type=int, default=100, help='число значений в каждом списке IP-адресов и URL')
+    parser.add_argument('--cases', type=lambda x: x.split(','), default=list(CASES), help=f'замеры через запятую: {",".join(CASES)}')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес поддельного UTM (порт 4040)')
+    parser.add_argument('--timeout', type=int, default=3600, help='максимальное время одного замера, сек.')
+    parser.add_argument('--output', metavar='FILE', help='записать результаты в файл json (по умолчанию - stdout)')
+    parser.add_argument('--compare', metavar='FILE', help='сравнить результаты с ранее сохранённым файлом json')
+    parser.add_argument('--child', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.host, args.sizes[0], args.result)
+        return
+
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error(f'неизвестные замеры: {", ".join(sorted(unknown))}')
+    if 'import' in args.cases and 'export' not in args.cases:
+        parser.error('замер import импортирует данные, выгруженные замером export')
+
+    report = run_benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=4, ensure_ascii=False)
+    else:
+        json.dump(report, sys.stdout, indent=4, ensure_ascii=False)
+        print()
+    if args.compare:
+        with open(args.compare, 'r') as fh:
+            compare(json.load(fh), report)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,528 @@
+#!/usr/bin/python3
+#
+# ug_fake_utm (Local stand-in for the UserGate UTM xml-rpc API).
+#
+# Copyright @ 2021-2022 UserGate Corporation. All rights reserved.
+# Author: Aleksei Remnev <ran1024@yandex.ru>
+# License: GPLv3
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, contact the site <https://www.gnu.org/licenses/>.
+#
+#########################################################################################
+# Версия 1.0                                                                            #
+# Локальный сервер xml-rpc, заменяющий UTM при тестировании скорости работы утилит.     #
+# Поддерживает задержку ответов, внесение ошибок, синтетические наборы данных,          #
+# запись сессии с реальным UTM и её воспроизведение.                                    #
+#########################################################################################
+
+import os, sys
+import json
+import time
+import random
+import argparse
+import threading
+import itertools
+import xmlrpc.client as rpc
+from collections import Counter, defaultdict, deque
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+
+
+# Методы, которые вызываются без auth_token.
+NO_AUTH = {
+    'v2.core.node.status', 'v2.core.login', 'v2.core.get.categories', 'v1.libraries.response.page.template.public.data.fetch'
+}
+
+# Последнее слово имени метода -> операция над коллекцией объектов.
+VERBS = {'list': 'list', 'add': 'add', 'update': 'update', 'delete': 'delete', 'fetch': 'fetch', 'get': 'get'}
+
+
+def collection_name(method):
+    """
+    Имя коллекции объектов для метода API: версия и операция отбрасываются, множественное число приводится
+    к единственному. 'v1.firewall.rules.list' и 'v1.firewall.rule.add' работают с коллекцией 'firewall.rule'.
+    """
+    parts = method.split('.')[1:-1]
+    return '.'.join(x[:-1] if x.endswith('s') else x for x in parts)
+
+def paging(params):
+    """Номер параметра offset (за ним идёт limit) в вызове списочного метода или None, если метод без разбивки на страницы"""
+    for i in range(1, len(params) - 1):
+        if all(isinstance(x, int) and not isinstance(x, bool) for x in params[i:i+2]):
+            return i
+    return None
+
+
+class FakeUtm:
+    """
+    Поддельный UTM: хранит объекты в памяти и обрабатывает вызовы методов API.
+    Методы add/update/delete/list/fetch работают с коллекциями объектов, имя коллекции берётся
+    из имени метода (см. collection_name). Именованные списки, справочники и сессии обрабатываются отдельно.
+    """
+    def __init__(self, version='7.0.1.0', node='fake-utm', session_ttl=0, seed=None):
+        self.version = version
+        self.node = node
+        self.session_ttl = session_ttl          # Сессия завершается через session_ttl секунд простоя (0 - без ограничения)
+        self.collections = defaultdict(dict)    # {коллекция: {id: объект}}
+        self.nlist_content = defaultdict(list)  # {id именованного списка: [значения]}
+        self.tokens = {}                        # {auth_token: время последнего запроса}
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self.settings = {                       # Параметры v2.settings.get.params/set.param
+            'ui_timezone': 'Europe/Moscow', 'ui_language': 'ru', 'web_console_ssl_profile_id': 1,
+            'response_pages_ssl_profile_id': 1, 'auth_captive': 'auth.captive', 'logout_captive': 'logout.captive',
+            'block_page_domain': 'block.captive', 'ftpclient_captive': 'ftpclient.captive', 'ftp_proxy_enabled': False,
+            'http_cache_mode': 'off', 'http_cache_docsize_max': 1, 'http_cache_precache_size': 64,
+        }
+        self.configs = {                        # Настройки, которые читаются методами *.get без id объекта
+            'setting.time': {'ntp_servers': ['pool.ntp.org'], 'ntp_enabled': True, 'ntp_synced': True, 'utc_time': ''},
+            'core.administrator.config': {
+                'strong_pwd': False, 'n_of_invalid_auth': 5, 'block_time': 600, 'min_length': 8, 'min_uppercase': 1,
+                'min_lowercase': 1, 'min_digit': 1, 'min_special': 0, 'max_char_repetition': 0,
+            },
+            'setting.proxy.port': 3128,
+            'netmanager.failover.config': {'enabled': False, 'period': 60, 'percent': 50, 'hosts': ['8.8.8.8']},
+            'mailsecurity.dnsbl.config': {'enabled': False, 'lists': [], 'white_list': [], 'black_list': []},
+            'mailsecurity.batv.config': {'enabled': False},
+        }
+        self.special = {
+            'v2.core.node.status': lambda: {'status': 'work'},
+            'v2.core.login': self.login,
+            'v2.core.logout': self.logout,
+            'v2.core.session.ping': lambda token: True,
+            'v2.core.get.categories': lambda: list(self.collections['categories'].values()),
+            'v2.core.get.l7categories': lambda *params: self.page('l7categories', params),
+            'v2.core.get.l7apps': lambda *params: self.page('l7apps', params),
+            'v1.libraries.geoip.countries.list': lambda token: list(self.collections['geoip'].values()),
+            'v2.settings.get.params': lambda token, params: {x: self.settings.get(x, '') for x in params},
+            'v2.settings.set.param': self.set_param,
+            'v1.libraries.response.page.template.public.data.fetch': self.template_data,
+            'v1.libraries.response.page.template.data.update': self.template_data_update,
+            'v2.nlists.list': self.nlists_list,
+            'v2.nlists.add': self.nlists_add,
+            'v2.nlists.update': self.nlists_update,
+            'v2.nlists.list.list': self.nlist_items_list,
+            'v2.nlists.list.add': self.nlist_item_add,
+            'v2.nlists.list.add.items': self.nlist_items_add,
+        }
+
+    def new_id(self):
+        return next(self._ids)
+
+    def new_guid(self):
+        return '-'.join(f'{self._random.getrandbits(n):0{n // 4}x}' for n in (32, 16, 16, 16, 48))
+
+    def new_object(self, collection, obj):
+        """Добавить объект в коллекцию. Возвращает id объекта."""
+        obj = dict(obj)
+        obj.setdefault('id', self.new_id())
+        obj.setdefault('guid', self.new_guid())
+        self.collections[collection][obj['id']] = obj
+        return obj['id']
+
+    def populate(self, rules=0, lists=0, list_size=0, users=0, groups=0, apps=3000):
+        """Заполнить UTM синтетическими данными заданного размера"""
+        for i in range(1, 201):
+            self.new_object('categories', {'id': i, 'name': f'Category {i}'})
+        for i in range(1, 51):
+            self.new_object('l7categories', {'id': i, 'name': f'L7 category {i}'})
+        for i in range(1, apps + 1):
+            self.new_object('l7apps', {'id': i, 'app_id': i, 'name': f'Application {i}'})
+        for code in ('RU', 'US', 'DE', 'CN', 'FR'):
+            self.new_object('geoip', {'id': code, 'code': code, 'name': f'Country {code}'})
+        ssl_profile_id = self.new_object('content.ssl.profile', {
+            'name': 'Default SSL profile', 'description': '', 'ssl_min_proto': 'TLSv1.2', 'ssl_max_proto': 'TLSv1.3',
+            'ssl_ciphers': ['ECDHE-ECDSA-AES256-GCM-SHA384', 'ECDHE-RSA-AES256-GCM-SHA384']
+        })
+        self.settings['web_console_ssl_profile_id'] = self.settings['response_pages_ssl_profile_id'] = ssl_profile_id
+        auth_profile_id = self.new_object('auth.user.auth.profile', {
+            'name': 'Example user auth profile', 'description': '', 'allowed_auth_methods': [], 'idle_time': 900,
+            'expiration_time': 0, '2fa_profile_id': False, 'max_auth_attempts': 10, 'auth_lockout_time': 1800
+        })
+        self.configs['proxyportal.config'] = {
+            'enabled': False, 'host': 'portal.example', 'port': 8443, 'ssl_profile_id': ssl_profile_id,
+            'user_auth_profile_id': auth_profile_id, 'proxy_portal_template_id': -1, 'proxy_portal_login_template_id': -1,
+            'certificate_id': -1, 'use_captcha': False,
+        }
+        for page in ('blockpage', 'captiveportal_user_auth'):
+            self.new_object('librarie.response.page.template', {
+                'name': f'Default {page}', 'description': '', 'type': page, 'default': True,
+                'default_template_name': page, 'last_update': '',
+            })
+        self.new_object('content.rule', {     # Последнее правило фильтрации контента на UTM защищено от изменений
+            'name': 'Block by default', 'description': '', 'enabled': True, 'action': 'accept', 'position': 1,
+            'public_name': '', 'blockpage_template_id': -1, 'scenario_rule_id': False, 'users': [], 'url_categories': [],
+            'url_categories_negate': False, 'urls': [], 'urls_negate': False, 'content_types': [], 'content_types_negate': False,
+            'morph_categories': [], 'src_zones': [], 'src_zones_negate': False, 'dst_zones': [], 'dst_zones_negate': False,
+            'src_ips': [], 'src_ips_negate': False, 'dst_ips': [], 'dst_ips_negate': False, 'user_agents': [],
+            'http_methods': [], 'referers': [], 'time_restrictions': [], 'enable_custom_redirect': False,
+            'custom_redirect': '', 'enable_kav_check': False, 'enable_md5_check': False, 'enable_safe_search': False,
+            'rule_log': False,
+        })
+        self.nlists_add(None, {'name': 'HTTP cache exceptions', 'type': 'httpcwl', 'description': '', 'attributes': {}})
+        for name in ('Trusted', 'Untrusted', 'DMZ'):
+            self.new_object('netmanager.zone', {
+                'name': name, 'description': '', 'services_access': [], 'networks': [], 'enable_antispoof': False,
+                'antispoof_invert': False, 'sessions_limit_enabled': False, 'sessions_limit_threshold': 0,
+                'sessions_limit_exclusions': [], 'dos_profiles': [
+                    {'kind': kind, 'enabled': True, 'aggregate': False, 'protect': False, 'alert_threshold': 3000,
+                     'drop_threshold': 6000, 'excluded_ips': []} for kind in ('syn', 'udp', 'icmp')
+                ]
+            })
+        for i in range(1, 51):
+            self.new_object('librarie.service', {
+                'name': f'Service {i}', 'description': '', 'protocols': [{'proto': 'tcp', 'port': str(1000 + i), 'source_port': ''}]
+            })
+        for i in range(groups):
+            self.new_object('account.group', {'name': f'group{i}', 'description': '', 'is_ldap': False, 'is_transient': False})
+        for i in range(users):
+            self.new_object('account.user', {
+                'name': f'user{i}', 'auth_login': f'user{i}', 'enabled': True, 'icap_clients': [], 'emails': [], 'phones': [],
+                'first_name': '', 'last_name': '', 'groups': [], 'static_ip_addresses': [],
+                'creation_date': '2022-01-01T00:00:00', 'expiration_date': ''
+            })
+        for list_type, value in (('network', '10.{}.{}.{}'), ('url', 'host{2}.site{1}-{0}.example')):
+            for i in range(lists):
+                list_id = self.nlists_add(None, {
+                    'name': f'{list_type} list {i}', 'type': list_type, 'description': '', 'attributes': {}, 'url': '',
+                    'list_type_update': 'static', 'schedule': 'disabled', 'read_only': False
+                })
+                self.nlist_content[list_id] = [
+                    {'id': self.new_id(), 'value': value.format(i % 256, j // 256 % 256, j % 256)} for j in range(list_size)
+                ]
+        rule = {
+            'description': '', 'enabled': True, 'scenario_rule_id': False, 'src_zones': [], 'dst_zones': [],
+            'src_zones_negate': False, 'dst_zones_negate': False, 'src_ips': [], 'dst_ips': [], 'src_ips_negate': False,
+            'dst_ips_negate': False, 'users': [], 'services': [], 'apps': [], 'apps_negate': False,
+            'time_restrictions': [], 'log': False, 'log_session_start': False, 'fragmented': 'ignore', 'send_host_icmp': '',
+        }
+        for i in range(rules):
+            self.new_object('firewall.rule', {**rule, 'name': f'Rule {i}', 'action': 'accept', 'position': i + 1})
+            self.new_object('traffic.rule', {
+                **rule, 'name': f'NAT rule {i}', 'action': 'nat', 'position': i + 1, 'service': [], 'snat_target_ip': '',
+                'target_ip': '', 'target_snat': False, 'zone_in': [], 'zone_out': [], 'source_ip': [], 'dest_ip': [],
+                'zone_in_negate': False, 'zone_out_negate': False, 'source_ip_negate': False, 'dest_ip_negate': False,
+            })
+
+    def check_token(self, method, params):
+        """Проверить auth_token. Если сессия завершена, возвращается ошибка 104, как на UTM."""
+        if method in NO_AUTH:
+            return
+        token = params[0] if params else None
+        now = time.monotonic()
+        with self._lock:
+            last = self.tokens.get(token)
+            if last is None or (self.session_ttl and now - last > self.session_ttl):
+                self.tokens.pop(token, None)
+                raise rpc.Fault(104, 'Session has expired or invalid auth token')
+            self.tokens[token] = now
+
+    def call(self, method, params):
+        """Выполнить вызов метода API"""
+        self.check_token(method, params)
+        with self._lock:
+            handler = self.special.get(method)
+            if handler:
+                return handler(*params)
+            return self.generic(method, params)
+
+    def page(self, name, params):
+        """Объекты коллекции name: страница {'count', 'total', 'items'} или весь список, если в вызове нет offset/limit"""
+        items = list(self.collections[name].values())
+        i = paging(params)
+        if i is None:
+            return items
+        offset, limit = params[i:i+2]
+        return {'count': len(items), 'total': len(items), 'items': items[offset:offset+limit]}
+
+    def generic(self, method, params):
+        """Обработать вызов add/update/delete/list/fetch над коллекцией объектов"""
+        verb = VERBS.get(method.rsplit('.', 1)[-1])
+        collection = self.collections[collection_name(method)]
+        if verb == 'list':
+            return self.page(collection_name(method), params)
+        elif verb == 'add':
+            obj = next((x for x in reversed(params) if isinstance(x, dict)), {})
+            if any(x.get('name') == obj.get('name') for x in collection.values()):
+                raise rpc.Fault(409, f'Object "{obj.get("name")}" already exists')
+            return self.new_object(collection_name(method), obj)
+        elif verb == 'update':
+            if len(params) < 3:
+                return True     # Методы вида settings.*.update(token, value) - настройки не сохраняются.
+            obj_id, obj = params[1], params[-1]
+            if obj_id not in collection:
+                raise rpc.Fault(404, f'Object {obj_id} not found')
+            collection[obj_id].update(obj)
+            return True
+        elif verb == 'delete':
+            if collection.pop(params[1], None) is None:
+                raise rpc.Fault(404, f'Object {params[1]} not found')
+            return True
+        elif verb in ('fetch', 'get') and len(params) > 1 and params[1] in collection:
+            return collection[params[1]]
+        elif verb == 'get' and collection_name(method) in self.configs:
+            return self.configs[collection_name(method)]
+        elif verb == 'fetch':
+            raise rpc.Fault(404, f'Object {params[1] if len(params) > 1 else ""} not found')
+        return {}
+
+    def login(self, login, password, options=None):
+        token = self.new_guid()
+        with self._lock:
+            self.tokens[token] = time.monotonic()
+        return {'auth_token': token, 'node': self.node, 'version': self.version}
+
+    def logout(self, token):
+        with self._lock:
+            self.tokens.pop(token, None)
+        return True
+
+    def template_data(self, template_type, template_id):
+        template = self.collections['librarie.response.page.template'].get(template_id)
+        if template is None:
+            raise rpc.Fault(404, f'Template {template_id} not found')
+        return f'<html><body>{template["name"]}</body></html>'
+
+    def template_data_update(self, token, template_id, data):
+        if template_id not in self.collections['librarie.response.page.template']:
+            raise rpc.Fault(404, f'Template {template_id} not found')
+        return True
+
+    def set_param(self, token, name, value):
+        self.settings[name] = value
+        return True
+
+    def nlists_list(self, token, list_type, offset, limit, filters=None):
+        items = [x for x in self.collections['nlist'].values() if x['type'] == list_type]
+        return {'count': len(items), 'items': items[offset:offset+limit]}
+
+    def nlists_add(self, token, named_list):
+        if any(x['name'] == named_list['name'] for x in self.collections['nlist'].values()):
+            raise rpc.Fault(409, f'List "{named_list["name"]}" already exists')
+        named_list = {
+            'editable': True, 'enabled': True, 'global': False, 'version': 1, 'last_update': '', **named_list
+        }
+        return self.new_object('nlist', named_list)
+
+    def nlists_update(self, token, list_id, named_list):
+        if list_id not in self.collections['nlist']:
+            raise rpc.Fault(404, f'List {list_id} not found')
+        self.collections['nlist'][list_id].update(named_list)
+        self.touch_nlist(list_id)
+        return True
+
+    def touch_nlist(self, list_id):
+        """Список изменён: как UTM, увеличиваем version и обновляем last_update"""
+        nlist = self.collections['nlist'][list_id]
+        nlist['version'] += 1
+        nlist['last_update'] = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def nlist_items_list(self, token, list_id, offset, limit, *tail):
+        items = self.nlist_content[list_id]
+        return {'count': len(items), 'items': items[offset:offset+limit]}
+
+    def nlist_item_add(self, token, list_id, item):
+        if any(x['value'] == item['value'] for x in self.nlist_content[list_id]):
+            raise rpc.Fault(2001, 'Item already exists')
+        item = {'id': self.new_id(), **item}
+        self.nlist_content[list_id].append(item)
+        self.touch_nlist(list_id)
+        return item['id']
+
+    def nlist_items_add(self, token, list_id, items):
+        values = {x['value'] for x in self.nlist_content[list_id]}
+        if any(x['value'] in values for x in items):
+            raise rpc.Fault(2001, 'Item already exists')
+        self.nlist_content[list_id].extend({'id': self.new_id(), **x} for x in items)
+        self.touch_nlist(list_id)
+        return len(items)
+
+
+class Recorder:
+    """
+    Запись сессии: вызовы пересылаются на реальный UTM, запросы и ответы сохраняются в файл (json lines).
+    auth_token в параметрах заменяется на '<token>', пароль в v2.core.login не сохраняется.
+    """
+    def __init__(self, upstream, file_name):
+        self.url = f'http://{upstream}:4040/rpc'
+        self.tokens = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._file = open(file_name, 'w')
+
+    def call(self, method, params):
+        if not hasattr(self._local, 'server'):
+            self._local.server = rpc.ServerProxy(self.url)
+        record = {'method': method, 'params': normalize(params, self.tokens)}
+        if method == 'v2.core.login':
+            record['params'] = [params[0], '***', *params[2:]]
+        try:
+            result = getattr(self._local.server, method)(*params)
+        except rpc.Fault as err:
+            record['fault'] = [err.faultCode, err.faultString]
+            raise
+        else:
+            if method == 'v2.core.login':
+                self.tokens.add(result['auth_token'])
+            record['result'] = result
+            return result
+        finally:
+            with self._lock:
+                self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+                self._file.flush()
+
+
+class Replayer:
+    """
+    Воспроизведение записанной сессии (см. Recorder). Ответ ищется по методу и параметрам,
+    а если таких параметров в записи нет - по методу. Повторные вызовы получают ответы в порядке записи.
+    """
+    def __init__(self, file_name):
+        self.tokens = set()
+        self.by_params = defaultdict(deque)
+        self.by_method = defaultdict(deque)
+        self._lock = threading.Lock()
+        with open(file_name, 'r') as fh:
+            for line in fh:
+                record = json.loads(line)
+                key = json.dumps(record['params'], sort_keys=True, ensure_ascii=False)
+                self.by_params[(record['method'], key)].append(record)
+                self.by_method[record['method']].append(record)
+
+    def call(self, method, params):
+        key = json.dumps(normalize(params, self.tokens), sort_keys=True, ensure_ascii=False, default=str)
+        if method == 'v2.core.login':
+            key = None
+        with self._lock:
+            queue = self.by_params.get((method, key)) or self.by_method.get(method)
+            if not queue:
+                raise rpc.Fault(1, f'Метод {method} с такими параметрами отсутствует в записи сессии')
+            record = queue.popleft() if len(queue) > 1 else queue[0]
+        if 'fault' in record:
+            raise rpc.Fault(*record['fault'])
+        if method == 'v2.core.login':
+            self.tokens.add(record['result']['auth_token'])
+        return record['result']
+
+
+def normalize(params, tokens):
+    """Заменить auth_token в параметрах вызова на '<token>'"""
+    return ['<token>' if isinstance(x, str) and x in tokens else x for x in params]
+
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    protocol_version = 'HTTP/1.1'       # keep-alive, как на UTM
+    rpc_paths = ('/rpc',)
+
+
+class FakeUtmServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """
+    Сервер xml-rpc на адресе address (UTM слушает порт 4040), вызовы выполняет backend (FakeUtm, Recorder или Replayer).
+    latency и jitter - задержка ответа в секундах, fault_rate - доля вызовов, на которые возвращается
+    ошибка fault_code (только для методов, имя которых содержит fault_match, если он задан).
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, backend, latency=0.0, jitter=0.0, fault_rate=0.0, fault_code=500, fault_match=None, seed=None):
+        super().__init__(address, requestHandler=RequestHandler, logRequests=False, allow_none=True)
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.fault_rate = fault_rate
+        self.fault_code = fault_code
+        self.fault_match = fault_match
+        self.calls = Counter()
+        self.faults = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.register_multicall_functions()
+
+    def _dispatch(self, method, params):
+        if method.startswith('system.'):
+            return super()._dispatch(method, params)
+        with self._lock:
+            self.calls[method] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fault = self.fault_rate and (not self.fault_match or self.fault_match in method) and self._random.random() < self.fault_rate
+            if fault:
+                self.faults[method] += 1
+        if delay:
+            time.sleep(delay)
+        if fault:
+            raise rpc.Fault(self.fault_code, f'Injected fault in {method}')
+        return self.backend.call(method, params)
+
+    def serve_in_thread(self):
+        """Запустить сервер в фоновом потоке (для тестов). Возвращает поток."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def print_summary(self):
+        """Напечатать число вызовов каждого метода"""
+        print(f"\nВсего вызовов: {sum(self.calls.values())}, ошибок внесено: {sum(self.faults.values())}.")
+        for method, count in self.calls.most_common():
+            print(f"\t{method:<55}{count:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Локальный сервер xml-rpc, заменяющий UTM UserGate.')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес сервера (по умолчанию 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=4040, help='порт сервера (по умолчанию 4040, как на UTM)')
+    parser.add_argument('--version', default='7.0.1.0', help='версия UTM, которую возвращает login')
+    parser.add_argument('--node', default='fake-utm', help='имя узла, которое возвращает login')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа, мс')
+    parser.add_argument('--jitter', type=float, default=0.0, help='разброс задержки ответа, мс')
+    parser.add_argument('--fault-rate', type=float, default=0.0, help='доля вызовов, завершаемых ошибкой (0..1)')
+    parser.add_argument('--fault-code', type=int, default=500, help='код вносимой ошибки')
+    parser.add_argument('--fault-match', help='вносить ошибки только в методы, имя которых содержит эту строку')
+    parser.add_argument('--session-ttl', type=float, default=0, help='сессия завершается через столько секунд простоя')
+    parser.add_argument('--rules', type=int, default=0, help='число правил МЭ и NAT')
+    parser.add_argument('--lists', type=int, default=0, help='число списков IP-адресов и URL')
+    parser.add_argument('--list-size', type=int, default=0, help='число значений в каждом списке')
+    parser.add_argument('--users', type=int, default=0, help='число локальных пользователей')
+    parser.add_argument('--groups', type=int, default=0, help='число локальных групп')
+    parser.add_argument('--apps', type=int, default=3000, help='число приложений L7')
+    parser.add_argument('--seed', type=int, help='начальное значение генератора случайных чисел')
+    parser.add_argument('--record', metavar='FILE', help='записать сессию с реальным UTM (--upstream) в файл')
+    parser.add_argument('--upstream', metavar='IP', help='IP-адрес реального UTM для --record')
+    parser.add_argument('--replay', metavar='FILE', help='воспроизвести записанную сессию')
+    args = parser.parse_args()
+
+    if args.record:
+        if not args.upstream:
+            parser.error('для --record нужен --upstream')
+        backend = Recorder(args.upstream, args.record)
+    elif args.replay:
+        backend = Replayer(args.replay)
+    else:
+        backend = FakeUtm(args.version, args.node, args.session_ttl, args.seed)
+        backend.populate(args.rules, args.lists, args.list_size, args.users, args.groups, args.apps)
+
+    server = FakeUtmServer(
+        (args.host, args.port), backend, args.latency / 1000, args.jitter / 1000,
+        args.fault_rate, args.fault_code, args.fault_match, args.seed
+    )
+    print(f"Сервер xml-rpc запущен: http://{args.host}:{args.port}/rpc (Ctrl-C - остановить).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.print_summary()
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
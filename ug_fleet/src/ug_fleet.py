@@ -0,0 +1,405 @@
+#!/usr/bin/python3
+#
+# ug_fleet (Export, import and reports for a fleet of UserGate UTM).
+#
+# Copyright @ 2021-2022 UserGate Corporation. All rights reserved.
+# Author: Aleksei Remnev <ran1024@yandex.ru>
+# License: GPLv3
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, contact the site <https://www.gnu.org/licenses/>.
+#
+#########################################################################################
+# Версия 1.0                                                                            #
+# Экспорт и импорт конфигурации (ug_convert_config) и отчёты (ug_listconf) для          #
+# многих UTM без диалога. Список узлов берётся из файла инвентаря, узлы обрабатываются  #
+# одновременно, каждый в отдельном процессе. Данные узла - в каталоге data/<узел>.      #
+#########################################################################################
+import os, sys, json, time, glob
+import argparse
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+TOOLS = {
+    'export': os.path.join(ROOT, 'ug_convert_config', 'src'),
+    'import': os.path.join(ROOT, 'ug_convert_config', 'src'),
+    'report': os.path.join(ROOT, 'ug_listconf', 'src'),
+}
+PASSWORD_ENV = 'UG_FLEET_PASSWORD'      # Пароль передаётся процессу узла через окружение, а не в командной строке
+WORK_DIR = '.work'                      # Рабочие каталоги узлов внутри каталога данных
+REPORT_FILE = 'ug_fleet_report.json'
+
+sys.path.append(TOOLS['export'])        # Хранилище снимков и форматы файлов конфигурации из ug_convert_config
+from snapshots import SnapshotStore, SnapshotError
+from jsonfiles import FORMATS, BundleError, make_bundle
+
+
+class InventoryError(Exception): pass
+
+
+def load_inventory(file_name, defaults=None):
+    """
+    Прочитать файл инвентаря (json):
+        {
+            "defaults": {"login": "Admin", "password_env": "UTM_PASSWORD", "workers": 4},
+            "nodes": [
+                {"name": "msk-utm1", "host": "10.0.0.1"},
+                {"name": "spb-utm1", "host": "10.1.0.1", "password": "...", "workers": 2, "sections": [1, 3], "format": "gzip"}
+            ]
+        }
+    Параметры узла дополняются из defaults файла, затем из defaults (параметры командной строки).
+    Пароль задаётся в password или берётся из переменной окружения, имя которой указано в password_env.
+    Возвращает список узлов со всеми параметрами.
+    """
+    try:
+        with open(file_name, 'r') as fh:
+            inventory = json.load(fh)
+    except (OSError, json.JSONDecodeError) as err:
+        raise InventoryError(f'Ошибка чтения файла инвентаря {file_name}: {err}')
+    if isinstance(inventory, list):
+        inventory = {'nodes': inventory}
+
+    nodes = []
+    names = set()
+    for i, item in enumerate(inventory.get('nodes', []), 1):
+        node = {'workers': 4, **(defaults or {}), **inventory.get('defaults', {}), **item}
+        if not node.get('host'):
+            raise InventoryError(f'Узел {i}: не указан host.')
+        node['name'] = str(node.get('name') or node['host'])
+        if node['name'].startswith('.') or os.sep in node['name'] or (os.altsep and os.altsep in node['name']):
+            raise InventoryError(f'Узел {i}: недопустимое имя "{node["name"]}".')
+        if node['name'] in names:
+            raise InventoryError(f'Узел {i}: имя "{node["name"]}" уже используется.')
+        names.add(node['name'])
+        if not node.get('login'):
+            raise InventoryError(f'Узел {node["name"]}: не указан login.')
+        if not node.get('password'):
+            node['password'] = os.environ.get(node.get('password_env') or '')
+            if not node['password']:
+                raise InventoryError(f'Узел {node["name"]}: не указан password или password_env.')
+        if node.get('format') and node['format'] not in FORMATS:
+            raise InventoryError(f'Узел {node["name"]}: неизвестный формат "{node["format"]}" (допустимо: {", ".join(FORMATS)}).')
+        nodes.append(node)
+    if not nodes:
+        raise InventoryError(f'В файле инвентаря {file_name} нет узлов.')
+    return nodes
+
+def select_commands(sections, selection):
+    """
+    Команды разделов (EXPORT_SECTIONS/IMPORT_SECTIONS) по списку selection:
+    номер раздела меню (1, 2...) выбирает все его подразделы, номер команды (101, 203...) - один подраздел.
+    """
+    if not selection:
+        return list(sections)
+    return [x for x in sections if x in selection or x // 100 in selection]
+
+def section_names(sections, timing):
+    return {sections[x][0] + ''.join(f'({y})' for y in sections[x][1]): t for x, t in timing.items()}
+
+#------------------------------------------ Обработка узла (выполняется в отдельном процессе) -------------------------------------------
+def node_export(server_ip, login, password, selection, workers, incremental):
+    import ug_convert_config as tool
+    os.makedirs('data', exist_ok=True)
+    utm = tool.UTM(server_ip, login, password)
+    try:
+        utm.incremental_export = incremental
+        # Параллельная загрузка списков внутри раздела - тоже не больше workers соединений.
+        utm.workers = workers
+        utm.init_struct()
+        utm.init_struct_for_export()
+        timing = tool.run_sections(utm, tool.EXPORT_SECTIONS, select_commands(tool.EXPORT_SECTIONS, selection), workers)
+        utm.save_export_state()
+    finally:
+        utm.logout()
+    return utm, section_names(tool.EXPORT_SECTIONS, timing)
+
+def node_import(server_ip, login, password, selection, workers, incremental):
+    import ug_convert_config as tool
+    utm = tool.UTM(server_ip, login, password)
+    success = False
+    try:
+        if not utm.version.startswith('6'):
+            raise tool.UtmError(f'Ошибка: UTM версии {utm.version}. Импорт конфигурации доступен только на версию 6.')
+        utm.workers = workers
+        utm.init_struct()
+        utm.init_struct_for_import()
+        # Журнал импорта (UG_IMPORT_JOURNAL) лежит в каталоге данных парка: повторный запуск продолжит прерванный импорт.
+        tool.open_journal(utm)
+        if os.environ.get('UG_IMPORT_BUNDLE'):
+            tool.mount_bundle(os.environ['UG_IMPORT_BUNDLE'])
+        # Разделы, которые задают вопросы пользователю, при пакетном импорте пропускаются.
+        commands = [x for x in select_commands(tool.IMPORT_SECTIONS, selection) if tool.IMPORT_SECTIONS[x][:2] not in tool.INTERACTIVE_SECTIONS]
+        timing = tool.run_sections(utm, tool.IMPORT_SECTIONS, tool.resume_sections(utm, commands), workers)
+        success = True
+    finally:
+        tool.close_journal(utm, success)
+        utm.logout()
+    return utm, section_names(tool.IMPORT_SECTIONS, timing)
+
+def node_report(server_ip, login, password, selection, workers, incremental):
+    import ug_listconf as tool
+    utm = tool.UTM(server_ip, login, password)
+    try:
+        file_name = tool.write_report(utm, server_ip)
+    finally:
+        utm.logout()
+    return utm, {'report': file_name}
+
+MODES = {
+    'export': node_export,
+    'import': node_import,
+    'report': node_report,
+}
+
+def run_child(mode, server_ip, login, selection, workers, incremental, result_file):
+    """Обработать узел в текущем процессе (каталог подготовлен родителем) и записать результат в result_file"""
+    sys.path.insert(0, TOOLS[mode])
+    start = time.monotonic()
+    try:
+        utm, details = MODES[mode](server_ip, login, os.environ.get(PASSWORD_ENV, ''), selection, workers, incremental)
+    except Exception as err:
+        # ug_convert_config сообщает об ошибках UTM исключением UtmError, ug_listconf печатает ошибку и завершается через sys.exit.
+        print(err)
+        sys.exit(1)
+    result = {'node_name': utm.node_name, 'version': utm.version, 'seconds': time.monotonic() - start}
+    result['sections' if mode != 'report' else 'details'] = details
+    with open(result_file, 'w') as fh:
+        json.dump(result, fh)
+
+#---------------------------------------------------------- Обработка парка UTM ----------------------------------------------------------
+def prepare_node(node, mode, args):
+    """Подготовить рабочий каталог узла. Возвращает каталог, в котором запускается процесс узла."""
+    node_dir = os.path.join(args.data, node['name'])
+    workdir = os.path.join(args.data, WORK_DIR, node['name'])
+    shutil.rmtree(workdir, ignore_errors=True)
+    if mode == 'report':
+        os.makedirs(node_dir, exist_ok=True)
+        return node_dir
+    os.makedirs(workdir)
+    if mode == 'import' and args.snapshot:
+        # Импорт из снимка: снимок восстанавливается в рабочий каталог, data/<узел> не меняется.
+        snapshot_id = None if args.snapshot == 'latest' else args.snapshot
+        SnapshotStore(args.snapshots).restore(node['name'], snapshot_id, os.path.join(workdir, 'data'))
+        return workdir
+    if mode == 'import' and args.bundle:
+        # Импорт из архива: процесс узла читает файлы прямо из data/<узел>.zip (см. UG_IMPORT_BUNDLE в ug_convert_config).
+        if not os.path.isfile(f'{node_dir}.zip'):
+            raise FileNotFoundError(f'нет архива {node_dir}.zip с конфигурацией узла')
+        return workdir
+    if mode == 'import' and not os.path.isdir(node_dir):
+        raise FileNotFoundError(f'нет каталога {node_dir} с конфигурацией узла')
+    if mode == 'import' or (node.get('incremental') and os.path.isdir(node_dir)):
+        # Импорт и инкрементальный экспорт работают с ./data: копируем в рабочий каталог прежнюю конфигурацию узла.
+        shutil.copytree(node_dir, os.path.join(workdir, 'data'), ignore=shutil.ignore_patterns('ug_fleet_*.log', 'config_*.txt'))
+    return workdir
+
+def finish_node(node, mode, data_dir, success):
+    """
+    Завершить обработку узла. Успешный полный экспорт заменяет прежнюю конфигурацию в каталоге data/<узел> целиком
+    (отчёт и журналы остаются), экспорт части разделов дописывает их файлы к прежней конфигурации.
+    При ошибке экспорта прежняя копия конфигурации остаётся без изменений.
+    """
+    node_dir = os.path.join(data_dir, node['name'])
+    workdir = os.path.join(data_dir, WORK_DIR, node['name'])
+    if mode == 'export' and success and node.get('sections'):
+        shutil.copytree(os.path.join(workdir, 'data'), node_dir, dirs_exist_ok=True)
+    elif mode == 'export' and success:
+        old_dir = f'{workdir}.old'
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.isdir(node_dir):
+            os.replace(node_dir, old_dir)
+        os.replace(os.path.join(workdir, 'data'), node_dir)
+        for file_name in glob.glob(os.path.join(old_dir, 'config_*.txt')) + glob.glob(os.path.join(old_dir, 'ug_fleet_*.log')):
+            os.replace(file_name, os.path.join(node_dir, os.path.basename(file_name)))
+        shutil.rmtree(old_dir, ignore_errors=True)
+    if mode != 'report':
+        shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(node_dir, exist_ok=True)
+    return node_dir
+
+def run_node(node, mode, args):
+    """Обработать один узел в отдельном процессе. Возвращает запись отчёта."""
+    record = {'name': node['name'], 'host': node['host'], 'mode': mode}
+    start = time.monotonic()
+    output = ''
+    try:
+        cwd = prepare_node(node, mode, args)
+    except (OSError, SnapshotError) as err:
+        record.update(status='error', error=f'Ошибка подготовки каталога узла: {err}', seconds=0)
+        return record
+
+    result_file = os.path.join(os.path.abspath(cwd), '.ug_fleet_result.json')
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', mode, '--host', node['host'], '--login', node['login'],
+        '--workers', str(node['workers']), '--result', result_file
+    ]
+    if node.get('sections'):
+        command += ['--sections', ','.join(str(x) for x in node['sections'])]
+    if node.get('incremental'):
+        command.append('--incremental')
+    env = {**os.environ, PASSWORD_ENV: node['password']}
+    if node.get('format'):
+        env['UG_EXPORT_FORMAT'] = node['format']
+    if mode == 'import' and args.bundle and not args.snapshot:
+        env['UG_IMPORT_BUNDLE'] = os.path.abspath(os.path.join(args.data, f"{node['name']}.zip"))
+    journal = os.path.abspath(os.path.join(args.data, f"{node['name']}.import_journal.jsonl"))
+    if mode == 'import':
+        env['UG_IMPORT_JOURNAL'] = journal
+    try:
+        process = subprocess.run(
+            command, cwd=cwd, env=env, stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=node.get('timeout', args.timeout)
+        )
+        output = process.stdout
+        if process.returncode == 0 and os.path.isfile(result_file):
+            with open(result_file, 'r') as fh:
+                record.update(json.load(fh))
+            record['status'] = 'ok'
+        else:
+            # Утилиты печатают ошибку в stdout, поэтому в отчёт идёт последняя строка вывода.
+            lines = [x.strip() for x in output.splitlines() if x.strip()]
+            record.update(status='error', error=lines[-1] if lines else f'код возврата {process.returncode}')
+    except subprocess.TimeoutExpired as err:
+        output = err.stdout.decode('utf-8', 'replace') if isinstance(err.stdout, bytes) else (err.stdout or '')
+        record.update(status='error', error=f'превышено время ожидания ({node.get("timeout", args.timeout)} сек.)')
+    finally:
+        if os.path.isfile(result_file):
+            os.remove(result_file)
+    if mode == 'import' and os.path.isfile(journal):
+        # Журнал остаётся, если не все разделы импортированы: повторный запуск продолжит импорт с места остановки.
+        record['journal'] = journal
+        if record['status'] == 'ok':
+            record.update(status='error', error=f'импорт не завершён, повторный запуск продолжит его (журнал {journal})')
+
+    try:
+        node_dir = finish_node(node, mode, args.data, record['status'] == 'ok')
+        with open(os.path.join(node_dir, f'ug_fleet_{mode}.log'), 'w') as fh:
+            fh.write(output)
+        if mode == 'export' and record['status'] == 'ok' and args.snapshots:
+            manifest = SnapshotStore(args.snapshots).save(
+                node['name'], node_dir, exclude=('*.tmp', 'ug_fleet_*.log', 'config_*.txt'),
+                info={'host': node['host'], 'version': record.get('version')}
+            )
+            record.update(snapshot=manifest['id'], snapshot_new_bytes=manifest['new_bytes'])
+        if mode == 'export' and record['status'] == 'ok' and args.bundle:
+            make_bundle(node_dir, f'{node_dir}.zip', exclude=('*.tmp', 'ug_fleet_*.log', 'config_*.txt'),
+                        info={'node': record.get('node_name'), 'host': node['host'], 'version': record.get('version')})
+            record['bundle'] = f'{node_dir}.zip'
+    except (OSError, SnapshotError, BundleError) as err:
+        record.update(status='error', error=f'Ошибка сохранения данных узла: {err}')
+    record['seconds'] = time.monotonic() - start
+    return record
+
+def run_fleet(nodes, mode, args):
+    """Обработать узлы, не больше args.jobs одновременно. Возвращает отчёт о выполнении."""
+    start = time.monotonic()
+    os.makedirs(args.data, exist_ok=True)
+    results = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(run_node, node, mode, args) for node in nodes]
+        for future in as_completed(futures):
+            record = future.result()
+            results.append(record)
+            status = f"\033[32m{record['seconds']:.2f} сек.\033[0m" if record['status'] == 'ok' else f"\033[31m{record['error']}\033[0m"
+            print(f"[{len(results)}/{len(nodes)}] {record['name']:<20} {record['host']:<16} {status}", file=sys.stderr, flush=True)
+    shutil.rmtree(os.path.join(args.data, WORK_DIR), ignore_errors=True)
+    order = {node['name']: i for i, node in enumerate(nodes)}
+    results.sort(key=lambda x: order[x['name']])
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'mode': mode,
+        'jobs': args.jobs,
+        'seconds': time.monotonic() - start,
+        'ok': sum(1 for x in results if x['status'] == 'ok'),
+        'failed': sum(1 for x in results if x['status'] != 'ok'),
+        'results': results,
+    }
+
+def print_report(report):
+    """Напечатать итог: узлы с ошибками, самые долгие узлы, общее время"""
+    print(f"\n\033[36mИтог ({report['mode']}): успешно {report['ok']}, с ошибками {report['failed']}, "
+          f"всего {report['seconds']:.2f} сек.\033[0m")
+    print(f"\t{'Узел':<20} {'IP':<16} {'Версия':<18} {'сек.':>8}  Результат")
+    for item in sorted(report['results'], key=lambda x: (x['status'] == 'ok', -x['seconds'])):
+        result = 'OK' if item['status'] == 'ok' else f"\033[31m{item['error']}\033[0m"
+        print(f"\t{item['name']:<20} {item['host']:<16} {item.get('version') or '':<18} {item['seconds']:8.2f}  {result}")
+
+def int_list(value):
+    return [int(x) for x in value.split(',') if x]
+
+def main():
+    parser = argparse.ArgumentParser(description='Экспорт, импорт конфигурации и отчёты для многих UTM по файлу инвентаря.')
+    parser.add_argument('mode', nargs='?', choices=MODES, help='export - экспорт, import - импорт, report - отчёт ug_listconf')
+    parser.add_argument('inventory', nargs='?', help='файл инвентаря (json)')
+    parser.add_argument('--data', default='data', help='каталог данных узлов (по умолчанию ./data)')
+    parser.add_argument('--nodes', type=lambda x: x.split(','), help='обработать только указанные узлы (имена через запятую)')
+    parser.add_argument('--jobs', type=int, default=8, help='сколько узлов обрабатывать одновременно (по умолчанию 8)')
+    parser.add_argument('--workers', type=int, help='число параллельных разделов (соединений) на узел, если не задано в инвентаре')
+    parser.add_argument('--sections', type=int_list, help='разделы через запятую: номера меню (1, 2...) или команды (101, 203...)')
+    parser.add_argument('--timeout', type=int, default=3600, help='максимальное время обработки одного узла, сек.')
+    parser.add_argument('--incremental', action='store_true', help='экспорт только изменившихся с прошлого экспорта списков и шаблонов')
+    parser.add_argument('--format', choices=FORMATS, help='формат файлов экспорта: indent (по умолчанию), compact или gzip')
+    parser.add_argument('--bundle', action='store_true', help='экспорт: упаковать конфигурацию узла в архив data/<узел>.zip, импорт: читать её из архива')
+    parser.add_argument('--snapshots', metavar='DIR', help='хранилище снимков: после экспорта сохранять снимок конфигурации узла')
+    parser.add_argument('--snapshot', metavar='ID', help='импорт из снимка ID хранилища --snapshots (latest - последний снимок узла)')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--host', help=argparse.SUPPRESS)
+    parser.add_argument('--login', help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.host, args.login, args.sections, args.workers, args.incremental, args.result)
+        return
+    if not args.mode or not args.inventory:
+        parser.error('укажите режим и файл инвентаря')
+    if args.snapshot and not args.snapshots:
+        parser.error('--snapshot используется вместе с --snapshots')
+
+    defaults = {}
+    if args.workers:
+        defaults['workers'] = args.workers
+    if args.sections:
+        defaults['sections'] = args.sections
+    if args.incremental:
+        defaults['incremental'] = True
+    if args.format:
+        defaults['format'] = args.format
+    try:
+        nodes = load_inventory(args.inventory, defaults)
+    except InventoryError as err:
+        print(f'\033[31m{err}\033[0m')
+        sys.exit(1)
+    if args.nodes:
+        unknown = set(args.nodes) - {x['name'] for x in nodes}
+        if unknown:
+            parser.error(f'нет в инвентаре: {", ".join(sorted(unknown))}')
+        nodes = [x for x in nodes if x['name'] in args.nodes]
+
+    try:
+        report = run_fleet(nodes, args.mode, args)
+    except KeyboardInterrupt:
+        print("\nПрограмма принудительно завершена пользователем.")
+        sys.exit(1)
+    print_report(report)
+    with open(os.path.join(args.data, REPORT_FILE), 'w') as fh:
+        json.dump(report, fh, indent=4, ensure_ascii=False)
+    print(f"\nОтчёт записан в файл {os.path.join(args.data, REPORT_FILE)}")
+    sys.exit(1 if report['failed'] else 0)
+
+if __name__ == '__main__':
+    main()
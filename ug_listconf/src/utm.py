@@ -3,32 +3,284 @@
 #
 # Версия 0.8
 #################################################################################################
-import sys
+import os, sys
+import json
+import time
+import atexit
+import bisect
+import threading
+import http.client
+from collections import Counter
 import xmlrpc.client as rpc
+from xml.parsers.expat import ExpatError
+
+
+class KeepAliveConnection(http.client.HTTPConnection):
+    """
+    HTTP/1.1 соединение с раздельными таймаутами:
+    connect_timeout - на установку TCP-соединения, read_timeout - на ожидание ответа UTM.
+    """
+    def __init__(self, host, connect_timeout, read_timeout):
+        super().__init__(host, timeout=connect_timeout)
+        self.read_timeout = read_timeout
+
+    def connect(self):
+        super().connect()
+        self.sock.settimeout(self.read_timeout)
+
+
+class UtmTransport(rpc.Transport):
+    """
+    Транспорт xml-rpc, использующий одно постоянное соединение HTTP/1.1 (keep-alive) для всех запросов.
+    Если UTM закрыл простаивающее соединение, транспорт переподключается и повторяет запрос один раз.
+    """
+    stale_errors = (
+        http.client.RemoteDisconnected,
+        http.client.CannotSendRequest,
+        http.client.ResponseNotReady,
+        ConnectionResetError,
+        ConnectionAbortedError,
+        BrokenPipeError,
+    )
+
+    def __init__(self, connect_timeout=10, read_timeout=300, stats=None):
+        super().__init__()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.stats = stats          # RpcStats - статистика вызовов (None - не собирается)
+        self._received = 0          # Байт ответа, прочитано при текущем запросе
+
+    def make_connection(self, host):
+        if self._connection and host == self._connection[0]:
+            return self._connection[1]
+        chost, self._extra_headers, x509 = self.get_host_info(host)
+        self._connection = host, KeepAliveConnection(chost, self.connect_timeout, self.read_timeout)
+        return self._connection[1]
+
+    def request(self, host, handler, request_body, verbose=False):
+        if self.stats is None:
+            return self._request(host, handler, request_body, verbose)
+        self._received = 0
+        fault = None
+        start = time.monotonic()
+        try:
+            return self._request(host, handler, request_body, verbose)
+        except rpc.Fault as err:
+            fault = err.faultCode
+            raise
+        except (OSError, http.client.HTTPException, rpc.ProtocolError, ExpatError) as err:
+            fault = type(err).__name__
+            raise
+        finally:
+            self.stats.record(RpcStats.method_name(request_body), time.monotonic() - start,
+                              len(request_body), self._received, fault)
+
+    def _request(self, host, handler, request_body, verbose):
+        try:
+            return self.single_request(host, handler, request_body, verbose)
+        except self.stale_errors:
+            self.close()
+        return self.single_request(host, handler, request_body, verbose)
+
+    def parse_response(self, response):
+        if self.stats is not None:
+            read = response.read
+            def counted_read(*args):
+                data = read(*args)
+                self._received += len(data)
+                return data
+            response.read = counted_read
+        return super().parse_response(response)
+
+
+class RpcStats:
+    """
+    Статистика вызовов API: для каждого метода число вызовов, гистограмма времени ответа,
+    размер запросов и ответов в байтах и коды ошибок. Вызовы внутри system.multicall (RpcBatch)
+    учитываются отдельно в колонке "в пачке". Если задан trace_file, каждый вызов дописывается
+    в него строкой json: время, поток, метод, длительность, размеры запроса и ответа, код ошибки.
+    """
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)   # Границы интервалов гистограммы, сек.
+
+    def __init__(self, trace_file=None):
+        self.methods = {}       # {метод: статистика}
+        self._lock = threading.Lock()
+        self._trace = open(trace_file, 'a') if trace_file else None
+
+    @staticmethod
+    def method_name(request_body):
+        """Имя метода из тела запроса xml-rpc"""
+        start = request_body.find(b'<methodName>') + 12
+        end = request_body.find(b'</methodName>', start)
+        return request_body[start:end].decode('utf-8', 'replace') if start >= 12 and end > 0 else 'unknown'
+
+    def _method(self, method):
+        item = self.methods.get(method)
+        if item is None:
+            item = self.methods[method] = {
+                'count': 0, 'batched': 0, 'time': 0.0, 'max': 0.0, 'sent': 0, 'received': 0,
+                'faults': Counter(), 'histogram': [0] * (len(self.buckets) + 1),
+            }
+        return item
+
+    def record(self, method, elapsed, sent, received, fault=None):
+        """Учесть вызов метода: elapsed - время ответа в секундах, sent и received - размер запроса и ответа в байтах"""
+        with self._lock:
+            item = self._method(method)
+            item['count'] += 1
+            item['time'] += elapsed
+            item['max'] = max(item['max'], elapsed)
+            item['sent'] += sent
+            item['received'] += received
+            item['histogram'][bisect.bisect_left(self.buckets, elapsed)] += 1
+            if fault is not None:
+                item['faults'][fault] += 1
+            if self._trace:
+                self._trace.write(json.dumps({
+                    'ts': round(time.time(), 3),
+                    'thread': threading.current_thread().name,
+                    'method': method,
+                    'ms': round(elapsed * 1000, 2),
+                    'sent': sent,
+                    'received': received,
+                    'fault': fault,
+                }) + '\n')
+
+    def record_batched(self, method, fault=None):
+        """Учесть вызов метода внутри system.multicall"""
+        with self._lock:
+            item = self._method(method)
+            item['batched'] += 1
+            if fault is not None:
+                item['faults'][fault] += 1
+
+    def percentile(self, item, p):
+        """Оценка p-го процентиля времени ответа по гистограмме (верхняя граница интервала), сек."""
+        rank = p * item['count']
+        total = 0
+        for i, n in enumerate(item['histogram']):
+            total += n
+            if n and total >= rank:
+                return self.buckets[i] if i < len(self.buckets) else item['max']
+        return 0.0
+
+    def summary(self):
+        """Таблица статистики по методам, начиная с методов с наибольшим суммарным временем"""
+        lines = [
+            f"{'Метод':<50}{'вызовов':>9}{'в пачке':>9}{'всего, с':>10}{'сред, мс':>10}{'p50, мс':>9}"
+            f"{'p95, мс':>9}{'макс, мс':>10}{'отпр, КБ':>10}{'получ, КБ':>11}  ошибки"
+        ]
+        with self._lock:
+            items = sorted(self.methods.items(), key=lambda x: x[1]['time'], reverse=True)
+            for method, item in items:
+                count = item['count']
+                faults = ', '.join(f'{code}x{n}' for code, n in item['faults'].most_common())
+                lines.append(
+                    f"{method:<50}{count:>9}{item['batched']:>9}{item['time']:>10.2f}"
+                    f"{item['time'] / count * 1000 if count else 0:>10.1f}{self.percentile(item, 0.5) * 1000:>9.0f}"
+                    f"{self.percentile(item, 0.95) * 1000:>9.0f}{item['max'] * 1000:>10.1f}"
+                    f"{item['sent'] / 1024:>10.1f}{item['received'] / 1024:>11.1f}  {faults}"
+                )
+            count = sum(x['count'] for x in self.methods.values())
+            elapsed = sum(x['time'] for x in self.methods.values())
+            sent = sum(x['sent'] for x in self.methods.values())
+            received = sum(x['received'] for x in self.methods.values())
+        lines.append(f"{'Всего':<50}{count:>9}{'':>9}{elapsed:>10.2f}{'':>38}{sent / 1024:>10.1f}{received / 1024:>11.1f}")
+        return '\n'.join(lines)
+
+    def print_summary(self):
+        """Напечатать статистику вызовов API (вызывается при завершении программы)"""
+        if self.methods:
+            print('\n\033[36mСтатистика вызовов API:\033[0m')
+            print(self.summary())
+        if self._trace:
+            self._trace.close()
+            self._trace = None
+
+
+class CatalogCache:
+    """
+    Дисковый кэш справочников UTM (категории URL, категории и приложения L7 и т.п.).
+    Справочники хранятся в файлах json в каталоге path отдельно для каждого узла и версии ПО UTM,
+    поэтому после обновления UTM справочники загружаются заново. ttl - время жизни записи в секундах.
+    """
+    def __init__(self, path=None, ttl=7*24*3600):
+        self.path = path or os.path.join(os.path.expanduser('~'), '.cache', 'ug_listconf')
+        self.ttl = ttl
+
+    def _file_name(self, node, version, name):
+        key = f'{node}_{version}_{name}'.replace(os.sep, '_')
+        return os.path.join(self.path, f'{key}.json')
+
+    def get(self, node, version, name, loader):
+        """Получить справочник name. Если его нет в кэше или запись устарела, справочник загружается вызовом loader()."""
+        file_name = self._file_name(node, version, name)
+        try:
+            if time.time() - os.path.getmtime(file_name) < self.ttl:
+                with open(file_name, 'r') as fh:
+                    return json.load(fh)
+        except (OSError, ValueError):
+            pass
+
+        data = loader()
+        tmp_name = f'{file_name}.{os.getpid()}.{threading.get_ident()}'
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(tmp_name, 'w') as fh:
+                json.dump(data, fh, ensure_ascii=False)
+            os.replace(tmp_name, file_name)
+        except (OSError, TypeError, ValueError):
+            # Кэш недоступен для записи или ответ не сохраняется в json - работаем без кэша.
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+        return data
+
+    def invalidate(self, node=None, version=None, name=None):
+        """Удалить записи кэша: все, для узла, для узла и версии или один справочник."""
+        if not os.path.isdir(self.path):
+            return
+        parts = [str(x) for x in (node, version, name) if x is not None]
+        prefix = '_'.join(parts)
+        for file_name in os.listdir(self.path):
+            if not parts or file_name.startswith(f'{prefix}_') or file_name == f'{prefix}.json':
+                os.remove(os.path.join(self.path, file_name))
 
 
 class UtmXmlRpc:
-    def __init__(self, server_ip, login, password):
+    def __init__(self, server_ip, login, password, connect_timeout=10, read_timeout=300):
         self._login = login
         self._password = password
         self._url = f'http://{server_ip}:4040/rpc'
         self._auth_token = None
         self._server = None
+        self._transport = UtmTransport(connect_timeout, read_timeout)
         self._groups = {}           # Список групп {name: guid}
         self._users = {}            # Список пользователей {guid: name}
-        self._categories = {}       # Список категорий URL {id: name}
         self._scenarios = {}        # Список сценариев {id: name}
-        self._l7apps = {}           # Список L7 приложений {id: name}
-        self._l7categories = {}     # Список L7 категорий {id: name}
-        self._geoip_code = {}       # Список кодов стран GEOIP {geoip_code: name}
+        self._catalogs = {}         # Справочники UTM (категории URL, L7, коды GeoIP), загружаются при первом обращении
+        self.cache = CatalogCache() # Дисковый кэш справочников UTM
+        self.stats = None           # Статистика вызовов API (см. enable_stats)
+        if os.environ.get('UG_RPC_STATS') or os.environ.get('UG_RPC_TRACE'):
+            self.enable_stats(os.environ.get('UG_RPC_TRACE'))
         self.version = None
         self.server_ip = server_ip
         self.node_name = None
 
+    def enable_stats(self, trace_file=None):
+        """
+        Включить сбор статистики вызовов API (RpcStats). Таблица статистики печатается при завершении программы.
+        trace_file - файл для записи каждого вызова. Включается также переменными окружения UG_RPC_STATS=1 и UG_RPC_TRACE=<файл>.
+        """
+        if self.stats is None:
+            self.stats = RpcStats(trace_file)
+            self._transport.stats = self.stats
+            atexit.register(self.stats.print_summary)
+        return self.stats
+
     def _connect(self):
         """Подключиться к UTM"""
         try:
-            self._server = rpc.ServerProxy(self._url, verbose=False)
+            self._server = rpc.ServerProxy(self._url, transport=self._transport, verbose=False)
             if self.get_node_status() == 'work':
                 result = self._server.v2.core.login(self._login, self._password, {'origin': 'dev-script'})
                 self._auth_token = result.get('auth_token')
@@ -53,8 +305,7 @@ class UtmXmlRpc:
         Заполнить структуры:
              self._groups - {name: guid}
              self._scenarios - {id: name}
-             self._l7apps - {id: name}
-             self._l7categories - {id: name}
+        Справочники self._l7apps, self._l7categories и self._geoip_code загружаются при первом обращении.
         """
         self._groups.clear()
         try:
@@ -64,33 +315,61 @@ class UtmXmlRpc:
             result = self._server.v1.scenarios.rules.list(self._auth_token, 0, 1000, {})
             self._scenarios = {x['id']: x['name'] for x in result['items'] if result['count']}
 
-            result = self._server.v2.core.get.l7categories(self._auth_token, 0, 10000, '')
-            self._l7categories = {x['id']: x['name'] for x in result['items'] if result['count']}
-
-            if self.version.startswith('6'):
-                result = self._server.v2.core.get.l7apps(self._auth_token, 0, 10000, {}, [])
-            else:
-                result = self._server.v2.core.get.l7apps(self._auth_token, 0, 10000, '')
-            self._l7apps = {x['id'] if 'id' in x.keys() else x['app_id']: x['name'] for x in result['items'] if result['count']}
-            
-            result = self._server.v1.libraries.geoip.countries.list(self._auth_token)
-            self._geoip_code = {x['code']: x['name'] for x in result}
-
         except rpc.Fault as err:
             print(f'Ошибка: [{err.faultCode}] {err.faultString} (Node: {self.server_ip}).')
             sys.exit(1)
 
     def _init_categories(self):
-        """Заполнить структуру категорий UserGate URL Filtering - {id: name}"""
-        self._categories.clear()
-        try:
-            result = self._server.v2.core.get.categories()
-        except rpc.Fault as err:
-            print(f"Ошибка _init_categories: [{err.faultCode}] — {err.faultString}")
-            sys.exit(1)
-        if result:
-            for item in result:
-                self._categories[item['id']] = item['name']
+        """
+        Сбросить структуру категорий UserGate URL Filtering - {id: name}.
+        Категории загружаются при первом обращении к self._categories.
+        """
+        self._catalogs.pop('categories', None)
+
+    def get_cached(self, name, method, *args):
+        """
+        Получить справочник UTM из дискового кэша (см. CatalogCache).
+        Если справочника нет в кэше для текущего узла и версии UTM, он загружается вызовом method(*args).
+        """
+        return self.cache.get(self.node_name or self.server_ip, self.version, name,
+                              lambda: getattr(self._server, method)(*args))
+
+    def _catalog(self, name, build, method, *args):
+        """
+        Справочник UTM name, загруженный при первом обращении.
+        build - функция, которая строит словарь справочника из ответа метода method(*args).
+        """
+        if name not in self._catalogs:
+            try:
+                self._catalogs[name] = build(self.get_cached(name, method, *args))
+            except rpc.Fault as err:
+                print(f'Ошибка: [{err.faultCode}] {err.faultString} (Node: {self.server_ip}).')
+                sys.exit(1)
+        return self._catalogs[name]
+
+    @property
+    def _categories(self):
+        """Список категорий URL {id: name}"""
+        return self._catalog('categories', lambda result: {x['id']: x['name'] for x in result}, 'v2.core.get.categories')
+
+    @property
+    def _l7categories(self):
+        """Список L7 категорий {id: name}"""
+        return self._catalog('l7categories', lambda result: {x['id']: x['name'] for x in result['items'] if result['count']},
+                             'v2.core.get.l7categories', self._auth_token, 0, 10000, '')
+
+    @property
+    def _l7apps(self):
+        """Список L7 приложений {id: name}"""
+        tail = ({}, []) if self.version.startswith('6') else ('',)
+        return self._catalog('l7apps', lambda result: {x['id'] if 'id' in x.keys() else x['app_id']: x['name'] for x in result['items'] if result['count']},
+                             'v2.core.get.l7apps', self._auth_token, 0, 10000, *tail)
+
+    @property
+    def _geoip_code(self):
+        """Список кодов стран GEOIP {geoip_code: name}"""
+        return self._catalog('geoip', lambda result: {x['code']: x['name'] for x in result},
+                             'v1.libraries.geoip.countries.list', self._auth_token)
 
     def get_node_status(self):
         """Получить статус узла"""